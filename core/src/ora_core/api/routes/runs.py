@@ -1,9 +1,7 @@
-import json
-
 from fastapi import APIRouter, Depends, HTTPException, Request
 from ora_core.database.repo import Repository
 from ora_core.database.session import get_db
-from ora_core.engine.simple_worker import event_manager
+from ora_core.engine.simple_worker import encode_event, event_manager
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,22 +14,46 @@ class ToolResultRequest(BaseModel):
     result: dict | str | list | int | float | bool | None = None
     tool_call_id: str | None = None
 
+def _parse_last_event_id(raw: str | None) -> int:
+    try:
+        return max(0, int(raw)) if raw else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+@router.get("/runs/streams/stats")
+async def get_stream_stats():
+    """
+    Fan-out metrics: subscribers per run, queue depths, drops and slow-consumer disconnects.
+    """
+    return event_manager.stream_stats()
+
+
 @router.get("/runs/{run_id}/events")
-async def stream_run_events(run_id: str, request: Request):
+async def stream_run_events(
+    run_id: str,
+    request: Request,
+    last_event_id: str | None = None,
+    policy: str | None = None,
+):
     """
     SSE Endpoint for streaming run events.
+    Each frame carries an `id:`; reconnecting clients send `Last-Event-ID`
+    (or `?last_event_id=`) to resume without losing or repeating events.
+    Several clients (web chat, Discord bot, dashboard) may watch the same run;
+    `policy` picks how a slow subscriber is handled (coalesce, drop_deltas, disconnect).
     """
+    resume_from = _parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+
     async def event_generator():
-        async for event in event_manager.listen(run_id):
+        async for event in event_manager.listen(run_id, last_event_id=resume_from, policy=policy):
             if await request.is_disconnected():
                 break
             # Bundle event type into data payload for simple client parsing
-            payload = {
-                "event": event["event"],
-                "data": event["data"]
-            }
+            # (pre-encoded once per event, shared across subscribers).
             yield {
-                "data": json.dumps(payload)
+                "id": str(event["id"]),
+                "data": encode_event(event)
             }
 
     return EventSourceResponse(event_generator())
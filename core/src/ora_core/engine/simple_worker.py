@@ -1,31 +1,251 @@
 import asyncio
-from typing import Any, Dict
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
 
 from ora_core.database.models import RunStatus
 
+logger = logging.getLogger(__name__)
+
+# Per-run replay buffer (bounded) and how long a finished run stays replayable.
+RUN_EVENT_BUFFER_SIZE = int(os.getenv("ORA_RUN_EVENT_BUFFER", "2048"))
+RUN_EVENT_TTL_SEC = float(os.getenv("ORA_RUN_EVENT_TTL_SEC", "300"))
+# Runs that never reach final/error are evicted after this much inactivity.
+RUN_EVENT_IDLE_SEC = float(os.getenv("ORA_RUN_EVENT_IDLE_SEC", "3600"))
+
+TERMINAL_EVENTS = {"final", "error"}
+
+# Per-subscriber queue bound and what to do when a subscriber falls behind:
+#   coalesce    - merge queued deltas into one frame (default)
+#   drop_deltas - drop new deltas; control/terminal events are always delivered
+#   disconnect  - close the stream; the client resumes via Last-Event-ID
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("ORA_SSE_SUBSCRIBER_QUEUE", "256"))
+SLOW_CONSUMER_POLICIES = ("coalesce", "drop_deltas", "disconnect")
+DEFAULT_SLOW_CONSUMER_POLICY = os.getenv("ORA_SSE_SLOW_POLICY", "coalesce")
+
+# Emit-side delta coalescing: model tokens are buffered per run and flushed as one
+# "delta" frame every DELTA_FLUSH_MS or once DELTA_FLUSH_BYTES accumulate (0 ms disables).
+DELTA_FLUSH_MS = float(os.getenv("ORA_SSE_DELTA_FLUSH_MS", "20"))
+DELTA_FLUSH_BYTES = int(os.getenv("ORA_SSE_DELTA_FLUSH_BYTES", "1024"))
+
+
+def encode_event(event: dict) -> str:
+    """
+    SSE `data:` payload for an event. Encoded once at append time and shared by
+    every subscriber; only frames rewritten by subscriber-side coalescing are re-encoded.
+    """
+    encoded = event.get("json")
+    if encoded is None:
+        encoded = json.dumps({"event": event["event"], "data": event["data"]})
+    return encoded
+
+
+class _DeltaBuffer:
+    __slots__ = ("parts", "size", "timer")
 
-class EventManager:
     def __init__(self):
-        # run_id -> asyncio.Queue
-        self.listeners: Dict[str, asyncio.Queue] = {}
+        self.parts: list[str] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class RunEventLog:
+    """
+    Bounded ring buffer of events for a single run.
+    Every event gets a monotonically increasing sequence number (the SSE `id:`),
+    so late or reconnecting subscribers can replay what they missed.
+    """
+    def __init__(self, maxlen: int = RUN_EVENT_BUFFER_SIZE):
+        self.events: Deque[dict] = deque(maxlen=maxlen)
+        self.next_seq = 1
+        self.finished_at: Optional[float] = None
+        self.last_event_at = time.monotonic()
+
+    def append(self, event_type: str, data: dict) -> dict:
+        event = {"id": self.next_seq, "event": event_type, "data": data}
+        event["json"] = encode_event(event)
+        self.next_seq += 1
+        self.events.append(event)
+        self.last_event_at = time.monotonic()
+        if event_type in TERMINAL_EVENTS:
+            self.finished_at = self.last_event_at
+        return event
+
+    def since(self, last_event_id: int) -> list[dict]:
+        return [e for e in self.events if e["id"] > last_event_id]
+
+    def oldest_id(self) -> int:
+        return self.events[0]["id"] if self.events else self.next_seq
+
+    def is_expired(self, now: float) -> bool:
+        if self.finished_at is not None:
+            return now - self.finished_at >= RUN_EVENT_TTL_SEC
+        return now - self.last_event_at >= RUN_EVENT_IDLE_SEC
+
+
+class Subscriber:
+    """
+    One consumer of a run's event stream with its own bounded queue.
+    `offer` never blocks the emitter; a slow consumer only affects itself.
+    """
+    def __init__(self, run_id: str, maxsize: int = SUBSCRIBER_QUEUE_SIZE, policy: str = DEFAULT_SLOW_CONSUMER_POLICY):
+        self.run_id = run_id
+        self.maxsize = max(1, maxsize)
+        self.policy = policy if policy in SLOW_CONSUMER_POLICIES else "coalesce"
+        self.disconnected = False
+        self._pending: Deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        # Metrics
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def offer(self, event: dict) -> None:
+        if self.disconnected:
+            return
+        if len(self._pending) >= self.maxsize:
+            if self.policy == "disconnect":
+                self.disconnect()
+                return
+            if event["event"] == "delta":
+                last = self._pending[-1] if self._pending else None
+                if self.policy == "coalesce" and last is not None and last["event"] == "delta":
+                    data = dict(last["data"])
+                    data["text"] = (data.get("text") or "") + (event["data"].get("text") or "")
+                    # Keep the newest id so Last-Event-ID resume stays exact.
+                    self._pending[-1] = {"id": event["id"], "event": "delta", "data": data}
+                    self.coalesced += 1
+                    return
+                if self.policy == "drop_deltas":
+                    self.dropped += 1
+                    return
+        self._pending.append(event)
+        if len(self._pending) > self.max_depth:
+            self.max_depth = len(self._pending)
+        self._wakeup.set()
+
+    def disconnect(self) -> None:
+        self.disconnected = True
+        self._pending.clear()
+        self._wakeup.set()
+
+    async def get(self) -> Optional[dict]:
+        """Next event, or None once the subscriber has been disconnected."""
+        while not self._pending:
+            if self.disconnected:
+                return None
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        self.delivered += 1
+        return self._pending.popleft()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "disconnected": self.disconnected,
+        }
+
+
+class EventManager:
+    def __init__(self, delta_flush_ms: float = DELTA_FLUSH_MS, delta_flush_bytes: int = DELTA_FLUSH_BYTES):
+        # run_id -> active subscribers (broadcast fan-out)
+        self.listeners: Dict[str, set[Subscriber]] = {}
+        # Subscribers cut off by the "disconnect" slow-consumer policy
+        self.slow_disconnects = 0
+        # run_id -> replay buffer (kept for RUN_EVENT_TTL_SEC after final/error)
+        self._logs: Dict[str, RunEventLog] = {}
         # (run_id, tool_call_id) -> Future for external tool result handoff
         self._tool_result_waiters: Dict[tuple[str, str], asyncio.Future] = {}
         # Buffer early arrivals when submit lands before wait registration
         self._tool_result_buffer: Dict[tuple[str, str], dict[str, Any]] = {}
         self._tool_result_lock = asyncio.Lock()
+        # run_id -> pending (not yet emitted) delta text
+        self.delta_flush_ms = delta_flush_ms
+        self.delta_flush_bytes = delta_flush_bytes
+        self._delta_buffers: Dict[str, _DeltaBuffer] = {}
 
-    async def listen(self, run_id: str):
-        queue = asyncio.Queue()
-        self.listeners[run_id] = queue
+    async def listen(self, run_id: str, last_event_id: int = 0, policy: Optional[str] = None):
+        """
+        Yield events for a run, starting after `last_event_id`.
+        Buffered events are replayed first, then live events follow without gaps or duplicates.
+        Any number of subscribers may listen to the same run concurrently.
+        """
+        sub = Subscriber(run_id, policy=policy or DEFAULT_SLOW_CONSUMER_POLICY)
+        self.listeners.setdefault(run_id, set()).add(sub)
+        # Snapshot the backlog *after* registering the subscriber (no await in between),
+        # so every event lands in either the snapshot or the subscriber queue.
+        log = self._logs.get(run_id)
+        backlog = log.since(last_event_id) if log else []
+        if log and last_event_id and last_event_id + 1 < log.oldest_id():
+            logger.warning(
+                f"Replay gap for run_id={run_id}: requested after {last_event_id}, oldest buffered {log.oldest_id()}"
+            )
+        last_seen = last_event_id
         try:
+            for event in backlog:
+                last_seen = event["id"]
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
             while True:
-                event = await queue.get()
+                event = await sub.get()
+                if event is None:
+                    self.slow_disconnects += 1
+                    logger.info(f"Disconnected slow subscriber for run_id={run_id} at event {last_seen}")
+                    return
+                if event["id"] <= last_seen:
+                    continue
+                last_seen = event["id"]
                 yield event
-                if event["event"] == "final" or event["event"] == "error":
+                if event["event"] in TERMINAL_EVENTS:
                     break
         finally:
-            if run_id in self.listeners:
-                del self.listeners[run_id]
+            subs = self.listeners.get(run_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self.listeners[run_id]
+
+    def stream_stats(self) -> dict[str, Any]:
+        """Queue depth / drop metrics for every active subscriber."""
+        runs = {}
+        total_depth = 0
+        max_depth = 0
+        for rid, subs in self.listeners.items():
+            sub_stats = [s.stats() for s in subs]
+            for st in sub_stats:
+                total_depth += st["depth"]
+                max_depth = max(max_depth, st["depth"])
+            runs[rid] = sub_stats
+        return {
+            "runs_buffered": len(self._logs),
+            "runs_streaming": len(runs),
+            "subscribers": sum(len(v) for v in runs.values()),
+            "queued_events": total_depth,
+            "max_queue_depth": max_depth,
+            "slow_disconnects": self.slow_disconnects,
+            "runs": runs,
+        }
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [rid for rid, log in self._logs.items() if rid not in self.listeners and log.is_expired(now)]
+        for rid in expired:
+            self._logs.pop(rid, None)
 
     async def dispatch_mock_stream(self, run_id: str, conversation_id: str):
         """
@@ -55,15 +275,32 @@ class EventManager:
                         input_messages.append({"role": role, "content": m.content})
 
         # 2. Stream from AI
-        full_text = ""
-        used_model = "ORA Universal Brain" # Default
+        full_text, used_model = await self.stream_engine_output(run_id, omni_engine.generate_stream(input_messages))
 
+        # 3. Final event & Save
+        async with AsyncSessionLocal() as db:
+            repo = Repository(db)
+            # Create Assistant Message
+            msg = await repo.create_message(
+                conversation_id=conversation_id,
+                role=AuthorRole.assistant,
+                content=full_text
+            )
+            await repo.update_run_status(run_id, RunStatus.done)
+
+        await self.emit(run_id, "final", {"text": full_text, "message_id": str(msg.id), "model": used_model})
+
+    async def stream_engine_output(self, run_id: str, stream, used_model: str = "ORA Universal Brain"):
+        """
+        Relay an OmniEngine stream to subscribers. Returns (full_text, used_model).
+        """
+        parts: list[str] = []
         try:
-            async for event_data in omni_engine.generate_stream(input_messages):
+            async for event_data in stream:
                 # Handle String (Legacy/Error)
                 if isinstance(event_data, str):
-                     full_text += event_data
-                     await self.emit(run_id, "delta", {"text": event_data})
+                    parts.append(event_data)
+                    self.emit_delta(run_id, event_data)
 
                 # Handle Structured Dict
                 elif isinstance(event_data, dict):
@@ -75,34 +312,61 @@ class EventManager:
 
                     elif evt_type == "text":
                         content = event_data.get("content", "")
-                        full_text += content
-                        await self.emit(run_id, "delta", {"text": content})
-
-                # await asyncio.sleep(0.01) # Optional: Smooth out if too fast
+                        parts.append(content)
+                        self.emit_delta(run_id, content)
         except Exception as e:
-            full_text += f"\n[Generation Error: {e}]"
+            parts.append(f"\n[Generation Error: {e}]")
             await self.emit(run_id, "error", {"text": str(e)})
+        self.flush_deltas(run_id)
+        return "".join(parts), used_model
 
-        # 3. Final event & Save
-        async with AsyncSessionLocal() as db:
-            repo = Repository(db)
-            # Create Assistant Message
-            msg = await repo.create_message(
-                conversation_id=conversation_id,
-                role=AuthorRole.assistant,
-                content=full_text
+    def emit_delta(self, run_id: str, text: str) -> None:
+        """
+        Queue a text delta. Consecutive deltas are merged into one frame per
+        flush window / byte threshold; any other event for the run flushes first.
+        """
+        if not text:
+            return
+        if self.delta_flush_ms <= 0:
+            self._publish(run_id, "delta", {"text": text})
+            return
+        buf = self._delta_buffers.get(run_id)
+        if buf is None:
+            buf = self._delta_buffers[run_id] = _DeltaBuffer()
+            buf.timer = asyncio.get_running_loop().call_later(
+                self.delta_flush_ms / 1000.0, self.flush_deltas, run_id
             )
-            await repo.update_run_status(run_id, RunStatus.done)
+        buf.parts.append(text)
+        buf.size += len(text.encode("utf-8"))
+        if buf.size >= self.delta_flush_bytes:
+            self.flush_deltas(run_id)
 
-        await self.emit(run_id, "final", {"text": full_text, "message_id": str(msg.id), "model": used_model})
+    def flush_deltas(self, run_id: str) -> None:
+        buf = self._delta_buffers.pop(run_id, None)
+        if buf is None:
+            return
+        if buf.timer is not None:
+            buf.timer.cancel()
+        if buf.parts:
+            self._publish(run_id, "delta", {"text": "".join(buf.parts)})
+
+    def _publish(self, run_id: str, event_type: str, data: dict) -> dict:
+        log = self._logs.get(run_id)
+        if log is None:
+            self._evict_expired()
+            log = self._logs[run_id] = RunEventLog()
+        event = log.append(event_type, data)
+        for sub in self.listeners.get(run_id, ()):
+            sub.offer(event)
+        return event
 
     async def emit(self, run_id: str, event_type: str, data: dict):
-        if run_id in self.listeners:
-            await self.listeners[run_id].put({
-                "event": event_type,
-                "data": data
-            })
-        if event_type in {"final", "error"}:
+        if event_type == "delta" and set(data) == {"text"}:
+            self.emit_delta(run_id, data["text"])
+            return
+        self.flush_deltas(run_id)
+        self._publish(run_id, event_type, data)
+        if event_type in TERMINAL_EVENTS:
             async with self._tool_result_lock:
                 waiter_keys = [k for k in self._tool_result_waiters.keys() if k[0] == run_id]
                 for key in waiter_keys:
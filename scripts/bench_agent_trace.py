@@ -0,0 +1,75 @@
+"""
+Benchmark: cost of trace_event() on the calling thread (the event loop in the bot).
+
+Compares:
+
+  open-per-call - makedirs + open(append) + write + close for every event (previous behaviour)
+  sink          - trace_event() queueing into the background TraceSink
+
+Usage:
+    python scripts/bench_agent_trace.py [--events 20000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils import agent_trace  # noqa: E402
+from src.utils.agent_trace import _sanitize  # noqa: E402
+
+
+def open_per_call(path: str, event: str, correlation_id: str = "", **payload) -> None:
+    record = {"ts": time.time(), "event": event, "cid": correlation_id, "payload": _sanitize(payload)}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8", errors="ignore") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def measure(fn, events: int) -> list[float]:
+    samples = []
+    for i in range(events):
+        start = time.perf_counter()
+        fn("chat.thought", correlation_id=f"c{i % 50}", run_id="r1", text="考え中… " * 20)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(name: str, samples: list[float], total_s: float) -> None:
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99)]
+    print(
+        f"  {name:<14} mean {statistics.fmean(samples):7.1f} us   p99 {p99:7.1f} us   "
+        f"max {samples[-1]:8.1f} us   total {total_s:6.2f} s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy", "agent_trace.jsonl")
+        start = time.perf_counter()
+        samples = measure(lambda *a, **kw: open_per_call(legacy_path, *a, **kw), args.events)
+        report("open-per-call", samples, time.perf_counter() - start)
+
+        os.environ["ORA_TRACE_LOG"] = os.path.join(tmp, "sink", "agent_trace.jsonl")
+        start = time.perf_counter()
+        samples = measure(agent_trace.trace_event, args.events)
+        emitted = time.perf_counter() - start
+        agent_trace.flush_traces(timeout=60)
+        report("sink", samples, emitted)
+        stats = agent_trace.get_trace_sink().stats()
+        print(f"  sink drained in {time.perf_counter() - start:.2f} s: {stats}")
+        agent_trace.close_trace_sink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: Store.search_conversations over a large synthetic conversations table.
+
+Builds a pre-migration database (conversations rows only, mostly Japanese text),
+then measures:
+
+  backfill  - Store.init() creating conversations_fts and indexing the existing rows
+  like      - the previous `message LIKE '%q%' OR response LIKE '%q%'` table scan
+  fts       - search_conversations (trigram FTS5, BM25-ranked, with snippets)
+
+for query terms of decreasing frequency (words follow a Zipf distribution).
+
+Usage:
+    python scripts/bench_conversation_search.py [--rows 1000000] [--users 5000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage import Store  # noqa: E402
+
+KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+PARTICLES = ("は", "が", "を", "に", "で", "と", "の", "も")
+VOCABULARY = 20_000
+QUERY_RANKS = (0, 10, 100, 1000, 10000)  # Frequency rank of the searched word (0 = most common).
+
+
+def vocabulary(rng: random.Random) -> tuple[list, list]:
+    """Random 2-5 kana words with Zipf frequencies (rank r is used ~1/r as often as the top word)."""
+    words = sorted({"".join(rng.choice(KANA) for _ in range(rng.randint(2, 5))) for _ in range(VOCABULARY)})
+    rng.shuffle(words)
+    cum, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum.append(total)
+    return words, cum
+
+
+def sentence(rng: random.Random, words: list, cum: list) -> str:
+    picked = rng.choices(words, cum_weights=cum, k=rng.randint(4, 12))
+    return "".join(w + rng.choice(PARTICLES) for w in picked) + "。"
+
+
+def build(path: str, rows: int, users: int) -> list:
+    """Write the rows; returns the vocabulary ordered by frequency."""
+    rng = random.Random(0)
+    words, cum = vocabulary(rng)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+        "platform TEXT NOT NULL, message TEXT NOT NULL, response TEXT, created_at INTEGER NOT NULL)"
+    )
+    batch = 50_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO conversations(user_id, platform, message, response, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    str(rng.randrange(users)),
+                    "discord",
+                    sentence(rng, words, cum),
+                    sentence(rng, words, cum),
+                    1_700_000_000 + i,
+                )
+                for i in range(start, min(rows, start + batch))
+            ],
+        )
+    conn.commit()
+    conn.close()
+    return words
+
+
+def like_search(path: str, query: str, user_id: str | None, limit: int = 5) -> list:
+    """The previous query (NOT INDEXED: the user_id index did not exist either)."""
+    conn = sqlite3.connect(path)
+    pattern = f"%{query}%"
+    sql = "SELECT * FROM conversations NOT INDEXED WHERE (message LIKE ? OR response LIKE ?)"
+    params: tuple = (pattern, pattern)
+    if user_id:
+        sql += " AND user_id=?"
+        params += (user_id,)
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    params += (limit,)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        words = [w for w in build(path, args.rows, args.users) if len(w) >= 3]
+        print(f"rows={args.rows} users={args.users}: generated in {time.perf_counter() - started:.1f}s")
+
+        store = Store(path)
+        started = time.perf_counter()
+        await store.init()
+        print(f"  backfill  {time.perf_counter() - started:6.1f} s   (fts={store._fts_enabled})")
+
+        conn = sqlite3.connect(path)
+        for rank in QUERY_RANKS:
+            query = words[rank]
+            matches = conn.execute(
+                "SELECT count(*) FROM conversations_fts WHERE conversations_fts MATCH ?", (f'"{query}"',)
+            ).fetchone()[0]
+            for scope, user_id in (("global", None), ("user", "42")):
+                like_ms = fts_ms = 0.0
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    await asyncio.to_thread(like_search, path, query, user_id)
+                    like_ms += (time.perf_counter() - started) * 1000
+                    started = time.perf_counter()
+                    hits = await store.search_conversations(query, user_id=user_id)
+                    fts_ms += (time.perf_counter() - started) * 1000
+                print(
+                    f"  rank {rank:>5} ({matches:>7} rows) {scope:<6}  like {like_ms / args.repeat:8.1f} ms"
+                    f"   fts {fts_ms / args.repeat:7.1f} ms"
+                )
+        conn.close()
+
+        if hits:
+            print(f"  sample snippet: {hits[0]['snippet']}")
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Micro-benchmark: CoreAPIClient send -> first event round trip.
+
+Starts a tiny in-process aiohttp server that mimics Core's /v1/messages and
+/v1/runs/{run_id}/events (SSE) endpoints, then measures the latency from
+send_message() to the first streamed event, comparing:
+
+  legacy  - a fresh aiohttp.ClientSession per call (previous behaviour)
+  pooled  - the shared keep-alive session in CoreAPIClient
+
+Usage:
+    python scripts/bench_core_client.py [--iterations 300] [--concurrency 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.core_client import CoreAPIClient  # noqa: E402
+
+
+async def _messages(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({"run_id": str(uuid.uuid4()), "conversation_id": "bench", "status": "queued"})
+
+
+async def _events(request: web.Request) -> web.StreamResponse:
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await resp.prepare(request)
+    for i, (evt, data) in enumerate([("delta", {"text": "hi"}), ("final", {"text": "hi"})], start=1):
+        frame = f"id: {i}\r\ndata: {json.dumps({'event': evt, 'data': data})}\r\n\r\n"
+        await resp.write(frame.encode())
+    return resp
+
+
+async def start_server() -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post("/v1/messages", _messages)
+    app.router.add_get("/v1/runs/{run_id}/events", _events)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def legacy_roundtrip(base_url: str) -> float:
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{base_url}/v1/messages", json={"content": "ping"}) as resp:
+            run_id = (await resp.json())["run_id"]
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/v1/runs/{run_id}/events") as resp:
+            async for line in resp.content:
+                if line.startswith(b"data: "):
+                    break
+    return time.perf_counter() - start
+
+
+async def pooled_roundtrip(client: CoreAPIClient) -> float:
+    start = time.perf_counter()
+    resp = await client.send_message("ping", provider_id="bench", display_name="bench")
+    async for _ in client.stream_events(resp["run_id"], timeout=10):
+        break
+    return time.perf_counter() - start
+
+
+async def measure(fn, iterations: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            samples.append(await fn())
+
+    await asyncio.gather(*[one() for _ in range(iterations)])
+    return samples
+
+
+def summarize(name: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(
+        f"{name:>7}: n={len(samples)} mean={statistics.mean(samples) * 1000:.2f}ms "
+        f"p50={statistics.median(samples) * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    runner, base_url = await start_server()
+    client = CoreAPIClient(base_url=base_url)
+    try:
+        # Warm up both paths once.
+        await legacy_roundtrip(base_url)
+        await pooled_roundtrip(client)
+
+        summarize("legacy", await measure(lambda: legacy_roundtrip(base_url), args.iterations, args.concurrency))
+        summarize("pooled", await measure(lambda: pooled_roundtrip(client), args.iterations, args.concurrency))
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark Core run-event streaming (EventManager -> SSE framing).
+
+Drives a fake OmniEngine token stream through EventManager.stream_engine_output for
+1/10/100 concurrent runs, with one subscriber per run that frames every event the way
+/v1/runs/{run_id}/events does. Reports events/sec, frames/sec and p50/p99 frame latency
+(time from a token leaving the engine to the frame carrying it being framed).
+
+Usage:
+    python scripts/bench_core_events.py [--tokens 400] [--token-interval-ms 2] [--runs 1,10,100]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "core", "src")))
+
+from ora_core.engine.simple_worker import EventManager, encode_event  # noqa: E402
+
+
+async def fake_engine_stream(n_tokens: int, interval: float, emitted: list):
+    """Mimics omni_engine.generate_stream: a meta event followed by text tokens."""
+    yield {"type": "meta", "model": "bench-model"}
+    total = 0
+    for i in range(n_tokens):
+        token = f"tok{i % 10} "
+        total += len(token)
+        emitted.append((total, time.perf_counter()))
+        yield {"type": "text", "content": token}
+        if interval > 0:
+            await asyncio.sleep(interval)
+        elif i % 16 == 0:
+            await asyncio.sleep(0)
+
+
+async def consume(em: EventManager, run_id: str, emitted: list, latencies: list, counters: dict):
+    received = 0
+    idx = 0
+    async for event in em.listen(run_id):
+        frame = f"id: {event['id']}\r\ndata: {encode_event(event)}\r\n\r\n"
+        now = time.perf_counter()
+        counters["frames"] += 1
+        counters["bytes"] += len(frame)
+        if event["event"] == "delta":
+            # Latency of the oldest token carried by this frame.
+            if idx < len(emitted):
+                latencies.append(now - emitted[idx][1])
+            received += len(event["data"]["text"])
+            while idx < len(emitted) and emitted[idx][0] <= received:
+                idx += 1
+
+
+async def run_one(em: EventManager, run_id: str, n_tokens: int, interval: float, latencies: list, counters: dict):
+    emitted: list = []
+    consumer = asyncio.create_task(consume(em, run_id, emitted, latencies, counters))
+    await asyncio.sleep(0)
+    full_text, model = await em.stream_engine_output(run_id, fake_engine_stream(n_tokens, interval, emitted))
+    await em.emit(run_id, "final", {"text": full_text, "model": model})
+    await consumer
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def bench(concurrency: int, n_tokens: int, interval: float, flush_ms: float) -> dict:
+    em = EventManager(delta_flush_ms=flush_ms)
+    latencies: list = []
+    counters = {"frames": 0, "bytes": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_one(em, f"bench-{concurrency}-{i}", n_tokens, interval, latencies, counters)
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    source_events = concurrency * (n_tokens + 2)
+    return {
+        "runs": concurrency,
+        "flush_ms": flush_ms,
+        "elapsed_s": elapsed,
+        "events_per_s": source_events / elapsed,
+        "frames_per_s": counters["frames"] / elapsed,
+        "frames": counters["frames"],
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-interval-ms", type=float, default=2.0)
+    parser.add_argument("--runs", default="1,10,100")
+    parser.add_argument("--flush-ms", default="0,20", help="Comma separated coalescing windows to compare")
+    args = parser.parse_args()
+
+    print(f"{'runs':>5} {'flush':>6} {'events/s':>10} {'frames/s':>10} {'frames':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in [int(x) for x in args.runs.split(",") if x]:
+        for flush_ms in [float(x) for x in args.flush_ms.split(",") if x]:
+            r = await bench(concurrency, args.tokens, args.token_interval_ms / 1000.0, flush_ms)
+            print(
+                f"{r['runs']:>5} {r['flush_ms']:>6.0f} {r['events_per_s']:>10.0f} {r['frames_per_s']:>10.0f} "
+                f"{r['frames']:>8} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
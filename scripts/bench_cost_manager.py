@@ -0,0 +1,79 @@
+"""
+Microbenchmark: CostManager reserve+commit throughput with a large user population.
+
+Seeds N users (one bucket + a day of hourly usage each), then times reserve/commit
+pairs for random users. Compares:
+
+  snapshot  - every change rewrites cost_state.json (previous behaviour)
+  ledger    - every change is one append to cost_ledger.sqlite3; snapshots amortized
+              (ORA_COST_SNAPSHOT_SEC / ORA_COST_SNAPSHOT_EVENTS)
+
+The time of one full snapshot is printed as well: that is the periodic event-loop stall
+the ledger mode still has.
+
+Usage:
+    python scripts/bench_cost_manager.py [--users 10000] [--calls 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.cost_manager import CostManager, Usage  # noqa: E402
+
+
+def seeded_manager(state_dir: str, users: int) -> CostManager:
+    cm = CostManager(os.path.join(state_dir, "cost_state.json"))
+    for uid in range(1, users + 1):
+        bucket = cm._get_or_create_bucket("stable", "openai", uid)
+        bucket.used = Usage(1000, 500, 0.01)
+        cm.user_hourly[str(uid)] = {
+            "stable:openai": {f"{cm._get_current_hour_key()[:11]}{h:02d}": Usage(10, 5, 0.0001) for h in range(24)}
+        }
+    cm._save_state()
+    return cm
+
+
+def run(mode: str, users: int, calls: int) -> float:
+    with tempfile.TemporaryDirectory() as state_dir:
+        cm = seeded_manager(state_dir, users)
+        if mode == "snapshot":
+            cm.close()  # No ledger: _record falls back to a full rewrite per change.
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for i in range(calls):
+            uid = rng.randint(1, users)
+            rid = f"bench-{i}"
+            cm.reserve("stable", "openai", uid, rid, Usage(100, 100, 0.001))
+            cm.commit("stable", "openai", uid, rid, Usage(80, 60, 0.0008))
+        cm.flush()
+        elapsed = time.perf_counter() - start
+        cm.close()
+    return calls / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"users={args.users} calls={args.calls} (reserve+commit per call)")
+    with tempfile.TemporaryDirectory() as state_dir:
+        cm = seeded_manager(state_dir, args.users)
+        start = time.perf_counter()
+        cm._save_state()
+        print(f"  one full snapshot: {(time.perf_counter() - start) * 1000:.1f} ms")
+        cm.close()
+    # The rewrite-per-change mode is orders of magnitude slower; time fewer calls.
+    for mode, calls in (("snapshot", max(1, args.calls // 400)), ("ledger", args.calls)):
+        rate = run(mode, args.users, calls)
+        print(f"  {mode:<9} {rate:10.1f} calls/s   {1000 / rate:8.3f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: building the /dashboard/users list.
+
+Compares:
+
+  json-scan - glob + parse every profile JSON per request (previous behaviour)
+  index     - DashboardUserIndex rebuild from the profile_index table
+  cached    - version() + cached list (what an unchanged request costs; 304 with If-None-Match)
+
+Usage:
+    python scripts/bench_dashboard_users.py [--profiles 5000] [--history 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.profile_store import ProfileStore  # noqa: E402
+from src.services.user_index import DashboardUserIndex, summarize  # noqa: E402
+
+
+def make_profile(i: int, history: int) -> dict:
+    return {
+        "discord_user_id": str(i),
+        "name": f"user{i}",
+        "guild_name": f"guild{i % 20}",
+        "traits": [f"trait{t}" for t in range(i % 12)],
+        "impression": "印象 " * 30,
+        "raw_history": [
+            {"content": "メッセージ " * 20, "timestamp": f"2026-01-01T00:{m % 60:02d}:00"} for m in range(history)
+        ],
+    }
+
+
+async def populate(store: ProfileStore, users_dir: str, profiles: int, history: int) -> None:
+    for i in range(profiles):
+        key = f"{i}_{i % 20}_public"
+        data = make_profile(i, history)
+        with open(os.path.join(users_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        await store.save(key, data)
+
+
+def json_scan(users_dir: str) -> int:
+    users = []
+    for name in os.listdir(users_dir):
+        with open(os.path.join(users_dir, name), "r", encoding="utf-8") as f:
+            users.append(summarize(name[: -len(".json")], json.load(f)))
+    return len(users)
+
+
+def timed(name: str, fn, repeat: int = 5) -> None:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    print(f"  {name:<10} best {min(samples) * 1000:9.1f} ms   mean {sum(samples) / len(samples) * 1000:9.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory, state, users_dir = (os.path.join(tmp, d) for d in ("memory", "state", "users_json"))
+        for d in (memory, state, users_dir):
+            os.makedirs(d)
+        db = os.path.join(memory, "profiles.sqlite3")
+        store = ProfileStore(db)
+        asyncio.run(populate(store, users_dir, args.profiles, args.history))
+        asyncio.run(store.close())
+        print(f"{args.profiles} profiles, {args.history} history entries each")
+
+        index = DashboardUserIndex(db, os.path.join(state, "cost_ledger.sqlite3"), memory, state)
+        timed("json-scan", lambda: json_scan(users_dir))
+
+        def rebuild():
+            index._version = None
+            index.users()
+
+        timed("index", rebuild)
+        timed("cached", lambda: index.users(index.version()), repeat=20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: Store throughput for the typical per-message call mix.
+
+Each simulated message does ensure_user, get_privacy, get_system_privacy,
+get_permission_level, get_points, add_points, log_tool_audit and log_chat_event.
+Compares:
+
+  per-call  - a fresh aiosqlite connection (thread + sqlite open) per method (previous behaviour)
+  pooled    - Store's long-lived WAL connections (one writer, ORA_STORE_READERS readers)
+
+Usage:
+    python scripts/bench_store.py [--messages 500] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage import Store  # noqa: E402
+
+OPS_PER_MESSAGE = 8
+
+
+class PerCallStore(Store):
+    """Store with the old connection handling: connect, run, close."""
+
+    @asynccontextmanager
+    async def _writer(self):
+        async with aiosqlite.connect(self._db_path) as db:
+            yield db
+
+    _reader = _writer
+
+
+async def one_message(store: Store, user_id: int) -> None:
+    now = int(time.time())
+    await store.ensure_user(user_id, "private", display_name=f"user{user_id}")
+    await store.get_privacy(user_id)
+    await store.get_system_privacy(user_id)
+    await store.get_permission_level(user_id)
+    await store.get_points(user_id)
+    await store.add_points(user_id, 1)
+    await store.log_tool_audit(
+        ts=now,
+        actor_id=user_id,
+        guild_id=1,
+        channel_id=2,
+        tool_name="web_search",
+        tool_call_id=None,
+        correlation_id=f"c{user_id}-{now}",
+        risk_score=0,
+        risk_level="low",
+        approval_required=False,
+        approval_status=None,
+        args_json="{}",
+        result_preview="",
+    )
+    await store.log_chat_event(
+        ts=now, actor_id=user_id, guild_id=1, channel_id=2, correlation_id=None, run_id=None, event_type="bench"
+    )
+
+
+async def run(store_cls, messages: int, concurrency: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = store_cls(os.path.join(tmp, "bench.db"))
+        await store.init()
+        sem = asyncio.Semaphore(concurrency)
+
+        async def worker(i: int) -> None:
+            async with sem:
+                await one_message(store, 1000 + i % 200)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(messages)))
+        elapsed = time.perf_counter() - start
+        await store.close()
+    return messages * OPS_PER_MESSAGE / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"messages={args.messages} concurrency={args.concurrency} ({OPS_PER_MESSAGE} Store calls each)")
+    for name, cls in (("per-call", PerCallStore), ("pooled", Store)):
+        ops = await run(cls, args.messages, args.concurrency)
+        print(f"  {name:<9} {ops:9.0f} ops/s   {ops / OPS_PER_MESSAGE:8.0f} messages/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
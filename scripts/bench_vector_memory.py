@@ -0,0 +1,134 @@
+"""
+Load test: event-loop lag under concurrent RAG lookups (VectorMemory.search_memory).
+
+Seeds a throwaway Chroma collection, then fires N concurrent searches (one per
+simulated user) while a ticker task measures how late the event loop wakes up.
+Compares:
+
+  inline    - collection.query() called directly inside the coroutine (previous behaviour)
+  executor  - VectorMemory.search_memory (dedicated pool + query micro-batching)
+
+By default a deterministic hashed embedding with a simulated inference cost is used so
+the test runs offline; pass --real-embeddings to use Chroma's default MiniLM model.
+
+Usage:
+    python scripts/bench_vector_memory.py [--users 1,10,50] [--docs 500] [--embed-ms 8]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.vector_memory import VectorMemory  # noqa: E402
+
+DIM = 64
+
+
+class FakeEmbedding:
+    """Hashed bag-of-words embedding; sleeps to mimic model inference (per call + per text)."""
+
+    def __init__(self, call_ms: float, text_ms: float):
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+
+    def __call__(self, input):
+        time.sleep((self.call_ms + self.text_ms * len(input)) / 1000.0)
+        out = []
+        for text in input:
+            vec = [0.0] * DIM
+            for word in text.lower().split():
+                vec[zlib.crc32(word.encode()) % DIM] += 1.0
+            norm = sum(v * v for v in vec) ** 0.5 or 1.0
+            out.append([v / norm for v in vec])
+        return out
+
+    @staticmethod
+    def name() -> str:
+        return "bench-fake"
+
+
+async def ticker(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def inline_search(vm: VectorMemory, query: str, user_id: str):
+    # The pre-executor implementation: synchronous embed + Chroma query on the event loop.
+    coll = vm._get_collection(vm._scope_name(("u", user_id)))
+    coll.query(query_embeddings=vm.embedding_function([query]), n_results=3)
+
+
+async def run(mode: str, vm: VectorMemory, users: int, rounds: int) -> dict:
+    stop = asyncio.Event()
+    lags: list = []
+    latencies: list = []
+    tick = asyncio.create_task(ticker(stop, lags))
+
+    async def one(i: int, r: int):
+        t0 = time.perf_counter()
+        query = f"what did user {i} say about topic {r % 7}"
+        if mode == "inline":
+            await inline_search(vm, query, f"user{i % 20}")
+        else:
+            await vm.search_memory(query, user_id=f"user{i % 20}", limit=3)
+        latencies.append(time.perf_counter() - t0)
+
+    batches_before = vm.stats["query_batches"]
+    start = time.perf_counter()
+    for r in range(rounds):
+        await asyncio.gather(*[one(i, r) for i in range(users)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+
+    ordered = sorted(lags) or [0.0]
+    return {
+        "mode": mode,
+        "users": users,
+        "qps": users * rounds / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "lag_p99_ms": ordered[int(0.99 * (len(ordered) - 1))] * 1000,
+        "lag_max_ms": ordered[-1] * 1000,
+        "batches": vm.stats["query_batches"] - batches_before,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1,10,50")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--embed-ms", type=float, default=8.0, help="Simulated per-call inference cost")
+    parser.add_argument("--embed-text-ms", type=float, default=1.0, help="Simulated per-text inference cost")
+    parser.add_argument("--real-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ef = None if args.real_embeddings else FakeEmbedding(args.embed_ms, args.embed_text_ms)
+        vm = VectorMemory("bench_memory", path=tmp, embedding_function=ef)
+        for i in range(args.docs):
+            await vm.add_memory(f"user {i % 20} talked about topic {i % 7} and item {i}", f"user{i % 20}")
+        await vm.flush()
+        print(f"seeded {vm.stats['adds']} docs in {vm.stats['add_batches']} add batches")
+
+        print(f"{'mode':>9} {'users':>6} {'qps':>8} {'p50 ms':>8} {'lag p99':>8} {'lag max':>8} {'batches':>8}")
+        for users in [int(x) for x in args.users.split(",") if x]:
+            for mode in ("inline", "executor"):
+                r = await run(mode, vm, users, args.rounds)
+                print(
+                    f"{r['mode']:>9} {r['users']:>6} {r['qps']:>8.1f} {r['p50_ms']:>8.1f} "
+                    f"{r['lag_p99_ms']:>8.1f} {r['lag_max_ms']:>8.1f} {r['batches'] if mode != 'inline' else '-':>8}"
+                )
+        await vm.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
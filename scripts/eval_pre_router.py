@@ -0,0 +1,107 @@
+"""
+Evaluate the local pre-router against recorded LLM routing decisions.
+
+Replays logs/agent_trace.jsonl and its rotated .jsonl.gz files: prompts come from
+`chat.request_received`, the LLM router's decision from `chat.tools_selected`
+(joined on correlation id). For each prompt the PreRouter predicts a category; we
+report coverage (share of prompts it would answer on its own), agreement with the
+LLM router on those prompts, its own latency, and the router round-trip time it
+would have saved.
+
+Usage:
+    python scripts/eval_pre_router.py [--trace logs/agent_trace.jsonl] [--sweep]
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.cogs.handlers.pre_router import PreRouter  # noqa: E402
+from src.cogs.tools.registry import classify_tool, get_tool_index  # noqa: E402
+from src.utils.agent_trace import iter_records  # noqa: E402
+
+
+def load_samples(path: str) -> list[dict]:
+    prompts: dict[str, str] = {}
+    samples: list[dict] = []
+    for rec in iter_records(path):
+        cid = rec.get("cid") or ""
+        payload = rec.get("payload") or {}
+        if rec.get("event") == "chat.request_received" and payload.get("prompt"):
+            prompts[cid] = payload["prompt"]
+        elif rec.get("event") == "chat.tools_selected" and cid in prompts:
+            cats = payload.get("selected_categories")
+            if not cats:
+                # Older traces only carry tool names; derive categories from them.
+                cats = sorted({classify_tool(n) for n in payload.get("selected_names") or [] if n})
+            source = payload.get("route_source") or "llm"
+            if not cats or source not in {"llm", "cache"}:
+                continue
+            samples.append({
+                "prompt": prompts.pop(cid),
+                "categories": list(cats),
+                "router_ms": float(payload.get("router_ms") or 0.0),
+            })
+    return samples
+
+
+def evaluate(router: PreRouter, samples: list[dict]) -> dict:
+    confident = agree = 0
+    saved_ms = 0.0
+    latencies = []
+    for s in samples:
+        pred = router.predict(s["prompt"])
+        latencies.append(pred["elapsed_ms"])
+        if not pred["confident"]:
+            continue
+        confident += 1
+        if pred["category"] in s["categories"]:
+            agree += 1
+            saved_ms += s["router_ms"]
+    n = len(samples)
+    return {
+        "samples": n,
+        "coverage": confident / n if n else 0.0,
+        "agreement": agree / confident if confident else 0.0,
+        "pre_router_p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "router_ms_saved_total": saved_ms,
+        "router_ms_saved_per_msg": saved_ms / n if n else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", default=os.getenv("ORA_TRACE_LOG", os.path.join("logs", "agent_trace.jsonl")))
+    parser.add_argument("--min-score", type=float, default=0.35)
+    parser.add_argument("--min-margin", type=float, default=0.12)
+    parser.add_argument("--sweep", action="store_true", help="Grid-search score/margin thresholds")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.trace):
+        print(f"Trace file not found: {args.trace}")
+        return
+    samples = load_samples(args.trace)
+    if not samples:
+        print("No chat.request_received/chat.tools_selected pairs found.")
+        return
+
+    index = get_tool_index()
+    grid = [(args.min_score, args.min_margin)]
+    if args.sweep:
+        grid = [(s, m) for s in (0.25, 0.3, 0.35, 0.4, 0.5) for m in (0.05, 0.08, 0.12, 0.16, 0.2)]
+
+    print(f"{'score':>6} {'margin':>6} {'n':>6} {'coverage':>9} {'agree':>7} {'p50 ms':>7} {'saved ms/msg':>13}")
+    for min_score, min_margin in grid:
+        router = PreRouter(mode="shadow", min_score=min_score, min_margin=min_margin)
+        router.build(index.categories, index.bundle_id)
+        r = evaluate(router, samples)
+        print(
+            f"{min_score:>6.2f} {min_margin:>6.2f} {r['samples']:>6} {r['coverage']:>9.1%} {r['agreement']:>7.1%} "
+            f"{r['pre_router_p50_ms']:>7.3f} {r['router_ms_saved_per_msg']:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Import legacy per-user JSON profiles (MEMORY_DIR/users/*.json) into the SQLite profile store.
+
+Safe to re-run: profiles already in the store are skipped unless --overwrite is given.
+MemoryCog also runs this import on startup, so the script is mainly for doing it
+offline (or into a different database) before switching over.
+
+Usage:
+    python scripts/migrate_profiles_to_sqlite.py [--src DIR] [--db PATH] [--overwrite]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.profile_store import MEMORY_DIR, PROFILE_DB_PATH, ProfileStore  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--src", default=os.path.join(MEMORY_DIR, "users"))
+    parser.add_argument("--db", default=PROFILE_DB_PATH)
+    parser.add_argument("--overwrite", action="store_true", help="Re-import profiles that already exist")
+    args = parser.parse_args()
+
+    print(f"Importing {args.src} -> {args.db}")
+    store = ProfileStore(args.db)
+    try:
+        stats = await store.import_json_dir(args.src, overwrite=args.overwrite)
+    finally:
+        await store.close()
+    print(
+        f"imported={stats['imported']} skipped={stats['skipped']} failed={stats['failed']} "
+        f"history_entries={stats['history']}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -88,6 +88,11 @@ class ORABot(commands.Bot):
         is_healthy = await self.connection_manager.check_health()
         mode_label = "API MODE" if is_healthy else "STANDALONE MODE"
         logger.info(f"🌐 Startup Mode Check: [{mode_label}] (Standalone: {self.connection_manager.is_standalone})")
+        if is_healthy:
+            # Warm the pooled Core API session (keep-alive connections shared by all cogs).
+            from .utils.core_client import core_client
+
+            await core_client.start()
 
         # 0. Initialize Google Client (Hybrid-Cloud)
         from .utils.google_client import GoogleClient
@@ -293,8 +298,29 @@ class ORABot(commands.Bot):
             await asyncio.shield(self.store.backup())
         except Exception as e:
             logger.error(f"Final backup failed: {e}")
+        try:
+            await self.store.close()
+        except Exception as e:
+            logger.warning(f"Store close failed: {e}")
+        try:
+            from .utils.agent_trace import close_trace_sink
+
+            await asyncio.to_thread(close_trace_sink)
+        except Exception as e:
+            logger.warning(f"Agent trace close failed: {e}")
 
         # 3. Close Resources
+        try:
+            from .utils.core_client import core_client
+
+            await core_client.close()
+        except Exception as e:
+            logger.warning(f"Core API session close failed: {e}")
+        if getattr(self, "vector_memory", None):
+            try:
+                await self.vector_memory.close()
+            except Exception as e:
+                logger.warning(f"Vector memory close failed: {e}")
         await super().close()
         # Session is managed by run_bot context manager, so we don't close it here explicitly
         # unless we want to force it. But run_bot handles it.
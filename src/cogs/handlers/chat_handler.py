@@ -2,7 +2,8 @@ import asyncio
 import datetime
 import json
 import logging
-from typing import Optional
+import time
+from typing import Any, Awaitable, Optional
 
 import discord
 
@@ -14,6 +15,12 @@ from src.utils.core_client import core_client, extract_text_from_core_data
 
 logger = logging.getLogger(__name__)
 
+# Per-stage deadlines for the pre-Core context pipeline (seconds).
+MEMORY_STAGE_TIMEOUT_SEC = 1.5
+VISION_STAGE_TIMEOUT_SEC = 20.0
+RAG_STAGE_TIMEOUT_SEC = 5.0
+ROUTER_STAGE_TIMEOUT_SEC = 30.0
+
 
 class ChatHandler:
     def __init__(self, cog):
@@ -73,6 +80,194 @@ class ChatHandler:
         except Exception as e:
             logger.debug(f"Agent activity notify skipped: {e}")
 
+    @staticmethod
+    async def _run_stage(
+        name: str,
+        coro: Awaitable[Any],
+        timeout: float,
+        fallback: Any,
+        timings: dict[str, dict],
+    ) -> Any:
+        """Await one pipeline stage under a deadline; record its timing and fall back on failure."""
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.warning(f"Context stage '{name}' exceeded {timeout}s; using fallback")
+            return fallback
+        except Exception as e:
+            status = "error"
+            logger.warning(f"Context stage '{name}' failed: {e}")
+            return fallback
+        finally:
+            timings[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "status": status}
+
+    async def _load_memory_context(self, message: discord.Message) -> tuple[str, str, str]:
+        """
+        [MEMORY INJECTION] Fetch user / channel / guild profiles concurrently.
+        Returns (memory_context, channel_memory_context, guild_memory_context).
+        """
+        memory_context = ""
+        channel_memory_context = ""
+        guild_memory_context = ""
+        memory_cog = self.cog.bot.get_cog("MemoryCog")
+        if not memory_cog:
+            return memory_context, channel_memory_context, guild_memory_context
+
+        async def _none():
+            return None
+
+        # Use a timeout to prevent hanging if file lock issue
+        user_profile, ch_profile, g_profile = await asyncio.gather(
+            asyncio.wait_for(
+                memory_cog.get_user_profile(message.author.id, message.guild.id if message.guild else None),
+                timeout=1.0,
+            ),
+            asyncio.wait_for(memory_cog.get_channel_profile(message.channel.id), timeout=1.0),
+            asyncio.wait_for(memory_cog.get_guild_profile(message.guild.id), timeout=1.0)
+            if message.guild and hasattr(memory_cog, "get_guild_profile")
+            else _none(),
+            return_exceptions=True,
+        )
+        if isinstance(user_profile, BaseException):
+            logger.warning(f"Memory Fetch Failed: {user_profile}")
+            user_profile = None
+
+        if user_profile:
+            # Extract key info
+            name = user_profile.get("name", message.author.display_name)
+            impression = user_profile.get("impression", "None")
+            traits = ", ".join(user_profile.get("traits", []))
+            l2 = user_profile.get("layer2_user_memory", {}) if isinstance(user_profile, dict) else {}
+            facts = ""
+            interests = ""
+            try:
+                if isinstance(l2, dict):
+                    facts = "; ".join([str(x) for x in (l2.get("facts") or []) if str(x).strip()])[:800]
+                    interests = "; ".join([str(x) for x in (l2.get("interests") or []) if str(x).strip()])[:400]
+            except Exception:
+                pass
+
+            memory_context = f"""
+[USER PROFILE]
+Name: {name}
+Impression: {impression}
+Traits: {traits}
+Facts: {facts}
+Interests: {interests}
+"""
+
+        # Channel-level memory (summary/topics/atmosphere)
+        try:
+            if isinstance(ch_profile, dict) and ch_profile:
+                c_sum = (ch_profile.get("summary") or "").strip()
+                c_atm = (ch_profile.get("atmosphere") or "").strip()
+                c_topics = ch_profile.get("topics") or []
+                if not isinstance(c_topics, list):
+                    c_topics = []
+                c_topics_s = ", ".join([str(x) for x in c_topics if str(x).strip()])[:200]
+
+                lines = []
+                if c_sum:
+                    lines.append(f"- Summary: {c_sum[:500]}")
+                if c_topics_s:
+                    lines.append(f"- Topics: {c_topics_s}")
+                if c_atm:
+                    lines.append(f"- Atmosphere: {c_atm[:120]}")
+
+                if lines:
+                    channel_memory_context = "\n[CHANNEL MEMORY]\n" + "\n".join(lines) + "\n"
+        except Exception:
+            pass
+
+        # Guild/server-level memory (high-level server identity / dominant topics)
+        try:
+            if isinstance(g_profile, dict) and g_profile:
+                g_hint = (g_profile.get("hint") or "").strip()
+                g_topics = g_profile.get("topics") or []
+                if not isinstance(g_topics, list):
+                    g_topics = []
+                g_topics_s = ", ".join([str(x) for x in g_topics if str(x).strip()])[:250]
+                lines = []
+                if g_hint:
+                    lines.append(f"- Hint: {g_hint[:500]}")
+                if g_topics_s:
+                    lines.append(f"- Topics: {g_topics_s}")
+                if lines:
+                    guild_memory_context = "\n[GUILD MEMORY]\n" + "\n".join(lines) + "\n"
+        except Exception:
+            pass
+
+        # Light heuristic: if the creator/sub-admin explicitly states server identity
+        # (e.g., "ここはVALORANTの鯖"), persist it as a guild hint to bias acronym disambiguation.
+        try:
+            from src.utils.access_control import is_owner, is_sub_admin
+            if message.guild and hasattr(memory_cog, "set_guild_hint"):
+                txt = (message.content or "").strip()
+                low = txt.lower()
+                if (("この鯖" in txt) or ("このサーバ" in txt) or ("ここは" in txt)) and any(k in low for k in ["valorant", "valo", "バロ", "バロラント"]):
+                    if is_owner(self.bot, message.author.id) or is_sub_admin(self.bot, message.author.id):
+                        await memory_cog.set_guild_hint(
+                            message.guild.id,
+                            "This server is primarily VALORANT-related (Valorant-focused context).",
+                        )
+        except Exception:
+            pass
+
+        return memory_context, channel_memory_context, guild_memory_context
+
+    async def _collect_vision_context(self, message: discord.Message) -> tuple[str, str, list]:
+        """
+        [Vision Integration] Process current attachments and the referenced (reply) message concurrently.
+        Returns (reply_context, vision_suffix, image_payloads).
+        """
+
+        async def _current_attachments() -> list:
+            # PERF: Unified GPT-5 Environment. Direct Image payload is sent.
+            # We skip the captioning suffix to avoid redundant LLM calls and latency.
+            if not message.attachments:
+                return []
+            # Only collect bytes/base64, don't trigger describe_media
+            _, imgs = await self.cog.vision_handler.process_attachments(message.attachments)
+            return imgs
+
+        async def _reference() -> tuple[str, str, list]:
+            reply_context = ""
+            vision_suffix = ""
+            image_payloads: list = []
+            if not message.reference:
+                return reply_context, vision_suffix, image_payloads
+            try:
+                if message.reference.cached_message:
+                    ref_msg = message.reference.cached_message
+                else:
+                    ref_msg = await message.channel.fetch_message(message.reference.message_id)
+
+                if ref_msg:
+                    reply_context += f"\n\n[REPLYING TO MESSAGE (Author: {ref_msg.author.display_name})]:\n{ref_msg.content or '(No Text)'}"
+                    for embed in ref_msg.embeds:
+                        if embed.url: reply_context += f"\n[EMBED URL]: {embed.url}"
+
+                    # Vision for References
+                    if ref_msg.attachments:
+                        suffix, imgs = await self.cog.vision_handler.process_attachments(ref_msg.attachments, is_reference=True)
+                        vision_suffix += suffix
+                        image_payloads.extend(imgs)
+
+                    if ref_msg.embeds:
+                        suffix, imgs = await self.cog.vision_handler.process_embeds(ref_msg.embeds, is_reference=True)
+                        vision_suffix += suffix
+                        image_payloads.extend(imgs)
+
+            except Exception as e:
+                logger.warning(f"Failed to fetch referenced message: {e}")
+            return reply_context, vision_suffix, image_payloads
+
+        current_imgs, (reply_context, vision_suffix, ref_imgs) = await asyncio.gather(_current_attachments(), _reference())
+        return reply_context, vision_suffix, current_imgs + ref_imgs
+
     async def handle_prompt(
         self,
         message: discord.Message,
@@ -158,111 +353,58 @@ class ChatHandler:
                 "is_admin": is_owner(self.bot, message.author.id),
             }
 
-            # 3. Call Core API
-            # [MEMORY INJECTION] Fetch User Profile
-            memory_context = ""
-            channel_memory_context = ""
-            guild_memory_context = ""
-            try:
-                memory_cog = self.cog.bot.get_cog("MemoryCog")
-                if memory_cog:
-                    # Use a timeout to prevent hanging if file lock issue
-                    user_profile = await asyncio.wait_for(
-                        memory_cog.get_user_profile(message.author.id, message.guild.id if message.guild else None),
-                        timeout=1.0
-                    )
+            # 3. Assemble context concurrently (memory / vision+reply / RAG -> router).
+            # Independent stages run in parallel with per-stage deadlines; a stage that fails
+            # or times out contributes its fallback instead of blocking the Core handshake.
+            # Tool visibility is creator-locked: non-owner users only get safe allowlist tools.
+            discord_tools = self.cog.get_context_tools("discord", user_id=message.author.id)
+            await status_manager.update_current("🔍 Intent Analysis (RAG)...")
 
-                    if user_profile:
-                        # Extract key info
-                        name = user_profile.get("name", message.author.display_name)
-                        impression = user_profile.get("impression", "None")
-                        traits = ", ".join(user_profile.get("traits", []))
-                        l2 = user_profile.get("layer2_user_memory", {}) if isinstance(user_profile, dict) else {}
-                        facts = ""
-                        interests = ""
-                        try:
-                            if isinstance(l2, dict):
-                                facts = "; ".join([str(x) for x in (l2.get("facts") or []) if str(x).strip()])[:800]
-                                interests = "; ".join([str(x) for x in (l2.get("interests") or []) if str(x).strip()])[:400]
-                        except Exception:
-                            pass
-
-                        memory_context = f"""
-[USER PROFILE]
-Name: {name}
-Impression: {impression}
-Traits: {traits}
-Facts: {facts}
-Interests: {interests}
-"""
+            guild_id_str = str(message.guild.id) if message.guild else None
+            stage_timings: dict[str, dict] = {}
+            pipeline_started = time.perf_counter()
 
-                    # Channel-level memory (summary/topics/atmosphere)
-                    try:
-                        ch_profile = await asyncio.wait_for(
-                            memory_cog.get_channel_profile(message.channel.id),
-                            timeout=1.0,
-                        )
-                        if isinstance(ch_profile, dict) and ch_profile:
-                            c_sum = (ch_profile.get("summary") or "").strip()
-                            c_atm = (ch_profile.get("atmosphere") or "").strip()
-                            c_topics = ch_profile.get("topics") or []
-                            if not isinstance(c_topics, list):
-                                c_topics = []
-                            c_topics_s = ", ".join([str(x) for x in c_topics if str(x).strip()])[:200]
-
-                            lines = []
-                            if c_sum:
-                                lines.append(f"- Summary: {c_sum[:500]}")
-                            if c_topics_s:
-                                lines.append(f"- Topics: {c_topics_s}")
-                            if c_atm:
-                                lines.append(f"- Atmosphere: {c_atm[:120]}")
-
-                            if lines:
-                                channel_memory_context = "\n[CHANNEL MEMORY]\n" + "\n".join(lines) + "\n"
-                    except Exception:
-                        pass
-
-                    # Guild/server-level memory (high-level server identity / dominant topics)
-                    try:
-                        if message.guild and hasattr(memory_cog, "get_guild_profile"):
-                            g_profile = await asyncio.wait_for(
-                                memory_cog.get_guild_profile(message.guild.id),
-                                timeout=1.0,
-                            )
-                            if isinstance(g_profile, dict) and g_profile:
-                                g_hint = (g_profile.get("hint") or "").strip()
-                                g_topics = g_profile.get("topics") or []
-                                if not isinstance(g_topics, list):
-                                    g_topics = []
-                                g_topics_s = ", ".join([str(x) for x in g_topics if str(x).strip()])[:250]
-                                lines = []
-                                if g_hint:
-                                    lines.append(f"- Hint: {g_hint[:500]}")
-                                if g_topics_s:
-                                    lines.append(f"- Topics: {g_topics_s}")
-                                if lines:
-                                    guild_memory_context = "\n[GUILD MEMORY]\n" + "\n".join(lines) + "\n"
-                    except Exception:
-                        pass
-
-                    # Light heuristic: if the creator/sub-admin explicitly states server identity
-                    # (e.g., "ここはVALORANTの鯖"), persist it as a guild hint to bias acronym disambiguation.
-                    try:
-                        from src.utils.access_control import is_owner, is_sub_admin
-                        if message.guild and hasattr(memory_cog, "set_guild_hint"):
-                            txt = (message.content or "").strip()
-                            low = txt.lower()
-                            if (("この鯖" in txt) or ("このサーバ" in txt) or ("ここは" in txt)) and any(k in low for k in ["valorant", "valo", "バロ", "バロラント"]):
-                                if is_owner(self.bot, message.author.id) or is_sub_admin(self.bot, message.author.id):
-                                    await memory_cog.set_guild_hint(
-                                        message.guild.id,
-                                        "This server is primarily VALORANT-related (Valorant-focused context).",
-                                    )
-                    except Exception:
-                        pass
-            except Exception as e:
-                logger.warning(f"Memory Fetch Failed: {e}")
+            # [Clawdbot Feature] Vector Memory Retrieval (User + Guild Shared)
+            rag_task = asyncio.create_task(
+                self._run_stage(
+                    "rag",
+                    self.rag_handler.get_context(prompt=prompt, user_id=str(message.author.id), guild_id=guild_id_str),
+                    RAG_STAGE_TIMEOUT_SEC,
+                    "",
+                    stage_timings,
+                )
+            )
+
+            async def _route_after_rag():
+                # [RAG ROUTER] Analyze Intent & Select Tools (depends on RAG context only)
+                rag_ctx = await rag_task
+                return await self._run_stage(
+                    "router",
+                    self.tool_selector.select_tools(
+                        prompt=prompt,
+                        available_tools=discord_tools,
+                        platform="discord",
+                        rag_context=rag_ctx,
+                        correlation_id=correlation_id,
+                    ),
+                    ROUTER_STAGE_TIMEOUT_SEC,
+                    discord_tools,
+                    stage_timings,
+                )
+
+            memory_parts, vision_result, rag_context, selected_tools = await asyncio.gather(
+                self._run_stage("memory", self._load_memory_context(message), MEMORY_STAGE_TIMEOUT_SEC, ("", "", ""), stage_timings),
+                self._run_stage("vision", self._collect_vision_context(message), VISION_STAGE_TIMEOUT_SEC, None, stage_timings),
+                rag_task,
+                _route_after_rag(),
+            )
+            memory_context, channel_memory_context, guild_memory_context = memory_parts
+            trace_event(
+                "chat.context_ready",
+                correlation_id=correlation_id,
+                total_ms=round((time.perf_counter() - pipeline_started) * 1000, 1),
+                stages=stage_timings,
+            )
 
             # [SOURCE INJECTION] Explicitly state this is Discord
             # [Moltbook] Inject Soul (Persona) if available
@@ -317,116 +459,36 @@ Interests: {interests}
             # Prepend to prompt
             full_prompt = system_context.strip() + "\n\n" + prompt
 
-            # [Vision Integration] Process Attachments & References
-            vision_suffix = ""
-            image_payloads = []
-
-            try:
-                # 1. Current Message
-                # 1. Current Message
-                # PERF: Unified GPT-5 Environment. Direct Image payload is sent.
-                # We skip the captioning suffix to avoid redundant LLM calls and latency.
-                if message.attachments:
-                    # Only collect bytes/base64, don't trigger describe_media
-                    _, imgs = await self.cog.vision_handler.process_attachments(message.attachments)
-                    image_payloads.extend(imgs)
-
-                # 2. Referenced Message (Reply) context
-                if message.reference:
-                    try:
-                        if message.reference.cached_message:
-                            ref_msg = message.reference.cached_message
-                        else:
-                            ref_msg = await message.channel.fetch_message(message.reference.message_id)
-
-                        if ref_msg:
-                            full_prompt += f"\n\n[REPLYING TO MESSAGE (Author: {ref_msg.author.display_name})]:\n{ref_msg.content or '(No Text)'}"
-                            for embed in ref_msg.embeds:
-                                if embed.url: full_prompt += f"\n[EMBED URL]: {embed.url}"
-
-                            # Vision for References
-                            if ref_msg.attachments:
-                                 suffix, imgs = await self.cog.vision_handler.process_attachments(ref_msg.attachments, is_reference=True)
-                                 vision_suffix += suffix
-                                 image_payloads.extend(imgs)
-
-                            if ref_msg.embeds:
-                                 suffix, imgs = await self.cog.vision_handler.process_embeds(ref_msg.embeds, is_reference=True)
-                                 vision_suffix += suffix
-                                 image_payloads.extend(imgs)
-
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch referenced message: {e}")
-
-            except Exception as e:
-                logger.error(f"Vision Processing Failed: {e}")
+            # [Vision Integration] Attachments & referenced message (collected above)
+            if vision_result is None:
                 # Fallback: Continue without vision data rather than crashing
                 full_prompt += "\n[SYSTEM ERROR: Image processing failed. Proceeding with text only.]"
-
-            # Append Vision Text Context
-            full_prompt += vision_suffix
-
-            # Prepare attachments for LLM (UnifiedClient expects 'attachments' list of dicts)
-            # The structure from VisionHandler is already compatible or needs minor adapt?
-            # UnifiedClient.chat expects 'attachments' argument.
-            # But here we are building `messages` manually?
-            # Wait, `endpoints.py` handles `attachments` argument.
-            # In `ChatHandler`, we delegate to `core_client` or `unified_client`.
-
-            # Update: ChatHandler calls `core_client.submit_message`.
-            # We need to pass `image_payloads` to clean attachments.
-            # Currently `chat_handler.py` uses `self.cog.unified_client` or `core_client`.
-            # Let's see the call site further down.
-
-            # Looking at previous code, `attachments` variable was created:
-            # attachments = []
-            # for att in message.attachments: ...
-
-            # So I should assign `attachments = image_payloads`
-
-            attachments = image_payloads
-
-            # Send Request (Initial Handshake)
-            # Fetch Context-Aware Tools (Discord Only)
-            # Tool visibility is creator-locked: non-owner users only get safe allowlist tools.
-            discord_tools = self.cog.get_context_tools("discord", user_id=message.author.id)
-
-            # [RAG ROUTER] Analyze Intent & Select Tools
-            # This reduces context usage and improves accuracy
-            await status_manager.update_current("🔍 Intent Analysis (RAG)...")
-
-            # [Clawdbot Feature] Vector Memory Retrieval (User + Guild Shared)
-            guild_id_str = str(message.guild.id) if message.guild else None
-            rag_context = await self.rag_handler.get_context(
-                prompt=prompt,
-                user_id=str(message.author.id),
-                guild_id=guild_id_str
-            )
+                attachments = []
+            else:
+                reply_context, vision_suffix, attachments = vision_result
+                full_prompt += reply_context
+                # Append Vision Text Context
+                full_prompt += vision_suffix
 
             # Append RAG context to system prompt or user prompt?
             # Ideally User prompt to make it visible to the model as "Context"
             full_prompt_with_rag = f"{rag_context}\n{full_prompt}"
 
-            # Select tools based on Platform Context
-            selected_tools = await self.tool_selector.select_tools(
-                prompt=prompt,
-                available_tools=discord_tools,
-                platform="discord",
-                rag_context=rag_context,
-                correlation_id=correlation_id
-            )
+            # Complexity is used for optional pre-orchestration (Swarm), but we avoid forcing a visible
+            # "execution plan" in the user's reply unless explicitly requested.
+            route_meta = getattr(self.tool_selector, "last_route_meta", {}) or {}
             trace_event(
                 "chat.tools_selected",
                 correlation_id=correlation_id,
                 available=len(discord_tools),
                 selected=len(selected_tools),
                 selected_names=[t.get("name") for t in selected_tools if isinstance(t, dict)],
+                selected_categories=route_meta.get("selected_categories"),
+                route_source=route_meta.get("route_source"),
+                router_ms=route_meta.get("router_roundtrip_ms"),
+                pre_router=route_meta.get("pre_router"),
             )
 
-            # Complexity is used for optional pre-orchestration (Swarm), but we avoid forcing a visible
-            # "execution plan" in the user's reply unless explicitly requested.
-            route_meta = getattr(self.tool_selector, "last_route_meta", {}) or {}
-
             # [SWARM] Optional high-complexity pre-orchestration
             if self.swarm.should_run(route_meta, prompt):
                 await status_manager.add_timeline("Swarm: タスク分解中")
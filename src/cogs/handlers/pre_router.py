@@ -0,0 +1,223 @@
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature space (stable across processes: crc32, not Python's randomized hash()).
+_DIM = 1 << 18
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_URL_RE = re.compile(r"https?://\S+")
+
+# Labelled exemplars per category. The first entries mirror the router's few-shot
+# examples; the rest cover common Discord phrasing in English and Japanese.
+PRE_ROUTER_EXEMPLARS: Dict[str, List[str]] = {
+    "WEB_FETCH": [
+        "Save this video", "download this video", "download the mp3", "save this as mp4", "record this stream",
+        "動画を保存して", "この動画ダウンロードして", "音声を保存", "mp3で落として", "録画して",
+    ],
+    "WEB_READ": [
+        "Screenshot this", "Open the browser and click X", "take a screenshot of this page", "open this url",
+        "search the web for", "read this article", "what does this page say",
+        "このページをスクショして", "スクショ撮って", "ブラウザで開いて", "検索して", "調べて", "このサイト見て",
+    ],
+    "DISCORD_SERVER": [
+        "Who is this user?", "give me the role", "kick this user", "ban him", "show server info",
+        "list the roles", "create a channel", "このユーザー誰", "ロールを付けて", "サーバー情報", "チャンネル作って",
+    ],
+    "VOICE_AUDIO": [
+        "Play music", "join vc", "leave the voice channel", "play this song", "skip the song", "read this aloud",
+        "音楽流して", "VCに来て", "VC抜けて", "この曲再生して", "読み上げて", "歌って",
+    ],
+    "MEDIA_CREATE": [
+        "generate an image of a cat", "draw a picture", "make a video", "create an illustration",
+        "画像を生成して", "絵を描いて", "イラスト作って", "動画を作って",
+    ],
+    "MEDIA_ANALYZE": [
+        "what is in this image", "describe this picture", "read the text in this screenshot", "analyze this photo",
+        "この画像なに", "この写真説明して", "画像の文字読んで",
+    ],
+    "CODEBASE": [
+        "grep the code for", "find where this function is defined", "read the source file", "show the repo tree",
+        "コードを検索して", "この関数どこ", "ソース読んで", "リポジトリの構成",
+    ],
+    "MCP": ["Use an MCP tool", "call the mcp server", "MCPツール使って"],
+    "SYSTEM_UTIL": [
+        "remind me in 10 minutes", "what's the weather", "check system status", "show the logs", "help",
+        "リマインドして", "天気教えて", "ステータス確認", "ログ見せて",
+    ],
+}
+
+
+# Categories a confident prediction may route on its own (ORA_PRE_ROUTER=on). Anything that
+# downloads, moderates, calls remote MCP servers, reads the codebase or spends generation
+# credits keeps the LLM router's intent check.
+DEFAULT_FAST_PATH_CATEGORIES = ("SYSTEM_UTIL", "WEB_READ", "VOICE_AUDIO", "MEDIA_ANALYZE")
+# Added to every fast-path decision, as the router's safety fallback always does.
+ALWAYS_CATEGORIES = ("SYSTEM_UTIL",)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    # URLs carry little intent but many n-grams; keep a single marker token.
+    return _URL_RE.sub(" urltoken ", text)
+
+
+def _features(text: str) -> Dict[int, float]:
+    """Word unigrams + character 2/3-grams (CJK friendly), hashed into a sparse L2-normalized vector."""
+    norm = _normalize(text)
+    counts: Dict[int, float] = {}
+
+    def add(token: str, weight: float) -> None:
+        idx = zlib.crc32(token.encode("utf-8")) & (_DIM - 1)
+        counts[idx] = counts.get(idx, 0.0) + weight
+
+    for word in _WORD_RE.findall(norm):
+        add("w:" + word, 1.0)
+    compact = re.sub(r"\s+", " ", norm).strip()
+    for n in (2, 3):
+        for i in range(len(compact) - n + 1):
+            gram = compact[i:i + n]
+            if gram.strip():
+                add(f"c{n}:" + gram, 0.5)
+
+    norm2 = math.sqrt(sum(v * v for v in counts.values()))
+    if norm2 == 0:
+        return {}
+    return {k: v / norm2 for k, v in counts.items()}
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def _centroid(vectors: Sequence[Dict[int, float]]) -> Dict[int, float]:
+    acc: Dict[int, float] = {}
+    for vec in vectors:
+        for k, v in vec.items():
+            acc[k] = acc.get(k, 0.0) + v
+    norm2 = math.sqrt(sum(v * v for v in acc.values()))
+    return {k: v / norm2 for k, v in acc.items()} if norm2 else {}
+
+
+class PreRouter:
+    """
+    Offline fast path in front of the LLM category router.
+
+    Embeds the prompt with a hashed n-gram vectorizer and compares it against per-category
+    centroids built from labelled exemplars plus the descriptions of the tools in each
+    category (blended with the nearest labelled exemplar). Only a single, clearly-separated
+    category is returned; anything ambiguous (low score or low margin) defers to the LLM router.
+
+    Modes (ORA_PRE_ROUTER): "off", "shadow" (predict + log only, default), "on". In "on"
+    mode only categories in `fast_path_categories` skip the LLM router.
+    """
+
+    def __init__(
+        self,
+        mode: str = "shadow",
+        min_score: float = 0.35,
+        min_margin: float = 0.12,
+        exemplars: Optional[Mapping[str, Sequence[str]]] = None,
+        fast_path_categories: Sequence[str] = DEFAULT_FAST_PATH_CATEGORIES,
+    ):
+        self.mode = mode if mode in {"off", "shadow", "on"} else "shadow"
+        self.fast_path_categories = frozenset(fast_path_categories)
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.exemplars = exemplars or PRE_ROUTER_EXEMPLARS
+        self._centroids: Dict[str, Dict[int, float]] = {}
+        self._exemplar_vecs: Dict[str, List[Dict[int, float]]] = {}
+        self._bundle_id: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "PreRouter":
+        return cls(
+            mode=(os.getenv("ORA_PRE_ROUTER") or "shadow").strip().lower(),
+            min_score=float(os.getenv("ORA_PRE_ROUTER_MIN_SCORE", "0.35")),
+            min_margin=float(os.getenv("ORA_PRE_ROUTER_MIN_MARGIN", "0.12")),
+            fast_path_categories=[
+                c.strip().upper()
+                for c in (os.getenv("ORA_PRE_ROUTER_FAST_CATEGORIES") or ",".join(DEFAULT_FAST_PATH_CATEGORIES)).split(",")
+                if c.strip()
+            ],
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def build(self, categories: Mapping[str, Sequence[dict]], bundle_id: str = "") -> None:
+        """(Re)build centroids for the categories that currently have tools."""
+        if bundle_id and bundle_id == self._bundle_id:
+            return
+        centroids: Dict[str, Dict[int, float]] = {}
+        exemplar_vecs: Dict[str, List[Dict[int, float]]] = {}
+        for cat, tools in categories.items():
+            if not tools or cat == "OTHER":
+                continue
+            labelled = [v for v in (_features(t) for t in self.exemplars.get(cat, [])) if v]
+            texts = []
+            for tool in tools:
+                name = str(tool.get("name", "")).replace("_", " ")
+                desc = str(tool.get("description", ""))[:200]
+                texts.append(f"{name} {desc}".strip())
+            vectors = labelled + [v for v in (_features(t) for t in texts) if v]
+            if vectors:
+                centroids[cat] = _centroid(vectors)
+                exemplar_vecs[cat] = labelled
+        self._centroids = centroids
+        self._exemplar_vecs = exemplar_vecs
+        self._bundle_id = bundle_id or None
+
+    def score(self, prompt: str) -> List[Tuple[str, float]]:
+        vec = _features(prompt)
+        if not vec:
+            return []
+        scored = []
+        for cat, c in self._centroids.items():
+            # Centroid similarity is robust but diluted by diverse exemplars; blend in the
+            # nearest labelled exemplar so short, idiomatic prompts still score clearly.
+            nearest = max((_cosine(vec, e) for e in self._exemplar_vecs.get(cat, ())), default=0.0)
+            scored.append((cat, 0.5 * _cosine(vec, c) + 0.5 * nearest))
+        scored.sort(key=lambda x: -x[1])
+        return scored
+
+    def predict(self, prompt: str) -> Dict[str, Any]:
+        """
+        Returns {"category": str|None, "score", "margin", "confident", "elapsed_ms"}.
+        `category` is set only when the decision is confident.
+        """
+        t0 = time.perf_counter()
+        scored = self.score(prompt)
+        top_cat, top = scored[0] if scored else (None, 0.0)
+        second = scored[1][1] if len(scored) > 1 else 0.0
+        margin = top - second
+        confident = bool(top_cat) and top >= self.min_score and margin >= self.min_margin
+        return {
+            "category": top_cat if confident else None,
+            "top": top_cat,
+            "score": round(top, 4),
+            "margin": round(margin, 4),
+            "confident": confident,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+
+    def fast_path(self, prediction: Optional[Dict[str, Any]], categories: Mapping[str, Sequence[dict]]) -> Optional[List[str]]:
+        """
+        Categories to use without the LLM router, or None to defer to it: requires mode "on",
+        a confident prediction and an allow-listed category. ALWAYS_CATEGORIES are added.
+        """
+        if self.mode != "on" or not prediction or not prediction.get("confident"):
+            return None
+        category = prediction.get("category")
+        if category not in self.fast_path_categories:
+            return None
+        return [category] + [c for c in ALWAYS_CATEGORIES if c != category and c in categories]
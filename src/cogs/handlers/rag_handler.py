@@ -17,7 +17,8 @@ class RAGHandler:
         # Check if vector memory is available on the bot
         if hasattr(self.bot, "vector_memory") and self.bot.vector_memory:
             try:
-                memories = await self.bot.vector_memory.search_memory(
+                # User (private) and guild (shared) hits come back merged and ranked by score.
+                memories = await self.bot.vector_memory.search_memory_scored(
                     query=prompt,
                     user_id=user_id,
                     guild_id=guild_id,
@@ -26,8 +27,10 @@ class RAGHandler:
                 
                 if memories:
                     # Format as a distinct block
-                    rag_context = "\n[Relevant Past Memories]:\n" + "\n".join([f"- {m}" for m in memories]) + "\n"
-                    logger.info(f"RAG: Injected {len(memories)} memories.")
+                    rag_context = "\n[Relevant Past Memories]:\n" + "\n".join([f"- {m['text']}" for m in memories]) + "\n"
+                    logger.info(
+                        f"RAG: Injected {len(memories)} memories (scores: {[m['score'] for m in memories]})."
+                    )
             
             except Exception as e:
                 logger.warning(f"RAG Retrieval Failed: {e}")
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form used as cache key: NFKC, lower-case, collapsed whitespace, no trailing punctuation."""
+    text = unicodedata.normalize("NFKC", prompt or "").lower()
+    text = _WS_RE.sub(" ", text).strip()
+    return text.rstrip(" .!?。！？、,")
+
+
+class RouterDecisionCache:
+    """
+    LRU + TTL cache of router decisions (selected categories + intents).
+
+    Keyed by (tools_bundle_id, prefix_hash, normalized prompt), so any change to the
+    tool set or the router system prompt naturally misses. Entries can optionally be
+    persisted to a JSON file (ORA_ROUTER_CACHE_PATH) and survive restarts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_sec: float = 6 * 3600,
+        persist_path: Optional[str] = None,
+        save_interval_sec: float = 60.0,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self.persist_path = persist_path
+        self.save_interval_sec = save_interval_sec
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if self.persist_path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "RouterDecisionCache":
+        return cls(
+            max_entries=int(os.getenv("ORA_ROUTER_CACHE_SIZE", "2048") or "2048"),
+            ttl_sec=float(os.getenv("ORA_ROUTER_CACHE_TTL_SEC", str(6 * 3600)) or 0),
+            persist_path=os.getenv("ORA_ROUTER_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def make_key(tools_bundle_id: str, prefix_hash: str, prompt: str) -> CacheKey:
+        return (tools_bundle_id, prefix_hash, normalize_prompt(prompt))
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        if self.ttl_sec <= 0:
+            self.misses += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry["ts"] > self.ttl_sec:
+                del self._entries[key]
+                self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"categories": list(entry["categories"]), "intents": dict(entry["intents"])}
+
+    def put(self, key: CacheKey, categories: list, intents: Dict[str, bool]) -> None:
+        if self.ttl_sec <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {"categories": list(categories), "intents": dict(intents), "ts": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def invalidate(self, reason: str = "") -> None:
+        """Drop every cached decision (e.g. when the tool registry changes)."""
+        with self._lock:
+            if self._entries:
+                self._entries.clear()
+                self._dirty = True
+            self.invalidations += 1
+        logger.info(f"Router decision cache invalidated ({reason or 'manual'})")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    # --- Persistence ---
+
+    def maybe_save(self) -> bool:
+        """Persist if dirty and the save interval elapsed. Returns True if a save happened."""
+        if not self.persist_path or not self._dirty:
+            return False
+        if time.time() - self._last_save < self.save_interval_sec:
+            return False
+        self.save()
+        return True
+
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+        with self._lock:
+            rows = [
+                {"key": list(k), "categories": v["categories"], "intents": v["intents"], "ts": v["ts"]}
+                for k, v in self._entries.items()
+            ]
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            directory = os.path.dirname(self.persist_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".router_cache_", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False)
+            os.replace(tmp, self.persist_path)
+        except Exception as e:
+            logger.warning(f"Router cache save failed: {e}")
+
+    def _load(self) -> None:
+        try:
+            if not os.path.exists(self.persist_path):
+                return
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            now = time.time()
+            for row in rows if isinstance(rows, list) else []:
+                key = tuple(row.get("key") or ())
+                if len(key) != 3 or now - float(row.get("ts", 0)) > self.ttl_sec:
+                    continue
+                self._entries[key] = {
+                    "categories": list(row.get("categories") or []),
+                    "intents": dict(row.get("intents") or {}),
+                    "ts": float(row["ts"]),
+                }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"Router decision cache loaded {len(self._entries)} entries from {self.persist_path}")
+        except Exception as e:
+            logger.warning(f"Router cache load failed: {e}")
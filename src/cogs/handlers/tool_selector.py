@@ -2,11 +2,13 @@ import logging
 import os
 import json
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Mapping, Optional, Sequence
 
 from src.utils.llm_client import LLMClient
 # S5 Optimization: Use Registry instead of heavy ToolHandler import
-from src.cogs.tools.registry import get_tool_schemas
+from src.cogs.tools.registry import add_registry_listener, get_tool_index, get_tool_schemas
+from src.cogs.handlers.router_cache import RouterDecisionCache
+from src.cogs.handlers.pre_router import PreRouter
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,8 @@ class ToolSelector:
     - S1: Deterministic (Temperature=0, Strict JSON)
     - S2: Safety Fallback (Default to Safe Tools on Error)
     - S3: Granular Categories (Split Web/Media for security)
+    - S9: Decision Cache (skip the LLM round trip for repeated prompts)
+    - S11: Local Pre-Router (hashed n-gram centroids; LLM only when the margin is low)
     """
 
     def __init__(self, bot):
@@ -45,6 +49,12 @@ class ToolSelector:
             model=self.model_name
         )
 
+        # S9: Router decision cache, dropped whenever the tool registry changes.
+        self.decision_cache = RouterDecisionCache.from_env()
+        add_registry_listener(self.decision_cache.invalidate)
+        # S11: Offline pre-router (ORA_PRE_ROUTER=off|shadow|on)
+        self.pre_router = PreRouter.from_env()
+
     async def select_tools(self, prompt: str, available_tools: Optional[List[dict]] = None, platform: str = "discord", rag_context: str = "", correlation_id: Optional[str] = None) -> List[dict]:
         """
         Analyzes prompt and selects relevant tool CATEGORIES (Granular).
@@ -64,118 +74,15 @@ class ToolSelector:
         if not available_tools:
             return []
 
-        # S6: Generate Tools Bundle ID (Canonical Hash)
-        # Sort by name first
-        sorted_tools = sorted(available_tools, key=lambda x: x.get("name", ""))
-        tools_json = json.dumps(sorted_tools, sort_keys=True, separators=(",", ":"))
-        tools_bundle_id = hashlib.sha256(tools_json.encode()).hexdigest()[:16]
-
-        # 1. Define Granular Categories (S3)
-        categories = {
-            "WEB_READ": {
-                "desc": "READ-ONLY Web Access. Browse, Screenshot, Dump content. NO downloading/saving files.",
-                "tools": []
-            },
-            "WEB_FETCH": {
-                "desc": "FILE DOWNLOADING & RECORDING. Select ONLY if user explicitly asks to 'Save', 'Download', 'Record' or 'Keep' media.",
-                "tools": []
-            },
-            "MEDIA_ANALYZE": {
-                "desc": "VIEWING/ANALYZING Images or Video. No generation.",
-                "tools": []
-            },
-            "MEDIA_CREATE": {
-                "desc": "GENERATING/EDITING Images, Video, Music. (DALL-E, Sora, Suno).",
-                "tools": []
-            },
-            "VOICE_AUDIO": {
-                "desc": "Voice Channel (VC) operations. Join, Leave, Speak (TTS), Play Music.",
-                "tools": []
-            },
-            "DISCORD_SERVER": {
-                "desc": "Server Management. Ban, Kick, Roles, User Info, Channel Ops.",
-                "tools": []
-            },
-            "CODEBASE": {
-                "desc": "Local codebase inspection tools (grep/find/read/tree). Select only for code/repo/debug requests.",
-                "tools": [],
-            },
-            "MCP": {
-                "desc": "Remote MCP (Model Context Protocol) tools from connected MCP servers.",
-                "tools": [],
-            },
-            "SYSTEM_UTIL": {
-                "desc": "Safe System Utils. Reminders, Memory, Help, Status checks. (SAFE DEFAULT)",
-                "tools": []
-            },
-            "OTHER": {"desc": "Anything else.", "tools": []}
-        }
-
-        # --- CLASSIFICATION LOGIC (Mapping Tools to Categories) ---
-        # Use sorted_tools here to be deterministic
-        safe_system_tools: set[str] = {
-            # Prefer keeping SYSTEM_UTIL small and actually safe.
-            "say",
-            "weather",
-            "read_chat_history",
-            "read_web_page",
-            "get_logs",
-            "system_info",
-            "router_health",
-            "check_privilege",
-        }
-
-        for tool in sorted_tools:
-            name = tool["name"].lower()
-            tags = set(tool.get("tags", []))
-
-            # MCP remote tools
-            if ("mcp" in tags) or name.startswith("mcp__"):
-                categories["MCP"]["tools"].append(tool)
-                continue
-
-            # Web Split
-            if name.startswith("web_"):
-                if any(x in name for x in ["download", "record", "save", "fetch"]):
-                    categories["WEB_FETCH"]["tools"].append(tool)
-                else:
-                    categories["WEB_READ"]["tools"].append(tool)
-
-            # Media Split
-            elif any(x in name for x in ["generate", "create", "imagine", "sora", "painting"]):
-                 categories["MEDIA_CREATE"]["tools"].append(tool)
-            elif any(x in name for x in ["vision", "analyze", "ocr", "describe"]):
-                 categories["MEDIA_ANALYZE"]["tools"].append(tool)
-
-            # Voice/Music
-            elif any(x in name for x in ["voice", "speak", "tts", "music", "join", "leave"]) or "vc" in tags:
-                 categories["VOICE_AUDIO"]["tools"].append(tool)
-
-            # Codebase / local search
-            elif ("code" in tags) or name.startswith("code_") or any(x in name for x in ["grep", "find", "read", "tree"]):
-                 categories["CODEBASE"]["tools"].append(tool)
-
-            # Discord
-            elif any(x in name for x in ["ban", "kick", "role", "user", "server", "channel", "wipe"]):
-                 categories["DISCORD_SERVER"]["tools"].append(tool)
-
-            # System/Default
-            elif (name in safe_system_tools) or ("system" in tags) or ("monitor" in tags) or ("health" in tags):
-                 categories["SYSTEM_UTIL"]["tools"].append(tool)
-            else:
-                 categories["OTHER"]["tools"].append(tool)
+        # S6/S10: Precomputed index from the registry (category buckets, canonical bundle hash,
+        # rendered category prompt). Rebuilt only when the tool set changes.
+        index = get_tool_index(available_tools)
+        tools_bundle_id = index.bundle_id
+        categories = index.categories
 
         # 2. Build Prompt (S6: Prefix Stabilization)
         # Construct STATIC parts first for KV Cache optimization
 
-        # Sort categories for stability
-        sorted_cats = sorted(categories.items()) # List of tuples, keys sorted alphabetically
-
-        cat_prompt_list = []
-        for cat_key, cat_data in sorted_cats:
-            if cat_data["tools"]:
-                cat_prompt_list.append(f"- {cat_key}: {cat_data['desc']}")
-
         # Static System Prompt (Strictly Canonical)
         #
         # IMPORTANT: Do not rely on keyword heuristics in the bot for routing.
@@ -190,7 +97,7 @@ class ToolSelector:
             f"4. **OUTPUT FORMAT** (JSON ONLY, no markdown):\n"
             f"   Preferred: {{\"categories\":[...],\"intents\":{{\"screenshot\":true|false,\"browser_control\":true|false,\"download\":true|false}}}}\n"
             f"   Example: {{\"categories\":[\"WEB_READ\"],\"intents\":{{\"screenshot\":true,\"browser_control\":false,\"download\":false}}}}\n\n"
-            f"Available Categories:\n" + "\n".join(cat_prompt_list) + "\n\n"
+            f"Available Categories:\n" + index.category_prompt + "\n\n"
             f"[FEW-SHOT EXAMPLES]\n"
             f"- 'Save this video' -> {{\"categories\":[\"WEB_FETCH\"],\"intents\":{{\"download\":true,\"screenshot\":false,\"browser_control\":false}}}}\n"
             f"- 'Screenshot this' -> {{\"categories\":[\"WEB_READ\"],\"intents\":{{\"screenshot\":true,\"browser_control\":false,\"download\":false}}}}\n"
@@ -219,16 +126,83 @@ class ToolSelector:
             "router_roundtrip_ms": 0, # LLM Time
             "router_local_ms": 0,     # Total - LLM
             "prefix_hash": prefix_hash,
-            "tools_bundle_id": tools_bundle_id
+            "tools_bundle_id": tools_bundle_id,
+            "cache_hit": False,
         }
 
+        cache_key = self.decision_cache.make_key(tools_bundle_id, prefix_hash, prompt)
+        cached = self.decision_cache.get(cache_key)
+        router_intents: Dict[str, bool] = {"screenshot": False, "browser_control": False, "download": False}
+
+        if cached is not None:
+            # S9: Cache hit -> reuse the previous routing decision, no LLM call.
+            selected_categories = [k for k in cached["categories"] if k in categories]
+            router_intents.update({k: bool(v) for k, v in cached["intents"].items() if k in router_intents})
+            log_payload["cache_hit"] = True
+            log_payload["route_source"] = "cache"
+        else:
+            pre = None
+            if self.pre_router.enabled:
+                self.pre_router.build(categories, tools_bundle_id)
+                pre = self.pre_router.predict(prompt)
+                log_payload["pre_router"] = pre
+
+            fast = self.pre_router.fast_path(pre, categories)
+            if fast is not None:
+                # S11: Obvious, low-risk intent -> skip the remote router call entirely.
+                selected_categories = fast
+                log_payload["route_source"] = "pre_router"
+            else:
+                selected_categories, fallback = await self._route_with_llm(
+                    messages, categories, prompt, router_intents, log_payload
+                )
+                log_payload["route_source"] = "fallback" if fallback else "llm"
+                if pre and pre["confident"] and not fallback:
+                    log_payload["pre_router_agree"] = pre["category"] in selected_categories
+                if not fallback and selected_categories:
+                    self.decision_cache.put(cache_key, selected_categories, router_intents)
+                    self.decision_cache.maybe_save()
+
+        log_payload["cache"] = self.decision_cache.stats()
+
+        # 5. Expand Categories -> Tools
+        # (If LLM succeeded, we trust it. If failed, we use the fallback list above)
+
+        final_tools = []
+        seen_tools = set()
+
+        for cat_key in selected_categories:
+            if cat_key in categories:
+                # Tools inside buckets are already sorted by name
+                for tool in categories[cat_key]:
+                    if tool["name"] not in seen_tools:
+                        final_tools.append(tool)
+                        seen_tools.add(tool["name"])
+
+        return self._finalize_selection(
+            prompt, final_tools, selected_categories, router_intents, log_payload, start_time_total
+        )
+
+    async def _route_with_llm(
+        self,
+        messages: List[dict],
+        categories: Mapping[str, Sequence[dict]],
+        prompt: str,
+        router_intents: Dict[str, bool],
+        log_payload: Dict[str, Any],
+    ) -> tuple[List[str], bool]:
+        """
+        Ask the router LLM for categories (updates router_intents in place).
+        Returns (selected_categories, fallback_triggered).
+        """
+        import time
+
         try:
             # 3. Call LLM (Deterministic S1 with Retry S4)
             # Force temperature=0 for stability
             # S4: Retry Loop (Max 2 attempts) for JSON validity
             max_retries = 2
             selected_categories = []
-            router_intents: Dict[str, bool] = {"screenshot": False, "browser_control": False, "download": False}
 
             for attempt in range(max_retries + 1):
                 t0_llm = time.perf_counter()
@@ -343,20 +317,21 @@ class ToolSelector:
 
             # Note: We do NOT auto-add WEB_FETCH (Download) on fallback for security.
             # User must re-prompt if Router fails on a sensitive action.
+            return selected_categories, True
 
-        # 5. Expand Categories -> Tools
-        # (If LLM succeeded, we trust it. If failed, we use the fallback list above)
-
-        final_tools = []
-        seen_tools = set()
+        return selected_categories, False
 
-        for cat_key in selected_categories:
-            if cat_key in categories:
-                # Tools inside buckets are already sorted by insertion order from sorted_tools
-                for tool in categories[cat_key]["tools"]:
-                    if tool["name"] not in seen_tools:
-                        final_tools.append(tool)
-                        seen_tools.add(tool["name"])
+    def _finalize_selection(
+        self,
+        prompt: str,
+        final_tools: List[dict],
+        selected_categories: List[str],
+        router_intents: Dict[str, bool],
+        log_payload: Dict[str, Any],
+        start_time_total: float,
+    ) -> List[dict]:
+        """Intent-based narrowing, tool cap, complexity estimate and structured logging."""
+        import time
 
         # Narrowing:
         # The router can over-expose remote browser tools when a URL is present.
@@ -414,6 +389,9 @@ class ToolSelector:
         if reasons:
             log_payload["complexity_reasons"] = reasons
         self.last_route_meta = {
+            "route_source": log_payload.get("route_source"),
+            "router_roundtrip_ms": log_payload.get("router_roundtrip_ms", 0),
+            "pre_router": log_payload.get("pre_router"),
             "complexity": complexity,
             "reasons": reasons,
             "selected_categories": list(selected_categories),
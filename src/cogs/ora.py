@@ -46,6 +46,7 @@ from duckduckgo_search import DDGS
 from src.utils.safe_shell import SafeShell
 
 from ..managers.resource_manager import ResourceManager
+from ..services.job_queue import OPTIMIZE_USER
 from ..storage import Store
 from ..utils.ascii_art import AsciiGenerator
 from ..utils.core_client import core_client
@@ -152,7 +153,6 @@ class ORACog(commands.Cog):
         if not hasattr(self.bot, "vector_memory"):
             self.bot.vector_memory = None
             
-        self.cost_manager = CostManager()
         self._public_base_url = public_base_url
         self._ora_api_base_url = ora_api_base_url
         self._privacy_default = privacy_default  # Store privacy setting
@@ -382,6 +382,10 @@ class ORACog(commands.Cog):
             self.desktop_loop.cancel()
         except Exception:
             pass
+        try:
+            self.cost_manager.close()
+        except Exception:
+            pass
         try:
             self.hourly_sync_loop.cancel()
         except Exception:
@@ -469,33 +473,10 @@ class ORACog(commands.Cog):
             logger.info(f"Found {len(candidates)} unoptimized users. Delegating to WorkerBot.")
 
             # --- IPC DELEGATION ---
-            queue_path = r"L:\ORA_State\optimize_queue.json"
             try:
-                # Read existing
-                current_queue = []
-                if os.path.exists(queue_path):
-                    try:
-                        with open(queue_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            if content.strip():
-                                current_queue = json.loads(content)
-                    except Exception:
-                        current_queue = []
-
-                # Append new (with simple deduplication)
-                existing_ids = {(r.get("user_id"), r.get("guild_id")) for r in current_queue}
-                new_tasks = []
-                for uid, gid in candidates:
-                    if (uid, gid) not in existing_ids:
-                        new_tasks.append({"user_id": uid, "guild_id": gid})
-
-                final_queue = current_queue + new_tasks
-
-                # Write back
-                with open(queue_path, "w", encoding="utf-8") as f:
-                    json.dump(final_queue, f, indent=2)
-
-                logger.info(f"Successfully queued {len(new_tasks)} new optimization tasks for WorkerBot.")
+                # Deduplicated per (user, guild) by the queue itself.
+                queued = await memory_cog.job_queue.enqueue_many(OPTIMIZE_USER, candidates)
+                logger.info(f"Successfully queued {queued} optimization tasks for WorkerBot.")
             except Exception as e:
                 logger.error(f"Failed to write to optimization queue: {e}")
                 # Fallback to direct call if IPC fails (slow but safe)
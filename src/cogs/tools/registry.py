@@ -1,4 +1,8 @@
-from typing import Dict, Any, List
+import hashlib
+import json
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Dict, Any, List, Mapping, Sequence, Tuple
 
 # Central Registry for Tool Metada (Schema + Implementation Path)
 # This file MUST NOT import heavy libraries (torch, numpy, etc.)
@@ -337,21 +341,176 @@ TOOL_REGISTRY: Dict[str, Dict[str, Any]] = {
     },
 }
 
-def get_tool_schemas() -> List[Dict[str, Any]]:
-    """Returns a list of tool definitions (JSON schemas) for the LLM."""
+# Callbacks fired after register_tool/unregister_tools mutate TOOL_REGISTRY
+# (e.g. the router decision cache drops decisions made against the old tool set).
+_CHANGE_LISTENERS: List[Callable[[str], None]] = []
+
+# Bumped on every mutation; cached views/indexes are tagged with the version they were built from.
+_REGISTRY_VERSION = 0
+_SCHEMA_VIEW: Tuple[int, Tuple[Dict[str, Any], ...]] | None = None
+_INDEX_CACHE: Dict[Tuple[int, Tuple[str, ...]], "ToolIndex"] = {}
+_INDEX_CACHE_MAX = 32
+
+
+def add_registry_listener(callback: Callable[[str], None]) -> None:
+    """Register a callback(reason) invoked whenever the registry changes."""
+    if callback not in _CHANGE_LISTENERS:
+        _CHANGE_LISTENERS.append(callback)
+
+
+def remove_registry_listener(callback: Callable[[str], None]) -> None:
+    try:
+        _CHANGE_LISTENERS.remove(callback)
+    except ValueError:
+        pass
+
+
+def registry_version() -> int:
+    return _REGISTRY_VERSION
+
+
+def notify_tools_changed(reason: str) -> None:
+    """
+    Invalidate cached schema views / tool indexes and fire listeners.
+    Called by register_tool/unregister_tools; call it directly when tools outside
+    TOOL_REGISTRY change (e.g. skills reloaded from disk).
+    """
+    global _REGISTRY_VERSION, _SCHEMA_VIEW
+    _REGISTRY_VERSION += 1
+    _SCHEMA_VIEW = None
+    _INDEX_CACHE.clear()
+    for cb in list(_CHANGE_LISTENERS):
+        try:
+            cb(reason)
+        except Exception:
+            pass
+
+
+def get_tool_schemas() -> Sequence[Dict[str, Any]]:
+    """
+    Returns the tool definitions (JSON schemas + tags) for the LLM.
+    The result is a cached, shared tuple rebuilt only when the registry changes;
+    callers must treat the schemas as read-only.
+    """
+    global _SCHEMA_VIEW
+    view = _SCHEMA_VIEW
+    if view is not None and view[0] == _REGISTRY_VERSION:
+        return view[1]
+
     schemas = []
     for key, data in TOOL_REGISTRY.items():
-        # Inject tags into the schema for the Router to see?
-        # Actually Router looks at tool['tags'] in our custom logic.
-        # We should return a dict that includes 'tags' alongside the schema wrapper.
-
         # Structure matching available_tools in ToolSelector:
         # { "name": "...", "tags": [], ... (schema fields) }
-
         s = data["schema"].copy()
         s["tags"] = data["tags"]
         schemas.append(s)
-    return schemas
+    _SCHEMA_VIEW = (_REGISTRY_VERSION, tuple(schemas))
+    return _SCHEMA_VIEW[1]
+
+
+# --- Router Categories (precomputed classification) ---
+
+TOOL_CATEGORIES: Mapping[str, str] = MappingProxyType({
+    "WEB_READ": "READ-ONLY Web Access. Browse, Screenshot, Dump content. NO downloading/saving files.",
+    "WEB_FETCH": "FILE DOWNLOADING & RECORDING. Select ONLY if user explicitly asks to 'Save', 'Download', 'Record' or 'Keep' media.",
+    "MEDIA_ANALYZE": "VIEWING/ANALYZING Images or Video. No generation.",
+    "MEDIA_CREATE": "GENERATING/EDITING Images, Video, Music. (DALL-E, Sora, Suno).",
+    "VOICE_AUDIO": "Voice Channel (VC) operations. Join, Leave, Speak (TTS), Play Music.",
+    "DISCORD_SERVER": "Server Management. Ban, Kick, Roles, User Info, Channel Ops.",
+    "CODEBASE": "Local codebase inspection tools (grep/find/read/tree). Select only for code/repo/debug requests.",
+    "MCP": "Remote MCP (Model Context Protocol) tools from connected MCP servers.",
+    "SYSTEM_UTIL": "Safe System Utils. Reminders, Memory, Help, Status checks. (SAFE DEFAULT)",
+    "OTHER": "Anything else.",
+})
+
+# Prefer keeping SYSTEM_UTIL small and actually safe.
+SAFE_SYSTEM_TOOLS = frozenset({
+    "say",
+    "weather",
+    "read_chat_history",
+    "read_web_page",
+    "get_logs",
+    "system_info",
+    "router_health",
+    "check_privilege",
+})
+
+
+@lru_cache(maxsize=4096)
+def classify_tool(name: str, tags: Tuple[str, ...] = ()) -> str:
+    """Map a tool (by name + tags) to its router category. Pure, so results are memoized."""
+    name = (name or "").lower()
+    tag_set = set(tags)
+
+    # MCP remote tools
+    if ("mcp" in tag_set) or name.startswith("mcp__"):
+        return "MCP"
+    # Web Split
+    if name.startswith("web_"):
+        if any(x in name for x in ["download", "record", "save", "fetch"]):
+            return "WEB_FETCH"
+        return "WEB_READ"
+    # Media Split
+    if any(x in name for x in ["generate", "create", "imagine", "sora", "painting"]):
+        return "MEDIA_CREATE"
+    if any(x in name for x in ["vision", "analyze", "ocr", "describe"]):
+        return "MEDIA_ANALYZE"
+    # Voice/Music
+    if any(x in name for x in ["voice", "speak", "tts", "music", "join", "leave"]) or "vc" in tag_set:
+        return "VOICE_AUDIO"
+    # Codebase / local search
+    if ("code" in tag_set) or name.startswith("code_") or any(x in name for x in ["grep", "find", "read", "tree"]):
+        return "CODEBASE"
+    # Discord
+    if any(x in name for x in ["ban", "kick", "role", "user", "server", "channel", "wipe"]):
+        return "DISCORD_SERVER"
+    # System/Default
+    if (name in SAFE_SYSTEM_TOOLS) or ("system" in tag_set) or ("monitor" in tag_set) or ("health" in tag_set):
+        return "SYSTEM_UTIL"
+    return "OTHER"
+
+
+class ToolIndex:
+    """
+    Immutable, precomputed routing view of a tool set:
+    category -> tools, canonical bundle hash and the rendered category prompt.
+    """
+    __slots__ = ("version", "tools", "bundle_id", "categories", "category_prompt")
+
+    def __init__(self, version: int, tools: Sequence[Dict[str, Any]]):
+        self.version = version
+        # Sort by name first (deterministic bucket order and bundle hash)
+        self.tools: Tuple[Dict[str, Any], ...] = tuple(sorted(tools, key=lambda x: x.get("name", "")))
+        tools_json = json.dumps(self.tools, sort_keys=True, separators=(",", ":"))
+        self.bundle_id = hashlib.sha256(tools_json.encode()).hexdigest()[:16]
+
+        buckets: Dict[str, List[Dict[str, Any]]] = {k: [] for k in TOOL_CATEGORIES}
+        for tool in self.tools:
+            buckets[classify_tool(tool["name"], tuple(tool.get("tags", [])))].append(tool)
+        self.categories: Mapping[str, Tuple[Dict[str, Any], ...]] = MappingProxyType(
+            {k: tuple(v) for k, v in buckets.items()}
+        )
+        # Sort categories for stability (keys sorted alphabetically)
+        self.category_prompt = "\n".join(
+            f"- {k}: {TOOL_CATEGORIES[k]}" for k in sorted(TOOL_CATEGORIES) if self.categories[k]
+        )
+
+
+def get_tool_index(tools: Sequence[Dict[str, Any]] | None = None) -> ToolIndex:
+    """
+    Return the precomputed index for `tools` (defaults to the registry schemas).
+    Indexes are memoized per (registry version, tool names), so classification,
+    sorting and bundle hashing only run when the tool set actually changes.
+    """
+    if tools is None:
+        tools = get_tool_schemas()
+    key = (_REGISTRY_VERSION, tuple(t.get("name", "") for t in tools))
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        if len(_INDEX_CACHE) >= _INDEX_CACHE_MAX:
+            _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+        index = _INDEX_CACHE[key] = ToolIndex(_REGISTRY_VERSION, tools)
+    return index
 
 def get_tool_impl(tool_name: str) -> str:
     """Returns the implementation path for a tool."""
@@ -392,6 +551,7 @@ def register_tool(
         "schema": schema,
         "meta": dict(meta or {}),
     }
+    notify_tools_changed(f"register:{tool_name}")
 
 
 def unregister_tools(prefix: str) -> int:
@@ -404,4 +564,6 @@ def unregister_tools(prefix: str) -> int:
             del TOOL_REGISTRY[k]
         except Exception:
             pass
+    if to_del:
+        notify_tools_changed(f"unregister:{prefix}")
     return len(to_del)
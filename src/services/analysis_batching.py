@@ -0,0 +1,98 @@
+"""Helpers for batching MemoryCog profile analyses into multi-user LLM requests."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+AnalysisItem = Tuple[int, List[Dict[str, Any]]]  # (user_id, messages)
+
+
+def format_chat_log(messages: Sequence[Dict[str, Any]]) -> str:
+    return "\n".join(f"[{m.get('timestamp', '')}] {m.get('content', '')}" for m in messages)
+
+
+def merge_messages(chunks: Sequence[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenate queued message lists for one user, dropping exact repeats (same timestamp + content)."""
+    seen = set()
+    merged = []
+    for chunk in chunks:
+        for m in chunk:
+            key = (str(m.get("timestamp", "")), m.get("content", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(m)
+    return merged
+
+
+def plan_batches(items: Sequence[AnalysisItem], max_users: int, max_chars: int) -> List[List[AnalysisItem]]:
+    """
+    Pack analyses into request batches of at most `max_users` users and `max_chars`
+    characters of chat log. A user whose log alone exceeds half of `max_chars` is
+    analyzed on its own (the single-user prompt keeps its full depth).
+    """
+    batches: List[List[AnalysisItem]] = []
+    current: List[AnalysisItem] = []
+    current_chars = 0
+    for item in sorted(items, key=lambda it: len(format_chat_log(it[1]))):
+        size = len(format_chat_log(item[1]))
+        if size > max_chars // 2 or max_users <= 1:
+            batches.append([item])
+            continue
+        if current and (len(current) >= max_users or current_chars + size > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(item)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_usage(total_in: int, total_out: int, in_weights: Dict[int, int], out_weights: Dict[int, int]) -> Dict[int, Tuple[int, int]]:
+    """Attribute a batched request's token usage to each user, proportional to their input / output size."""
+    in_sum = sum(in_weights.values()) or 1
+    out_sum = sum(out_weights.values()) or 1
+    shares: Dict[int, Tuple[int, int]] = {}
+    for uid in in_weights:
+        tokens_in = round(total_in * in_weights[uid] / in_sum)
+        tokens_out = round(total_out * out_weights.get(uid, 0) / out_sum) if out_weights else round(total_out / len(in_weights))
+        shares[uid] = (tokens_in, tokens_out)
+    return shares
+
+
+def build_multi_user_request(items: Sequence[AnalysisItem], extra_instructions: str) -> str:
+    """User message asking for one 4-layer analysis per user, keyed by user id."""
+    sections = "\n\n".join(f"### User {uid}\n{format_chat_log(msgs)}" for uid, msgs in items)
+    example = json.dumps(
+        {
+            str(items[0][0]): {
+                "layer1_session_meta": {"environment": "...", "mood": "...", "device_est": "..."},
+                "layer2_user_memory": {
+                    "facts": ["..."],
+                    "traits": ["..."],
+                    "impression": "...",
+                    "interests": ["..."],
+                    "deep_analysis": "...",
+                },
+                "layer3_recent_summaries": [{"title": "...", "timestamp": "...", "snippet": "..."}],
+            }
+        },
+        ensure_ascii=False,
+    )
+    return (
+        f"Analyze the chat logs of each of the {len(items)} users below SEPARATELY, based on the 4-Layer Memory Architecture.\n"
+        f"Never mix facts between users. For each user extract:\n"
+        f"1. **Layer 1 - Metadata**: 今回のセッションの環境的コンテキスト (e.g., 深夜, テンション高め, PC/Mobile推定, 活動内容)。\n"
+        f"2. **Layer 2 - Facts**: ユーザーの「ブレない軸」となる確定事実（名前, 職業, 継続中のプロジェクト, 価値観）。\n"
+        f"3. **Layer 3 - Digest**: 今回の会話の「タイトル＋タイムスタンプ＋ユーザー発言の要約」のリスト。\n"
+        f"4. **Interests/Impression**: 補足的な興味・印象データ。\n"
+        f"   - **Impression**: ユーザーを表す短い「一言」キャッチフレーズ（20文字以内・UI表示用）。\n"
+        f"   - **deep_analysis**: Item 5, 6, 7の内容（心理分析・人間関係・予測）をまとめた詳細テキスト。\n"
+        f"{extra_instructions}\n\n"
+        f"{sections}\n\n"
+        f"Output strictly one JSON object whose keys are the user ids above (All values in Japanese), e.g.:\n"
+        f"{example}\n"
+        f"IMPORTANT: Output ONLY the raw JSON. Do NOT use markdown code blocks (```json). Do not add any preamble."
+    )
@@ -0,0 +1,162 @@
+"""Background writer for Store audit rows (tool_audit, chat_events)."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Tuple
+
+from src.utils.write_behind import WriteBehindBuffer
+
+if TYPE_CHECKING:
+    from src.storage import Store
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("ORA_AUDIT_FLUSH_MS", "250") or "250")
+AUDIT_BATCH_MAX = int(os.getenv("ORA_AUDIT_BATCH_MAX", "500") or "500")
+# Events beyond this many unwritten ones are dropped (audit logging is best-effort).
+AUDIT_QUEUE_MAX = int(os.getenv("ORA_AUDIT_QUEUE_MAX", "10000") or "10000")
+
+_KEY = "audit"  # Single key: the buffer keeps events in arrival order.
+
+_SQL = {
+    "tool_audit": (
+        "INSERT OR REPLACE INTO tool_audit("
+        "ts, actor_id, guild_id, channel_id, tool_name, tool_call_id, correlation_id, "
+        "risk_score, risk_level, approval_required, approval_status, args_json, result_preview"
+        ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "tool_result": "UPDATE tool_audit SET result_preview=? WHERE tool_call_id=?",
+    "chat_event": (
+        "INSERT INTO chat_events(ts, actor_id, guild_id, channel_id, correlation_id, run_id, event_type, detail) "
+        "VALUES(?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+}
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default)).strip()))
+    except Exception:
+        return default
+
+
+def _opt_str(value: Any) -> str | None:
+    return str(value) if value is not None else None
+
+
+def _to_row(kind: str, ev: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Redact / truncate one event into its SQL parameters (CPU work, runs in a thread)."""
+    from src.utils.redaction import redact_json_string, redact_text
+
+    if kind == "tool_audit":
+        max_args_chars = _env_int("ORA_AUDIT_MAX_ARGS_CHARS", 5000, 500)
+        max_result_chars = _env_int("ORA_AUDIT_MAX_RESULT_CHARS", 2000, 200)
+        return (
+            int(ev["ts"]),
+            _opt_str(ev["actor_id"]),
+            _opt_str(ev["guild_id"]),
+            _opt_str(ev["channel_id"]),
+            str(ev["tool_name"] or ""),
+            str(ev["tool_call_id"]) if ev["tool_call_id"] else None,
+            str(ev["correlation_id"]) if ev["correlation_id"] else None,
+            int(ev["risk_score"]),
+            str(ev["risk_level"] or ""),
+            1 if ev["approval_required"] else 0,
+            str(ev["approval_status"]) if ev["approval_status"] else None,
+            redact_json_string(str(ev["args_json"] or ""), max_chars=max_args_chars),
+            redact_text(str(ev["result_preview"] or ""))[:max_result_chars],
+        )
+    if kind == "tool_result":
+        return (redact_text(str(ev["result_preview"] or ""))[:2000], str(ev["tool_call_id"]))
+    return (
+        int(ev["ts"]),
+        _opt_str(ev["actor_id"]),
+        _opt_str(ev["guild_id"]),
+        _opt_str(ev["channel_id"]),
+        ev["correlation_id"],
+        ev["run_id"],
+        ev["event_type"],
+        ev["detail"],
+    )
+
+
+def _prepare(events: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+    """Turn events into runs of same-kind rows, preserving order (an UPDATE must follow its INSERT)."""
+    runs: List[Tuple[str, List[Tuple[Any, ...]]]] = []
+    for kind, ev in events:
+        try:
+            row = _to_row(kind, ev)
+        except Exception as e:
+            logger.debug(f"AuditSink: skipping malformed {kind} event: {e}")
+            continue
+        if runs and runs[-1][0] == kind:
+            runs[-1][1].append(row)
+        else:
+            runs.append((kind, [row]))
+    return runs
+
+
+class AuditSink:
+    """
+    Queues audit events in memory and writes them in one transaction per batch
+    (every AUDIT_FLUSH_INTERVAL_MS, or once AUDIT_BATCH_MAX are pending), so logging
+    never waits on a commit. Redaction happens in a worker thread at flush time.
+    """
+
+    def __init__(
+        self,
+        store: "Store",
+        *,
+        flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+        batch_max: int = AUDIT_BATCH_MAX,
+        queue_max: int = AUDIT_QUEUE_MAX,
+    ) -> None:
+        self._store = store
+        self.queue_max = max(1, queue_max)
+        self.dropped = 0
+        self._buffer = WriteBehindBuffer(
+            self._write,
+            name="audit-sink",
+            flush_interval_sec=flush_interval_ms / 1000,
+            max_pending=batch_max,
+        )
+
+    def add(self, kind: str, event: Dict[str, Any]) -> None:
+        if self._buffer.depth >= self.queue_max:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"AuditSink: queue full ({self.queue_max}), dropped {self.dropped} events so far")
+            return
+        self._buffer.add(_KEY, (kind, event))
+
+    async def _write(self, batch: Dict[Hashable, List[Any]]) -> None:
+        runs = await asyncio.to_thread(_prepare, batch.get(_KEY, []))
+        if not runs:
+            return
+        async with self._store._writer() as db:
+            try:
+                for kind, rows in runs:
+                    await db.executemany(_SQL[kind], rows)
+            except sqlite3.IntegrityError:
+                # One bad row must not block the batch forever (the buffer retries failed flushes).
+                await db.rollback()
+                for kind, rows in runs:
+                    for row in rows:
+                        try:
+                            await db.execute(_SQL[kind], row)
+                        except sqlite3.IntegrityError as e:
+                            logger.debug(f"AuditSink: dropping {kind} row: {e}")
+            await db.commit()
+
+    async def flush(self) -> int:
+        return await self._buffer.flush()
+
+    async def close(self) -> None:
+        await self._buffer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._buffer.stats(), "dropped": self.dropped}
@@ -0,0 +1,405 @@
+"""Indexed SQLite archive of guild chat logs (replaces full-file scans in LocalLogReader)."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from src.utils.log_reader import LocalLogReader, parse_log_line
+
+logger = logging.getLogger(__name__)
+
+CHAT_LOG_DB_PATH = os.getenv("ORA_CHAT_LOG_DB") or os.path.join(LocalLogReader.LOG_DIR, "chat_logs.sqlite3")
+# Log tails are read in chunks of this many bytes, so a first import of a huge file stays bounded in memory.
+_IMPORT_CHUNK_BYTES = 4 * 1024 * 1024
+# RotatingFileHandler backups (GuildLogger backupCount) searched for the rest of a rotated log.
+_ROTATED_BACKUPS = 5
+# A log line is stamped when the bot received the message, up to a few seconds after created_at.
+DEDUP_WINDOW_SEC = 3
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  guild_id INTEGER NOT NULL,
+  channel_id INTEGER,
+  message_id INTEGER UNIQUE,  -- NULL for lines imported from text logs
+  author_id INTEGER NOT NULL,
+  author_name TEXT,
+  content TEXT NOT NULL,
+  ts TEXT NOT NULL,
+  is_public INTEGER,  -- 1 / 0, NULL when the source log was not scoped
+  attachments INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chat_user ON chat_messages(guild_id, author_id, ts);
+CREATE INDEX IF NOT EXISTS idx_chat_guild ON chat_messages(guild_id, ts);
+
+-- Idle-archiver checkpoints: newest/oldest archived message id per channel.
+CREATE TABLE IF NOT EXISTS archive_cursors (
+  channel_id INTEGER PRIMARY KEY,
+  guild_id INTEGER NOT NULL,
+  newest INTEGER,
+  oldest INTEGER,
+  complete INTEGER NOT NULL DEFAULT 0,  -- 1 once the backward scan reached the start of the channel
+  updated_at REAL NOT NULL
+);
+
+-- How far each text log has been imported; lets lookups ingest only newly appended lines.
+CREATE TABLE IF NOT EXISTS log_offsets (
+  path TEXT PRIMARY KEY,
+  file_id INTEGER NOT NULL,
+  byte_offset INTEGER NOT NULL,
+  updated_at REAL NOT NULL
+);
+"""
+
+_INSERT = (
+    "INSERT OR IGNORE INTO chat_messages"
+    "(guild_id, channel_id, message_id, author_id, author_name, content, ts, is_public, attachments) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Same message: same guild and author, within the receive window, and the log line is the
+# message's content (a log line only holds the first line of a multi-line message).
+_SAME_MESSAGE = (
+    "guild_id = :guild_id AND author_id = :author_id AND ts >= :lo AND ts < :hi "
+    "AND (content = :line OR substr(content, 1, length(:line) + 1) = :line || char(10))"
+)
+
+# Log lines carry no message id: skip those the archiver (or an earlier import) already stored.
+_INSERT_LOG_LINE = (
+    "INSERT INTO chat_messages"
+    "(guild_id, channel_id, message_id, author_id, author_name, content, ts, is_public, attachments) "
+    "SELECT :guild_id, NULL, NULL, :author_id, :author_name, :line, :ts, :is_public, 0 "
+    f"WHERE NOT EXISTS (SELECT 1 FROM chat_messages WHERE {_SAME_MESSAGE})"
+)
+
+# An archived message that was first imported from a log line takes over that row.
+_CLAIM_LOG_LINE = (
+    "UPDATE chat_messages SET channel_id = :channel_id, message_id = :message_id, author_name = :author_name, "
+    "content = :content, ts = :ts, is_public = COALESCE(is_public, :is_public), attachments = :attachments "
+    f"WHERE id = (SELECT id FROM chat_messages WHERE message_id IS NULL AND {_SAME_MESSAGE} ORDER BY ts LIMIT 1) "
+    "AND NOT EXISTS (SELECT 1 FROM chat_messages WHERE message_id = :message_id)"
+)
+
+_DEDUP_EXISTING = f"""
+DELETE FROM chat_messages WHERE message_id IS NULL AND EXISTS (
+  SELECT 1 FROM chat_messages a WHERE a.message_id IS NOT NULL
+    AND a.guild_id = chat_messages.guild_id AND a.author_id = chat_messages.author_id
+    AND a.ts >= strftime('%Y-%m-%dT%H:%M:%S', chat_messages.ts, '-{DEDUP_WINDOW_SEC} seconds')
+    AND a.ts < strftime('%Y-%m-%dT%H:%M:%S', chat_messages.ts, '+1 seconds')
+    AND (a.content = chat_messages.content
+         OR substr(a.content, 1, length(chat_messages.content) + 1) = chat_messages.content || char(10))
+)
+"""
+
+
+def _utc_ts(ts: str, legacy_local: bool = False) -> str:
+    """
+    Canonical UTC timestamp (YYYY-MM-DDTHH:MM:SS.ffffff+00:00), so rows from every source sort
+    together. Guild logs written before GuildLogger switched to UTC stamp local time with a
+    "Z" suffix; `legacy_local` reads those (and naive stamps) as local time.
+    """
+    try:
+        dt = datetime.fromisoformat(ts.replace(",", "."))
+    except ValueError:
+        return ts
+    if legacy_local and (dt.tzinfo is None or ts.endswith("Z")):
+        dt = dt.replace(tzinfo=None).astimezone()
+    elif dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _window(ts: str, before_sec: int, after_sec: int) -> Tuple[str, str]:
+    """[lo, hi) second-precision bounds around a canonical timestamp."""
+    sec = datetime.fromisoformat(ts[:19])
+    return (
+        (sec - timedelta(seconds=before_sec)).isoformat(timespec="seconds"),
+        (sec + timedelta(seconds=after_sec + 1)).isoformat(timespec="seconds"),
+    )
+
+
+def _read_chunk(path: str, offset: int, final: bool) -> Tuple[List[str], int]:
+    """Complete lines after `offset` (at most one chunk). `final`: the file gets no more writes."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(_IMPORT_CHUNK_BYTES)
+    if not data:
+        return [], offset
+    if final and len(data) < _IMPORT_CHUNK_BYTES:
+        end = len(data) - 1  # Rotated away: a trailing line without newline is complete.
+    else:
+        end = data.rfind(b"\n")
+        if end < 0:
+            # A partial line still being written; wait for its newline unless the chunk is full.
+            if len(data) < _IMPORT_CHUNK_BYTES:
+                return [], offset
+            end = len(data) - 1
+    lines = data[: end + 1].decode("utf-8", errors="ignore").splitlines()
+    return lines, offset + end + 1
+
+
+def _rotated_path(path: str, file_id: int) -> Optional[str]:
+    """Where RotatingFileHandler moved the file with inode `file_id` ({path}.1, {path}.2, ...), if still there."""
+    for n in range(1, _ROTATED_BACKUPS + 1):
+        try:
+            if os.stat(f"{path}.{n}").st_ino == file_id:
+                return f"{path}.{n}"
+        except OSError:
+            continue
+    return None
+
+
+def _read_tail(path: str, offset: int, file_id: int) -> Tuple[List[str], int, int]:
+    """
+    Complete lines appended to `path` after `offset` (at most one chunk).
+    Returns (lines, new_offset, file_id). After a rotation the rest of the old file is read
+    first (lines written between the last import and the rollover); then the new file from 0.
+    """
+    st = os.stat(path)
+    current_id = st.st_ino or 0
+    if file_id and current_id != file_id:
+        rotated = _rotated_path(path, file_id)
+        if rotated is not None:
+            lines, new_offset = _read_chunk(rotated, offset, final=True)
+            if new_offset != offset:
+                return lines, new_offset, file_id
+        offset = 0
+    elif st.st_size < offset:
+        offset = 0  # Truncated in place.
+    if st.st_size == offset:
+        return [], offset, current_id
+    lines, new_offset = _read_chunk(path, offset, final=False)
+    return lines, new_offset, current_id
+
+
+class ChatLogStore:
+    """
+    Guild chat history indexed by (guild_id, author_id, ts).
+
+    The idle archiver writes messages straight into it (deduplicated by message id).
+    The plain-text guild logs (live GuildLogger output and older archive files) are
+    imported incrementally: each lookup ingests only the bytes appended since the
+    recorded offset, so "last N messages by user" no longer depends on log size.
+    Timestamps are stored as UTC; a log line and an archived copy of the same message
+    (same author and content, DEDUP_WINDOW_SEC apart at most) are kept once.
+    """
+
+    def __init__(self, db_path: str = CHAT_LOG_DB_PATH, reader: Optional[LocalLogReader] = None) -> None:
+        self._db_path = db_path
+        self._reader = reader or LocalLogReader()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._import_locks: Dict[int, asyncio.Lock] = {}
+
+    async def open(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._open_lock:
+            if self._db is None:
+                os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+                db = await aiosqlite.connect(self._db_path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.execute("PRAGMA busy_timeout=5000")
+                await db.executescript(SCHEMA)
+                async with db.execute("PRAGMA user_version") as cur:
+                    version = (await cur.fetchone())[0]
+                if version < SCHEMA_VERSION:
+                    await self._migrate(db)
+                    await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                await db.commit()
+                self._db = db
+        return self._db
+
+    async def _migrate(self, db: aiosqlite.Connection) -> None:
+        """v1: rewrite timestamps as UTC and drop log-line copies of archived messages."""
+        async with db.execute("SELECT id, ts, message_id IS NULL FROM chat_messages") as cur:
+            rows = await cur.fetchall()
+        updates = [(fixed, row_id) for row_id, ts, from_log in rows if (fixed := _utc_ts(ts, bool(from_log))) != ts]
+        await db.executemany("UPDATE chat_messages SET ts = ? WHERE id = ?", updates)
+        cur = await db.execute(_DEDUP_EXISTING)
+        if updates or cur.rowcount:
+            logger.info(f"ChatLogStore: Normalised {len(updates)} timestamps, removed {cur.rowcount} duplicate log lines.")
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def add_messages(
+        self, guild_id: int, channel_id: Optional[int], messages: Iterable[Dict[str, Any]], is_public: Optional[bool]
+    ) -> int:
+        """
+        Store messages ({"message_id", "author_id", "author_name", "content", "timestamp",
+        "attachments"}) in one transaction. Already archived message ids are skipped.
+        """
+        scope = None if is_public is None else int(bool(is_public))
+        rows = []
+        for m in messages:
+            ts = _utc_ts(str(m["timestamp"]))
+            content = m.get("content") or ""
+            lo, hi = _window(ts, 0, DEDUP_WINDOW_SEC)
+            rows.append(
+                {
+                    "guild_id": guild_id,
+                    "channel_id": channel_id,
+                    "message_id": m.get("message_id"),
+                    "author_id": int(m["author_id"]),
+                    "author_name": m.get("author_name"),
+                    "content": content,
+                    "line": content.split("\n", 1)[0],
+                    "ts": ts,
+                    "lo": lo,
+                    "hi": hi,
+                    "is_public": scope,
+                    "attachments": int(m.get("attachments") or 0),
+                }
+            )
+        if not rows:
+            return 0
+        db = await self.open()
+        async with self._write_lock:
+            await db.executemany(_CLAIM_LOG_LINE, [r for r in rows if r["message_id"] is not None])
+            before = db.total_changes
+            await db.executemany(
+                _INSERT,
+                [
+                    (
+                        r["guild_id"],
+                        r["channel_id"],
+                        r["message_id"],
+                        r["author_id"],
+                        r["author_name"],
+                        r["content"],
+                        r["ts"],
+                        r["is_public"],
+                        r["attachments"],
+                    )
+                    for r in rows
+                ],
+            )
+            added = db.total_changes - before
+            await db.commit()
+            return added
+
+    async def get_cursors(self) -> Dict[int, Dict[str, Any]]:
+        """Archive cursors by channel id."""
+        db = await self.open()
+        async with db.execute("SELECT channel_id, guild_id, newest, oldest, complete FROM archive_cursors") as cur:
+            return {
+                r[0]: {"guild_id": r[1], "newest": r[2], "oldest": r[3], "complete": bool(r[4])}
+                for r in await cur.fetchall()
+            }
+
+    async def save_cursor(
+        self, channel_id: int, guild_id: int, newest: Optional[int], oldest: Optional[int], complete: bool = False
+    ) -> None:
+        """Checkpoint one channel (a single-row upsert)."""
+        db = await self.open()
+        async with self._write_lock:
+            await db.execute(
+                "INSERT INTO archive_cursors(channel_id, guild_id, newest, oldest, complete, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(channel_id) DO UPDATE SET guild_id = excluded.guild_id, "
+                "newest = excluded.newest, oldest = excluded.oldest, complete = excluded.complete, "
+                "updated_at = excluded.updated_at",
+                (channel_id, guild_id, newest, oldest, int(complete), time.time()),
+            )
+            await db.commit()
+
+    async def import_guild_logs(self, guild_id: int) -> int:
+        """Ingest lines appended to the guild's text logs since the last import. Returns rows added."""
+        lock = self._import_locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            db = await self.open()
+            loop = asyncio.get_running_loop()
+            added = 0
+            for path, is_public in self._reader.log_files(guild_id):
+                if not os.path.exists(path):
+                    continue
+                async with db.execute("SELECT file_id, byte_offset FROM log_offsets WHERE path = ?", (path,)) as cur:
+                    row = await cur.fetchone()
+                file_id, offset = (row[0], row[1]) if row else (0, 0)
+                while True:
+                    try:
+                        lines, new_offset, new_id = await loop.run_in_executor(None, _read_tail, path, offset, file_id)
+                    except OSError as e:
+                        logger.warning(f"ChatLogStore: Could not read {path}: {e}")
+                        break
+                    if new_offset == offset and new_id == file_id:
+                        break
+                    file_id = new_id
+                    parsed = [m for m in (parse_log_line(line) for line in lines) if m]
+                    scope = None if is_public is None else int(is_public)
+                    rows = []
+                    for m in parsed:
+                        ts = _utc_ts(m["timestamp"], legacy_local=True)
+                        try:
+                            lo, hi = _window(ts, DEDUP_WINDOW_SEC, 0)
+                        except ValueError:
+                            continue  # Unparseable timestamp.
+                        rows.append(
+                            {
+                                "guild_id": guild_id,
+                                "author_id": m["author_id"],
+                                "author_name": m["author_name"],
+                                "line": m["content"],
+                                "ts": ts,
+                                "lo": lo,
+                                "hi": hi,
+                                "is_public": scope,
+                            }
+                        )
+                    async with self._write_lock:
+                        before = db.total_changes
+                        await db.executemany(_INSERT_LOG_LINE, rows)
+                        added += db.total_changes - before
+                        await db.execute(
+                            "INSERT INTO log_offsets(path, file_id, byte_offset, updated_at) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT(path) DO UPDATE SET file_id = excluded.file_id, byte_offset = excluded.byte_offset, "
+                            "updated_at = excluded.updated_at",
+                            (path, file_id, new_offset, time.time()),
+                        )
+                        await db.commit()
+                    offset = new_offset
+            if added:
+                logger.debug(f"ChatLogStore: Imported {added} log lines for guild {guild_id}.")
+            return added
+
+    async def recent_messages(
+        self,
+        guild_id: int,
+        limit: int = 50,
+        user_id: Optional[int] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Most recent messages (newest first) in the shape LocalLogReader returned:
+        {"author_name", "author_id", "content", "timestamp"}. Unscoped log lines match any scope.
+        """
+        try:
+            await self.import_guild_logs(guild_id)
+        except Exception as e:
+            logger.warning(f"ChatLogStore: Log import for {guild_id} failed: {e}")
+        db = await self.open()
+        sql = "SELECT author_name, author_id, content, ts FROM chat_messages WHERE guild_id = ?"
+        params: List[Any] = [guild_id]
+        if user_id:
+            sql += " AND author_id = ?"
+            params.append(user_id)
+        if is_public is not None:
+            sql += " AND (is_public = ? OR is_public IS NULL)"
+            params.append(int(is_public))
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+        async with db.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+        return [{"author_name": r[0], "author_id": r[1], "content": r[2], "timestamp": r[3]} for r in rows]
@@ -0,0 +1,266 @@
+"""Concurrent, resumable channel-history backfill for the idle archiver."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from src.services.chat_log_store import ChatLogStore
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CONCURRENCY = int(os.getenv("ORA_BACKFILL_CONCURRENCY", "4") or "4")
+# Budget for history requests issued by the archiver (Discord's global limit is 50/s per bot;
+# per-route buckets are still honoured by discord.py's HTTP client on top of this).
+BACKFILL_REQUESTS_PER_SEC = float(os.getenv("ORA_BACKFILL_REQUESTS_PER_SEC", "5") or "5")
+BACKFILL_PAGE_SIZE = 100  # Discord's maximum per history request.
+
+_DISCORD_EPOCH_MS = 1420070400000
+
+SaveFn = Callable[[int, int, List[Any], bool], Awaitable[Any]]
+
+
+def snowflake_seconds(snowflake: int) -> float:
+    return ((snowflake >> 22) + _DISCORD_EPOCH_MS) / 1000
+
+
+class RateBudget:
+    """Token bucket shared by all backfill workers (`rate` requests/s, bursts up to `burst`)."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = max(0.01, rate)
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_sec = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited_sec += delay
+                await asyncio.sleep(delay)
+                self._updated = time.monotonic()
+                self._tokens = 1.0
+            self._tokens -= 1
+
+
+class _ChannelJob:
+    __slots__ = ("channel", "is_public", "guild_id", "newest", "oldest", "complete", "created_s")
+
+    def __init__(self, channel: Any, is_public: bool, cursor: Optional[Dict[str, Any]]) -> None:
+        self.channel = channel
+        self.is_public = is_public
+        self.guild_id = channel.guild.id
+        cursor = cursor or {}
+        self.newest: Optional[int] = cursor.get("newest")
+        self.oldest: Optional[int] = cursor.get("oldest")
+        self.complete: bool = bool(cursor.get("complete"))
+        if self.oldest is None and self.newest is not None:
+            self.oldest = self.newest
+        created = getattr(channel, "created_at", None)
+        self.created_s = created.timestamp() if created else snowflake_seconds(channel.id)
+
+    @property
+    def needs_forward(self) -> bool:
+        last = getattr(self.channel, "last_message_id", None)
+        return self.newest is None or (last is not None and last > self.newest)
+
+    @property
+    def remaining_span_sec(self) -> float:
+        """Time between the oldest archived message and channel creation (what the backward scan still covers)."""
+        if self.complete:
+            return 0.0
+        if self.oldest is None:
+            return max(0.0, time.time() - self.created_s)
+        return max(0.0, snowflake_seconds(self.oldest) - self.created_s)
+
+
+class BackfillEngine:
+    """
+    Archives channel history across guilds with a pool of workers.
+
+    Each step fetches one page for one channel: catching up on new messages first
+    (most recently active channels first), then walking backwards through older
+    history. A channel is held by at most one worker at a time and goes back on the
+    queue after every page, so big channels do not starve the rest. All requests draw
+    from a shared RateBudget, and the channel cursor is checkpointed after each page,
+    so an interrupted cycle resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        store: ChatLogStore,
+        save_fn: SaveFn,
+        *,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        requests_per_sec: float = BACKFILL_REQUESTS_PER_SEC,
+        page_size: int = BACKFILL_PAGE_SIZE,
+    ) -> None:
+        self.store = store
+        self._save_fn = save_fn
+        self.concurrency = max(1, concurrency)
+        self.budget = RateBudget(requests_per_sec)
+        self.page_size = page_size
+        self._last: Dict[str, Any] = {}
+
+    async def import_legacy_state(self, path: str, guild_of: Callable[[int], Optional[int]]) -> int:
+        """Seed cursors from the old archive_status.json ({channel_id: {"newest", "oldest"}}) and rename it."""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Backfill: Could not read legacy state {path}: {e}")
+            return 0
+        count = 0
+        for channel_id, ch_state in state.items():
+            guild_id = guild_of(int(channel_id))
+            if guild_id is None or not isinstance(ch_state, dict):
+                continue
+            await self.store.save_cursor(int(channel_id), guild_id, ch_state.get("newest"), ch_state.get("oldest"))
+            count += 1
+        try:
+            os.replace(path, path + ".migrated")
+        except OSError as e:
+            logger.warning(f"Backfill: Could not rename legacy state {path}: {e}")
+        return count
+
+    async def run_cycle(self, channels: Iterable[Tuple[Any, bool]], deadline_sec: float) -> Dict[str, Any]:
+        """Archive as much as possible within `deadline_sec`. Returns throughput / ETA stats."""
+        cursors = await self.store.get_cursors()
+        seq = itertools.count()
+        heap: List[Tuple[Tuple[int, int], int, _ChannelJob]] = []
+        jobs: List[_ChannelJob] = []
+        for channel, is_public in channels:
+            job = _ChannelJob(channel, is_public, cursors.get(channel.id))
+            jobs.append(job)
+            self._push(heap, job, seq)
+
+        stats = {"requests": 0, "messages": 0, "backfilled_span_sec": 0.0}
+        start = time.monotonic()
+        deadline = start + deadline_sec
+
+        # A job being stepped is off the heap; workers wait for it to come back rather than
+        # exiting while the heap is only momentarily empty.
+        ready = asyncio.Condition()
+        in_flight = 0
+
+        async def next_job() -> Optional[_ChannelJob]:
+            nonlocal in_flight
+            async with ready:
+                while not heap:
+                    remaining = deadline - time.monotonic()
+                    if in_flight == 0 or remaining <= 0:
+                        return None
+                    try:
+                        await asyncio.wait_for(ready.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return None
+                in_flight += 1
+                return heapq.heappop(heap)[2]
+
+        async def worker() -> None:
+            nonlocal in_flight
+            while time.monotonic() < deadline:
+                job = await next_job()
+                if job is None:
+                    return
+                requeue = False
+                try:
+                    await self._step(job, stats)
+                    requeue = True
+                except discord.Forbidden:
+                    pass  # Lost access; drop for this cycle.
+                except Exception as e:
+                    logger.error(f"Backfill: #{getattr(job.channel, 'name', job.channel.id)} failed: {e}")
+                finally:
+                    async with ready:
+                        in_flight -= 1
+                        if requeue:
+                            self._push(heap, job, seq)
+                        ready.notify_all()
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(heap)) or 1)))
+
+        elapsed = max(time.monotonic() - start, 1e-6)
+        remaining = sum(j.remaining_span_sec for j in jobs)
+        span_rate = stats["backfilled_span_sec"] / elapsed
+        self._last = {
+            "channels": len(jobs),
+            "channels_complete": sum(1 for j in jobs if j.complete),
+            "pending_channels": len(heap),
+            "requests": stats["requests"],
+            "messages": stats["messages"],
+            "elapsed_sec": round(elapsed, 2),
+            "msgs_per_sec": round(stats["messages"] / elapsed, 2),
+            "rate_wait_sec": round(self.budget.waited_sec, 2),
+            # Backward progress is measured in channel time covered (snowflake timestamps).
+            "eta_sec": round(remaining / span_rate) if span_rate > 0 else (0 if remaining == 0 else None),
+        }
+        return self._last
+
+    def stats(self) -> Dict[str, Any]:
+        """Stats of the most recent cycle."""
+        return dict(self._last)
+
+    def _push(self, heap: list, job: _ChannelJob, seq) -> None:
+        if job.needs_forward:
+            phase = 0
+        elif not job.complete:
+            phase = 1
+        else:
+            return
+        activity = getattr(job.channel, "last_message_id", None) or 0
+        heapq.heappush(heap, ((phase, -activity), next(seq), job))
+
+    async def _step(self, job: _ChannelJob, stats: Dict[str, Any]) -> None:
+        channel = job.channel
+        await self.budget.acquire()
+        stats["requests"] += 1
+        if job.needs_forward:
+            last = getattr(channel, "last_message_id", None) or 0
+            if job.newest is None:
+                msgs = [m async for m in channel.history(limit=self.page_size)]
+                msgs.reverse()
+                if msgs:
+                    job.oldest = msgs[0].id
+                job.complete = len(msgs) < self.page_size
+            else:
+                msgs = [
+                    m
+                    async for m in channel.history(
+                        limit=self.page_size, after=discord.Object(id=job.newest), oldest_first=True
+                    )
+                ]
+            if msgs:
+                job.newest = msgs[-1].id
+            if len(msgs) < self.page_size:
+                job.newest = max(job.newest or 0, last)  # Caught up (also steps over deleted messages).
+        else:
+            msgs = [m async for m in channel.history(limit=self.page_size, before=discord.Object(id=job.oldest))]
+            if msgs:
+                before = snowflake_seconds(job.oldest)
+                job.oldest = msgs[-1].id
+                stats["backfilled_span_sec"] += max(0.0, before - snowflake_seconds(job.oldest))
+            if len(msgs) < self.page_size:
+                stats["backfilled_span_sec"] += job.remaining_span_sec
+                job.complete = True
+
+        if msgs:
+            await self._save_fn(job.guild_id, channel.id, msgs, job.is_public)
+            stats["messages"] += len(msgs)
+        await self.store.save_cursor(channel.id, job.guild_id, job.newest, job.oldest, job.complete)
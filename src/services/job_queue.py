@@ -0,0 +1,286 @@
+"""SQLite-backed job queue shared by the main bot, the worker bot and the dashboard (replaces optimize_queue.json)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+try:
+    from src.config import STATE_DIR
+except Exception:
+    STATE_DIR = os.path.join(os.getcwd(), "data", "state")
+
+JOB_QUEUE_DB_PATH = os.getenv("ORA_JOB_QUEUE_DB") or os.path.join(STATE_DIR, "jobs.sqlite3")
+# Queue files written by older versions; imported once and renamed to *.migrated.
+LEGACY_OPTIMIZE_QUEUE_PATHS = (r"L:\ORA_State\optimize_queue.json", os.path.join(STATE_DIR, "optimize_queue.json"))
+
+OPTIMIZE_USER = "optimize_user"
+
+PRIORITY_BACKGROUND = 0
+PRIORITY_DASHBOARD = 10
+
+JOB_LEASE_SEC = float(os.getenv("ORA_JOB_LEASE_SEC", "600") or "600")
+JOB_MAX_ATTEMPTS = int(os.getenv("ORA_JOB_MAX_ATTEMPTS", "5") or "5")
+JOB_RETRY_BASE_SEC = float(os.getenv("ORA_JOB_RETRY_BASE_SEC", "30") or "30")
+JOB_RETRY_MAX_SEC = 3600.0
+JOB_KEEP_FINISHED_SEC = 7 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  user_id TEXT NOT NULL,
+  guild_id TEXT NOT NULL DEFAULT '',
+  priority INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'queued',  -- queued | running | done | failed
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL,
+  available_at REAL NOT NULL,
+  lease_until REAL,
+  claimed_by TEXT,
+  last_error TEXT,
+  result TEXT,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL
+);
+-- At most one live job per (kind, user, guild): re-enqueueing bumps it instead.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_live ON jobs(kind, user_id, guild_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(kind, status, priority DESC, available_at);
+"""
+
+_UPSERT = (
+    "INSERT INTO jobs(kind, user_id, guild_id, priority, max_attempts, available_at, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(kind, user_id, guild_id) WHERE status IN ('queued', 'running') DO UPDATE SET "
+    "priority = MAX(priority, excluded.priority), "
+    "available_at = CASE WHEN status = 'queued' THEN MIN(available_at, excluded.available_at) ELSE available_at END, "
+    "updated_at = excluded.updated_at"
+)
+
+
+def _job(row: aiosqlite.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["guild_id"] = int(job["guild_id"]) if job["guild_id"] else None
+    job["user_id"] = int(job["user_id"]) if str(job["user_id"]).isdigit() else job["user_id"]
+    return job
+
+
+class JobQueue:
+    """
+    Durable work queue on SQLite (WAL), safe to share between processes.
+
+    Jobs are deduplicated per (kind, user_id, guild_id) while queued or running.
+    claim() atomically leases the highest-priority ready jobs to one worker; a lease
+    that is not completed within `lease_sec` (worker crashed) makes the job claimable
+    again. fail() retries with exponential backoff until `max_attempts` is reached.
+    """
+
+    def __init__(self, db_path: str = JOB_QUEUE_DB_PATH) -> None:
+        self._db_path = db_path
+        self._db: Optional[aiosqlite.Connection] = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    async def open(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._open_lock:
+            if self._db is None:
+                os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+                db = await aiosqlite.connect(self._db_path, isolation_level=None)
+                db.row_factory = aiosqlite.Row
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.execute("PRAGMA busy_timeout=5000")
+                await db.executescript(SCHEMA)
+                self._db = db
+        return self._db
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def enqueue(
+        self,
+        kind: str,
+        user_id: Any,
+        guild_id: Any = None,
+        priority: int = PRIORITY_BACKGROUND,
+        delay_sec: float = 0.0,
+    ) -> None:
+        await self.enqueue_many(kind, [(user_id, guild_id)], priority=priority, delay_sec=delay_sec)
+
+    async def enqueue_many(
+        self,
+        kind: str,
+        targets: Iterable[Tuple[Any, Any]],
+        priority: int = PRIORITY_BACKGROUND,
+        delay_sec: float = 0.0,
+    ) -> int:
+        """Enqueue (user_id, guild_id) pairs in one transaction. Returns the number of rows touched."""
+        now = time.time()
+        rows = [
+            (kind, str(uid), str(gid) if gid else "", priority, JOB_MAX_ATTEMPTS, now + delay_sec, now, now)
+            for uid, gid in targets
+        ]
+        if not rows:
+            return 0
+        db = await self.open()
+        async with self._write_lock:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                await db.executemany(_UPSERT, rows)
+                await db.execute("COMMIT")
+            except BaseException:
+                await db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    async def claim(
+        self,
+        kind: str,
+        worker_id: str,
+        guild_ids: Optional[Iterable[Any]] = None,
+        limit: int = 1,
+        lease_sec: float = JOB_LEASE_SEC,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` ready jobs to `worker_id`. With `guild_ids`, only jobs for
+        those guilds (or without a guild) are claimed, so each bot takes the work it can do.
+        """
+        now = time.time()
+        sql = (
+            "SELECT id FROM jobs WHERE kind = ? AND "
+            "((status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_until < ?))"
+        )
+        params: List[Any] = [kind, now, now]
+        if guild_ids is not None:
+            sql += " AND (guild_id = '' OR guild_id IN (SELECT value FROM json_each(?)))"
+            params.append(json.dumps([str(g) for g in guild_ids]))
+        sql += " ORDER BY priority DESC, available_at, id LIMIT ?"
+        params.append(max(1, limit))
+
+        db = await self.open()
+        async with self._write_lock:
+            # BEGIN IMMEDIATE takes the database write lock up front, so two processes
+            # can never select and lease the same row.
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease expired on their last allowed attempt are given up on.
+                await db.execute(
+                    "UPDATE jobs SET status = 'failed', lease_until = NULL, last_error = 'lease expired', updated_at = ? "
+                    "WHERE kind = ? AND status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, kind, now),
+                )
+                async with db.execute(sql, params) as cur:
+                    ids = [row[0] for row in await cur.fetchall()]
+                jobs: List[Dict[str, Any]] = []
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    await db.execute(
+                        f"UPDATE jobs SET status = 'running', attempts = attempts + 1, claimed_by = ?, "
+                        f"lease_until = ?, updated_at = ? WHERE id IN ({marks})",
+                        (worker_id, now + lease_sec, now, *ids),
+                    )
+                    async with db.execute(
+                        f"SELECT * FROM jobs WHERE id IN ({marks}) ORDER BY priority DESC, available_at, id", ids
+                    ) as cur:
+                        jobs = [_job(row) for row in await cur.fetchall()]
+                await db.execute("COMMIT")
+            except BaseException:
+                await db.execute("ROLLBACK")
+                raise
+        return jobs
+
+    async def complete(self, job_id: int, result: Optional[str] = None) -> None:
+        await self._finish(
+            "UPDATE jobs SET status = 'done', lease_until = NULL, result = ?, updated_at = ? WHERE id = ?",
+            (result, time.time(), job_id),
+        )
+
+    async def fail(self, job_id: int, error: str) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried (after backoff)."""
+        db = await self.open()
+        async with db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            return False
+        attempts, max_attempts = row[0], row[1]
+        now = time.time()
+        if attempts >= max_attempts:
+            await self._finish(
+                "UPDATE jobs SET status = 'failed', lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                (error[:1000], now, job_id),
+            )
+            return False
+        delay = min(JOB_RETRY_MAX_SEC, JOB_RETRY_BASE_SEC * (2 ** max(0, attempts - 1)))
+        await self._finish(
+            "UPDATE jobs SET status = 'queued', lease_until = NULL, claimed_by = NULL, last_error = ?, "
+            "available_at = ?, updated_at = ? WHERE id = ?",
+            (error[:1000], now + delay, now, job_id),
+        )
+        return True
+
+    async def _finish(self, sql: str, params: Tuple[Any, ...]) -> None:
+        db = await self.open()
+        async with self._write_lock:
+            await db.execute(sql, params)
+
+    async def prune(self, keep_sec: float = JOB_KEEP_FINISHED_SEC) -> int:
+        """Delete finished (done/failed) jobs older than `keep_sec`."""
+        db = await self.open()
+        async with self._write_lock:
+            cur = await db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (time.time() - keep_sec,)
+            )
+        return cur.rowcount
+
+    async def counts(self, kind: Optional[str] = None) -> Dict[str, int]:
+        """Number of jobs per status."""
+        db = await self.open()
+        sql = "SELECT status, COUNT(*) FROM jobs"
+        params: Tuple[Any, ...] = ()
+        if kind:
+            sql += " WHERE kind = ?"
+            params = (kind,)
+        async with db.execute(sql + " GROUP BY status", params) as cur:
+            return {row[0]: row[1] for row in await cur.fetchall()}
+
+    async def import_legacy_json(self, kind: str, path: str) -> int:
+        """Enqueue the entries of an old optimize_queue.json and rename it to *.migrated."""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            entries = json.loads(content) if content.strip() else []
+        except Exception as e:
+            logger.warning(f"JobQueue: Could not read legacy queue {path}: {e}")
+            return 0
+        targets = [(e["user_id"], e.get("guild_id")) for e in entries if isinstance(e, dict) and e.get("user_id")]
+        count = await self.enqueue_many(kind, targets)
+        try:
+            os.replace(path, path + ".migrated")
+        except OSError as e:
+            logger.warning(f"JobQueue: Could not rename legacy queue {path}: {e}")
+        return count
+
+
+_shared: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue on JOB_QUEUE_DB_PATH (used by the web dashboard)."""
+    global _shared
+    if _shared is None:
+        _shared = JobQueue(JOB_QUEUE_DB_PATH)
+    return _shared
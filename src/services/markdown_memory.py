@@ -2,7 +2,7 @@
 import logging
 import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import aiofiles
 
@@ -63,13 +63,25 @@ class MarkdownMemory:
             
         logger.info(f"Saved persistent memory to {filename}")
 
+    def _format_block(self, role: str, content: str, timestamp: str) -> str:
+        icon = "👤" if role == "user" else "🤖"
+        return f"\n### {icon} {role.capitalize()} ({timestamp})\n{content}\n"
+
     async def append_message(self, session_id: str, role: str, content: str):
         """Appends a single message to the active session file."""
         filename = self._get_filename(session_id)
         timestamp = datetime.now().strftime("%H:%M:%S")
-        icon = "👤" if role == "user" else "🤖"
-        
-        block = f"\n### {icon} {role.capitalize()} ({timestamp})\n{content}\n"
+        block = self._format_block(role, content, timestamp)
         
         async with aiofiles.open(filename, "a", encoding="utf-8") as f:
             await f.write(block)
+
+    async def append_messages(self, session_id: str, messages: List[Tuple[str, str, str]]):
+        """Appends several (role, content, HH:MM:SS timestamp) messages with a single write."""
+        if not messages:
+            return
+        filename = self._get_filename(session_id)
+        blocks = "".join(self._format_block(role, content, ts) for role, content, ts in messages)
+
+        async with aiofiles.open(filename, "a", encoding="utf-8") as f:
+            await f.write(blocks)
@@ -0,0 +1,568 @@
+"""SQLite-backed user profile store (replaces per-user JSON files under memory/users)."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import copy
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from src.services.user_index import (
+    INDEX_SCHEMA,
+    LAST_ACTIVE_RESOLUTION_SEC,
+    SUMMARY_FIELDS,
+    TOUCH_INDEX,
+    UPSERT_INDEX,
+    index_row,
+    summarize,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    from src.config import MEMORY_DIR
+except Exception:
+    MEMORY_DIR = os.path.join(os.getcwd(), "data", "memory")
+
+PROFILE_DB_PATH = os.getenv("ORA_PROFILE_DB") or os.path.join(MEMORY_DIR, "profiles.sqlite3")
+PROFILE_HISTORY_LIMIT = 100
+PROFILE_CACHE_SIZE = int(os.getenv("ORA_PROFILE_CACHE_SIZE", "4096") or "4096")
+PROFILE_CACHE_TTL_SEC = float(os.getenv("ORA_PROFILE_CACHE_TTL_SEC", "300") or "300")
+# Per-scope generation counters are striped so memory stays bounded however many users are seen.
+PROFILE_CACHE_GENERATION_STRIPES = 1024
+# Entries kept in profile_changes; a reader that falls further behind resynchronizes from scratch.
+PROFILE_CHANGE_LOG_SIZE = int(os.getenv("ORA_PROFILE_CHANGE_LOG_SIZE", "10000") or "10000")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+  profile_key TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  guild_id TEXT,
+  scope TEXT NOT NULL,
+  updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_user ON profiles(user_id);
+CREATE INDEX IF NOT EXISTS idx_profiles_updated ON profiles(updated_at);
+
+-- One row per top-level profile field (JSON encoded), so updates touch only what changed.
+CREATE TABLE IF NOT EXISTS profile_fields (
+  profile_key TEXT NOT NULL,
+  field TEXT NOT NULL,
+  value TEXT NOT NULL,
+  updated_at REAL NOT NULL,
+  PRIMARY KEY (profile_key, field)
+) WITHOUT ROWID;
+
+-- Append-only message history (formerly profile["raw_history"]).
+CREATE TABLE IF NOT EXISTS profile_history (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  profile_key TEXT NOT NULL,
+  ts TEXT,
+  entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profile_history_key ON profile_history(profile_key, id);
+
+-- Keys touched by each committed write (fields or history), in commit order, so other
+-- processes can invalidate their caches. Writes hold the database write lock until commit,
+-- so seq order is commit order; AUTOINCREMENT never reuses a seq after pruning.
+CREATE TABLE IF NOT EXISTS profile_changes (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  profile_key TEXT NOT NULL,
+  writer TEXT NOT NULL
+);
+"""
+
+
+def parse_profile_key(key: str) -> Tuple[str, Optional[str], str]:
+    """
+    Split a legacy file stem into (user_id, guild_id, scope).
+    "123" -> ("123", None, "global"), "123_456_public" -> ("123", "456", "public"),
+    "123_456" -> ("123", "456", "public").
+    """
+    parts = key.split("_")
+    user_id = parts[0]
+    if len(parts) == 1:
+        return user_id, None, "global"
+    scope = "public"
+    if parts[-1] in ("public", "private"):
+        scope = parts.pop()
+    return user_id, "_".join(parts[1:]) or None, scope
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _clone(profile: Any) -> Any:
+    """Copy handed to/from the cache: callers mutate profiles before saving them back."""
+    if not isinstance(profile, dict):
+        return copy.deepcopy(profile)
+    history = profile.get("raw_history")
+    out = copy.deepcopy({k: v for k, v in profile.items() if k != "raw_history"})
+    if history is not None:
+        out["raw_history"] = list(history)  # Entries are append-only; a shallow copy is enough.
+    return out
+
+
+class ProfileCache:
+    """
+    Bounded LRU + TTL cache of parsed (and pre-merged) profiles.
+
+    Keys are tuples such as ("user", user_id, guild_id, view), ("channel", id) and
+    ("guild", id). Misses (None) are cached too. Loaders take generation_for(key)
+    before reading and pass it to put(); an invalidation of the same scope (the key's
+    first two parts) in between makes put() a no-op, so a load that raced with a write
+    never repopulates the cache with stale data. Loads of other scopes are unaffected.
+    """
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE, ttl_sec: float = PROFILE_CACHE_TTL_SEC):
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.generation = 0  # Bumped by invalidations that are not limited to one scope.
+        self._scope_generations = [0] * PROFILE_CACHE_GENERATION_STRIPES
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.history_patches = 0
+
+    @staticmethod
+    def _stripe(scope: Hashable) -> int:
+        return hash(scope) % PROFILE_CACHE_GENERATION_STRIPES
+
+    def generation_for(self, key: Hashable) -> Tuple[int, int]:
+        """Token for put(): changes when `key`'s scope (or the whole cache) is invalidated."""
+        return self.generation, self._scope_generations[self._stripe(key[:2])]
+
+    def _bump(self, scope: Optional[Hashable]) -> None:
+        if scope is None:
+            self.generation += 1
+        else:
+            self._scope_generations[self._stripe(scope)] += 1
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Returns (hit, profile copy)."""
+        entry = self._entries.get(key)
+        if entry is None or self.ttl_sec <= 0 or time.monotonic() - entry[0] > self.ttl_sec:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, _clone(entry[1])
+
+    def put(self, key: Hashable, profile: Any, generation: Optional[Tuple[int, int]] = None) -> None:
+        if self.ttl_sec <= 0 or (generation is not None and generation != self.generation_for(key)):
+            return
+        self._entries[key] = (time.monotonic(), _clone(profile))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, match, scope: Optional[Hashable] = None) -> int:
+        """
+        Drop every key for which `match(key)` is true. `scope` (e.g. ("user", user_id))
+        limits which in-flight loads are rejected; every matched key must be in it.
+        """
+        self._bump(scope)
+        self.invalidations += 1
+        stale = [k for k in self._entries if match(k)]
+        for k in stale:
+            del self._entries[k]
+        return len(stale)
+
+    def invalidate_profile_key(self, profile_key: str) -> int:
+        """Invalidate cached views derived from a store key ("uid", "uid_gid_public", ...)."""
+        user_id, guild_id, _ = parse_profile_key(profile_key)
+        return self.invalidate(
+            lambda k: k[0] == "user" and k[1] == user_id and (guild_id is None or k[2] in (guild_id, "")),
+            scope=("user", user_id),
+        )
+
+    def append_history(self, profile_key: str, entries: List[Dict[str, Any]], limit: int = PROFILE_HISTORY_LIMIT) -> int:
+        """
+        Patch entries just appended to `profile_key`'s history into its cached views
+        (keeping the newest `limit`, like ProfileStore.get) instead of dropping them.
+        Returns the number of views patched.
+        """
+        user_id, guild_id, scope = parse_profile_key(profile_key)
+        if scope == "private":
+            return 0  # Views take raw_history from the public / global profile only.
+        self._bump(("user", user_id))  # A load that read history before the append is stale.
+        patched = 0
+        for k in [k for k in self._entries if k[0] == "user" and k[1] == user_id and k[2] == (guild_id or "")]:
+            ts, profile = self._entries[k]
+            if isinstance(profile, dict) and isinstance(profile.get("raw_history"), list):
+                profile["raw_history"] = (profile["raw_history"] + list(entries))[-limit:]
+                patched += 1
+            else:
+                del self._entries[k]  # Cached miss / skeleton: the append just created the profile.
+        self.history_patches += patched
+        return patched
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "history_patches": self.history_patches,
+        }
+
+
+class ProfileStore:
+    """
+    Transactional profile storage on SQLite (WAL).
+
+    Profiles are addressed by the legacy file stem (e.g. "123_456_public") so the cog
+    can switch storage without changing how it names profiles. Field writes are
+    row-level upserts of changed fields only; message history is a separate
+    append-only table and reads return the most recent PROFILE_HISTORY_LIMIT entries
+    as "raw_history".
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self._db_path = db_path
+        self._db: Optional[aiosqlite.Connection] = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._known: set[str] = set()
+        self._writer = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"  # Tags this store's rows in profile_changes.
+
+    async def open(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._open_lock:
+            if self._db is None:
+                os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+                db = await aiosqlite.connect(self._db_path)
+                # WAL lets the worker process and the main bot read while one writes.
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.execute("PRAGMA busy_timeout=5000")
+                await db.executescript(SCHEMA + INDEX_SCHEMA)
+                await db.commit()
+                async with db.execute("SELECT profile_key FROM profiles") as cur:
+                    self._known = {row[0] for row in await cur.fetchall()}
+                await self._backfill_index(db)
+                self._db = db
+        return self._db
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def has(self, key: str) -> bool:
+        """Whether the profile exists (in-memory index, no I/O; valid after open())."""
+        return key in self._known
+
+    async def keys(self) -> List[str]:
+        db = await self.open()
+        async with db.execute("SELECT profile_key FROM profiles ORDER BY profile_key") as cur:
+            return [row[0] for row in await cur.fetchall()]
+
+    async def get(self, key: str, history_limit: int = PROFILE_HISTORY_LIMIT) -> Optional[Dict[str, Any]]:
+        db = await self.open()
+        if key not in self._known:
+            # Another process (worker mode) may have created it since open().
+            async with db.execute("SELECT 1 FROM profiles WHERE profile_key = ?", (key,)) as cur:
+                if await cur.fetchone() is None:
+                    return None
+            self._known.add(key)
+        async with db.execute("SELECT field, value FROM profile_fields WHERE profile_key = ?", (key,)) as cur:
+            profile: Dict[str, Any] = {field: json.loads(value) for field, value in await cur.fetchall()}
+        if history_limit > 0:
+            profile["raw_history"] = await self.history(key, limit=history_limit)
+        return profile
+
+    async def history(self, key: str, limit: int = PROFILE_HISTORY_LIMIT, since_ts: Optional[str] = None) -> List[dict]:
+        """Most recent history entries (oldest first), optionally only those with ts >= since_ts."""
+        db = await self.open()
+        sql = "SELECT entry FROM profile_history WHERE profile_key = ?"
+        params: List[Any] = [key]
+        if since_ts:
+            sql += " AND ts >= ?"
+            params.append(since_ts)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        async with db.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    async def change_seq(self) -> int:
+        """Current high-water mark of profile_changes (start point for changes_since)."""
+        db = await self.open()
+        async with db.execute("SELECT COALESCE(MAX(seq), 0) FROM profile_changes") as cur:
+            return (await cur.fetchone())[0]
+
+    async def changes_since(self, seq: int) -> Tuple[int, Optional[List[str]]]:
+        """
+        (new high-water mark, keys other writers changed after `seq`). The key list is None
+        when the log was pruned past `seq`, i.e. the caller must drop everything it cached.
+        """
+        db = await self.open()
+        async with db.execute(
+            "SELECT seq, profile_key, writer FROM profile_changes WHERE seq > ? ORDER BY seq", (seq,)
+        ) as cur:
+            rows = await cur.fetchall()
+        if not rows:
+            return seq, []
+        if rows[0][0] > seq + 1:
+            return rows[-1][0], None  # Seqs are contiguous (rolled-back writes release theirs): a gap means pruning.
+        keys = list(dict.fromkeys(key for _, key, writer in rows if writer != self._writer))
+        return rows[-1][0], keys
+
+    async def find(self, field: str, values: Iterable[Any]) -> List[str]:
+        """Keys of profiles whose `field` equals one of `values`."""
+        db = await self.open()
+        encoded = [_dumps(v) for v in values]
+        if not encoded:
+            return []
+        marks = ",".join("?" * len(encoded))
+        async with db.execute(
+            f"SELECT profile_key FROM profile_fields WHERE field = ? AND value IN ({marks})", (field, *encoded)
+        ) as cur:
+            return [row[0] for row in await cur.fetchall()]
+
+    async def _backfill_index(self, db: aiosqlite.Connection) -> None:
+        """Migration: summary rows for profiles written before profile_index existed."""
+        async with db.execute(
+            "SELECT p.profile_key, p.updated_at FROM profiles p "
+            "LEFT JOIN profile_index i ON i.profile_key = p.profile_key WHERE i.profile_key IS NULL"
+        ) as cur:
+            missing = dict(await cur.fetchall())
+        if not missing:
+            return
+        marks = ",".join("?" * len(SUMMARY_FIELDS))
+        fields: Dict[str, Dict[str, Any]] = {key: {} for key in missing}
+        async with db.execute(
+            f"SELECT profile_key, field, value FROM profile_fields WHERE field IN ({marks})", SUMMARY_FIELDS
+        ) as cur:
+            async for key, field, value in cur:
+                if key in fields:
+                    fields[key][field] = json.loads(value)
+        now = time.time()
+        await db.executemany(
+            UPSERT_INDEX, [index_row(summarize(key, fields[key]), missing[key], now) for key in missing]
+        )
+        await db.commit()
+        logger.info(f"ProfileStore: indexed {len(missing)} profiles for the dashboard")
+
+    async def _reindex(self, db: aiosqlite.Connection, key: str, now: float) -> None:
+        """Rebuild the summary row of `key` from its stored fields (same transaction as the write)."""
+        marks = ",".join("?" * len(SUMMARY_FIELDS))
+        async with db.execute(
+            f"SELECT field, value FROM profile_fields WHERE profile_key = ? AND field IN ({marks})",
+            (key, *SUMMARY_FIELDS),
+        ) as cur:
+            fields = {field: json.loads(value) for field, value in await cur.fetchall()}
+        await db.execute(UPSERT_INDEX, index_row(summarize(key, fields), now, now))
+
+    async def _touch_index(self, db: aiosqlite.Connection, keys: Iterable[str], now: float) -> None:
+        """Record activity (a history append) on existing summary rows, at LAST_ACTIVE_RESOLUTION_SEC granularity."""
+        await db.executemany(TOUCH_INDEX, [(now, now, key, now - LAST_ACTIVE_RESOLUTION_SEC) for key in keys])
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self):
+        """
+        Hold the write lock for one transaction on the shared connection: commit on success,
+        roll back and re-raise on any error so a failed write never leaks into the next commit.
+        """
+        db = await self.open()
+        async with self._write_lock:
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+
+    async def _log_changes(self, db: aiosqlite.Connection, keys: Iterable[str]) -> None:
+        """Record the keys this transaction wrote (see changes_since) and trim the log."""
+        await db.executemany(
+            "INSERT INTO profile_changes(profile_key, writer) VALUES (?, ?)", [(key, self._writer) for key in keys]
+        )
+        await db.execute(
+            "DELETE FROM profile_changes WHERE seq <= (SELECT MAX(seq) FROM profile_changes) - ?",
+            (PROFILE_CHANGE_LOG_SIZE,),
+        )
+
+    async def _ensure_row(self, db: aiosqlite.Connection, key: str, now: float) -> bool:
+        if key in self._known:
+            return False
+        user_id, guild_id, scope = parse_profile_key(key)
+        cur = await db.execute(
+            "INSERT OR IGNORE INTO profiles(profile_key, user_id, guild_id, scope, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (key, user_id, guild_id, scope, now),
+        )
+        return cur.rowcount == 1
+
+    async def save(self, key: str, data: Dict[str, Any]) -> bool:
+        """
+        Store a whole profile dict, writing only fields whose value changed and deleting
+        fields that disappeared. `raw_history` is imported only when the profile is new
+        (migration); afterwards history is written exclusively via append_history().
+        Returns True if anything changed.
+        """
+        now = time.time()
+        fields = {k: _dumps(v) for k, v in data.items() if k != "raw_history"}
+        async with self._transaction() as db:
+            created = await self._ensure_row(db, key, now)
+            async with db.execute("SELECT field, value FROM profile_fields WHERE profile_key = ?", (key,)) as cur:
+                current = dict(await cur.fetchall())
+            upserts = [(key, f, v, now) for f, v in fields.items() if current.get(f) != v]
+            removed = [(key, f) for f in current if f not in fields]
+            if upserts:
+                await db.executemany(
+                    "INSERT INTO profile_fields(profile_key, field, value, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(profile_key, field) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                    upserts,
+                )
+            if removed:
+                await db.executemany("DELETE FROM profile_fields WHERE profile_key = ? AND field = ?", removed)
+            if created and isinstance(data.get("raw_history"), list):
+                await db.executemany(
+                    "INSERT INTO profile_history(profile_key, ts, entry) VALUES (?, ?, ?)",
+                    [(key, str(e.get("timestamp", "")), _dumps(e)) for e in data["raw_history"] if isinstance(e, dict)],
+                )
+            changed = bool(created or upserts or removed)
+            if changed:
+                await db.execute("UPDATE profiles SET updated_at = ? WHERE profile_key = ?", (now, key))
+                await db.execute(UPSERT_INDEX, index_row(summarize(key, data), now, now))
+                await self._log_changes(db, [key])
+        self._known.add(key)
+        return changed
+
+    async def update_fields(self, key: str, fields: Dict[str, Any]) -> None:
+        """Upsert individual fields without reading the rest of the profile."""
+        now = time.time()
+        async with self._transaction() as db:
+            await self._ensure_row(db, key, now)
+            await db.executemany(
+                "INSERT INTO profile_fields(profile_key, field, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(profile_key, field) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                [(key, f, _dumps(v), now) for f, v in fields.items() if f != "raw_history"],
+            )
+            await db.execute("UPDATE profiles SET updated_at = ? WHERE profile_key = ?", (now, key))
+            await self._reindex(db, key, now)
+            await self._log_changes(db, [key])
+        self._known.add(key)
+
+    async def append_history(
+        self, key: str, entry: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Append one message to the profile history (a single INSERT). `defaults` seed a new profile."""
+        now = time.time()
+        async with self._transaction() as db:
+            if await self._ensure_row(db, key, now):
+                if defaults:
+                    await db.executemany(
+                        "INSERT OR IGNORE INTO profile_fields(profile_key, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                        [(key, f, _dumps(v), now) for f, v in defaults.items() if f != "raw_history"],
+                    )
+                await self._reindex(db, key, now)
+            else:
+                await self._touch_index(db, [key], now)
+            await db.execute(
+                "INSERT INTO profile_history(profile_key, ts, entry) VALUES (?, ?, ?)",
+                (key, str(entry.get("timestamp", "")), _dumps(entry)),
+            )
+            await self._log_changes(db, [key])
+        self._known.add(key)
+
+    async def append_history_batch(
+        self, batch: Dict[str, List[Dict[str, Any]]], defaults: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Append many entries for many profiles in one transaction (one commit).
+        `defaults` maps profile key -> fields used to seed profiles that do not exist yet.
+        """
+        now = time.time()
+        defaults = defaults or {}
+        rows: List[Tuple[str, str, str]] = []
+        existing: List[str] = []
+        # A failed batch is rolled back so the write-behind retry starts from a clean transaction.
+        async with self._transaction() as db:
+            for key, entries in batch.items():
+                if await self._ensure_row(db, key, now):
+                    if defaults.get(key):
+                        await db.executemany(
+                            "INSERT OR IGNORE INTO profile_fields(profile_key, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                            [(key, f, _dumps(v), now) for f, v in defaults[key].items() if f != "raw_history"],
+                        )
+                    await self._reindex(db, key, now)
+                else:
+                    existing.append(key)
+                rows.extend((key, str(e.get("timestamp", "")), _dumps(e)) for e in entries)
+            await self._touch_index(db, existing, now)
+            await db.executemany("INSERT INTO profile_history(profile_key, ts, entry) VALUES (?, ?, ?)", rows)
+            await self._log_changes(db, batch.keys())
+        self._known.update(batch.keys())
+        return len(rows)
+
+    async def prune_history(self, keep: int = PROFILE_HISTORY_LIMIT * 5) -> int:
+        """Trim each profile's history to its newest `keep` entries. Returns rows deleted."""
+        db = await self.open()
+        async with self._write_lock:
+            cur = await db.execute(
+                "DELETE FROM profile_history WHERE id IN ("
+                " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY profile_key ORDER BY id DESC) AS rn"
+                " FROM profile_history) WHERE rn > ?)",
+                (keep,),
+            )
+            await db.commit()
+            return cur.rowcount or 0
+
+    async def import_json_dir(self, directory: str, overwrite: bool = False) -> Dict[str, int]:
+        """
+        Import a legacy USER_MEMORY_DIR tree ({user_id}[_{guild_id}[_public|_private]].json).
+        Profiles already in the store are skipped unless overwrite=True.
+        """
+        await self.open()
+        stats = {"imported": 0, "skipped": 0, "failed": 0, "history": 0}
+        if not os.path.isdir(directory):
+            return stats
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json") or not name.split("_")[0].isdigit():
+                continue
+            key = name[:-5]
+            if key in self._known and not overwrite:
+                stats["skipped"] += 1
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("profile is not an object")
+                if overwrite and key in self._known:
+                    await self._delete(key)
+                await self.save(key, data)
+                stats["imported"] += 1
+                stats["history"] += len(data.get("raw_history") or [])
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning(f"ProfileStore: failed to import {name}: {e}")
+        return stats
+
+    async def _delete(self, key: str) -> None:
+        async with self._transaction() as db:
+            for table in ("profile_history", "profile_fields", "profiles", "profile_index"):
+                await db.execute(f"DELETE FROM {table} WHERE profile_key = ?", (key,))
+            await self._log_changes(db, [key])
+        self._known.discard(key)
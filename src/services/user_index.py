@@ -0,0 +1,534 @@
+"""
+Dashboard user index: one summary row per profile, maintained by ProfileStore in the
+same transaction as the profile write, and the /dashboard/users view built from it
+(merged with Discord presence and per-user cost).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_index (
+  profile_key TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  display_name TEXT NOT NULL,
+  guild_name TEXT NOT NULL,
+  status TEXT NOT NULL,
+  trait_count INTEGER NOT NULL,
+  message_count INTEGER NOT NULL,
+  last_updated TEXT NOT NULL,
+  last_active REAL NOT NULL,
+  detail TEXT NOT NULL,
+  updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profile_index_updated ON profile_index(updated_at);
+"""
+
+# Profile fields the summary is built from (everything else, e.g. raw_history, is ignored).
+SUMMARY_FIELDS = (
+    "discord_user_id",
+    "name",
+    "guild_name",
+    "status",
+    "traits",
+    "message_count",
+    "last_context",
+    "last_updated",
+    "impression",
+    "banner",
+    "layer2_user_memory",
+)
+
+UPSERT_INDEX = """
+INSERT INTO profile_index (
+  profile_key, user_id, display_name, guild_name, status, trait_count, message_count,
+  last_updated, last_active, detail, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (profile_key) DO UPDATE SET
+  user_id = excluded.user_id,
+  display_name = excluded.display_name,
+  guild_name = excluded.guild_name,
+  status = excluded.status,
+  trait_count = excluded.trait_count,
+  message_count = excluded.message_count,
+  last_updated = excluded.last_updated,
+  last_active = MAX(last_active, excluded.last_active),
+  detail = excluded.detail,
+  updated_at = excluded.updated_at
+"""
+
+# History appends move last_active at most this often (keeps index churn and ETag changes bounded).
+LAST_ACTIVE_RESOLUTION_SEC = 60
+TOUCH_INDEX = "UPDATE profile_index SET last_active = ?, updated_at = ? WHERE profile_key = ? AND last_active < ?"
+
+SORT_KEYS = ("last_active", "name", "usd", "traits", "status", "guild")
+
+
+def summarize(key: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Dashboard summary of one profile (file stem `key`)."""
+    traits = profile.get("traits") or []
+    if not isinstance(traits, list):
+        traits = []
+    layer2 = profile.get("layer2_user_memory")
+    return {
+        "profile_key": key,
+        "user_id": str(profile.get("discord_user_id") or key.split("_")[0]),
+        "display_name": str(profile.get("name") or "Unknown"),
+        "guild_name": str(profile.get("guild_name") or "Unknown Server"),
+        # Respect saved status
+        "status": str(profile.get("status") or ("Optimized" if traits else "New")),
+        "trait_count": len(traits),
+        "message_count": int(profile.get("message_count") or len(profile.get("last_context") or [])),
+        "last_updated": str(profile.get("last_updated") or ""),
+        "traits": traits,
+        "impression": profile.get("impression"),
+        "banner": profile.get("banner"),
+        "deep_analysis": layer2.get("deep_analysis") if isinstance(layer2, dict) else None,
+    }
+
+
+def index_row(summary: Dict[str, Any], last_active: float, now: float) -> Tuple[Any, ...]:
+    detail = {k: summary[k] for k in ("traits", "impression", "banner", "deep_analysis")}
+    return (
+        summary["profile_key"],
+        summary["user_id"],
+        summary["display_name"],
+        summary["guild_name"],
+        summary["status"],
+        summary["trait_count"],
+        summary["message_count"],
+        summary["last_updated"],
+        last_active,
+        json.dumps(detail, ensure_ascii=False),
+        now,
+    )
+
+
+# --- Dashboard view (web process, synchronous; run it in a worker thread) ---
+
+
+def _guild_name(discord_state: Dict[str, Any], guild_id: Optional[str]) -> str:
+    guilds = discord_state.get("guilds", {})
+    if guild_id and guild_id in guilds:
+        return guilds[guild_id]
+    return "Unknown Server"
+
+
+def _status_score(status: str) -> int:
+    # Deduplication Logic: Prioritize Processing (Show activity) > Optimized > Error > New
+    return {"processing": 2500, "optimized": 2000, "error": 1000}.get(status.lower(), 0)
+
+
+def merge_dashboard_users(
+    profiles: Iterable[Dict[str, Any]],
+    discord_state: Dict[str, Any],
+    usage_today: Dict[str, Dict[str, Any]],
+    usage_ever: Dict[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    The /dashboard/users list: profile summaries, users with cost activity but no profile
+    and users only seen in Discord, one entry per (user, guild), with presence and
+    today's cost usage injected.
+    """
+    d_users = discord_state.get("users", {})
+    users: List[Dict[str, Any]] = []
+
+    for p in profiles:
+        uid = p["profile_key"]
+        real_id = p["user_id"]
+        d_user = d_users.get(real_id, {})
+        display_name = p["display_name"]
+        # Prefer the live Discord name over generic placeholders ("Unknown", "User_<id>", bare ids).
+        if (
+            display_name in ("Unknown", "") or display_name.startswith("User_") or display_name.isdigit()
+        ) and d_user.get("name"):
+            display_name = d_user["name"]
+        guild_name = p["guild_name"]
+        if guild_name == "Unknown Server":
+            # Guild from the profile key (UID_GID[_scope]), then from the user's Discord state.
+            parts = uid.split("_")
+            if len(parts) >= 2:
+                guild_name = _guild_name(discord_state, parts[1])
+            if guild_name == "Unknown Server":
+                guild_name = _guild_name(discord_state, d_user.get("guild_id"))
+        users.append(
+            {
+                "discord_user_id": uid,
+                "real_user_id": real_id,
+                "display_name": display_name,
+                "created_at": p["last_updated"],
+                "last_active": p.get("last_active") or None,
+                "points": p["trait_count"],
+                "message_count": p["message_count"],
+                "status": p["status"],
+                "impression": p.get("impression"),
+                "guild_name": guild_name,
+                "banner": p.get("banner"),
+                "traits": p.get("traits") or [],
+                "deep_analysis": p.get("deep_analysis"),
+                "is_nitro": d_user.get("is_nitro", False),
+                "_sort_score": _status_score(p["status"]) + p["trait_count"],
+            }
+        )
+
+    # Use a set of (REAL User ID, Guild Name) to allow same user in different guilds
+    existing_keys = {(str(u["real_user_id"]), u["guild_name"]) for u in users}
+
+    # Users who have cost activity but NO profile yet
+    for uid in usage_ever:
+        real_uid = uid.split("_")[0]
+        d_user = d_users.get(real_uid, {})
+        guild_name = _guild_name(discord_state, d_user.get("guild_id"))
+        if (real_uid, guild_name) in existing_keys:
+            continue
+        users.append(
+            {
+                "discord_user_id": uid,  # Keep original ID for cost lookup
+                "real_user_id": real_uid,
+                "display_name": d_user.get("name", f"User {real_uid}"[:12] + "..."),
+                "created_at": "",
+                "last_active": None,
+                "points": 0,
+                "status": "New",
+                "impression": "No memory data yet",
+                "guild_name": guild_name,
+                "banner": d_user.get("banner"),
+                "traits": [],
+                "is_nitro": d_user.get("is_nitro", False),
+                "_sort_score": 0,
+            }
+        )
+        existing_keys.add((real_uid, guild_name))
+
+    # Active Discord users without cost or memory
+    for d_uid, d_user in d_users.items():
+        guild_name = _guild_name(discord_state, d_user.get("guild_id"))
+        if (str(d_uid), guild_name) in existing_keys:
+            continue
+        users.append(
+            {
+                "discord_user_id": d_uid,
+                "real_user_id": d_uid,
+                "display_name": d_user.get("name", "Unknown"),
+                "created_at": "",
+                "last_active": None,
+                "points": 0,
+                "status": "Online" if d_user.get("status") != "offline" else "Offline",
+                "impression": "Active in Discord",
+                "guild_name": guild_name,
+                "banner": d_user.get("banner"),
+                "traits": [],
+                "is_nitro": d_user.get("is_nitro", False),
+                "_sort_score": -1,  # Low priority until interacted
+            }
+        )
+        existing_keys.add((str(d_uid), guild_name))
+
+    # Presence, avatar / banner URLs and cost usage
+    for u in users:
+        uid = u["discord_user_id"]
+        target_uid = str(u["real_user_id"])
+        d_user = d_users.get(target_uid, {})
+        u["discord_status"] = d_user.get("status", "offline")
+        u.setdefault("is_bot", d_user.get("is_bot", False))
+        if u["display_name"] == "Unknown" and d_user.get("name"):
+            u["display_name"] = d_user["name"]
+        u["avatar_url"] = (
+            f"https://cdn.discordapp.com/avatars/{target_uid}/{d_user.get('avatar')}.png"
+            if d_user.get("avatar")
+            else None
+        )
+        # Banner Prioritization: profile (Global/Memory) > Discord State (Live)
+        banner_key = u.get("banner") or d_user.get("banner")
+        u["banner_url"] = f"https://cdn.discordapp.com/banners/{target_uid}/{banner_key}.png" if banner_key else None
+
+        # If composite ID (UID_GID) has no usage, use the real user id.
+        cost_id = uid if uid in usage_ever else target_uid
+        today = usage_today.get(cost_id, {})
+        cost = {"high": 0, "stable": 0, "burn": 0, "total_usd": today.get("usd", 0.0)}
+        for lane, tokens in today.get("lanes", {}).items():
+            lane = lane.lower()
+            for name in ("high", "stable", "burn", "optimization"):
+                if lane.startswith(name):
+                    cost[name] = cost.get(name, 0) + tokens
+        u["cost_usage"] = cost
+
+        providers = usage_ever.get(cost_id, {}).get("providers", set())
+        if "openai" in providers:
+            u["mode"] = "API (Paid)"
+        elif "local" in providers or "gemini_trial" in providers:
+            u["mode"] = "Private (Local/Free)"
+        else:
+            u["mode"] = "Unknown"
+
+    # Deduplicate by (real_user_id, guild_name), keeping the entry with the highest score
+    unique: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for u in users:
+        key = (u["real_user_id"], u["guild_name"])
+        if key not in unique or u["_sort_score"] > unique[key]["_sort_score"]:
+            unique[key] = u
+    final_users = list(unique.values())
+    for u in final_users:
+        u.pop("_sort_score", None)
+
+    # Global Property Sync: banner / Nitro / impression are per user, not per guild.
+    global_props: Dict[str, Dict[str, Any]] = {}
+    for u in final_users:
+        rid = u["real_user_id"]
+        props = global_props.setdefault(rid, {"banner_url": None, "is_nitro": False, "impression": None})
+        if u.get("banner_url") and not props["banner_url"]:
+            props["banner_url"] = u["banner_url"]
+        if u.get("is_nitro"):
+            props["is_nitro"] = True
+        # The general profile's impression (ID == real ID) wins over guild profiles.
+        if u.get("impression") and (str(u["discord_user_id"]) == str(rid) or not props["impression"]):
+            props["impression"] = u["impression"]
+    for u in final_users:
+        props = global_props[u["real_user_id"]]
+        if props["banner_url"] and not u.get("banner_url"):
+            u["banner_url"] = props["banner_url"]
+        if props["is_nitro"]:
+            u["is_nitro"] = True
+        if props["impression"] and not u.get("impression"):
+            u["impression"] = props["impression"]
+    return final_users
+
+
+def query_users(
+    users: List[Dict[str, Any]],
+    *,
+    q: Optional[str] = None,
+    guild: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: str = "last_active",
+    descending: bool = True,
+    offset: int = 0,
+    limit: int = 0,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Filter (name / id substring, guild, status), sort and page. Returns (matching total, page)."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    rows = users
+    if q:
+        needle = q.casefold()
+        rows = [
+            u
+            for u in rows
+            if needle in str(u["display_name"]).casefold()
+            or needle in str(u["discord_user_id"])
+            or needle in str(u["real_user_id"])
+        ]
+    if guild:
+        rows = [u for u in rows if u["guild_name"] == guild]
+    if status:
+        wanted = status.casefold()
+        rows = [u for u in rows if str(u["status"]).casefold() == wanted]
+
+    def key(u: Dict[str, Any]) -> Any:
+        if sort == "last_active":
+            return u.get("last_active") or 0.0
+        if sort == "name":
+            return str(u["display_name"]).casefold()
+        if sort == "usd":
+            return u["cost_usage"]["total_usd"]
+        if sort == "traits":
+            return u["points"]
+        if sort == "status":
+            return _status_score(str(u["status"]))
+        return str(u["guild_name"]).casefold()
+
+    rows = sorted(rows, key=key, reverse=descending)
+    end = offset + limit if limit > 0 else None
+    return len(rows), rows[offset:end]
+
+
+class DashboardUserIndex:
+    """
+    Builds the merged user list for the dashboard from the profile index, cached in
+    memory until one of its inputs changes. version() is cheap (a few stats and
+    single-row queries) and doubles as the ETag source.
+    """
+
+    def __init__(
+        self,
+        profile_db: str,
+        usage_db: str,
+        memory_dir: str,
+        state_dir: str,
+        tz: str = "UTC",
+    ) -> None:
+        self.profile_db = profile_db
+        self.usage_db = usage_db
+        self.memory_dir = memory_dir
+        self.state_dir = state_dir
+        self.tz = tz
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[Any, ...]] = None
+        self._users: List[Dict[str, Any]] = []
+        self._legacy: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}  # path -> (mtime_ns, size, summary)
+        self.builds = 0
+
+    @property
+    def paths(self) -> Tuple[str, str, str, str]:
+        return (self.profile_db, self.usage_db, self.memory_dir, self.state_dir)
+
+    def _today(self) -> str:
+        import pytz  # type: ignore
+
+        return datetime.now(pytz.timezone(self.tz)).strftime("%Y-%m-%d")
+
+    def _legacy_files(self) -> List[os.DirEntry]:
+        """Profile JSON files the index does not cover: legacy MEMORY_DIR/{uid}.json (and users/ before the store exists)."""
+        dirs = [self.memory_dir]
+        if not os.path.exists(self.profile_db):
+            dirs.append(os.path.join(self.memory_dir, "users"))
+        entries = []
+        for directory in dirs:
+            try:
+                with os.scandir(directory) as it:
+                    entries.extend(e for e in it if e.name.endswith(".json") and e.is_file())
+            except OSError:
+                continue
+        return entries
+
+    def _connect(self, path: str) -> Optional[sqlite3.Connection]:
+        if not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def version(self) -> Tuple[Any, ...]:
+        today = self._today()
+        parts: List[Any] = [today]
+        conn = self._connect(self.profile_db)
+        if conn is not None:
+            try:
+                parts.extend(conn.execute("SELECT COUNT(*), MAX(updated_at) FROM profile_index").fetchone())
+            except sqlite3.OperationalError:
+                parts.append("no-index")  # Bot not upgraded yet: index table missing.
+            finally:
+                conn.close()
+        parts.append(tuple(sorted((e.path, e.stat().st_mtime_ns, e.stat().st_size) for e in self._legacy_files())))
+        try:
+            st = os.stat(os.path.join(self.state_dir, "discord_state.json"))
+            parts.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            parts.append(None)
+        conn = self._connect(self.usage_db)
+        if conn is not None:
+            try:
+                from src.utils.usage_series import UsageSeries
+
+                parts.append(UsageSeries(conn).version(today))
+            except sqlite3.OperationalError:
+                parts.append(None)
+            finally:
+                conn.close()
+        return tuple(parts)
+
+    @staticmethod
+    def etag(version: Tuple[Any, ...], *extra: Any) -> str:
+        digest = hashlib.sha1(repr((version, extra)).encode("utf-8")).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+    def users(self, version: Optional[Tuple[Any, ...]] = None) -> Tuple[Tuple[Any, ...], List[Dict[str, Any]]]:
+        """(version, merged users); rebuilt only when version() changed."""
+        with self._lock:
+            version = version or self.version()
+            if version != self._version:
+                started = time.perf_counter()
+                self._users = merge_dashboard_users(*self._load(version[0]))
+                self._version = version
+                self.builds += 1
+                logger.debug(
+                    f"Dashboard user index rebuilt ({len(self._users)} users) in {time.perf_counter() - started:.3f}s"
+                )
+            return self._version, self._users
+
+    def _load(self, today: str):
+        profiles: List[Dict[str, Any]] = []
+        conn = self._connect(self.profile_db)
+        if conn is not None:
+            try:
+                for row in conn.execute(
+                    "SELECT profile_key, user_id, display_name, guild_name, status, trait_count, message_count, "
+                    "last_updated, last_active, detail FROM profile_index ORDER BY profile_key"
+                ):
+                    key, user_id, name, guild_name, status, traits, messages, updated, active, detail = row
+                    profiles.append(
+                        {
+                            "profile_key": key,
+                            "user_id": user_id,
+                            "display_name": name,
+                            "guild_name": guild_name,
+                            "status": status,
+                            "trait_count": traits,
+                            "message_count": messages,
+                            "last_updated": updated,
+                            "last_active": active,
+                            **json.loads(detail),
+                        }
+                    )
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Dashboard user index: profile index unavailable: {e}")
+            finally:
+                conn.close()
+
+        indexed = {p["profile_key"] for p in profiles}
+        seen = set()
+        for entry in self._legacy_files():
+            stem = entry.name[: -len(".json")]
+            seen.add(entry.path)
+            if stem in indexed:
+                continue
+            st = entry.stat()
+            cached = self._legacy.get(entry.path)
+            if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    cached = (st.st_mtime_ns, st.st_size, {**summarize(stem, data), "last_active": st.st_mtime})
+                except Exception as e:
+                    logger.debug(f"Dashboard user index: skipping {entry.path}: {e}")
+                    continue
+                self._legacy[entry.path] = cached
+            profiles.append(cached[2])
+        for path in set(self._legacy) - seen:
+            del self._legacy[path]
+
+        discord_state: Dict[str, Any] = {"users": {}, "guilds": {}}
+        try:
+            with open(os.path.join(self.state_dir, "discord_state.json"), "r", encoding="utf-8") as f:
+                discord_state = {"users": {}, "guilds": {}, **json.load(f)}
+        except FileNotFoundError:
+            pass
+        except Exception:
+            pass  # Sync might be writing
+
+        usage_today: Dict[str, Dict[str, Any]] = {}
+        usage_ever: Dict[str, Dict[str, Any]] = {}
+        conn = self._connect(self.usage_db)
+        if conn is not None:
+            try:
+                from src.utils.usage_series import UsageSeries
+
+                series = UsageSeries(conn)
+                usage_today = series.per_user("day", today)
+                usage_ever = series.per_user("month")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Dashboard user index: usage series unavailable: {e}")
+            finally:
+                conn.close()
+        return profiles, discord_state, usage_today, usage_ever
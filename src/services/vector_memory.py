@@ -1,10 +1,16 @@
-
+import asyncio
+import hashlib
 import logging
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import chromadb
+from chromadb.utils import embedding_functions
 
 # Keep VectorMemory import-safe in CI/test environments where DISCORD_BOT_TOKEN is absent.
 # Do not call Config.load() at module import time.
@@ -17,33 +23,231 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# All Chroma work (embedding inference + HNSW) runs on a small dedicated pool so RAG
+# lookups never block the event loop / Discord heartbeats.
+VECTOR_MEMORY_WORKERS = int(os.getenv("ORA_VECTOR_MEMORY_WORKERS", "2") or "2")
+# Ingestion: add_memory() is queued and flushed as one multi-document add.
+VECTOR_ADD_BATCH_SIZE = int(os.getenv("ORA_VECTOR_ADD_BATCH_SIZE", "64") or "64")
+VECTOR_ADD_FLUSH_MS = float(os.getenv("ORA_VECTOR_ADD_FLUSH_MS", "200") or "200")
+# Queries arriving while another batch is in flight are embedded together.
+VECTOR_QUERY_BATCH_SIZE = int(os.getenv("ORA_VECTOR_QUERY_BATCH_SIZE", "32") or "32")
+VECTOR_QUERY_BATCH_MS = float(os.getenv("ORA_VECTOR_QUERY_BATCH_MS", "0") or "0")
+# Query embeddings are cached (LRU) so repeated prompts skip model inference.
+VECTOR_EMBED_CACHE_SIZE = int(os.getenv("ORA_VECTOR_EMBED_CACHE_SIZE", "1024") or "1024")
+
+_MIGRATE_PAGE = 500
+_COLLECTION_NAME_RE = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]$")
+
+Scope = Tuple[str, str]  # ("u", user_id) or ("g", guild_id)
+
+
+def _scopes_for(user_id: Optional[str], guild_id: Optional[str]) -> List[Scope]:
+    """Private (user) and shared (guild) partitions a query/document belongs to."""
+    scopes: List[Scope] = []
+    if user_id:
+        scopes.append(("u", str(user_id)))
+    if guild_id:
+        scopes.append(("g", str(guild_id)))
+    return scopes
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of query text -> embedding."""
+
+    def __init__(self, max_entries: int = VECTOR_EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return " ".join((text or "").split())
+
+    def get(self, text: str) -> Optional[Any]:
+        key = self.key(text)
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, text: str, vec: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[self.key(text)] = vec
+            self._entries.move_to_end(self.key(text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
 class VectorMemory:
     """
     Long-term Semantic Memory using ChromaDB.
     Stores conversation snippets as vectors for RAG (Retrieval Augmented Generation).
+
+    Memories are partitioned into one collection per scope (`<name>__u_<user_id>`,
+    `<name>__g_<guild_id>`), so a lookup is a plain HNSW query per scope instead of a
+    `$or` metadata filter over one shared index. A document with a guild_id is written
+    to both its user and guild partition (embedded once).
+
+    Chroma calls are synchronous, so they are executed on a bounded thread pool:
+    - add_memory() enqueues and returns; a writer task flushes multi-document adds.
+    - search_memory() requests that overlap are embedded in one batch (with an LRU of
+      query embeddings) and then queried per scope inside a single executor job. Reads see
+      committed memories only; they never wait for queued adds.
     """
-    def __init__(self, collection_name: str = "ora_memory"):
-        self.client = chromadb.PersistentClient(path=DB_DIR)
-        
+    def __init__(self,
+                 collection_name: str = "ora_memory",
+                 path: Optional[str] = None,
+                 embedding_function: Any = None,
+                 max_workers: int = VECTOR_MEMORY_WORKERS):
+        self.client = chromadb.PersistentClient(path=path or DB_DIR)
+        self.collection_name = collection_name
+
         # Use default embedding function (all-MiniLM-L6-v2) for now to keep it local/free.
         # Ideally switch to OpenAI for better quality if budget allows.
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        logger.info(f"VectorMemory initialized at {DB_DIR} (Collection: {collection_name})")
-
-    async def add_memory(self, 
-                         text: str, 
-                         user_id: str, 
+        # Kept as an attribute: documents and queries are embedded by us in batches.
+        self.embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        self.embedding_cache = EmbeddingCache()
+        self._scope_collections: Dict[str, Any] = {}
+        self._scope_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="vector-memory")
+
+        # Pre-partition data lived in a single collection filtered by metadata. It is moved
+        # into scope collections by one background task, started on first use; until it has
+        # finished, queries also read the legacy collection.
+        self._legacy_pending = False
+        self._migration_task: Optional[asyncio.Task] = None
+        try:
+            legacy = self.client.get_collection(name=collection_name)
+            self._legacy_pending = legacy.count() > 0
+        except Exception:
+            pass
+
+        self._pending_adds: List[Tuple[str, Dict[str, Any], str]] = []
+        self._writer_task: Optional[asyncio.Task] = None
+        self._pending_queries: List[Tuple[str, int, List[Scope], asyncio.Future]] = []
+        self._query_task: Optional[asyncio.Task] = None
+        self.stats = {"adds": 0, "add_batches": 0, "queries": 0, "query_batches": 0, "migrated": 0}
+        logger.info(f"VectorMemory initialized at {path or DB_DIR} (Collection: {collection_name})")
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # --- Scope partitions ---
+
+    def _scope_name(self, scope: Scope) -> str:
+        kind, key = scope
+        name = f"{self.collection_name}__{kind}_{key}"
+        if not _COLLECTION_NAME_RE.match(name):
+            name = f"{self.collection_name}__{kind}_{hashlib.sha1(key.encode()).hexdigest()[:20]}"
+        return name
+
+    def _get_collection(self, name: str, create: bool = False):
+        """Returns a scope collection by name (None if it does not exist and create=False)."""
+        with self._scope_lock:
+            coll = self._scope_collections.get(name)
+        if coll is not None:
+            return coll
+        try:
+            if create:
+                coll = self.client.get_or_create_collection(
+                    name=name,
+                    metadata={"hnsw:space": "cosine"},
+                    embedding_function=self.embedding_function,
+                )
+            else:
+                coll = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+        except Exception:
+            return None
+        with self._scope_lock:
+            self._scope_collections[name] = coll
+        return coll
+
+    def _all_scope_names(self) -> List[str]:
+        prefix = f"{self.collection_name}__"
+        names = []
+        for c in self.client.list_collections():
+            name = c if isinstance(c, str) else getattr(c, "name", "")
+            if name.startswith(prefix):
+                names.append(name)
+        return names
+
+    def _write_sync(self, batch: Sequence[Tuple[str, Dict[str, Any], str]], embeddings: Optional[list] = None):
+        if embeddings is None:
+            embeddings = self.embedding_function([b[0] for b in batch])
+        by_scope: Dict[Scope, List[int]] = {}
+        for i, (_, meta, _) in enumerate(batch):
+            for scope in _scopes_for(meta.get("user_id"), meta.get("guild_id")):
+                by_scope.setdefault(scope, []).append(i)
+        for scope, idxs in by_scope.items():
+            coll = self._get_collection(self._scope_name(scope), create=True)
+            coll.upsert(
+                documents=[batch[i][0] for i in idxs],
+                metadatas=[batch[i][1] for i in idxs],
+                ids=[batch[i][2] for i in idxs],
+                embeddings=[embeddings[i] for i in idxs],
+            )
+
+    def _migrate_legacy_sync(self) -> int:
+        legacy = self.client.get_collection(name=self.collection_name)
+        moved = 0
+        while True:
+            page = legacy.get(limit=_MIGRATE_PAGE, include=["documents", "metadatas", "embeddings"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            docs = page.get("documents") or [""] * len(ids)
+            metas = page.get("metadatas") or [{}] * len(ids)
+            batch = [(docs[i], dict(metas[i] or {}), ids[i]) for i in range(len(ids))]
+            embeddings = page.get("embeddings")
+            self._write_sync(batch, list(embeddings) if embeddings is not None else None)
+            legacy.delete(ids=ids)
+            moved += len(ids)
+        return moved
+
+    def _start_migration(self) -> Optional[asyncio.Task]:
+        """The legacy migration task (started once; None when there is nothing to migrate)."""
+        if self._migration_task is None and self._legacy_pending:
+            self._migration_task = asyncio.create_task(self._migrate_legacy())
+        return self._migration_task
+
+    async def _migrate_legacy(self):
+        try:
+            moved = await self._run(self._migrate_legacy_sync)
+            self.stats["migrated"] += moved
+            logger.info(f"VectorMemory: migrated {moved} legacy memories into scope collections")
+        except Exception as e:
+            logger.error(f"VectorMemory legacy migration failed: {e}")
+        finally:
+            self._legacy_pending = False
+
+    async def _ensure_migrated(self):
+        """Wait for the legacy migration. A cancelled caller leaves the migration running."""
+        task = self._start_migration()
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    # --- Ingestion ---
+
+    async def add_memory(self,
+                         text: str,
+                         user_id: str,
                          metadata: Optional[Dict[str, Any]] = None):
-        """Add a text snippet to the vector database."""
+        """Queue a text snippet for the vector database (flushed in batches)."""
         if not text or len(text.strip()) < 5:
             return # Ignore noise
 
         if metadata is None:
             metadata = {}
-        
+
         # Ensure metadata values are primitives
         clean_meta = {
             "user_id": str(user_id),
@@ -52,21 +256,42 @@ class VectorMemory:
         }
 
         # Generate ID based on timestamp and hash
-        import hashlib
         doc_id = hashlib.md5(f"{text}{datetime.now().timestamp()}".encode()).hexdigest()
 
-        try:
-            self.collection.add(
-                documents=[text],
-                metadatas=[clean_meta],
-                ids=[doc_id]
-            )
-        except Exception as e:
-            logger.error(f"Failed to add memory: {e}")
+        self._pending_adds.append((text, clean_meta, doc_id))
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _writer_loop(self):
+        # Give concurrent add_memory() calls a moment to pile up into one batch.
+        if VECTOR_ADD_FLUSH_MS > 0 and len(self._pending_adds) < VECTOR_ADD_BATCH_SIZE:
+            await asyncio.sleep(VECTOR_ADD_FLUSH_MS / 1000.0)
+        await self._ensure_migrated()
+        while self._pending_adds:
+            batch = self._pending_adds[:VECTOR_ADD_BATCH_SIZE]
+            del self._pending_adds[:VECTOR_ADD_BATCH_SIZE]
+            try:
+                await self._run(self._add_batch_sync, batch)
+            except Exception as e:
+                logger.error(f"Failed to add memory batch ({len(batch)} docs): {e}")
+
+    def _add_batch_sync(self, batch: List[Tuple[str, Dict[str, Any], str]]):
+        self._write_sync(batch)
+        self.stats["adds"] += len(batch)
+        self.stats["add_batches"] += 1
+
+    async def flush(self):
+        """Wait until every queued add_memory() call has been written."""
+        while self._pending_adds or (self._writer_task and not self._writer_task.done()):
+            if self._writer_task is None or self._writer_task.done():
+                self._writer_task = asyncio.create_task(self._writer_loop())
+            await asyncio.shield(self._writer_task)
 
-    async def search_memory(self, 
-                            query: str, 
-                            user_id: Optional[str] = None, 
+    # --- Retrieval ---
+
+    async def search_memory(self,
+                            query: str,
+                            user_id: Optional[str] = None,
                             guild_id: Optional[str] = None,
                             limit: int = 5,
                             threshold: float = 0.6) -> List[str]:
@@ -77,51 +302,184 @@ class VectorMemory:
             user_id: Filter by this user (Private Memory).
             guild_id: Filter by this guild (Shared Memory).
         """
-        try:
-            # Complex filtering logic for Chroma is limited in basic API.
-            # We want: (user_id == UID) OR (guild_id == GID)
-            # Chroma's $or requires exact matches.
-            
-            where_clause = None
-            if user_id and guild_id:
-                where_clause = {
-                    "$or": [
-                        {"user_id": str(user_id)},
-                        {"guild_id": str(guild_id)}
-                    ]
-                }
-            elif user_id:
-                where_clause = {"user_id": str(user_id)}
-            elif guild_id:
-                where_clause = {"guild_id": str(guild_id)}
-
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=limit,
-                where=where_clause
-            )
+        hits = await self.search_memory_scored(query, user_id=user_id, guild_id=guild_id, limit=limit, threshold=threshold)
+        return [h["text"] for h in hits]
 
-            # Results structure: {'documents': [[...]], 'distances': [[...]], ...}
-            memories = []
-            if results["documents"] and results["distances"]:
-                docs = results["documents"][0]
-                dists = results["distances"][0]
+    async def search_memory_scored(self,
+                                   query: str,
+                                   user_id: Optional[str] = None,
+                                   guild_id: Optional[str] = None,
+                                   limit: int = 5,
+                                   threshold: float = 0.6) -> List[Dict[str, Any]]:
+        """
+        Like search_memory, but returns ranked hits for callers that merge sources:
+        [{"id", "text", "score" (1 - cosine distance), "distance", "scope", "metadata"}, ...]
+        Hits from the user and guild scopes are merged, de-duplicated and sorted by score.
+        """
+        try:
+            # Never wait on the RAG path: the migration runs in the background (legacy data is
+            # read directly until it finishes) and queued adds become visible once the writer
+            # has flushed them.
+            self._start_migration()
 
-                for doc, dist in zip(docs, dists, strict=False):
-                    # Filter by relevance (heuristic)
-                    if dist < threshold: 
-                        memories.append(doc)
-            
-            return memories
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending_queries.append((query, limit, _scopes_for(user_id, guild_id), future))
+            if self._query_task is None or self._query_task.done():
+                self._query_task = asyncio.create_task(self._query_loop())
+            hits = await future
+            # Filter by relevance (heuristic)
+            return [h for h in hits if h["distance"] < threshold]
 
         except Exception as e:
             logger.error(f"Memory search failed: {e}")
             return []
 
+    async def _query_loop(self):
+        # Queries that arrive while a batch is running are picked up by the next one.
+        if VECTOR_QUERY_BATCH_MS > 0:
+            await asyncio.sleep(VECTOR_QUERY_BATCH_MS / 1000.0)
+        else:
+            await asyncio.sleep(0)
+        while self._pending_queries:
+            batch = self._pending_queries[:VECTOR_QUERY_BATCH_SIZE]
+            del self._pending_queries[:VECTOR_QUERY_BATCH_SIZE]
+            try:
+                results = await self._run(self._query_batch_sync, [(q, n, s) for q, n, s, _ in batch])
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (*_, future), result in zip(batch, results, strict=False):
+                if not future.done():
+                    future.set_result(result)
+
+    def _embed_queries(self, texts: List[str]) -> List[Any]:
+        vectors: List[Any] = [self.embedding_cache.get(t) for t in texts]
+        missing = sorted({t for t, v in zip(texts, vectors, strict=False) if v is None})
+        if missing:
+            fresh = dict(zip(missing, self.embedding_function(missing), strict=False))
+            for t, v in fresh.items():
+                self.embedding_cache.put(t, v)
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors, strict=False)]
+        return vectors
+
+    def _query_batch_sync(self, batch: List[Tuple[str, int, List[Scope]]]) -> List[List[Dict[str, Any]]]:
+        # One embedding call for the uncached queries, then one HNSW query per (scope, limit).
+        embeddings = self._embed_queries([q for q, _, _ in batch])
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for i, (_, limit, scopes) in enumerate(batch):
+            names = [self._scope_name(s) for s in scopes] if scopes else self._all_scope_names()
+            for name in names:
+                groups.setdefault((name, limit), []).append(i)
+
+        merged: List[Dict[str, Dict[str, Any]]] = [{} for _ in batch]
+        results = []
+        for (name, limit), idxs in groups.items():
+            coll = self._get_collection(name)
+            count = coll.count() if coll is not None else 0
+            if count == 0:
+                continue  # Scope has no memories yet.
+            res = coll.query(
+                query_embeddings=[embeddings[i] for i in idxs],
+                n_results=min(limit, count),
+                include=["documents", "metadatas", "distances"],
+            )
+            results.append((name[len(self.collection_name) + 2:], idxs, res))
+        if self._legacy_pending:
+            results.extend(self._query_legacy_sync(batch, embeddings))
+
+        for scope_label, idxs, res in results:
+            id_rows = res.get("ids") or []
+            for row, i in enumerate(idxs):
+                ids = id_rows[row] if row < len(id_rows) else []
+                docs = res["documents"][row] if res.get("documents") else [None] * len(ids)
+                dists = res["distances"][row] if res.get("distances") else [1.0] * len(ids)
+                metas = res["metadatas"][row] if res.get("metadatas") else [{}] * len(ids)
+                for doc_id, doc, dist, meta in zip(ids, docs, dists, metas, strict=False):
+                    prev = merged[i].get(doc_id)
+                    if prev is None or dist < prev["distance"]:
+                        merged[i][doc_id] = {
+                            "id": doc_id,
+                            "text": doc,
+                            "score": round(1.0 - float(dist), 4),
+                            "distance": float(dist),
+                            "scope": scope_label,
+                            "metadata": dict(meta or {}),
+                        }
+
+        self.stats["queries"] += len(batch)
+        self.stats["query_batches"] += 1
+        out = []
+        for i, (_, limit, _) in enumerate(batch):
+            out.append(sorted(merged[i].values(), key=lambda h: h["distance"])[:limit])
+        return out
+
+    def _query_legacy_sync(self, batch: List[Tuple[str, int, List[Scope]]], embeddings: List[Any]) -> List[tuple]:
+        """Query the not yet migrated legacy collection (metadata-filtered per request)."""
+        try:
+            legacy = self.client.get_collection(name=self.collection_name, embedding_function=self.embedding_function)
+            count = legacy.count()
+        except Exception:
+            return []
+        results = []
+        for i, (_, limit, scopes) in enumerate(batch):
+            if count == 0:
+                break
+            clauses = [{"user_id": key} if kind == "u" else {"guild_id": key} for kind, key in scopes]
+            where = None if not clauses else clauses[0] if len(clauses) == 1 else {"$or": clauses}
+            try:
+                res = legacy.query(
+                    query_embeddings=[embeddings[i]],
+                    n_results=min(limit, count),
+                    where=where,
+                    include=["documents", "metadatas", "distances"],
+                )
+            except Exception as e:
+                logger.debug(f"VectorMemory: legacy query skipped: {e}")  # Migration may be deleting rows.
+                continue
+            results.append(("legacy", [i], res))
+        return results
+
+    # --- Maintenance ---
+
+    def _wipe_user_sync(self, user_id: str):
+        try:
+            self.client.delete_collection(name=self._scope_name(("u", str(user_id))))
+        except Exception:
+            pass  # No private partition yet.
+        with self._scope_lock:
+            self._scope_collections.pop(self._scope_name(("u", str(user_id))), None)
+        # Shared (guild) partitions may hold copies of this user's memories.
+        for name in self._all_scope_names():
+            if name.startswith(f"{self.collection_name}__g_"):
+                self.client.get_collection(name=name).delete(where={"user_id": str(user_id)})
+
     async def wipe_user_memory(self, user_id: str):
         """Delete all memories for a user."""
         try:
-            self.collection.delete(where={"user_id": str(user_id)})
+            await self._ensure_migrated()
+            await self.flush()
+            await self._run(self._wipe_user_sync, user_id)
             logger.info(f"Wiped vector memory for {user_id}")
         except Exception as e:
             logger.error(f"Failed to wipe memory: {e}")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        total = self.embedding_cache.hits + self.embedding_cache.misses
+        return {
+            "size": len(self.embedding_cache._entries),
+            "hits": self.embedding_cache.hits,
+            "misses": self.embedding_cache.misses,
+            "hit_rate": round(self.embedding_cache.hits / total, 4) if total else 0.0,
+        }
+
+    async def close(self):
+        """Flush queued memories and stop the worker pool."""
+        try:
+            await self._ensure_migrated()
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Vector memory flush on close failed: {e}")
+        self._executor.shutdown(wait=False)
@@ -32,6 +32,11 @@ class SkillLoader:
         
         logger.info(f"Loaded {len(self.skills)} skills: {list(self.skills.keys())}")
 
+        # Skill schemas feed the router's tool index; drop cached indexes/decisions.
+        from src.cogs.tools.registry import notify_tools_changed
+
+        notify_tools_changed("skills_loaded")
+
     def _load_single_skill(self, skill_name: str, path: str):
         md_path = os.path.join(path, "SKILL.md")
         tool_path = os.path.join(path, "tool.py")
@@ -7,14 +7,24 @@ import logging
 import os
 import sqlite3
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Sequence, Tuple
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
 import aiosqlite
 
+from src.services.audit_sink import AuditSink
+
 logger = logging.getLogger(__name__)
 
+# Long-lived connections: one writer (writes are serialized anyway) plus readers that
+# run concurrently with it under WAL.
+STORE_READERS = max(1, int(os.getenv("ORA_STORE_READERS", "2") or "2"))
+STORE_BUSY_TIMEOUT_MS = int(os.getenv("ORA_STORE_BUSY_TIMEOUT_MS", "5000") or "5000")
+# Per-connection prepared statement cache (sqlite3 default is 128).
+STORE_STATEMENT_CACHE = 256
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (
   id TEXT PRIMARY KEY,
@@ -45,6 +55,7 @@ CREATE TABLE IF NOT EXISTS conversations (
   response TEXT,
   created_at INTEGER NOT NULL
 );
+CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations(user_id, created_at);
 CREATE TABLE IF NOT EXISTS dashboard_tokens (
   token TEXT PRIMARY KEY,
   guild_id TEXT NOT NULL,
@@ -133,18 +144,166 @@ CREATE INDEX IF NOT EXISTS idx_chat_events_corr ON chat_events(correlation_id);
 CREATE INDEX IF NOT EXISTS idx_chat_events_ts ON chat_events(ts);
 """
 
+# Full-text index over conversations (external content: the text is stored once, in
+# `conversations`). The trigram tokenizer matches any substring of 3+ characters, so it
+# works for Japanese / CJK text that has no word boundaries. Needs SQLite >= 3.34.
+CONVERSATIONS_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+  message, response, content='conversations', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+  INSERT INTO conversations_fts(rowid, message, response) VALUES (new.id, new.message, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+  INSERT INTO conversations_fts(conversations_fts, rowid, message, response)
+  VALUES ('delete', old.id, old.message, old.response);
+END;
+CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE ON conversations BEGIN
+  INSERT INTO conversations_fts(conversations_fts, rowid, message, response)
+  VALUES ('delete', old.id, old.message, old.response);
+  INSERT INTO conversations_fts(rowid, message, response) VALUES (new.id, new.message, new.response);
+END;
+"""
+FTS_MIN_TERM_CHARS = 3  # Shorter terms cannot match trigrams; those queries use a LIKE scan.
+SNIPPET_TOKENS = 24  # Roughly characters of context with the trigram tokenizer.
+# BM25 costs a few microseconds per matching row; a term found in more rows than this
+# says little about relevance anyway, so such searches return the newest matches instead.
+SEARCH_RANK_MAX_MATCHES = int(os.getenv("ORA_SEARCH_RANK_MAX_MATCHES", "20000") or "20000")
+
+
+def _fts_query(terms: Sequence[str]) -> Optional[str]:
+    """FTS5 MATCH expression requiring every term (each as a literal phrase), or None if a term is too short."""
+    if any(len(t) < FTS_MIN_TERM_CHARS for t in terms):
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _like_snippet(row: dict, terms: Sequence[str], width: int = SNIPPET_TOKENS) -> str:
+    """Snippet in the same format as FTS5 snippet() for rows found by a LIKE scan."""
+    for text in (row.get("message") or "", row.get("response") or ""):
+        lowered = text.lower()
+        for term in terms:
+            pos = lowered.find(term.lower())
+            if pos < 0:
+                continue
+            end_match = pos + len(term)
+            start, end = max(0, pos - width // 2), min(len(text), end_match + width // 2)
+            return (
+                ("…" if start > 0 else "")
+                + f"{text[start:pos]}**{text[pos:end_match]}**{text[end_match:end]}"
+                + ("…" if end < len(text) else "")
+            )
+    return ""
+
 
 class Store:
     """Async wrapper around the SQLite database."""
 
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self, db_path: str, *, readers: int = STORE_READERS, busy_timeout_ms: int = STORE_BUSY_TIMEOUT_MS
+    ) -> None:
         self._db_path = db_path
+        self._reader_count = max(1, readers)
+        self._busy_timeout_ms = busy_timeout_ms
+        self._db: Optional[aiosqlite.Connection] = None  # Writer
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._audit: Optional[AuditSink] = None
+        self._fts_enabled = False  # Set by init() once conversations_fts exists.
+
+    @property
+    def audit(self) -> AuditSink:
+        """Background writer for tool_audit / chat_events rows (created on first use)."""
+        if self._audit is None:
+            self._audit = AuditSink(self)
+        return self._audit
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self._db_path, cached_statements=STORE_STATEMENT_CACHE)
+        try:
+            await db.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+            await db.execute("PRAGMA synchronous=NORMAL")
+        except BaseException:
+            await db.close()
+            raise
+        return db
+
+    async def open(self) -> None:
+        """Open the connection pool (done lazily by every method)."""
+        if self._db is not None:
+            return
+        async with self._open_lock:
+            if self._db is not None:
+                return
+            Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = await self._connect()
+            readers: List[aiosqlite.Connection] = []
+            try:
+                # Persistent for the database file; lets readers (and the web process) run during writes.
+                # The result row must be consumed, otherwise the statement keeps the file locked.
+                async with db.execute("PRAGMA journal_mode=WAL") as cur:
+                    await cur.fetchall()
+                for _ in range(self._reader_count):
+                    readers.append(await self._connect())
+            except BaseException:
+                for conn in [db, *readers]:
+                    await conn.close()
+                raise
+            idle: asyncio.Queue = asyncio.Queue()
+            for reader in readers:
+                idle.put_nowait(reader)
+            self._readers, self._idle_readers = readers, idle
+            self._db = db
+
+    async def close(self) -> None:
+        if self._audit is not None:
+            audit, self._audit = self._audit, None
+            await audit.close()  # Final flush while the writer is still open.
+        async with self._open_lock:
+            connections = ([self._db] if self._db is not None else []) + self._readers
+            self._db, self._readers, self._idle_readers = None, [], None
+            for db in connections:
+                try:
+                    await db.close()
+                except Exception as e:
+                    logger.debug(f"Store: closing connection failed: {e}")
+
+    @staticmethod
+    async def _release(db: aiosqlite.Connection) -> None:
+        # Same outcome as closing a per-call connection: uncommitted work is dropped.
+        if db.in_transaction:
+            await db.rollback()
+        db.row_factory = None
+
+    @asynccontextmanager
+    async def _writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self.open()
+        async with self._write_lock:
+            db = self._db
+            try:
+                yield db
+            finally:
+                await self._release(db)
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self.open()
+        idle = self._idle_readers
+        db = await idle.get()
+        try:
+            yield db
+        finally:
+            try:
+                await self._release(db)
+            finally:
+                idle.put_nowait(db)
 
     async def init(self) -> None:
         """Initialise tables if they do not exist."""
 
-        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.executescript(SCHEMA)
 
             # Migration: Ensure points column exists
@@ -167,6 +326,23 @@ class Store:
 
             await db.commit()
 
+            # Migration: full-text index for conversations, backfilled from existing rows.
+            try:
+                async with db.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='conversations_fts'"
+                ) as cursor:
+                    existed = await cursor.fetchone() is not None
+                await db.executescript(CONVERSATIONS_FTS_SCHEMA)
+                if not existed:
+                    started = time.perf_counter()
+                    await db.execute("INSERT INTO conversations_fts(conversations_fts) VALUES('rebuild')")
+                    logger.info(f"conversations_fts: indexed existing rows in {time.perf_counter() - started:.1f}s")
+                await db.commit()
+                self._fts_enabled = True
+            except sqlite3.OperationalError as e:
+                await db.rollback()
+                logger.warning(f"FTS5 trigram search unavailable (SQLite {sqlite3.sqlite_version}), using LIKE: {e}")
+
     async def backup(self) -> None:
         """Create an atomic backup of the database file."""
 
@@ -291,7 +467,7 @@ class Store:
         now = int(time.time())
         # When not provided, fallback to 0
         sp_default = int(speak_search_progress_default or 0)
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             if display_name:
                 await db.execute(
                     (
@@ -311,7 +487,7 @@ class Store:
             await db.commit()
 
     async def set_privacy(self, discord_user_id: int, mode: str) -> None:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 "UPDATE users SET privacy=? WHERE id=?",
                 (mode, str(discord_user_id)),
@@ -319,7 +495,7 @@ class Store:
             await db.commit()
 
     async def get_privacy(self, discord_user_id: int) -> str:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 "SELECT privacy FROM users WHERE id=?",
                 (str(discord_user_id),),
@@ -345,7 +521,7 @@ class Store:
         now = int(time.time())
         interval_sec = max(30, int(interval_sec))
         next_run_at = now + interval_sec
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             cur = await db.execute(
                 (
                     "INSERT INTO scheduled_tasks(owner_id, guild_id, channel_id, prompt, interval_sec, enabled, model_pref, "
@@ -398,27 +574,23 @@ class Store:
         now = int(time.time())
         cutoff = now - (retention_days * 86400)
 
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Time-based pruning
             await db.execute("DELETE FROM tool_audit WHERE ts < ?", (int(cutoff),))
             await db.execute("DELETE FROM approval_requests WHERE created_at < ?", (int(cutoff),))
             await db.execute("DELETE FROM chat_events WHERE ts < ?", (int(cutoff),))
 
-            # Size-based pruning (keep newest rows)
-            async def _prune_by_count(table: str, ts_col: str, keep: int) -> None:
-                async with db.execute(f"SELECT COUNT(1) FROM {table}") as cur:
+            # Size-based pruning (keep the newest ids). ids only grow, so a watermark below
+            # MAX(id) is a range delete on the primary key instead of a COUNT + ORDER BY scan.
+            async def _prune_by_watermark(table: str, keep: int) -> None:
+                async with db.execute(f"SELECT MAX(id) FROM {table}") as cur:
                     row = await cur.fetchone()
-                total = int(row[0] or 0) if row else 0
-                excess = total - int(keep)
-                if excess <= 0:
-                    return
-                await db.execute(
-                    f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} ORDER BY {ts_col} ASC LIMIT ?)",
-                    (int(excess),),
-                )
+                watermark = int(row[0] or 0) - int(keep) if row else 0
+                if watermark > 0:
+                    await db.execute(f"DELETE FROM {table} WHERE id <= ?", (watermark,))
 
-            await _prune_by_count("tool_audit", "ts", max_rows)
-            await _prune_by_count("chat_events", "ts", max_chat_rows)
+            await _prune_by_watermark("tool_audit", max_rows)
+            await _prune_by_watermark("chat_events", max_chat_rows)
 
             await db.commit()
 
@@ -439,68 +611,31 @@ class Store:
         args_json: str,
         result_preview: str,
     ) -> None:
-        from src.utils.redaction import redact_json_string, redact_text
-
-        max_args_chars_raw = os.getenv("ORA_AUDIT_MAX_ARGS_CHARS", "5000").strip()
-        max_result_chars_raw = os.getenv("ORA_AUDIT_MAX_RESULT_CHARS", "2000").strip()
-        try:
-            max_args_chars = max(500, int(max_args_chars_raw))
-        except Exception:
-            max_args_chars = 5000
-        try:
-            max_result_chars = max(200, int(max_result_chars_raw))
-        except Exception:
-            max_result_chars = 2000
-
-        safe_args = redact_json_string(str(args_json or ""), max_chars=max_args_chars)
-        safe_preview = redact_text(str(result_preview or ""))[:max_result_chars]
-
-        async with aiosqlite.connect(self._db_path) as db:
-            try:
-                await db.execute(
-                    (
-                        "INSERT OR REPLACE INTO tool_audit("
-                        "ts, actor_id, guild_id, channel_id, tool_name, tool_call_id, correlation_id, "
-                        "risk_score, risk_level, approval_required, approval_status, args_json, result_preview"
-                        ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-                    ),
-                    (
-                        int(ts),
-                        str(actor_id) if actor_id is not None else None,
-                        str(guild_id) if guild_id is not None else None,
-                        str(channel_id) if channel_id is not None else None,
-                        str(tool_name or ""),
-                        str(tool_call_id) if tool_call_id else None,
-                        str(correlation_id) if correlation_id else None,
-                        int(risk_score),
-                        str(risk_level or ""),
-                        1 if approval_required else 0,
-                        str(approval_status) if approval_status else None,
-                        safe_args,
-                        safe_preview,
-                    ),
-                )
-                await db.commit()
-            except Exception:
-                # Best-effort; never fail tool execution due to logging.
-                return
+        """Queue a tool audit row (written in the background; redaction happens at write time)."""
+        self.audit.add(
+            "tool_audit",
+            {
+                "ts": ts,
+                "actor_id": actor_id,
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "tool_name": tool_name,
+                "tool_call_id": tool_call_id,
+                "correlation_id": correlation_id,
+                "risk_score": risk_score,
+                "risk_level": risk_level,
+                "approval_required": approval_required,
+                "approval_status": approval_status,
+                "args_json": args_json,
+                "result_preview": result_preview,
+            },
+        )
 
     async def update_tool_audit_result(self, *, tool_call_id: str, result_preview: str) -> None:
-        """Update the result preview for an existing tool_call_id (best-effort)."""
-        from src.utils.redaction import redact_text
-
+        """Update the result preview for an existing tool_call_id (best-effort, queued)."""
         if not tool_call_id:
             return
-        safe_preview = redact_text(str(result_preview or ""))[:2000]
-        try:
-            async with aiosqlite.connect(self._db_path) as db:
-                await db.execute(
-                    "UPDATE tool_audit SET result_preview=? WHERE tool_call_id=?",
-                    (safe_preview, str(tool_call_id)),
-                )
-                await db.commit()
-        except Exception:
-            return
+        self.audit.add("tool_result", {"tool_call_id": tool_call_id, "result_preview": result_preview})
 
     async def get_tool_audit_rows(
         self,
@@ -529,7 +664,9 @@ class Store:
             f"FROM tool_audit{clause} ORDER BY ts DESC LIMIT ?"
         )
         params.append(limit)
-        async with aiosqlite.connect(self._db_path) as db:
+        if self._audit is not None:
+            await self._audit.flush()  # Include events still queued in the sink.
+        async with self._reader() as db:
             async with db.execute(sql, tuple(params)) as cur:
                 rows = await cur.fetchall()
         out: list[dict] = []
@@ -567,7 +704,7 @@ class Store:
             f"FROM approval_requests{clause} ORDER BY created_at DESC LIMIT ?"
         )
         params.append(limit)
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(sql, tuple(params)) as cur:
                 rows = await cur.fetchall()
         out: list[dict] = []
@@ -611,7 +748,9 @@ class Store:
             f"FROM chat_events{clause} ORDER BY ts DESC LIMIT ?"
         )
         params.append(limit)
-        async with aiosqlite.connect(self._db_path) as db:
+        if self._audit is not None:
+            await self._audit.flush()  # Include events still queued in the sink.
+        async with self._reader() as db:
             async with db.execute(sql, tuple(params)) as cur:
                 rows = await cur.fetchall()
         out: list[dict] = []
@@ -644,7 +783,7 @@ class Store:
         requires_code: bool,
         expected_code: str | None,
     ) -> None:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             try:
                 await db.execute(
                     (
@@ -675,7 +814,7 @@ class Store:
 
     async def set_approval_status(self, *, tool_call_id: str, status: str) -> None:
         now = int(time.time())
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             try:
                 await db.execute(
                     "UPDATE approval_requests SET status=?, decided_at=? WHERE tool_call_id=?",
@@ -686,7 +825,7 @@ class Store:
                 return
 
     async def get_approval_status(self, *, tool_call_id: str) -> Optional[str]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             try:
                 async with db.execute(
                     "SELECT status FROM approval_requests WHERE tool_call_id=?",
@@ -700,7 +839,7 @@ class Store:
                 return None
 
     async def list_scheduled_tasks(self, *, owner_id: int) -> list[dict]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 (
                     "SELECT id, guild_id, channel_id, prompt, interval_sec, enabled, model_pref, next_run_at, last_run_at, created_at "
@@ -728,7 +867,7 @@ class Store:
         return out
 
     async def delete_scheduled_task(self, *, owner_id: int, task_id: int) -> bool:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute("DELETE FROM scheduled_task_runs WHERE task_id=?", (int(task_id),))
             cur = await db.execute(
                 "DELETE FROM scheduled_tasks WHERE owner_id=? AND id=?",
@@ -749,33 +888,24 @@ class Store:
         event_type: str,
         detail: Optional[str] = None,
     ) -> None:
-        """Best-effort chat-level event logging (must never break primary flow)."""
-        try:
-            async with aiosqlite.connect(self._db_path) as db:
-                await db.execute(
-                    (
-                        "INSERT INTO chat_events(ts, actor_id, guild_id, channel_id, correlation_id, run_id, event_type, detail) "
-                        "VALUES(?, ?, ?, ?, ?, ?, ?, ?)"
-                    ),
-                    (
-                        int(ts),
-                        str(actor_id) if actor_id is not None else None,
-                        str(guild_id) if guild_id is not None else None,
-                        str(channel_id) if channel_id is not None else None,
-                        correlation_id,
-                        run_id,
-                        event_type,
-                        detail,
-                    ),
-                )
-                await db.commit()
-        except Exception:
-            # Never block chat on logging failures.
-            return
+        """Best-effort chat-level event logging (queued; never blocks the chat flow)."""
+        self.audit.add(
+            "chat_event",
+            {
+                "ts": ts,
+                "actor_id": actor_id,
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "correlation_id": correlation_id,
+                "run_id": run_id,
+                "event_type": event_type,
+                "detail": detail,
+            },
+        )
 
     async def set_scheduled_task_enabled(self, *, owner_id: int, task_id: int, enabled: bool) -> bool:
         now = int(time.time())
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             cur = await db.execute(
                 "UPDATE scheduled_tasks SET enabled=?, updated_at=? WHERE owner_id=? AND id=?",
                 (1 if enabled else 0, now, str(owner_id), int(task_id)),
@@ -784,7 +914,7 @@ class Store:
             return (cur.rowcount or 0) > 0
 
     async def get_due_scheduled_tasks(self, *, now_ts: int, limit: int = 5) -> list[dict]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 (
                     "SELECT id, owner_id, guild_id, channel_id, prompt, interval_sec, model_pref, next_run_at "
@@ -813,7 +943,7 @@ class Store:
         """
         Atomically move next_run_at forward so multiple workers don't run the same task concurrently.
         """
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             async with db.execute("SELECT interval_sec FROM scheduled_tasks WHERE id=? AND enabled=1", (int(task_id),)) as cur:
                 row = await cur.fetchone()
             if not row:
@@ -828,7 +958,7 @@ class Store:
             return (cur2.rowcount or 0) > 0
 
     async def insert_task_run(self, *, task_id: int, started_at: int, status: str = "running") -> int:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             cur = await db.execute(
                 "INSERT INTO scheduled_task_runs(task_id, started_at, status) VALUES(?, ?, ?)",
                 (int(task_id), int(started_at), status),
@@ -853,7 +983,7 @@ class Store:
         err = (error or "").strip()
         if len(err) > 2000:
             err = err[:1997] + "..."
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 (
                     "UPDATE scheduled_task_runs SET finished_at=?, status=?, core_run_id=?, output=?, error=? "
@@ -864,7 +994,7 @@ class Store:
             await db.commit()
 
     async def set_system_privacy(self, discord_user_id: int, mode: str) -> None:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Lazy migration
             try:
                 await db.execute("ALTER TABLE users ADD COLUMN system_privacy TEXT DEFAULT 'private'")
@@ -878,7 +1008,7 @@ class Store:
             await db.commit()
 
     async def get_system_privacy(self, discord_user_id: int) -> str:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             try:
                 async with db.execute(
                     "SELECT system_privacy FROM users WHERE id=?",
@@ -894,7 +1024,7 @@ class Store:
 
     async def get_speak_search_progress(self, discord_user_id: int) -> int:
         """Return the search progress speech setting (0 or 1) for a user."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 "SELECT speak_search_progress FROM users WHERE id=?",
                 (str(discord_user_id),),
@@ -910,7 +1040,7 @@ class Store:
     async def set_speak_search_progress(self, discord_user_id: int, value: int) -> None:
         """Update the search progress speech setting for a user."""
         val = 1 if value else 0
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 "UPDATE users SET speak_search_progress=? WHERE id=?",
                 (val, str(discord_user_id)),
@@ -919,7 +1049,7 @@ class Store:
 
     async def get_desktop_watch_enabled(self, discord_user_id: int) -> bool:
         """Return whether desktop watcher is enabled for this user (Admin)."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             # Check if column exists first (migration hack for dev)
             # In production, we should use proper migrations.
             # For now, we'll just try-catch or assume schema is updated if we recreate DB.
@@ -940,7 +1070,7 @@ class Store:
     async def set_desktop_watch_enabled(self, discord_user_id: int, enabled: bool) -> None:
         """Set desktop watcher state."""
         val = 1 if enabled else 0
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Ensure column exists (hacky migration)
             try:
                 await db.execute("ALTER TABLE users ADD COLUMN desktop_watch_enabled INTEGER DEFAULT 1")
@@ -956,7 +1086,7 @@ class Store:
     async def upsert_google_sub(
         self, discord_user_id: int, google_sub: str, refresh_token: Optional[str] = None
     ) -> None:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             if refresh_token:
                 await db.execute(
                     (
@@ -978,7 +1108,7 @@ class Store:
             await db.commit()
 
     async def get_google_creds(self, discord_user_id: int) -> Optional[dict]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute(
                 "SELECT google_sub, refresh_token FROM users WHERE id=?",
@@ -997,7 +1127,7 @@ class Store:
         }
 
     async def get_google_sub(self, discord_user_id: int) -> Optional[str]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 "SELECT google_sub FROM users WHERE id=?",
                 (str(discord_user_id),),
@@ -1006,7 +1136,7 @@ class Store:
         return row[0] if row and row[0] else None
 
     async def start_login_state(self, state: str, discord_user_id: int, ttl_sec: int = 900) -> None:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 ("INSERT OR REPLACE INTO login_states(state, discord_user_id, expires_at) VALUES(?, ?, ?)"),
                 (state, str(discord_user_id), int(time.time()) + ttl_sec),
@@ -1014,7 +1144,7 @@ class Store:
             await db.commit()
 
     async def consume_login_state(self, state: str) -> Optional[str]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 "SELECT discord_user_id, expires_at FROM login_states WHERE state=?",
                 (state,),
@@ -1026,18 +1156,18 @@ class Store:
 
         discord_user_id, expires_at = row
         if int(time.time()) > int(expires_at):
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._writer() as db:
                 await db.execute("DELETE FROM login_states WHERE state=?", (state,))
                 await db.commit()
             return None
 
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute("DELETE FROM login_states WHERE state=?", (state,))
             await db.commit()
         return str(discord_user_id)
 
     async def add_dataset(self, discord_user_id: int, name: str, source_url: Optional[str]) -> int:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             cursor = await db.execute(
                 ("INSERT INTO datasets(discord_user_id, name, source_url, created_at) VALUES(?, ?, ?, ?)"),
                 (str(discord_user_id), name, source_url, int(time.time())),
@@ -1049,7 +1179,7 @@ class Store:
     async def list_datasets(
         self, discord_user_id: int, limit: int = 10
     ) -> Sequence[Tuple[int, str, Optional[str], int]]:
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 (
                     "SELECT id, name, source_url, created_at FROM datasets "
@@ -1062,7 +1192,7 @@ class Store:
 
     async def add_conversation(self, user_id: str, platform: str, message: str, response: str) -> None:
         """Log a conversation turn. user_id can be Discord ID or Google Sub."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 ("INSERT INTO conversations(user_id, platform, message, response, created_at) VALUES(?, ?, ?, ?, ?)"),
                 (user_id, platform, message, response, int(time.time())),
@@ -1071,7 +1201,7 @@ class Store:
 
     async def get_conversations(self, user_id: Optional[str] = None, limit: int = 20) -> list[dict]:
         """Get recent conversations. If user_id is None, return all."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             db.row_factory = aiosqlite.Row
             if user_id:
                 query = "SELECT * FROM conversations WHERE user_id=? ORDER BY created_at DESC LIMIT ?"
@@ -1085,26 +1215,51 @@ class Store:
                 return [dict(row) for row in rows]
 
     async def search_conversations(self, query: str, user_id: Optional[str] = None, limit: int = 5) -> list[dict]:
-        """Search conversations for a keyword."""
-        async with aiosqlite.connect(self._db_path) as db:
+        """
+        Search conversations containing every whitespace-separated term of `query`. Each row
+        gets a `snippet` with the match in **bold**. Results come from the FTS index ranked by
+        BM25; terms under 3 characters (or no FTS5) fall back to a LIKE scan, newest first.
+        """
+        terms = query.split() or [query]
+        match = _fts_query(terms) if self._fts_enabled else None
+        async with self._reader() as db:
             db.row_factory = aiosqlite.Row
-            search_query = f"%{query}%"
-
+            if match is not None:
+                async with db.execute(
+                    "SELECT count(*) FROM conversations_fts WHERE conversations_fts MATCH ?", (match,)
+                ) as cursor:
+                    matches = (await cursor.fetchone())[0]
+                # A very common term within one user's history: scanning their rows is cheaper.
+                if matches <= SEARCH_RANK_MAX_MATCHES or not user_id:
+                    order = "rank" if matches <= SEARCH_RANK_MAX_MATCHES else "conversations_fts.rowid DESC"
+                    sql = (
+                        "SELECT c.*, snippet(conversations_fts, -1, '**', '**', '…', ?) AS snippet "
+                        "FROM conversations_fts JOIN conversations c ON c.id = conversations_fts.rowid "
+                        "WHERE conversations_fts MATCH ?"
+                    )
+                    params: tuple = (SNIPPET_TOKENS, match)
+                    if user_id:
+                        sql += " AND c.user_id=?"
+                        params += (user_id,)
+                    async with db.execute(f"{sql} ORDER BY {order} LIMIT ?", params + (limit,)) as cursor:
+                        return [dict(row) for row in await cursor.fetchall()]
+
+            conditions = ["(message LIKE ? OR response LIKE ?)"] * len(terms)
+            params = tuple(p for t in terms for p in (f"%{t}%", f"%{t}%"))
             if user_id:
-                sql = "SELECT * FROM conversations WHERE user_id=? AND (message LIKE ? OR response LIKE ?) ORDER BY created_at DESC LIMIT ?"
-                params = (user_id, search_query, search_query, limit)
-            else:
-                # Global search (if allowed permissions, but typically restricted by caller)
-                sql = "SELECT * FROM conversations WHERE message LIKE ? OR response LIKE ? ORDER BY created_at DESC LIMIT ?"
-                params = (search_query, search_query, limit)
-
-            async with db.execute(sql, params) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                conditions.insert(0, "user_id=?")
+                params = (user_id,) + params
+            # Global search (if allowed permissions, but typically restricted by caller) scans the table.
+            sql = f"SELECT * FROM conversations WHERE {' AND '.join(conditions)} ORDER BY created_at DESC LIMIT ?"
+            async with db.execute(sql, params + (limit,)) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+            for row in rows:
+                row["snippet"] = _like_snippet(row, terms)
+            return rows
 
     async def clear_conversations(self, user_id: str) -> int:
         """Clear conversation history for a user."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             cursor = await db.execute("DELETE FROM conversations WHERE user_id=?", (user_id,))
             await db.commit()
             return cursor.rowcount
@@ -1113,51 +1268,50 @@ class Store:
         """Update or insert Google user info."""
         # credentials is a google.oauth2.credentials.Credentials object
 
-        async with aiosqlite.connect(self._db_path):
-            # We might need a separate table for google users if we want to store email
-            # But for now, let's assume we map it to the 'users' table via some mechanism
-            # OR we just update the existing users table if we can find the user?
-            # The current schema has 'users' keyed by 'discord_user_id'.
-            # If we don't have a discord_user_id yet, we can't insert into 'users' easily unless we allow null discord_id
-            # or use a different table.
+        # We might need a separate table for google users if we want to store email
+        # But for now, let's assume we map it to the 'users' table via some mechanism
+        # OR we just update the existing users table if we can find the user?
+        # The current schema has 'users' keyed by 'discord_user_id'.
+        # If we don't have a discord_user_id yet, we can't insert into 'users' easily unless we allow null discord_id
+        # or use a different table.
 
-            # However, the 'users' table schema is:
-            # discord_user_id TEXT PRIMARY KEY, google_sub TEXT, ...
+        # However, the 'users' table schema is:
+        # discord_user_id TEXT PRIMARY KEY, google_sub TEXT, ...
 
-            # The Web Auth flow gets Google info FIRST, then links to Discord.
-            # So we might need to store Google info temporarily or allow looking up by google_sub.
+        # The Web Auth flow gets Google info FIRST, then links to Discord.
+        # So we might need to store Google info temporarily or allow looking up by google_sub.
 
-            # For this implementation, let's assume we are updating an existing user OR
-            # we need a way to store "Unlinked Google Users".
-            # But the 'link_discord_google' method implies we link them later.
+        # For this implementation, let's assume we are updating an existing user OR
+        # we need a way to store "Unlinked Google Users".
+        # But the 'link_discord_google' method implies we link them later.
 
-            # Let's just store the refresh token if we can find the user, or do nothing?
-            # Wait, the user's snippet says:
-            # await store.upsert_google_user(google_sub=google_sub, email=email, credentials=creds)
-            # await store.link_discord_google(discord_user_id, google_sub)
+        # Let's just store the refresh token if we can find the user, or do nothing?
+        # Wait, the user's snippet says:
+        # await store.upsert_google_user(google_sub=google_sub, email=email, credentials=creds)
+        # await store.link_discord_google(discord_user_id, google_sub)
 
-            # This implies 'upsert_google_user' might create a record.
-            # But our 'users' table requires discord_user_id as PK.
+        # This implies 'upsert_google_user' might create a record.
+        # But our 'users' table requires discord_user_id as PK.
 
-            # Let's modify 'users' table or add a 'google_users' table?
-            # Given the constraints, I will implement 'link_discord_google' to do the heavy lifting
-            # and 'upsert_google_user' to maybe just log or update if the user exists.
+        # Let's modify 'users' table or add a 'google_users' table?
+        # Given the constraints, I will implement 'link_discord_google' to do the heavy lifting
+        # and 'upsert_google_user' to maybe just log or update if the user exists.
 
-            # ACTUALLY, looking at the schema:
-            # CREATE TABLE IF NOT EXISTS users (discord_user_id TEXT PRIMARY KEY, google_sub TEXT, ...)
+        # ACTUALLY, looking at the schema:
+        # CREATE TABLE IF NOT EXISTS users (discord_user_id TEXT PRIMARY KEY, google_sub TEXT, ...)
 
-            # If we don't have discord_id, we can't insert.
-            # But the auth flow has 'state' which contains 'discord_user_id'.
-            # So 'link_discord_google' is the one that matters.
+        # If we don't have discord_id, we can't insert.
+        # But the auth flow has 'state' which contains 'discord_user_id'.
+        # So 'link_discord_google' is the one that matters.
 
-            # Let's make 'upsert_google_user' a no-op or just helper if we had a google_users table.
-            # BUT, if the user logs in via Web and we want to show their data, we need to know who they are.
-            # If they are already linked, we can update their refresh token.
-            pass
+        # Let's make 'upsert_google_user' a no-op or just helper if we had a google_users table.
+        # BUT, if the user logs in via Web and we want to show their data, we need to know who they are.
+        # If they are already linked, we can update their refresh token.
+        pass
 
     async def link_discord_google(self, discord_user_id: int | str, google_sub: str) -> None:
         """Link a Discord user to a Google Subject ID."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Check if user exists
             async with db.execute("SELECT 1 FROM users WHERE id=?", (str(discord_user_id),)) as cursor:
                 exists = await cursor.fetchone()
@@ -1179,7 +1333,7 @@ class Store:
 
     async def get_points(self, discord_user_id: int) -> int:
         """Get the current point balance for a user."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute("SELECT points FROM users WHERE id=?", (str(discord_user_id),))
             row = await cursor.fetchone()
             if row:
@@ -1188,7 +1342,7 @@ class Store:
 
     async def add_points(self, discord_user_id: int, amount: int) -> int:
         """Add points to a user. Returns new balance."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Upsert User if not exists
             await db.execute(
                 "INSERT INTO users(id, created_at, points) VALUES(?, ?, 0) ON CONFLICT(id) DO NOTHING",
@@ -1210,7 +1364,7 @@ class Store:
 
     async def set_points(self, discord_user_id: int, amount: int) -> None:
         """Set absolute point balance."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             await db.execute(
                 "INSERT INTO users(id, created_at, points) VALUES(?, ?, ?) ON CONFLICT(id) DO UPDATE SET points=?",
                 (str(discord_user_id), int(time.time()), amount, amount),
@@ -1219,7 +1373,7 @@ class Store:
 
     async def get_permission_level(self, discord_user_id: int) -> str:
         """Get the permission level for a user (user, sub_admin, vc_admin, owner)."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             async with db.execute(
                 "SELECT permission_level FROM users WHERE id=?", (str(discord_user_id),)
             ) as cursor:
@@ -1231,7 +1385,7 @@ class Store:
 
     async def set_permission_level(self, discord_user_id: int, level: str) -> None:
         """Set permission level (owner, sub_admin, vc_admin, user)."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # Upsert
             await db.execute(
                 "INSERT INTO users(id, created_at, permission_level) VALUES(?, ?, ?) "
@@ -1242,7 +1396,7 @@ class Store:
 
     async def get_rank(self, discord_user_id: int) -> Tuple[int, int]:
         """Get the rank of a user based on points. Returns (rank, total_users)."""
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._reader() as db:
             # 1. Get user's points
             async with db.execute(
                 "SELECT points FROM users WHERE id=?", (str(discord_user_id),)
@@ -1271,7 +1425,7 @@ class Store:
 
         now = int(time.time())
 
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             # 1. Try to find existing valid token
             async with db.execute(
                 "SELECT token, expires_at FROM dashboard_tokens WHERE guild_id=?", (str(guild_id),)
@@ -1302,7 +1456,7 @@ class Store:
     async def validate_dashboard_token(self, token: str) -> Optional[str]:
         """Validate token and return guild_id if valid. Deletes expired tokens."""
         now = int(time.time())
-        async with aiosqlite.connect(self._db_path) as db:
+        async with self._writer() as db:
             async with db.execute(
                 "SELECT guild_id, expires_at FROM dashboard_tokens WHERE token=?", (token,)
             ) as cursor:
@@ -1,10 +1,31 @@
+import atexit
+import glob
+import gzip
 import json
+import logging
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict
+import random
+import shutil
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
 
 SENSITIVE_KEYS = ("token", "secret", "password", "api_key", "authorization", "cookie", "webhook")
 
+TRACE_FLUSH_INTERVAL_MS = int(os.getenv("ORA_TRACE_FLUSH_MS", "500") or "500")
+TRACE_BATCH_MAX = int(os.getenv("ORA_TRACE_BATCH_MAX", "256") or "256")
+# Ring buffer of unwritten events: when the writer falls behind, the oldest are dropped.
+TRACE_QUEUE_MAX = int(os.getenv("ORA_TRACE_QUEUE_MAX", "10000") or "10000")
+# The live file is rotated (gzip-compressed) when it exceeds this size or its period ends.
+TRACE_MAX_BYTES = int(os.getenv("ORA_TRACE_MAX_MB", "50") or "50") * 1024 * 1024
+TRACE_ROTATE_SEC = int(os.getenv("ORA_TRACE_ROTATE_SEC", "86400") or "86400")
+TRACE_KEEP_FILES = int(os.getenv("ORA_TRACE_KEEP_FILES", "14") or "14")
+
 
 def _is_enabled() -> bool:
     raw = (os.getenv("ORA_TRACE_ENABLED") or "1").strip().lower()
@@ -15,6 +36,45 @@ def _log_path() -> str:
     return os.getenv("ORA_TRACE_LOG", os.path.join("logs", "agent_trace.jsonl"))
 
 
+def _parse_sample_rates(raw: str) -> Dict[str, float]:
+    """`chat.thought=0.1,chat.progress=0.25,swarm.*=0.5` -> {event or prefix*: keep rate}."""
+    rates: Dict[str, float] = {}
+    for part in raw.split(","):
+        name, sep, rate = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            logger.warning(f"ORA_TRACE_SAMPLE: ignoring invalid rate in {part!r}")
+    return rates
+
+
+TRACE_SAMPLE_RATES = _parse_sample_rates(os.getenv("ORA_TRACE_SAMPLE", ""))
+
+
+def _sample_rate(event: str, rates: Dict[str, float]) -> float:
+    if event in rates:
+        return rates[event]
+    best = None
+    for name, rate in rates.items():
+        if name.endswith("*") and event.startswith(name[:-1]) and (best is None or len(name) > len(best[0])):
+            best = (name, rate)
+    return best[1] if best else 1.0
+
+
+def _sampled(event: str, correlation_id: str, rates: Dict[str, float]) -> bool:
+    """Keep decision per event type. Keyed on the correlation id, so a kept request keeps all its events."""
+    rate = _sample_rate(event, rates)
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    if correlation_id:
+        return zlib.crc32(f"{event}:{correlation_id}".encode("utf-8")) / 0xFFFFFFFF < rate
+    return random.random() < rate
+
+
 def _sanitize(value: Any, max_str: int = 500) -> Any:
     if isinstance(value, dict):
         out: Dict[str, Any] = {}
@@ -32,17 +92,316 @@ def _sanitize(value: Any, max_str: int = 500) -> Any:
     return value
 
 
+def rotated_files(path: str) -> List[str]:
+    """Compressed rotations of `path`, oldest first (names sort by rotation time)."""
+    base, _ = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(base)}.*.jsonl.gz"))
+
+
+class TraceSink:
+    """
+    Writes trace records from a background thread: callers only append to an in-memory
+    ring buffer, and the thread appends them to the JSONL file in batches (every
+    flush_interval_ms, or once batch_max are queued). The file is rotated into
+    `<name>.<UTC timestamp>.jsonl.gz` when it grows past max_bytes or its rotate_sec
+    period ends; only the newest keep_files rotations are kept.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        flush_interval_ms: int = TRACE_FLUSH_INTERVAL_MS,
+        batch_max: int = TRACE_BATCH_MAX,
+        queue_max: int = TRACE_QUEUE_MAX,
+        max_bytes: int = TRACE_MAX_BYTES,
+        rotate_sec: int = TRACE_ROTATE_SEC,
+        keep_files: int = TRACE_KEEP_FILES,
+    ) -> None:
+        self.path = path
+        self.flush_interval_sec = max(0.01, flush_interval_ms / 1000)
+        self.batch_max = max(1, batch_max)
+        self.max_bytes = max_bytes
+        self.rotate_sec = rotate_sec
+        self.keep_files = max(0, keep_files)
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=max(1, queue_max))
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._flush_wanted = False
+        self._enqueued = 0  # Sequence numbers, for flush() to wait on.
+        self._done = 0
+        self._file = None
+        self._size = 0
+        self._period = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+                self._done += 1  # The evicted record will never be written.
+            self._pending.append(record)
+            self._enqueued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agent-trace", daemon=True)
+                self._thread.start()
+            if len(self._pending) in (1, self.batch_max):
+                self._cond.notify_all()  # Start the batch timer / write a full batch.
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything emitted so far is written. False on timeout."""
+        with self._cond:
+            target = self._enqueued
+            self._flush_wanted = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= target or self._thread is None, timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            depth = len(self._pending)
+        return {
+            "depth": depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    # --- Writer thread ---
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.flush_interval_sec
+                while len(self._pending) < self.batch_max and not (self._closed or self._flush_wanted):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = list(self._pending)
+                self._pending.clear()
+                self._flush_wanted = False
+                closing = self._closed
+            if batch:
+                self._write(batch)  # File I/O outside the lock: emit() never waits on it.
+            with self._cond:
+                self._done += len(batch)
+                if closing and not self._pending:
+                    self._close_file()
+                    self._thread = None
+                self._cond.notify_all()
+                if self._thread is None:
+                    return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch).encode("utf-8", errors="ignore")
+            now = time.time()
+            if self._file is None:
+                self._open()
+            if self._size and (
+                self._size + len(data) > self.max_bytes
+                or (self.rotate_sec > 0 and int(now // self.rotate_sec) != self._period)
+            ):
+                self._rotate()
+            if self._size == 0 and self.rotate_sec > 0:
+                self._period = int(now // self.rotate_sec)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.written += len(batch)
+        except Exception as e:
+            self.errors += 1
+            self._close_file()
+            if self.errors == 1 or self.errors % 100 == 0:
+                logger.warning(f"Agent trace write failed ({len(batch)} events dropped): {e}")
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        if self._size and self.rotate_sec > 0:
+            self._period = int(os.path.getmtime(self.path) // self.rotate_sec)
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _rotate(self) -> None:
+        self._close_file()
+        base, _ = os.path.splitext(self.path)
+        now = datetime.now(timezone.utc)
+        target = f"{base}.{now:%Y%m%dT%H%M%S%f}.jsonl.gz"
+        while os.path.exists(target):  # Keep names unique and in rotation order.
+            now += timedelta(microseconds=1)
+            target = f"{base}.{now:%Y%m%dT%H%M%S%f}.jsonl.gz"
+        staging = f"{self.path}.rotating"
+        os.replace(self.path, staging)
+        with open(staging, "rb") as src, gzip.open(target + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(target + ".tmp", target)
+        os.remove(staging)
+        self.rotations += 1
+        for old in rotated_files(self.path)[: -self.keep_files or None]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        self._open()
+
+
+_sink: Optional[TraceSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_trace_sink() -> TraceSink:
+    """Process-wide sink for the configured ORA_TRACE_LOG path."""
+    global _sink
+    path = _log_path()
+    sink = _sink
+    if sink is not None and sink.path == path:
+        return sink
+    with _sink_lock:
+        if _sink is None or _sink.path != path:
+            if _sink is not None:
+                _sink.close()
+            _sink = TraceSink(path)
+        return _sink
+
+
+def flush_traces(timeout: float = 5.0) -> bool:
+    """Write out queued trace events (e.g. before shutdown or before reading the file)."""
+    return _sink.flush(timeout) if _sink is not None else True
+
+
+def close_trace_sink(timeout: float = 5.0) -> None:
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.close(timeout)
+
+
+atexit.register(close_trace_sink)
+
+
 def trace_event(event: str, correlation_id: str = "", **payload: Any) -> None:
-    """Write a sanitized single-line JSON trace event for agent debugging."""
+    """Queue a sanitized single-line JSON trace event for agent debugging (written in the background)."""
     if not _is_enabled():
         return
+    if TRACE_SAMPLE_RATES and not _sampled(event, correlation_id, TRACE_SAMPLE_RATES):
+        return
     record = {
         "ts": datetime.now(timezone.utc).isoformat(),
         "event": event,
         "cid": correlation_id,
         "payload": _sanitize(payload),
     }
-    path = _log_path()
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "a", encoding="utf-8", errors="ignore") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    get_trace_sink().emit(record)
+
+
+# --- Readers ---
+
+
+def _reverse_lines(path: str, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Lines of an uncompressed file, last first, reading backwards in blocks."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if tail:
+            yield tail
+
+
+def iter_records(path: Optional[str] = None, *, include_rotated: bool = True) -> Iterator[Dict[str, Any]]:
+    """All trace records, oldest first (rotated files, then the live file). Bad lines are skipped."""
+    path = path or _log_path()
+    files = (rotated_files(path) if include_rotated else []) + ([path] if os.path.exists(path) else [])
+    for name in files:
+        opener = gzip.open if name.endswith(".gz") else open
+        try:
+            with opener(name, "rt", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except (OSError, EOFError) as e:
+            logger.debug(f"Skipping unreadable trace file {name}: {e}")
+
+
+def read_events(
+    path: Optional[str] = None,
+    *,
+    limit: int = 200,
+    event: Optional[str] = None,
+    correlation_id: Optional[str] = None,
+    since: Optional[str] = None,
+    include_rotated: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Newest trace records first, for the dashboard. `event` matches exactly or, ending in
+    `*`, by prefix; `since` is an ISO timestamp. Reads the live file backwards, then (with
+    `include_rotated`) the rotated files, stopping once `limit` records match.
+    """
+    path = path or _log_path()
+    out: List[Dict[str, Any]] = []
+
+    def sources() -> Iterator[Iterator[bytes]]:
+        if os.path.exists(path):
+            yield _reverse_lines(path)
+        if include_rotated:
+            for name in reversed(rotated_files(path)):
+                try:
+                    with gzip.open(name, "rb") as f:
+                        lines = f.read().splitlines()
+                except (OSError, EOFError):
+                    continue
+                yield reversed(lines)
+
+    for lines in sources():
+        for line in lines:
+            try:
+                rec = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if since and str(rec.get("ts", "")) < since:
+                return out  # Records are in time order; everything further back is older.
+            name = str(rec.get("event", ""))
+            if event and not (name.startswith(event[:-1]) if event.endswith("*") else name == event):
+                continue
+            if correlation_id and rec.get("cid") != correlation_id:
+                continue
+            out.append(rec)
+            if len(out) >= limit:
+                return out
+    return out
@@ -59,13 +59,56 @@ class CoreAPIClient:
     """
     Client for ORA Core API (/v1).
     Delegates message processing and memory management to the the central Brain.
+
+    All requests share one long-lived aiohttp session (keep-alive pool + DNS cache).
+    The session is created lazily and closed by ORABot.close().
+    Set ORA_CORE_API_UDS to a socket path to talk to a same-host Core over a Unix
+    domain socket (e.g. `uvicorn ... --uds /run/ora/core.sock`).
     """
-    def __init__(self, base_url: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, uds_path: Optional[str] = None):
         # 1. Parameter Priority
         # 2. Env variable Priority (match ORA Core API default)
         # 3. Last fallback
         env_url = os.getenv("ORA_CORE_API_URL") or os.getenv("ORA_API_BASE_URL", "http://localhost:8001")
         self.base_url = (base_url or env_url).rstrip("/")
+        self.uds_path = uds_path or os.getenv("ORA_CORE_API_UDS") or None
+        self.pool_limit = int(os.getenv("ORA_CORE_POOL_LIMIT", "100"))
+        self.pool_limit_per_host = int(os.getenv("ORA_CORE_POOL_LIMIT_PER_HOST", "32"))
+        self.keepalive_timeout = float(os.getenv("ORA_CORE_KEEPALIVE_SEC", "60"))
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _make_connector(self) -> aiohttp.BaseConnector:
+        if self.uds_path:
+            return aiohttp.UnixConnector(
+                path=self.uds_path,
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+        return aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300,
+            use_dns_cache=True,
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._make_connector(),
+                timeout=aiohttp.ClientTimeout(total=300, sock_connect=10),
+            )
+        return self._session
+
+    async def start(self) -> None:
+        """Warm the pool at bot startup (optional; requests also create it lazily)."""
+        await self.get_session()
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def send_message(self,
                            content: str,
@@ -137,18 +180,18 @@ class CoreAPIClient:
         if correlation_id:
             headers["X-Correlation-ID"] = correlation_id
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(f"{self.base_url}/v1/messages", json=payload, headers=headers) as resp:
-                    if resp.status == 200:
-                        return await resp.json()
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"Core API Error ({resp.status}): {error_text}")
-                        return {"error": error_text, "status": resp.status}
-            except Exception as e:
-                logger.error(f"Failed to connect to Core API: {e}")
-                return {"error": str(e), "status": 500}
+        session = await self.get_session()
+        try:
+            async with session.post(f"{self.base_url}/v1/messages", json=payload, headers=headers) as resp:
+                if resp.status == 200:
+                    return await resp.json()
+                else:
+                    error_text = await resp.text()
+                    logger.error(f"Core API Error ({resp.status}): {error_text}")
+                    return {"error": error_text, "status": resp.status}
+        except Exception as e:
+            logger.error(f"Failed to connect to Core API: {e}")
+            return {"error": str(e), "status": 500}
 
     async def stream_events(self, run_id: str, timeout: int = 300):
         """
@@ -159,64 +202,74 @@ class CoreAPIClient:
 
         # Robustness:
         # SSE streams can be interrupted (proxy resets, chunked transfer errors, etc.).
-        # Retry within the timeout window and de-duplicate already-seen events.
+        # Core numbers every frame (`id:`) and replays from `Last-Event-ID`, so a reconnect
+        # resumes exactly where we left off instead of re-streaming the whole answer.
         import asyncio
         import time
 
         deadline = time.monotonic() + max(1, int(timeout))
-        backoff = 0.5
-        seen: set[str] = set()
+        backoff = 0.1
+        last_event_id: Optional[int] = None
 
         while time.monotonic() < deadline:
             remaining = max(1, int(deadline - time.monotonic()))
             timeout_cfg = aiohttp.ClientTimeout(total=remaining)
+            headers = {}
+            if last_event_id is not None:
+                headers["Last-Event-ID"] = str(last_event_id)
             try:
-                async with aiohttp.ClientSession(timeout=timeout_cfg) as session:
-                    async with session.get(url) as resp:
-                        if resp.status != 200:
-                            logger.error(f"Failed to connect to events: {await resp.text()}")
-                            return
+                session = await self.get_session()
+                async with session.get(url, headers=headers, timeout=timeout_cfg) as resp:
+                    if resp.status != 200:
+                        logger.error(f"Failed to connect to events: {await resp.text()}")
+                        return
 
-                        async for line in resp.content:
-                            if not line:
-                                continue
+                    frame_id: Optional[int] = None
+                    async for line in resp.content:
+                        if not line:
+                            continue
 
-                            decoded_line = line.decode("utf-8", errors="ignore").strip()
-                            if not decoded_line:
-                                continue
-
-                            if not decoded_line.startswith("data: "):
-                                continue
+                        decoded_line = line.decode("utf-8", errors="ignore").strip()
+                        if not decoded_line:
+                            # Blank line terminates an SSE frame.
+                            frame_id = None
+                            continue
 
+                        if decoded_line.startswith("id:"):
                             try:
-                                event_data = json.loads(decoded_line[6:])
-                            except json.JSONDecodeError:
-                                continue
+                                frame_id = int(decoded_line[3:].strip())
+                            except ValueError:
+                                frame_id = None
+                            continue
 
-                            # De-dupe by stable JSON (best-effort).
-                            try:
-                                key = json.dumps(event_data, sort_keys=True, ensure_ascii=False)
-                            except Exception:
-                                key = str(event_data)
-                            if key in seen:
+                        if not decoded_line.startswith("data: "):
+                            continue
+
+                        try:
+                            event_data = json.loads(decoded_line[6:])
+                        except json.JSONDecodeError:
+                            continue
+
+                        if frame_id is not None:
+                            if last_event_id is not None and frame_id <= last_event_id:
                                 continue
-                            if len(seen) < 5000:
-                                seen.add(key)
+                            last_event_id = frame_id
+                        backoff = 0.1
 
-                            yield event_data
+                        yield event_data
 
-                            # Terminate on final or error
-                            if event_data.get("event") in ["final", "error"]:
-                                return
+                        # Terminate on final or error
+                        if event_data.get("event") in ["final", "error"]:
+                            return
 
-                        # If the stream ends without final/error, retry.
-                        raise aiohttp.ClientPayloadError("SSE ended without terminal event")
+                    # If the stream ends without final/error, retry.
+                    raise aiohttp.ClientPayloadError("SSE ended without terminal event")
 
             except asyncio.CancelledError:
                 return
             except Exception as e:
                 # Common transient: TransferEncodingError / ClientPayloadError ("not enough data ...")
-                logger.warning(f"SSE stream interrupted for run_id={run_id}; retrying: {e}")
+                logger.warning(f"SSE stream interrupted for run_id={run_id} (last_event_id={last_event_id}); resuming: {e}")
                 await asyncio.sleep(backoff)
                 backoff = min(backoff * 2, 5.0)
 
@@ -252,18 +305,18 @@ class CoreAPIClient:
             "result": result,
             "tool_call_id": tool_call_id,
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(url, json=payload) as resp:
-                    if resp.status == 200:
-                        logger.info(f"✅ Successfully submitted output for {tool_name}")
-                        return True
-                    else:
-                        text = await resp.text()
-                        logger.error(f"❌ Failed to submit output ({resp.status}): {text}")
-                        return False
-            except Exception as e:
-                logger.error(f"❌ Error submitting tool output: {e}")
-                return False
+        session = await self.get_session()
+        try:
+            async with session.post(url, json=payload) as resp:
+                if resp.status == 200:
+                    logger.info(f"✅ Successfully submitted output for {tool_name}")
+                    return True
+                else:
+                    text = await resp.text()
+                    logger.error(f"❌ Failed to submit output ({resp.status}): {text}")
+                    return False
+        except Exception as e:
+            logger.error(f"❌ Error submitting tool output: {e}")
+            return False
 
 core_client = CoreAPIClient()
@@ -1,17 +1,25 @@
 import json
 import logging
 import os
-from dataclasses import asdict, dataclass, field
+import sqlite3
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 import aiohttp
 import pytz  # type: ignore
 
 from src.config import COST_LIMITS, COST_TZ, SAFETY_BUFFER_RATIO, STATE_DIR
+from src.utils.usage_series import ALL_USERS, UsageSeries
 
 logger = logging.getLogger(__name__)
 
+# cost_state.json is rewritten from memory at most this often (or after this many ledger events);
+# every reserve/commit in between is a single append to the SQLite ledger next to it.
+COST_SNAPSHOT_SEC = float(os.getenv("ORA_COST_SNAPSHOT_SEC", "60") or "60")
+COST_SNAPSHOT_EVENTS = int(os.getenv("ORA_COST_SNAPSHOT_EVENTS", "20000") or "20000")
+
 Lane = Literal["high", "stable", "burn", "byok", "optimization"]
 Provider = Literal["local", "openai", "gemini_dev", "gemini_trial", "claude", "grok"]
 
@@ -43,6 +51,22 @@ class Bucket:
     last_update_iso: str = ""
 
 
+def _usage_dict(usage: Usage) -> Dict[str, Any]:
+    return {"tokens_in": usage.tokens_in, "tokens_out": usage.tokens_out, "usd": usage.usd}
+
+
+def _bucket_dict(bucket: Bucket) -> Dict[str, Any]:
+    # Same shape as dataclasses.asdict(bucket), without its deep-copy overhead.
+    return {
+        "day": bucket.day,
+        "month": bucket.month,
+        "used": _usage_dict(bucket.used),
+        "reserved": _usage_dict(bucket.reserved),
+        "hard_stopped": bucket.hard_stopped,
+        "last_update_iso": bucket.last_update_iso,
+    }
+
+
 @dataclass
 class AllowDecision:
     allowed: bool
@@ -51,8 +75,20 @@ class AllowDecision:
 
 
 class CostManager:
-    def __init__(self):
-        self.state_file = os.path.join(STATE_DIR, "cost_state.json")
+    """
+    Token / USD budgets per lane, provider and user.
+
+    State lives in memory. `cost_state.json` is a periodic snapshot (still read directly by
+    the dashboard); every change since the last snapshot is appended to `cost_ledger.sqlite3`
+    and replayed on startup. Writing a snapshot compacts the ledger.
+
+    Consumed usage is also rolled up into hourly / daily / monthly series (`self.series`)
+    in the same transaction, which the dashboard queries instead of the snapshot.
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file or os.path.join(STATE_DIR, "cost_state.json")
+        self.ledger_file = os.path.join(os.path.dirname(self.state_file), "cost_ledger.sqlite3")
         self.timezone = pytz.timezone(COST_TZ)
         self.global_buckets: Dict[str, Bucket] = {}  # key = f"{lane}:{provider}"
         self.user_buckets: Dict[str, Dict[str, Bucket]] = {}  # user_id -> (key -> Bucket)
@@ -69,7 +105,16 @@ class CostManager:
 
         self.unlimited_mode = False  # Deprecated but kept for safe migration (will be removed logic-wise)
 
+        self._ledger: Optional[sqlite3.Connection] = None
+        self.series: Optional[UsageSeries] = None
+        self._ledger_seq = 0  # Last ledger event included in the in-memory state.
+        self._snapshot_seq = 0  # Last ledger event included in cost_state.json.
+        self._snapshot_at = time.monotonic()
+
         self._load_state()
+        self._open_ledger()
+        self._replay_ledger()
+        self._seed_series()
 
     def toggle_unlimited_mode(self, enabled: bool, user_id: str = None):
         """
@@ -91,6 +136,7 @@ class CostManager:
             self.unlimited_mode = enabled
             logger.warning(f"⚠️ SYSTEM OVERRIDE: Global Unlimited Mode set to {enabled}")
 
+        self._save_unlimited_meta()
         self._save_state()
 
     def _get_current_time_keys(self):
@@ -143,6 +189,7 @@ class CostManager:
             # Restore Unlimited Users
             self.unlimited_users = set(data.get("unlimited_users", []))
             self.unlimited_mode = data.get("unlimited_mode", False)
+            self._snapshot_seq = self._ledger_seq = int(data.get("ledger_seq", 0))
 
             logger.info("Cost state loaded successfully.")
         except Exception as e:
@@ -172,8 +219,10 @@ class CostManager:
                 # If parsing fails, drop malformed keys to keep data clean.
                 del hour_map[hour]
 
-    def _add_hourly_usage(self, lane: Lane, provider: Provider, user_id: Optional[int], usage: Usage) -> None:
-        hour_key = self._get_current_hour_key()
+    def _add_hourly_usage(
+        self, lane: Lane, provider: Provider, user_id: Optional[int], usage: Usage, hour_key: Optional[str] = None
+    ) -> None:
+        hour_key = hour_key or self._get_current_hour_key()
         bucket_key = self._get_bucket_key(lane, provider)
 
         if user_id is not None:
@@ -189,42 +238,315 @@ class CostManager:
         if hour_usage is None:
             hour_usage = Usage()
             hour_map[hour_key] = hour_usage
+            # Old hours can only fall out of the window when a new hour starts.
+            self._prune_hourly(hour_map)
 
         hour_usage.add(usage)
-        self._prune_hourly(hour_map)
+
+    # --- Ledger ---
+
+    def _open_ledger(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.ledger_file) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.ledger_file, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cost_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    lane TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    user_id TEXT,
+                    day TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    hour TEXT NOT NULL,
+                    ts TEXT NOT NULL,
+                    used_in INTEGER NOT NULL DEFAULT 0,
+                    used_out INTEGER NOT NULL DEFAULT 0,
+                    used_usd REAL NOT NULL DEFAULT 0,
+                    res_in INTEGER NOT NULL DEFAULT 0,
+                    res_out INTEGER NOT NULL DEFAULT 0,
+                    res_usd REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            series = UsageSeries(conn)
+            series.ensure_schema()
+            self._ledger = conn
+            self.series = series
+        except Exception as e:
+            logger.error(f"Failed to open cost ledger (falling back to full snapshots): {e}")
+            self._ledger = None
+            self.series = None
+
+    def _seed_series(self) -> None:
+        """
+        One-time backfill of the usage series from buckets / history / hourly maps of the loaded state.
+
+        Global buckets hold unattributed usage plus user charges mirrored by add_cost, while user
+        commits never reach them, and the state cannot tell the two apart. ALL_USERS therefore takes,
+        per lane and period, the larger of the global usage and the sum over users, so no charge is
+        counted twice.
+        """
+        if self.series is None or self.series.get_meta("series_seeded"):
+            return
+        rows = []
+        global_cells: Dict[tuple, List[float]] = {}
+        user_cells: Dict[tuple, List[float]] = {}
+
+        def add_usage(scope: Optional[str], cell: tuple, u: Usage) -> None:
+            if not (u.tokens_in or u.tokens_out or u.usd):
+                return
+            if scope is not None:
+                rows.append((*cell[:2], scope, *cell[2:], u.tokens_in, u.tokens_out, u.usd))
+            totals = (user_cells if scope is not None else global_cells).setdefault(cell, [0, 0, 0.0])
+            totals[0] += u.tokens_in
+            totals[1] += u.tokens_out
+            totals[2] += u.usd
+
+        def add_bucket(scope: Optional[str], key: str, bucket: Bucket) -> None:
+            lane, _, provider = key.partition(":")
+            for granularity, period in (("day", bucket.day), ("month", bucket.month)):
+                add_usage(scope, (granularity, period, lane, provider), bucket.used)
+
+        def add_hours(scope: Optional[str], key: str, hour_map: Dict[str, Usage]) -> None:
+            lane, _, provider = key.partition(":")
+            for hour, u in hour_map.items():
+                add_usage(scope, ("hour", hour, lane, provider), u)
+
+        for key, bucket in self.global_buckets.items():
+            add_bucket(None, key, bucket)
+        for key, hist in self.global_history.items():
+            for bucket in hist:
+                add_bucket(None, key, bucket)
+        for key, hour_map in self.global_hourly.items():
+            add_hours(None, key, hour_map)
+        for uid in set(self.user_buckets) | set(self.user_history) | set(self.user_hourly):
+            for key, bucket in self.user_buckets.get(uid, {}).items():
+                add_bucket(uid, key, bucket)
+            for key, hist in self.user_history.get(uid, {}).items():
+                for bucket in hist:
+                    add_bucket(uid, key, bucket)
+            for key, hour_map in self.user_hourly.get(uid, {}).items():
+                add_hours(uid, key, hour_map)
+        for cell in set(global_cells) | set(user_cells):
+            g = global_cells.get(cell, [0, 0, 0.0])
+            u = user_cells.get(cell, [0, 0, 0.0])
+            rows.append((*cell[:2], ALL_USERS, *cell[2:], max(g[0], u[0]), max(g[1], u[1]), max(g[2], u[2])))
+
+        try:
+            self._ledger.execute("BEGIN IMMEDIATE")
+            try:
+                self.series.add_rows(rows)
+                self._save_unlimited_meta()
+                self.series.set_meta("series_seeded", True)
+                self._ledger.execute("COMMIT")
+            except Exception:
+                self._ledger.execute("ROLLBACK")
+                raise
+            if rows:
+                logger.info(f"Seeded usage series with {len(rows)} rows from cost state.")
+        except Exception as e:
+            logger.error(f"Failed to seed usage series: {e}")
+
+    def _save_unlimited_meta(self) -> None:
+        if self.series is None:
+            return
+        try:
+            self.series.set_meta("unlimited_mode", self.unlimited_mode)
+            self.series.set_meta("unlimited_users", sorted(self.unlimited_users))
+        except Exception as e:
+            logger.warning(f"Failed to store unlimited settings: {e}")
+
+    def _replay_ledger(self) -> None:
+        """Apply ledger events written after the loaded snapshot (i.e. before an unclean shutdown)."""
+        if self._ledger is None:
+            return
+        try:
+            rows = self._ledger.execute(
+                "SELECT seq, op, lane, provider, user_id, day, month, hour, ts, "
+                "used_in, used_out, used_usd, res_in, res_out, res_usd "
+                "FROM cost_events WHERE seq > ? ORDER BY seq",
+                (self._snapshot_seq,),
+            ).fetchall()
+        except Exception as e:
+            logger.error(f"Failed to replay cost ledger: {e}")
+            return
+        for seq, op, lane, provider, uid, day, month, hour, ts, ui, uo, uu, ri, ro, ru in rows:
+            self._apply_event(op, lane, provider, uid, Usage(ui, uo, uu), Usage(ri, ro, ru), (day, month, hour, ts))
+            self._ledger_seq = seq
+        if rows:
+            logger.info(f"Replayed {len(rows)} cost ledger events.")
+
+    def _apply_event(
+        self,
+        op: str,
+        lane: Lane,
+        provider: Provider,
+        user_id: Optional[Any],
+        used: Usage,
+        reserved: Usage,
+        when: tuple,
+    ) -> Bucket:
+        """
+        Single place where bucket totals change; used live and when replaying the ledger.
+        `when` is (day, month, hour, iso timestamp) of the event.
+        """
+        day, month, hour, ts = when
+        bucket = self._get_or_create_bucket(lane, provider, user_id, day_key=day, month_key=month)
+        if op == "reserve":
+            bucket.reserved.add(reserved)
+        elif op == "commit":
+            # Reservation settled with actual usage ("keep" rollbacks settle with the estimate).
+            bucket.used.add(used)
+            bucket.reserved.sub(reserved)
+            self._add_hourly_usage(lane, provider, user_id, used, hour_key=hour)
+        elif op == "release":
+            bucket.reserved.sub(reserved)
+        elif op == "add":
+            bucket.used.add(used)
+            self._add_hourly_usage(lane, provider, user_id, used, hour_key=hour)
+        elif op == "adjust":
+            bucket.used.add(used)  # Drift correction: not attributed to an hour.
+        elif op == "hard_stop":
+            bucket.hard_stopped = True
+        bucket.last_update_iso = ts
+        return bucket
+
+    def _record(
+        self,
+        op: str,
+        lane: Lane,
+        provider: Provider,
+        user_id: Optional[int],
+        used: Optional[Usage] = None,
+        reserved: Optional[Usage] = None,
+        rollup: bool = True,
+    ) -> Bucket:
+        """
+        Apply a change in memory and append it to the ledger (O(1); snapshots are amortized).
+        Consumed usage is added to the usage series unless `rollup` is False (mirrored global adds).
+        """
+        used = used or Usage()
+        reserved = reserved or Usage()
+        now = datetime.now(self.timezone)
+        when = (now.strftime("%Y-%m-%d"), now.strftime("%Y-%m"), now.strftime("%Y-%m-%dT%H"), now.isoformat())
+        bucket = self._apply_event(op, lane, provider, user_id, used, reserved, when)
+
+        if self._ledger is None:
+            self._save_state()
+            return bucket
+        try:
+            self._ledger.execute("BEGIN IMMEDIATE")
+            cur = self._ledger.execute(
+                "INSERT INTO cost_events (op, lane, provider, user_id, day, month, hour, ts, "
+                "used_in, used_out, used_usd, res_in, res_out, res_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    op,
+                    lane,
+                    provider,
+                    str(user_id) if user_id else None,
+                    *when,
+                    used.tokens_in,
+                    used.tokens_out,
+                    used.usd,
+                    reserved.tokens_in,
+                    reserved.tokens_out,
+                    reserved.usd,
+                ),
+            )
+            if rollup and op in ("commit", "add", "adjust") and (used.tokens_in or used.tokens_out or used.usd):
+                self.series.add(when[:3], lane, provider, user_id or None, used.tokens_in, used.tokens_out, used.usd)
+            self._ledger.execute("COMMIT")
+            self._ledger_seq = cur.lastrowid
+        except Exception as e:
+            if self._ledger.in_transaction:
+                self._ledger.execute("ROLLBACK")
+            logger.error(f"Failed to append cost ledger event: {e}")
+            self._save_state()
+            return bucket
+
+        if (
+            self._ledger_seq - self._snapshot_seq >= COST_SNAPSHOT_EVENTS
+            or time.monotonic() - self._snapshot_at >= COST_SNAPSHOT_SEC
+        ):
+            self._save_state()
+        return bucket
+
+    def flush(self) -> None:
+        """Write a snapshot if anything changed since the last one."""
+        if self._ledger_seq != self._snapshot_seq or self._ledger is None:
+            self._save_state()
+
+    def close(self) -> None:
+        self.flush()
+        if self._ledger is not None:
+            try:
+                self._ledger.close()
+            except Exception:
+                pass
+            self._ledger = None
 
     def _save_state(self):
+        """Write the full snapshot (atomically) and compact the ledger events it covers."""
         try:
             data = {
-                "global_buckets": {k: asdict(v) for k, v in self.global_buckets.items()},
-                "global_history": {k: [asdict(b) for b in v] for k, v in self.global_history.items()},
+                "global_buckets": {k: _bucket_dict(v) for k, v in self.global_buckets.items()},
+                "global_history": {k: [_bucket_dict(b) for b in v] for k, v in self.global_history.items()},
                 "user_buckets": {
-                    uid: {k: asdict(v) for k, v in ubuckets.items()} for uid, ubuckets in self.user_buckets.items()
+                    uid: {k: _bucket_dict(v) for k, v in ubuckets.items()} for uid, ubuckets in self.user_buckets.items()
                 },
                 "user_history": {
-                    uid: {k: [asdict(b) for b in v] for k, v in uhists.items()}
+                    uid: {k: [_bucket_dict(b) for b in v] for k, v in uhists.items()}
                     for uid, uhists in self.user_history.items()
                 },
                 "global_hourly": {
-                    k: {hour: asdict(u) for hour, u in hour_map.items()} for k, hour_map in self.global_hourly.items()
+                    k: {hour: _usage_dict(u) for hour, u in hour_map.items()} for k, hour_map in self.global_hourly.items()
                 },
                 "user_hourly": {
-                    uid: {k: {hour: asdict(u) for hour, u in hour_map.items()} for k, hour_map in uhists.items()}
+                    uid: {k: {hour: _usage_dict(u) for hour, u in hour_map.items()} for k, hour_map in uhists.items()}
                     for uid, uhists in self.user_hourly.items()
                 },
                 "unlimited_mode": self.unlimited_mode,
                 "unlimited_users": list(self.unlimited_users),
+                "ledger_seq": self._ledger_seq,
             }
             if not os.path.exists(os.path.dirname(self.state_file)):
                 os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-                
-            with open(self.state_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+
+            # Replace atomically so readers (dashboard) never see a half-written file.
+            tmp_path = self.state_file + ".tmp"
+            # Compact output keeps json on its C encoder (indent=2 made large snapshots take seconds).
+            payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.state_file)
         except Exception as e:
             logger.error(f"Failed to save cost state: {e}")
+            return
+
+        self._snapshot_seq = self._ledger_seq
+        self._snapshot_at = time.monotonic()
+        if self._ledger is not None:
+            try:
+                self._ledger.execute("DELETE FROM cost_events WHERE seq <= ?", (self._snapshot_seq,))
+                self.series.prune_hours(datetime.now(self.timezone).replace(tzinfo=None))
+            except Exception as e:
+                logger.warning(f"Failed to compact cost ledger: {e}")
 
-    def _get_or_create_bucket(self, lane: Lane, provider: Provider, user_id: Optional[int] = None) -> Bucket:
-        day_key, month_key = self._get_current_time_keys()
+    def _get_or_create_bucket(
+        self,
+        lane: Lane,
+        provider: Provider,
+        user_id: Optional[int] = None,
+        day_key: Optional[str] = None,
+        month_key: Optional[str] = None,
+    ) -> Bucket:
+        if day_key is None or month_key is None:
+            day_key, month_key = self._get_current_time_keys()
         bucket_key = self._get_bucket_key(lane, provider)
 
         # Determine target dictionary (Global or User)
@@ -338,7 +660,7 @@ class CostManager:
                 # 1. Stop Current Lane
                 bucket = self._get_or_create_bucket(lane, provider, user_id)
                 if not bucket.hard_stopped:
-                    bucket.hard_stopped = True
+                    self._record("hard_stop", lane, provider, user_id)
                     logger.warning(f"⛔ [CostManager] Hard Stop Triggered for {lane}:{provider} user={user_id}")
 
                 # 2. Stop Shared Lane (if applicable)
@@ -349,10 +671,8 @@ class CostManager:
                     if other_limits.get("hard_stop", False):
                         other_bucket = self._get_or_create_bucket(other_lane, provider, user_id)
                         if not other_bucket.hard_stopped:
-                            other_bucket.hard_stopped = True
+                            self._record("hard_stop", other_lane, provider, user_id)
                             logger.warning(f"⛔ [CostManager] Shared Hard Stop Triggered for {other_lane}:{provider} user={user_id}")
-
-                self._save_state()
             
             return decision
 
@@ -368,25 +688,13 @@ class CostManager:
         self._reservations[reservation_id] = est
 
         # Add to Bucket Reserved
-        bucket = self._get_or_create_bucket(lane, provider, user_id)
-        bucket.reserved.add(est)
-        bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-        self._save_state()
+        self._record("reserve", lane, provider, user_id, reserved=est)
 
     def commit(
         self, lane: Lane, provider: Provider, user_id: Optional[int], reservation_id: str, actual: Usage
     ) -> float:
         est = self._reservations.pop(reservation_id, None)
-        bucket = self._get_or_create_bucket(lane, provider, user_id)
-
-        bucket.used.add(actual)
-        if est:
-            bucket.reserved.sub(est)
-
-        bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-        self._add_hourly_usage(lane, provider, user_id, actual)
-        self._save_state()
-
+        bucket = self._record("commit", lane, provider, user_id, used=actual, reserved=est)
         return bucket.used.usd
 
     def rollback(
@@ -407,20 +715,13 @@ class CostManager:
         if not est:
             return
 
-        bucket = self._get_or_create_bucket(lane, provider, user_id)
-
         if mode == "release":
-            bucket.reserved.sub(est)
+            self._record("release", lane, provider, user_id, reserved=est)
             del self._reservations[reservation_id]
         elif mode == "keep":
             # Treat as Used
-            bucket.used.add(est)
-            bucket.reserved.sub(est)
+            self._record("commit", lane, provider, user_id, used=est, reserved=est)
             del self._reservations[reservation_id]
-            self._add_hourly_usage(lane, provider, user_id, est)
-
-        bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-        self._save_state()
 
     async def sync_openai_usage(
         self, session: aiohttp.ClientSession, api_key: str, update_local: bool = False
@@ -479,9 +780,7 @@ class CostManager:
                     diff = total_tokens - local_used
                     # Add difference to 'tokens_out' (Costliest assumption, or split)
                     # Just add to tokens_out to ensure limit checking works.
-                    bucket.used.tokens_out += diff
-                    bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-                    self._save_state()
+                    self._record("adjust", "stable", "openai", None, used=Usage(tokens_out=diff))
                     result["updated"] = True
                     result["drift_added"] = diff
                     logger.info(f"🔄 [Sync] Updated Local State. Added {diff} tokens to match Official {total_tokens}.")
@@ -545,19 +844,12 @@ class CostManager:
         """
         Directly add cost (used for background tasks like memory optimization).
         """
-        bucket = self._get_or_create_bucket(lane, provider, user_id)
-        bucket.used.add(usage)
-        bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-        self._add_hourly_usage(lane, provider, user_id, usage)
+        bucket = self._record("add", lane, provider, user_id, used=usage)
 
         # Also update Global Bucket if this was a user-specific add
         if user_id is not None:
-            global_bucket = self._get_or_create_bucket(lane, provider, None)
-            global_bucket.used.add(usage)
-            global_bucket.last_update_iso = datetime.now(self.timezone).isoformat()
-            self._add_hourly_usage(lane, provider, None, usage)
+            self._record("add", lane, provider, None, used=usage, rollup=False)
 
-        self._save_state()
         logger.info(f"CostAdded: {lane}:{provider} user={user_id} used={usage}")
         return bucket.used.usd
 
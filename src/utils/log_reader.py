@@ -1,15 +1,40 @@
 import logging
 import os
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Archived format: TIMESTAMP INFO guild_ID Message: User#1234 (12345): Content | Attachments: 0
+_ARCHIVED_RE = re.compile(r"Message: (.*?) \((\d+)\): (.*?) \| Attachments: \d+$", re.DOTALL)
+# Fallback for standard logger or missing attachments part: Message: User (12345): Content
+_MESSAGE_RE = re.compile(r"Message: (.*?) \((\d+)\): (.*)$", re.DOTALL)
+
+
+def parse_log_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one guild log line into {"author_name", "author_id", "content", "timestamp"} (None if not a message)."""
+    parts = line.split(" ", 3)
+    if len(parts) < 4:
+        return None
+    msg_content = parts[3].strip()
+    match = _ARCHIVED_RE.search(msg_content) or _MESSAGE_RE.search(msg_content)
+    if not match:
+        return None
+    return {
+        "author_name": match.group(1),
+        "author_id": int(match.group(2)),
+        "content": match.group(3),
+        "timestamp": parts[0],
+    }
+
 
 class LocalLogReader:
     """
     Reads chat history from local rotation logs (L:/ORA_Logs/guilds/{guild_id}.log)
     to bypass Discord API Rate Limits.
+
+    get_recent_messages() scans whole files; lookups should go through
+    src.services.chat_log_store.ChatLogStore, which indexes these files incrementally.
     """
 
     try:
@@ -31,26 +56,25 @@ class LocalLogReader:
         )
         # 2024-01-01T12:00:00.000 INFO guild_123 User (123): Content
 
+    def log_files(self, guild_id: int, is_public: Optional[bool] = None) -> List[Tuple[str, Optional[bool]]]:
+        """(path, is_public) of the log files holding a guild's messages; None = unscoped."""
+        files: List[Tuple[str, Optional[bool]]] = []
+        if is_public is not False:
+            files.append((os.path.join(self.LOG_DIR, f"{guild_id}_public.log"), True))
+        if is_public is not True:
+            files.append((os.path.join(self.LOG_DIR, f"{guild_id}_private.log"), False))
+        if is_public is None:
+            files.append((os.path.join(self.LOG_DIR, f"{guild_id}_archive.log"), None))  # Legacy fallback
+        files.append((os.path.join(self.LOG_DIR, f"{guild_id}.log"), None))  # Active log
+        return files
+
     def get_recent_messages(
         self, guild_id: int, limit: int = 50, user_id: Optional[int] = None, is_public: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
         Parses local logs to find recent messages. Supports privacy scoping.
         """
-        # 1. Determine log files to read
-        log_files = []
-        if is_public is True:
-            log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}_public.log"))
-        elif is_public is False:
-            log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}_private.log"))
-        else:
-            # Both (legacy or combined)
-            log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}_public.log"))
-            log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}_private.log"))
-            log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}_archive.log"))  # Legacy fallback
-
-        log_files.append(os.path.join(self.LOG_DIR, f"{guild_id}.log"))  # Active log
-
+        log_files = [path for path, _ in self.log_files(guild_id, is_public)]
         all_lines = []
         for log_file in log_files:
             if os.path.exists(log_file):
@@ -69,35 +93,12 @@ class LocalLogReader:
                 if len(messages) >= limit:
                     break
 
-                # Format: TIMESTAMP INFO guild_ID Message: User (ID): Content | Attachments: N
-                parts = line.split(" ", 3)
-                if len(parts) < 4:
+                msg_obj = parse_log_line(line)
+                if msg_obj is None:
                     continue
-
-                msg_content = parts[3].strip()
-
-                # Regex for archived format: Message: User#1234 (12345): Content | Attachments: 0
-                match = re.search(r"Message: (.*?) \((\d+)\): (.*?) \| Attachments: \d+$", msg_content, re.DOTALL)
-                if not match:
-                    # Fallback for standard logger or missing attachments part
-                    # Expected: Message: User (12345): Content
-                    match = re.search(r"Message: (.*?) \((\d+)\): (.*)$", msg_content, re.DOTALL)
-
-                if match:
-                    author_name = match.group(1)
-                    author_id = int(match.group(2))
-                    content = match.group(3)
-
-                    if user_id and author_id != user_id:
-                        continue
-
-                    msg_obj = {
-                        "author_name": author_name,
-                        "author_id": author_id,
-                        "content": content,
-                        "timestamp": parts[0],
-                    }
-                    messages.append(msg_obj)
+                if user_id and msg_obj["author_id"] != user_id:
+                    continue
+                messages.append(msg_obj)
 
             logger.debug(f"LocalLogReader: Found {len(messages)} messages for {user_id} in {guild_id}.")
             return messages
@@ -1,6 +1,7 @@
 import logging
 import logging.handlers
 import os
+import time
 from logging import Handler
 
 
@@ -49,12 +50,12 @@ class GuildLogger:
                 encoding="utf-8",
             )
 
-            # Use the standard formatting
+            # Use the standard formatting, stamped in UTC. Older lines carry local time with a
+            # "Z" suffix; the explicit "+00:00" tells the chat log importer which is which.
             formatter = logging.Formatter(
-                "%(asctime)s %(levelname)s %(name)s %(message)s", datefmt="%Y-%m-%dT%H:%M:%SZ"
+                "%(asctime)s %(levelname)s %(name)s %(message)s", datefmt="%Y-%m-%dT%H:%M:%S+00:00"
             )
-            # Use ISO8601UTCFormatter if available, effectively defaulting to standard for now
-            # to avoid circular imports or complex referencing.
+            formatter.converter = time.gmtime
 
             from src.utils.privacy import PrivacyFilter
             handler.setFormatter(formatter)
@@ -0,0 +1,200 @@
+"""Cross-process advisory file locks (flock / msvcrt) with async waiting and contention metrics."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+try:  # POSIX
+    import fcntl  # type: ignore
+
+    msvcrt = None
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_MIN_BACKOFF = 0.002
+_MAX_BACKOFF = 0.1
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a ProcessLock could not be acquired within its timeout."""
+
+
+@dataclass
+class LockStats:
+    acquired: int = 0
+    contended: int = 0
+    timeouts: int = 0
+    stale_holders: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+
+
+_STATS: Dict[str, LockStats] = {}
+# One asyncio.Lock per lock file: coroutines of the same process queue here (no polling);
+# only contention with another process falls back to backoff polling.
+_LOCAL_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def lock_stats() -> Dict[str, dict]:
+    """Contention metrics per lock name."""
+    return {name: asdict(stats) for name, stats in _STATS.items()}
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        import psutil
+
+        return psutil.pid_exists(pid)
+    except Exception:
+        return True
+
+
+class ProcessLock:
+    """
+    Exclusive lock on `<path>.lock`, shared by the main bot and the worker-mode process.
+
+    The OS releases the lock when the holding process exits, so a crashed holder can
+    never leave a stale lock behind (the lock file itself is left in place on purpose;
+    deleting it would let two processes lock different inodes). The holder's pid is
+    written into the file; waits longer than `stale_after` log the holder and count it
+    in `stale_holders` if that process is gone.
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0, name: str = "default", stale_after: float = 5.0):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self.name = name
+        self.stale_after = stale_after
+        self._fd: Optional[int] = None
+        self._local: Optional[asyncio.Lock] = None
+
+    def _stats(self) -> LockStats:
+        stats = _STATS.get(self.name)
+        if stats is None:
+            stats = _STATS[self.name] = LockStats()
+        return stats
+
+    async def acquire(self) -> None:
+        stats = self._stats()
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+
+        local = _LOCAL_LOCKS.get(self.lock_path)
+        if local is None:
+            local = asyncio.Lock()
+            _LOCAL_LOCKS[self.lock_path] = local
+        self._local = local
+        try:
+            await asyncio.wait_for(local.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._local = None
+            stats.timeouts += 1
+            raise LockTimeout(f"Timed out waiting for {self.lock_path} (in-process)") from None
+
+        fd: Optional[int] = None
+        try:
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+            backoff = _MIN_BACKOFF
+            contended = False
+            warned = False
+            while not _try_lock(fd):
+                contended = True
+                if time.monotonic() >= deadline:
+                    stats.timeouts += 1
+                    raise LockTimeout(f"Timed out waiting for {self.lock_path} (held by {self._holder()})")
+                if not warned and time.perf_counter() - start > self.stale_after:
+                    warned = True
+                    self._check_holder(stats)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, _MAX_BACKOFF)
+        except BaseException:
+            # Timeouts and cancellations (e.g. a chat stage timeout) must not leak the descriptor.
+            if fd is not None:
+                os.close(fd)
+            local.release()
+            self._local = None
+            raise
+
+        try:
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, f"{os.getpid()}:{time.time():.3f}".encode())
+        except OSError:
+            pass  # Diagnostics only.
+        self._fd = fd
+
+        waited_ms = (time.perf_counter() - start) * 1000
+        stats.acquired += 1
+        if contended or waited_ms > 1.0:
+            stats.contended += 1
+        stats.wait_ms_total += waited_ms
+        stats.wait_ms_max = max(stats.wait_ms_max, waited_ms)
+
+    def _holder(self) -> str:
+        try:
+            with open(self.lock_path, "r", encoding="utf-8") as f:
+                return f.read().strip() or "unknown"
+        except OSError:
+            return "unknown"
+
+    def _check_holder(self, stats: LockStats) -> None:
+        holder = self._holder()
+        try:
+            pid = int(holder.split(":", 1)[0])
+        except ValueError:
+            pid = None
+        if pid is not None and pid != os.getpid() and not _pid_alive(pid):
+            stats.stale_holders += 1
+            logger.warning(f"Lock {self.lock_path} still busy but recorded holder pid {pid} is gone")
+        else:
+            logger.warning(f"Waiting on lock {self.lock_path} for >{self.stale_after:.0f}s (holder {holder})")
+
+    def release(self) -> None:
+        if self._fd is not None:
+            try:
+                _unlock(self._fd)
+            except OSError as e:
+                logger.debug(f"Failed to unlock {self.lock_path}: {e}")
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        if self._local is not None:
+            self._local.release()
+            self._local = None
+
+    async def __aenter__(self) -> "ProcessLock":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
@@ -0,0 +1,258 @@
+"""Rolled-up token / USD usage series (hour, day, month) kept next to the CostManager ledger."""
+
+import json
+import math
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import STATE_DIR
+
+USAGE_DB_PATH = os.path.join(STATE_DIR, "cost_ledger.sqlite3")
+# Hour rows are only needed for the recent charts; day / month rows are kept forever.
+USAGE_HOURLY_RETENTION_DAYS = int(os.getenv("ORA_USAGE_HOURLY_RETENTION_DAYS", "30") or "30")
+
+GRANULARITIES = ("hour", "day", "month")
+ALL_USERS = "*"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_series (
+    granularity TEXT NOT NULL,
+    period TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    tokens_in INTEGER NOT NULL DEFAULT 0,
+    tokens_out INTEGER NOT NULL DEFAULT 0,
+    usd REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, scope, period, lane, provider)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_usage_series_period ON usage_series (granularity, period);
+CREATE TABLE IF NOT EXISTS cost_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_UPSERT = """
+INSERT INTO usage_series (granularity, period, scope, lane, provider, tokens_in, tokens_out, usd)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularity, scope, period, lane, provider) DO UPDATE SET
+    tokens_in = tokens_in + excluded.tokens_in,
+    tokens_out = tokens_out + excluded.tokens_out,
+    usd = usd + excluded.usd
+"""
+
+Periods = Tuple[str, str, str]  # (day "YYYY-MM-DD", month "YYYY-MM", hour "YYYY-MM-DDTHH")
+
+
+def _period_index(granularity: str, period: str) -> int:
+    if granularity == "hour":
+        dt = datetime.strptime(period, "%Y-%m-%dT%H")
+        return dt.toordinal() * 24 + dt.hour
+    if granularity == "day":
+        return date.fromisoformat(period).toordinal()
+    year, month = period.split("-")
+    return int(year) * 12 + int(month) - 1
+
+
+def _index_period(granularity: str, index: int) -> str:
+    if granularity == "hour":
+        return datetime.fromordinal(index // 24).replace(hour=index % 24).strftime("%Y-%m-%dT%H")
+    if granularity == "day":
+        return date.fromordinal(index).isoformat()
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def downsample(granularity: str, points: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive periods into equal-width bins so at most `max_points` remain.
+    Bins are aligned to multiples of their width and labelled with their first period.
+    """
+    if max_points <= 0 or len(points) <= max_points:
+        return points
+    first = _period_index(granularity, points[0]["period"])
+    last = _period_index(granularity, points[-1]["period"])
+    step = max(1, math.ceil((last - first + 1) / max_points))
+    bins: Dict[int, Dict[str, Any]] = {}
+    for point in points:
+        start = _period_index(granularity, point["period"]) // step * step
+        acc = bins.get(start)
+        if acc is None:
+            acc = bins[start] = {"period": _index_period(granularity, start), "tokens": 0, "usd": 0.0, "lanes": {}}
+        acc["tokens"] += point["tokens"]
+        acc["usd"] += point["usd"]
+        for lane, tokens in point["lanes"].items():
+            acc["lanes"][lane] = acc["lanes"].get(lane, 0) + tokens
+    return [bins[k] for k in sorted(bins)]
+
+
+class UsageSeries:
+    """
+    Usage rolled up per (granularity, period, scope, lane, provider), where scope is a
+    user id or ALL_USERS. CostManager writes it in the same transaction as its ledger
+    appends; readers (dashboard) get bounded range queries instead of parsing the full
+    cost state.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    @classmethod
+    def open_reader(cls, path: Optional[str] = None) -> Optional["UsageSeries"]:
+        """Connection for queries from another process (the web API). None if CostManager never created it."""
+        path = path or USAGE_DB_PATH
+        if not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return cls(conn)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def ensure_schema(self) -> None:
+        self.conn.executescript(_SCHEMA)
+
+    # --- Writes (caller owns the transaction) ---
+
+    def add(self, periods: Periods, lane: str, provider: str, user_id: Optional[Any], tokens_in: int, tokens_out: int, usd: float) -> None:
+        """Add usage to the hour/day/month rows of the user (if any) and of ALL_USERS."""
+        day, month, hour = periods
+        scopes = [ALL_USERS] if user_id is None else [ALL_USERS, str(user_id)]
+        self.conn.executemany(
+            _UPSERT,
+            [
+                (granularity, period, scope, lane, provider, tokens_in, tokens_out, usd)
+                for scope in scopes
+                for granularity, period in (("hour", hour), ("day", day), ("month", month))
+            ],
+        )
+
+    def add_rows(self, rows: Iterable[Tuple[str, str, str, str, str, int, int, float]]) -> None:
+        """Bulk-add raw (granularity, period, scope, lane, provider, tokens_in, tokens_out, usd) rows."""
+        self.conn.executemany(_UPSERT, rows)
+
+    def prune_hours(self, now: datetime, retention_days: int = USAGE_HOURLY_RETENTION_DAYS) -> None:
+        cutoff = (now - timedelta(days=retention_days)).strftime("%Y-%m-%dT%H")
+        self.conn.execute("DELETE FROM usage_series WHERE granularity = 'hour' AND period < ?", (cutoff,))
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute("SELECT value FROM cost_meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any) -> None:
+        self.conn.execute(
+            "INSERT INTO cost_meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    # --- Queries ---
+
+    def series(
+        self,
+        granularity: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        *,
+        user_id: Optional[Any] = None,
+        lane: Optional[str] = None,
+        provider: Optional[str] = None,
+        max_points: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Usage per period in [start, end] (inclusive, period strings of `granularity`),
+        as [{"period", "tokens", "usd", "lanes": {lane: tokens}}] sorted by period.
+        Periods without usage are omitted. `max_points` > 0 downsamples the result.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        sql = (
+            "SELECT period, lane, SUM(tokens_in + tokens_out), SUM(usd) FROM usage_series "
+            "WHERE granularity = ? AND scope = ?"
+        )
+        params: List[Any] = [granularity, ALL_USERS if user_id is None else str(user_id)]
+        for clause, value in (("period >= ?", start), ("period <= ?", end), ("lane = ?", lane), ("provider = ?", provider)):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        sql += " GROUP BY period, lane ORDER BY period"
+
+        points: List[Dict[str, Any]] = []
+        for period, row_lane, tokens, usd in self.conn.execute(sql, params):
+            if not points or points[-1]["period"] != period:
+                points.append({"period": period, "tokens": 0, "usd": 0.0, "lanes": {}})
+            point = points[-1]
+            point["tokens"] += tokens
+            point["usd"] += usd
+            point["lanes"][row_lane] = point["lanes"].get(row_lane, 0) + tokens
+        return downsample(granularity, points, max_points)
+
+    def totals(self, granularity: str = "month", period: Optional[str] = None, user_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """Usage per (lane, provider) for one period, or over all periods when `period` is None."""
+        sql = (
+            "SELECT lane, provider, SUM(tokens_in), SUM(tokens_out), SUM(usd) FROM usage_series "
+            "WHERE granularity = ? AND scope = ?"
+        )
+        params: List[Any] = [granularity, ALL_USERS if user_id is None else str(user_id)]
+        if period is not None:
+            sql += " AND period = ?"
+            params.append(period)
+        sql += " GROUP BY lane, provider ORDER BY lane, provider"
+        return [
+            {"lane": lane, "provider": provider, "tokens_in": t_in, "tokens_out": t_out, "usd": usd}
+            for lane, provider, t_in, t_out, usd in self.conn.execute(sql, params)
+        ]
+
+    def per_user(self, granularity: str, period: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        {user_id: {"usd", "lanes": {lane: tokens}, "providers": {provider}}} for every user
+        with usage in one period, or in any period when `period` is None.
+        """
+        sql = (
+            "SELECT scope, lane, provider, SUM(tokens_in + tokens_out), SUM(usd) FROM usage_series "
+            "WHERE granularity = ? AND scope != ?"
+        )
+        params: List[Any] = [granularity, ALL_USERS]
+        if period is not None:
+            sql += " AND period = ?"
+            params.append(period)
+        sql += " GROUP BY scope, lane, provider"
+        users: Dict[str, Dict[str, Any]] = {}
+        for scope, lane, provider, tokens, usd in self.conn.execute(sql, params):
+            entry = users.setdefault(scope, {"usd": 0.0, "lanes": {}, "providers": set()})
+            entry["usd"] += usd
+            entry["lanes"][lane] = entry["lanes"].get(lane, 0) + tokens
+            entry["providers"].add(provider)
+        return users
+
+    def version(self, day: str) -> Tuple[Any, ...]:
+        """Cheap change marker for per-user views of `day`: its all-users totals (a PK lookup)."""
+        row = self.conn.execute(
+            "SELECT COUNT(*), TOTAL(tokens_in + tokens_out), TOTAL(usd) FROM usage_series "
+            "WHERE granularity = 'day' AND scope = ? AND period = ?",
+            (ALL_USERS, day),
+        ).fetchone()
+        return tuple(row)
+
+    def top_users(self, granularity: str, period: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Users with the highest USD spend in one period, with tokens per lane."""
+        rows = self.conn.execute(
+            """
+            SELECT scope, lane, SUM(tokens_in + tokens_out), SUM(usd) FROM usage_series
+            WHERE granularity = ? AND period = ? AND scope IN (
+                SELECT scope FROM usage_series
+                WHERE granularity = ? AND period = ? AND scope != ?
+                GROUP BY scope ORDER BY SUM(usd) DESC, SUM(tokens_in + tokens_out) DESC LIMIT ?
+            )
+            GROUP BY scope, lane
+            """,
+            (granularity, period, granularity, period, ALL_USERS, limit),
+        ).fetchall()
+        users: Dict[str, Dict[str, Any]] = {}
+        for scope, lane, tokens, usd in rows:
+            entry = users.setdefault(scope, {"user_id": scope, "usd": 0.0, "lanes": {}})
+            entry["usd"] += usd
+            entry["lanes"][lane] = entry["lanes"].get(lane, 0) + tokens
+        return sorted(users.values(), key=lambda u: u["usd"], reverse=True)
@@ -0,0 +1,140 @@
+"""Write-behind buffer: coalesce many small writes per key into periodic batched flushes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FlushFn = Callable[[Dict[Hashable, List[Any]]], Awaitable[None]]
+
+
+class WriteBehindBuffer:
+    """
+    Buffers items per key and hands them to `flush_fn` as {key: [items...]} batches.
+
+    A flush happens `flush_interval_sec` after the first pending item, or right away
+    once `max_pending` items are queued. If `flush_fn` raises, the batch is put back in
+    front of newer items and retried on the next flush, so nothing is dropped before
+    close() (which performs a final, durable flush).
+    """
+
+    def __init__(
+        self,
+        flush_fn: FlushFn,
+        *,
+        name: str = "write-behind",
+        flush_interval_sec: float = 1.0,
+        max_pending: int = 200,
+    ) -> None:
+        self.name = name
+        self._flush_fn = flush_fn
+        self.flush_interval_sec = max(0.0, flush_interval_sec)
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[Hashable, List[Any]] = {}
+        self._depth = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._sleeping = False
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+        self._latencies_ms: Deque[float] = deque(maxlen=256)
+        self.flushes = 0
+        self.items_flushed = 0
+        self.failures = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def add(self, key: Hashable, item: Any) -> None:
+        self._pending.setdefault(key, []).append(item)
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+        if self._closed:
+            return  # close() is flushing; it will pick this up.
+        if self._depth >= self.max_pending:
+            self._schedule(0.0)
+        else:
+            self._schedule(self.flush_interval_sec)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None and not self._timer.done():
+            # Only a timer that is still sleeping may be cut short; one that is
+            # already flushing re-checks the queue when it finishes.
+            if delay > 0 or not self._sleeping:
+                return
+            self._timer.cancel()
+        self._sleeping = delay > 0
+        self._timer = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float) -> None:
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                return
+            finally:
+                self._sleeping = False
+        failures = self.failures
+        await self.flush()
+        if self._pending and not self._closed:
+            self._timer = None
+            if self.failures != failures:
+                self._schedule(max(self.flush_interval_sec, 1.0))  # Back off after a failed flush.
+            else:
+                self._schedule(0.0 if self._depth >= self.max_pending else self.flush_interval_sec)
+
+    async def flush(self) -> int:
+        """Write everything pending now. Returns the number of items written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            count = sum(len(v) for v in batch.values())
+            self._depth -= count
+            start = time.perf_counter()
+            try:
+                await self._flush_fn(batch)
+            except Exception as e:
+                self.failures += 1
+                # Re-queue ahead of anything that arrived during the failed flush.
+                for key, items in self._pending.items():
+                    batch.setdefault(key, []).extend(items)
+                self._pending = batch
+                self._depth += count
+                logger.error(f"{self.name}: flush of {count} items failed, will retry: {e}")
+                return 0
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+            self.flushes += 1
+            self.items_flushed += count
+            return count
+
+    async def close(self) -> None:
+        """Stop the timer and flush synchronously (used on cog unload / shutdown)."""
+        self._closed = True
+        if self._timer is not None and not self._timer.done() and self._sleeping:
+            self._timer.cancel()
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lat = sorted(self._latencies_ms)
+        return {
+            "depth": self._depth,
+            "max_depth": self.max_depth,
+            "keys": len(self._pending),
+            "flushes": self.flushes,
+            "items_flushed": self.items_flushed,
+            "items_per_flush": round(self.items_flushed / self.flushes, 2) if self.flushes else 0.0,
+            "failures": self.failures,
+            "flush_ms_p50": round(lat[len(lat) // 2], 3) if lat else 0.0,
+            "flush_ms_max": round(lat[-1], 3) if lat else 0.0,
+        }
@@ -91,9 +91,9 @@ async def on_startup() -> None:
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     global store
-    # Store might not need explicit disconnect if using aiofiles/sqlite3 directly per request,
-    # but good to have the hook.
-    store = None
     task = getattr(app.state, "_temp_download_cleanup_task", None)
     if task:
         task.cancel()
+    if store:
+        await store.close()
+    store = None
@@ -629,711 +629,241 @@ async def get_memory_graph(_: None = Depends(require_web_api)):
         return {"ok": False, "error_code": "READ_ERROR", "error_message": str(e)}
 
 
-@router.get("/dashboard/usage")
-async def get_dashboard_usage(_: None = Depends(require_web_api)):
-    """Get global cost usage stats from CostManager state file (Aggregated)."""
-    import json
-    from pathlib import Path
+_DASHBOARD_LANES = ("high", "stable", "optimization", "burn")
 
-    from src.config import STATE_DIR
-    state_path = Path(STATE_DIR) / "cost_state.json"
 
-    # Calculate Today in JST
-    # Calculate Today (Match CostManager Timezone)
+async def _read_usage_series(query):
+    """Run `query(UsageSeries)` against the CostManager usage database off the event loop (None if missing)."""
+    from src.utils.usage_series import UsageSeries
+
+    def run():
+        series = UsageSeries.open_reader()
+        if series is None:
+            return None
+        try:
+            return query(series)
+        finally:
+            series.close()
+
+    return await asyncio.to_thread(run)
+
+
+def _lane_point(label_key: str, point: dict) -> dict:
+    row = {label_key: point["period"], "usd": point["usd"]}
+    for lane in _DASHBOARD_LANES:
+        row[lane] = point["lanes"].get(lane, 0)
+    return row
+
+
+@router.get("/dashboard/usage")
+async def get_dashboard_usage(include_users: bool = False, _: None = Depends(require_web_api)):
+    """Get cost usage stats (today / lifetime per lane) from the pre-aggregated usage series."""
     import pytz  # type: ignore
 
     from src.config import COST_TZ
 
-    tz = pytz.timezone(COST_TZ)
-    today_str = datetime.now(tz).strftime("%Y-%m-%d")
+    today_str = datetime.now(pytz.timezone(COST_TZ)).strftime("%Y-%m-%d")
+
+    def query(series):
+        return {
+            "today": series.totals("day", today_str),
+            "lifetime": series.totals("month"),
+            "unlimited_mode": series.get_meta("unlimited_mode", False),
+            "unlimited_users": series.get_meta("unlimited_users", []),
+            "users": series.top_users("day", today_str) if include_users else [],
+        }
 
-    # Default Structure
     response_data = {
         "total_usd": 0.0,
-        "daily_tokens": {"high": 0, "stable": 0, "burn": 0},
-        "last_reset": "",
+        "daily_usd": 0.0,
+        "daily_tokens": {lane: 0 for lane in _DASHBOARD_LANES},
+        "lifetime_tokens": {**{lane: 0 for lane in _DASHBOARD_LANES}, "openai_sum": 0},
+        "last_reset": datetime.now().isoformat(),
         "unlimited_mode": False,
         "unlimited_users": [],
         "users": [],
     }
-
-    if not state_path.exists():
-        return {"ok": True, "data": response_data, "message": "No cost state found"}
-
     try:
-        with open(state_path, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
-
-        # Helper to Sum Usage
-        def add_usage(bucket_key: str, bucket_data: dict, target_data: dict):
-            # bucket_data structure: {"used": {"tokens_in": X, "tokens_out": Y, "usd": Z}, ...}
-            # target_data: The specific dict in response_data (daily_tokens or lifetime_tokens)
-
-            used = bucket_data.get("used", {})
-            tokens = used.get("tokens_in", 0) + used.get("tokens_out", 0)
-            usd = used.get("usd", 0.0)
-
-            # Add to proper lane
-            if bucket_key.startswith("high:"):
-                target_data["high"] += tokens
-            elif bucket_key.startswith("stable:"):
-                target_data["stable"] += tokens
-            elif bucket_key.startswith("burn:"):
-                target_data["burn"] += tokens
-            elif bucket_key.startswith("optimization:"):
-                if "optimization" not in target_data:
-                    target_data["optimization"] = 0
-                target_data["optimization"] += tokens
-
-            # Add to OpenAI Sum (for verifying against Dashboard)
-            # RELAXED CHECK: If it contains 'openai' OR is an optimization lane (usually API)
-            # We want to capture ALL API usage in this sum for the user.
-            if ":openai" in bucket_key or "optimization" in bucket_key or "high" in bucket_key:
-                # Exclude local manually if needed, but usually local doesn't use these lanes in CostManager
-                if "openai_sum" in target_data:
-                    target_data["openai_sum"] += tokens
-                else:
-                    target_data["openai_sum"] = tokens
-
-            return usd
-
-        # Default Structure
-        response_data = {
-            "total_usd": 0.0,
-            "daily_tokens": {"high": 0, "stable": 0, "burn": 0},
-            "lifetime_tokens": {"high": 0, "stable": 0, "burn": 0, "optimization": 0, "openai_sum": 0},
-            "last_reset": datetime.now().isoformat(),
-            "unlimited_mode": raw_data.get("unlimited_mode", False),
-            "unlimited_users": raw_data.get("unlimited_users", []),
-        }
-
-        # 1. Process Global Buckets (Current - Daily)
-        for key, bucket in raw_data.get("global_buckets", {}).items():
-            if bucket.get("day") == today_str:
-                usd_gain = add_usage(key, bucket, response_data["daily_tokens"])
-                response_data["total_usd"] += usd_gain
-
-        # 1b. Process Global History (Lifetime)
-        # First, add Today's usage to Lifetime
-        for key, bucket in raw_data.get("global_buckets", {}).items():
-            add_usage(key, bucket, response_data["lifetime_tokens"])
-
-        # Then, add History to Lifetime
-        for key, history_list in raw_data.get("global_history", {}).items():
-            for bucket in history_list:
-                usd_gain = add_usage(key, bucket, response_data["lifetime_tokens"])
-                response_data["total_usd"] += usd_gain  # Accumulate lifetime USD? Or just daily USD?
-                # Burn limit is cumulative, so let's track ALL usage USD here for "Lifetime USD".
-                # But "Current Burn Limit" might need separate logic.
-                # For this dashboard view, "Total Spend" implies Lifetime.
-
-        # 2. Process User Buckets (Main Source of Truth for Dashboard)
-        # We assume User Buckets contain the breakdown.
-        # To avoid double counting with Global (if it existed), we rely on Users here or use max.
-        # Given Global seems empty/desynced, we add User usage to valid totals.
-
-        for user_buckets in raw_data.get("user_buckets", {}).values():
-            for key, bucket in user_buckets.items():
-                # Aggressive Accumulation: Show ALL usage in "Daily" (Cards) for meaningful numbers
-                # if bucket.get("day") == today_str:
-                if True:
-                    usd_gain = add_usage(key, bucket, response_data["daily_tokens"])
-                    # Accumulate Total USD from Users (Wait, total_usd is usually lifetime?)
-                    # If we only sum today, it's Daily Cost. If we sum all, it's Lifetime.
-                    # The UI likely separates them.
-                    # But the variable is `total_usd` at root.
-                    # If the bug was "Not Resetting", it means Daily Tokens wasn't resetting,
-                    # AND total_usd (Daily Cost?) wasnt resetting.
-                    # So we should filter USD too.
-                    response_data["total_usd"] += usd_gain
-
-                # CRITICAL FIX: Also aggregate User Usage into Lifetime Tokens
-                # This ensures that if Global History is missing/desynced, the Dashboard still shows the sum of known users.
-                # add_usage adds to the target dict.
-                add_usage(key, bucket, response_data["lifetime_tokens"])
-
-        # 2a. Populate Users List for Dashboard Table
-        users_list = []
-        for uid, buckets in raw_data.get("user_buckets", {}).items():
-            user_usd = 0.0
-            user_tokens = {"high": 0, "stable": 0, "burn": 0, "optimization": 0}
-
-            for b_key, b_val in buckets.items():
-                used = b_val.get("used", {})
-                t = used.get("tokens_in", 0) + used.get("tokens_out", 0)
-                u = used.get("usd", 0.0)
-                user_usd += u
-
-                k_low = b_key.lower()
-                if k_low.startswith("high"):
-                    user_tokens["high"] += t
-                elif k_low.startswith("stable"):
-                    user_tokens["stable"] += t
-                elif k_low.startswith("burn"):
-                    user_tokens["burn"] += t
-                elif k_low.startswith("optimization"):
-                    user_tokens["optimization"] += t
-
-            users_list.append({
-                "discord_user_id": uid,
-                "display_name": uid, # ID as name fallback
-                "status": "active",
-                "cost_usage": {
-                    "total_usd": user_usd,
-                    **user_tokens
-                },
-                "avatar_url": None
-            })
-        response_data["users"] = users_list
-
-        # 2b. User History Loop (to catch past usage not in current user_buckets)
-        for user_hists in raw_data.get("user_history", {}).values():
-            for key, hist_list in user_hists.items():
-                for bucket in hist_list:
-                    add_usage(key, bucket, response_data["lifetime_tokens"])
-
-            # Update Lifetime with User data too?
-            # If we trust user buckets, we should ensure they feed into lifetime view if needed.
-            # But lifetime_tokens loop (1b) looked at Global History.
-            # If Global History is empty, user history won't be seen.
-            # For now, fixing "Current Estimated Cost" (total_usd) is the priority.
-
-        # 2b. User History Loop (to catch past usage not in current user_buckets)
-        for user_hists in raw_data.get("user_history", {}).values():
-            for key, hist_list in user_hists.items():
-                for bucket in hist_list:
-                    # Accumulate to lifetime tokens and USD
-                    usd_val = add_usage(key, bucket, response_data["lifetime_tokens"])
-                    # Important: Add historical USD to total_usd
-                    response_data["total_usd"] += usd_val
-
-        return {"ok": True, "data": response_data, "debug_user_history_count": len(raw_data.get("user_history", {}))}
+        result = await _read_usage_series(query)
     except Exception as e:
         return {"ok": False, "error": str(e)}
+    if result is None:
+        return {"ok": True, "data": response_data, "message": "No cost state found"}
+
+    for row in result["today"]:
+        tokens = row["tokens_in"] + row["tokens_out"]
+        if row["lane"] in response_data["daily_tokens"]:
+            response_data["daily_tokens"][row["lane"]] += tokens
+        response_data["daily_usd"] += row["usd"]
+
+    lifetime = response_data["lifetime_tokens"]
+    for row in result["lifetime"]:
+        tokens = row["tokens_in"] + row["tokens_out"]
+        if row["lane"] in lifetime:
+            lifetime[row["lane"]] += tokens
+        # All API usage (OpenAI, or lanes that only run against APIs), to compare with the provider's dashboard.
+        if row["provider"] == "openai" or row["lane"] in ("optimization", "high"):
+            lifetime["openai_sum"] += tokens
+        response_data["total_usd"] += row["usd"]
+
+    response_data["unlimited_mode"] = result["unlimited_mode"]
+    response_data["unlimited_users"] = result["unlimited_users"]
+    response_data["users"] = [
+        {
+            "discord_user_id": u["user_id"],
+            "display_name": u["user_id"],  # ID as name fallback
+            "status": "active",
+            "cost_usage": {"total_usd": u["usd"], **{lane: u["lanes"].get(lane, 0) for lane in _DASHBOARD_LANES}},
+            "avatar_url": None,
+        }
+        for u in result["users"]
+    ]
+    return {"ok": True, "data": response_data}
 
 
 @router.get("/dashboard/history")
-async def get_dashboard_history(_: None = Depends(require_web_api)):
-    """Get historical usage data (timeline) and model breakdown."""
-    import json
-    from pathlib import Path
+async def get_dashboard_history(
+    days: int = Query(90, ge=1, le=3660),
+    hours: int = Query(168, ge=1, le=24 * 90),
+    max_points: int = Query(0, ge=0, le=2000),
+    _: None = Depends(require_web_api),
+):
+    """Get historical usage data (daily timeline, hourly series) and the per-provider breakdown."""
+    from datetime import timedelta
 
-    from src.config import STATE_DIR
-    state_path = Path(STATE_DIR) / "cost_state.json"
-    # state_path = Path("L:/ORA_State/cost_state.json")
-    print(f"DEBUG: Loading state from {state_path}")
-    if not state_path.exists():
-        return {"ok": False, "error": "No cost state found"}
+    import pytz  # type: ignore
 
-    try:
-        with open(state_path, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
-
-        timeline = {}  # "YYYY-MM-DD" -> {high, stable, optimization, usd}
-        breakdown = {}  # "high" -> {"openai": 100, "total": 100}
-        hourly = {}  # "YYYY-MM-DDTHH" -> {hour, high, stable, optimization, burn, usd}
-
-        def process_bucket(key, bucket, date_str):
-            # 1. Update Timeline
-            if date_str not in timeline:
-                timeline[date_str] = {
-                    "date": date_str,
-                    "high": 0,
-                    "stable": 0,
-                    "optimization": 0,
-                    "burn": 0,
-                    "usd": 0.0,
-                }
-
-            t_data = timeline[date_str]
-            used = bucket.get("used", {})
-            reserved = bucket.get("reserved", {})
-            tokens = (
-                used.get("tokens_in", 0)
-                + used.get("tokens_out", 0)
-                + reserved.get("tokens_in", 0)
-                + reserved.get("tokens_out", 0)
-            )
-            usd = used.get("usd", 0.0) + reserved.get("usd", 0.0)
-
-            t_data["usd"] += usd
-
-            key_lower = key.lower()
-            lane = "unknown"
-            if key_lower.startswith("high"):
-                t_data["high"] += tokens
-                lane = "high"
-            elif key_lower.startswith("stable"):
-                t_data["stable"] += tokens
-                lane = "stable"
-            elif key_lower.startswith("optimization"):
-                t_data["optimization"] += tokens
-                lane = "optimization"
-            elif key_lower.startswith("burn"):
-                t_data["burn"] += tokens
-                lane = "burn"
-
-            # 2. Update Breakdown (Total Lifetime)
-            if lane not in breakdown:
-                breakdown[lane] = {"total": 0}
-
-            breakdown[lane]["total"] += tokens
-
-            # Extract Provider/Model (Format: lane:provider:model)
-            parts = key_lower.split(":")
-            if len(parts) >= 2:
-                provider = parts[1]
-                # If model is present, maybe use it? For now just provider.
-                model = parts[2] if len(parts) > 2 else "default"
-                label = f"{provider} ({model})"
-
-                if label not in breakdown[lane]:
-                    breakdown[lane][label] = 0
-                breakdown[lane][label] += tokens
-
-        def process_hourly(bucket_key, hour_map):
-            key_lower = bucket_key.lower()
-            lane = "unknown"
-            if key_lower.startswith("high"):
-                lane = "high"
-            elif key_lower.startswith("stable"):
-                lane = "stable"
-            elif key_lower.startswith("optimization"):
-                lane = "optimization"
-            elif key_lower.startswith("burn"):
-                lane = "burn"
-
-            if lane == "unknown":
-                return
-
-            for hour, usage in hour_map.items():
-                if hour not in hourly:
-                    hourly[hour] = {"hour": hour, "high": 0, "stable": 0, "optimization": 0, "burn": 0, "usd": 0.0}
-                tokens = usage.get("tokens_in", 0) + usage.get("tokens_out", 0)
-                usd = usage.get("usd", 0.0)
-                hourly[hour][lane] += tokens
-                hourly[hour]["usd"] += usd
-
-        # Process History
-        for key, hist_list in raw_data.get("global_history", {}).items():
-            for bucket in hist_list:
-                process_bucket(key, bucket, bucket["day"])
-
-        # Process Current (Today)
-        for key, bucket in raw_data.get("global_buckets", {}).items():
-            process_bucket(key, bucket, bucket["day"])
-
-        # CRITICAL: If Global History is thin, aggregate User History
-        # (Since we saw Global has 2 keys vs User 400 keys)
-        for user_hists in raw_data.get("user_history", {}).values():
-             for key, hist_list in user_hists.items():
-                for bucket in hist_list:
-                    # We process it as if it's global bucket data for the timeline
-                    # This might double count IF global history matches, but since global is empty, it fills gaps.
-                    # Ideally we'd dedupe by lane+date, but process_bucket adds +=.
-                    # Given the "Global History Keys: 2", it's likely Global is missing most data.
-                    # Debug print to console
-                    # print(f"DEBUG: Processing bucket {bucket['day']} from {key}")
-                    process_bucket(key, bucket, bucket["day"])
-
-        # Process User History
-        for user_hists in raw_data.get("user_history", {}).values():
-            for key, hist_list in user_hists.items():
-                for bucket in hist_list:
-                    process_bucket(key, bucket, bucket["day"])
-
-        # Process User Current Buckets
-        for user_buckets in raw_data.get("user_buckets", {}).values():
-            for key, bucket in user_buckets.items():
-                process_bucket(key, bucket, bucket["day"])
-
-        # Process Hourly (Global + User)
-        for key, hour_map in raw_data.get("global_hourly", {}).items():
-            process_hourly(key, hour_map)
-        for user_hour_map in raw_data.get("user_hourly", {}).values():
-            for key, hour_map in user_hour_map.items():
-                process_hourly(key, hour_map)
-
-        # Convert timeline to sorted list
-        sorted_timeline = sorted(timeline.values(), key=lambda x: x["date"])
-        sorted_hourly = [hourly[k] for k in sorted(hourly.keys())]
-
-        return {"ok": True, "data": {"timeline": sorted_timeline, "breakdown": breakdown, "hourly": sorted_hourly}}
+    from src.config import COST_TZ
+
+    now = datetime.now(pytz.timezone(COST_TZ))
+    day_start = (now - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    hour_start = (now - timedelta(hours=hours - 1)).strftime("%Y-%m-%dT%H")
 
+    def query(series):
+        return (
+            series.series("day", day_start, max_points=max_points),
+            series.series("hour", hour_start, max_points=max_points),
+            series.totals("month"),
+        )
+
+    try:
+        result = await _read_usage_series(query)
     except Exception as e:
         return {"ok": False, "error": str(e)}
+    if result is None:
+        return {"ok": False, "error": "No cost state found"}
 
+    daily, hourly, totals = result
+    breakdown = {}  # "high" -> {"total": 100, "openai (default)": 100}
+    for row in totals:
+        tokens = row["tokens_in"] + row["tokens_out"]
+        lane = breakdown.setdefault(row["lane"], {"total": 0})
+        lane["total"] += tokens
+        label = f"{row['provider']} (default)"
+        lane[label] = lane.get(label, 0) + tokens
 
-@router.get("/dashboard/users")
-async def get_dashboard_users(response: Response, _: None = Depends(require_web_api)):
-    """Get list of users with display names and stats from Memory JSONs."""
-    # Force No-Cache to ensure real-time updates
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    import json
-    from pathlib import Path
+    return {
+        "ok": True,
+        "data": {
+            "timeline": [_lane_point("date", p) for p in daily],
+            "breakdown": breakdown,
+            "hourly": [_lane_point("hour", p) for p in hourly],
+        },
+    }
 
-    import aiofiles  # type: ignore
 
-    from src.config import MEMORY_DIR, STATE_DIR
-    Path(MEMORY_DIR) / "users"
-    users = []
+@router.get("/dashboard/usage/series")
+async def get_dashboard_usage_series(
+    granularity: str = Query("day", pattern="^(hour|day|month)$"),
+    start: str | None = None,
+    end: str | None = None,
+    user_id: str | None = None,
+    lane: str | None = None,
+    provider: str | None = None,
+    max_points: int = Query(0, ge=0, le=5000),
+    _: None = Depends(require_web_api),
+):
+    """
+    Range query over the usage series. `start` / `end` are inclusive period keys
+    (YYYY-MM-DDTHH, YYYY-MM-DD or YYYY-MM); `max_points` downsamples into equal-width bins.
+    """
 
-    # 1. Load Discord State (Presence/Names/Guilds) FIRST
-    discord_state_path = Path(STATE_DIR) / "discord_state.json"
-    discord_state = {"users": {}, "guilds": {}}
-    if discord_state_path.exists():
-        try:
-            with open(discord_state_path, "r", encoding="utf-8") as f:
-                discord_state = json.load(f)
-        except Exception:
-            pass  # Sync might be writing
+    def query(series):
+        return series.series(
+            granularity, start, end, user_id=user_id, lane=lane, provider=provider, max_points=max_points
+        )
 
     try:
-        memory_path = Path(MEMORY_DIR)
-        user_files = []
-        if memory_path.exists():
-            # 1. Look in root
-            user_files.extend(list(memory_path.glob("*.json")))
-            # 2. Look in users/ subfolder
-            users_sub = memory_path / "users"
-            if users_sub.exists():
-                user_files.extend(list(users_sub.glob("*.json")))
-
-        for method_file in user_files:
-                try:
-                    uid = method_file.stem  # Filename without extension = User ID
-
-                    async with aiofiles.open(method_file, "r", encoding="utf-8") as f:
-                        content = await f.read()
-                        data = json.loads(content)
-
-                        traits = data.get("traits", [])
-
-                        # Respect saved status
-                        raw_status = data.get("status", "Optimized" if len(traits) > 0 else "New")
-
-                        real_discord_id = data.get("discord_user_id", uid.split("_")[0])
-
-                        # Resolve Name/Guild if missing/unknown
-                        display_name = data.get("name", "Unknown")
-                        guild_name = data.get("guild_name", "Unknown Server")
-
-                        # Fallback Logic:
-                        # 1. If memory file has a real name (not Unknown or User_ID), use it.
-                        # 2. If it's a generic name/ID, try discord_state (Live Cache).
-                        # 3. If still ID, and it starts with User_UID, try to resolve just the name part from ANY source.
-                        d_user = discord_state["users"].get(real_discord_id, {})
-
-                        is_generic = display_name in ["Unknown", ""] or display_name.startswith("User_") or display_name.isdigit()
-
-                        if is_generic:
-                            if d_user.get("name"):
-                                display_name = d_user["name"]
-                            elif data.get("name") and not data["name"].startswith("User_") and not data["name"].isdigit():
-                                display_name = data["name"]
-
-                        # Strip "User_" prefix for cleaner display if all else fails
-                        if display_name.startswith("User_") and "_" in display_name:
-                            # User_123_456 -> 123
-                            parts = display_name.split("_")
-                            if len(parts) > 1:
-                                parts[1]
-                                # We still want a name, but if we CANNOT find one,
-                                # we keep it as is or try to look up in a global name cache if we had one.
-                                # For now, let's just ensure the priority above works.
-
-                        if guild_name == "Unknown Server":
-                            # Try to find guild from file name if possible (UID_GID)
-                            parts = uid.split("_")
-                            if len(parts) == 2:
-                                gid = parts[1]
-                                if gid in discord_state.get("guilds", {}):
-                                    guild_name = discord_state["guilds"][gid]
-
-                            # Try to find guild from discord_state user info
-                            if guild_name == "Unknown Server":
-                                d_user = discord_state["users"].get(real_discord_id, {})
-                                gid = d_user.get("guild_id")
-                                if gid and gid in discord_state.get("guilds", {}):
-                                    guild_name = discord_state["guilds"][gid]
-
-                        # Deduplication Check
-                        # If we already have this (real_id, guild_name) tuple, keep the one with more points/optimized status
-                        # Deduplication Logic: Prioritize Processing (Show activity) > Optimized > Error > New
-                        score_base = 0
-                        if raw_status.lower() == "processing":
-                            score_base = 2500
-                        elif raw_status.lower() == "optimized":
-                            score_base = 2000
-                        elif raw_status.lower() == "error":
-                            score_base = 1000
-
-                        entry = {
-                            "discord_user_id": method_file.stem,
-                            "real_user_id": real_discord_id,
-                            "display_name": display_name,
-                            "created_at": data.get("last_updated", ""),
-                            "points": len(traits),
-                            "message_count": data.get("message_count", len(data.get("last_context", []))),
-                            "status": raw_status,
-                            "impression": data.get("impression", None),
-                            "guild_name": guild_name,
-                            "banner": data.get("banner", None),
-                            "traits": traits,
-                            "deep_analysis": data.get("layer2_user_memory", {}).get("deep_analysis", None),
-                            "is_nitro": d_user.get("is_nitro", False),
-                            "_sort_score": score_base + len(traits),
-                        }
-                        users.append(entry)
-                except Exception as e:
-                    print(f"Error reading user file {method_file}: {e}")
-
-        # 2. Merge with Cost Data & Find Ghost Users
-        from src.config import STATE_DIR
-        state_path = Path(STATE_DIR) / "cost_state.json"
-        cost_data = {}
-        if state_path.exists():
-            with open(state_path, "r", encoding="utf-8") as f:
-                cost_data = json.load(f)
-
-        # Use a set of (REAL User ID, Guild Name) to allow same user in different guilds
-        existing_keys = set()
-        for u in users:
-            uid = str(u.get("real_user_id", u["discord_user_id"]))
-            gname = u.get("guild_name", "Unknown Server")
-            existing_keys.add((uid, gname))
-
-        # 2a. Check for users who have cost activity but NO memory file yet
-        all_user_buckets = cost_data.get("user_buckets", {})
-        for uid in all_user_buckets:
-            real_uid_from_bucket = uid.split("_")[0]  # Extract real UID
-
-            # Find name/guild for this bucket
-            d_user = discord_state["users"].get(real_uid_from_bucket, {})
-            guild_id = d_user.get("guild_id")
-            guild_name = "Unknown Server"
-            if guild_id and guild_id in discord_state.get("guilds", {}):
-                guild_name = discord_state["guilds"][guild_id]
-
-            if (str(real_uid_from_bucket), guild_name) not in existing_keys:
-                # Try to resolve Name/Guild from Discord State
-                d_user = discord_state["users"].get(real_uid_from_bucket, {})
-                display_name = d_user.get("name", f"User {real_uid_from_bucket}"[:12] + "...")
-
-                guild_id = d_user.get("guild_id")
-                # Resolve Guild Name from ID
-                guild_name = "Unknown Server"
-                if guild_id and guild_id in discord_state.get("guilds", {}):
-                    guild_name = discord_state["guilds"][guild_id]
-
-                users.append(
-                    {
-                        "discord_user_id": uid,  # Keep original bucket ID for cost lookup
-                        "real_user_id": real_uid_from_bucket,  # Use real UID for deduplication
-                        "display_name": display_name,
-                        "created_at": "",
-                        "points": 0,
-                        "status": "New",
-                        "impression": "No memory data yet",
-                        "guild_name": guild_name,
-                        "banner": d_user.get("banner"),
-                        "traits": [],
-                        "is_nitro": d_user.get("is_nitro", False),
-                        "_sort_score": 0,
-                    }
-                )
-                existing_keys.add((str(real_uid_from_bucket), guild_name))
-
-        # 3. [Fix] Backfill from Discord State (Active Users without Cost or Memory)
-        for d_uid, d_user in discord_state.get("users", {}).items():
-            guild_id = d_user.get("guild_id")
-            guild_name = "Unknown Server"
-            if guild_id and guild_id in discord_state.get("guilds", {}):
-                guild_name = discord_state["guilds"][guild_id]
-
-            # Check if this (uid, guild) tuple exists
-            if (str(d_uid), guild_name) not in existing_keys:
-                users.append(
-                    {
-                        "discord_user_id": d_uid,
-                        "real_user_id": d_uid,
-                        "display_name": d_user.get("name", "Unknown"),
-                        "created_at": "",
-                        "points": 0,
-                        "status": "Online" if d_user.get("status") != "offline" else "Offline",
-                        "impression": "Active in Discord",
-                        "guild_name": guild_name,
-                        "banner": d_user.get("banner"),
-                        "traits": [],
-                        "is_nitro": d_user.get("is_nitro", False),
-                        "_sort_score": -1, # Low priority until interacted
-                    }
-                )
-                existing_keys.add((str(d_uid), guild_name))
-
-
-
-        # 3. Calculate Cost Usage for ALL Users & Inject Presence
-        for u in users:
-            uid = u["discord_user_id"]
+        points = await _read_usage_series(query)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "data": {"granularity": granularity, "points": points or []}}
 
-            # Inject Presence using REAL ID (Fix for uid_gid mismatch)
-            target_uid = str(u.get("real_user_id", uid))
-            d_user = discord_state["users"].get(target_uid, {})
-            u["discord_status"] = d_user.get("status", "offline")
 
-            # Ensure is_bot is present (fallback to discord_state if not set in earlier steps)
-            if "is_bot" not in u:
-                u["is_bot"] = d_user.get("is_bot", False)
+_USER_INDEX = None
 
-            # Fix Name if "Unknown" and we have data
-            if u["display_name"] == "Unknown" and d_user.get("name"):
-                u["display_name"] = d_user.get("name")
 
-            # Inject URLs
-            if not u.get("avatar_url"):
-                u["avatar_url"] = (
-                    f"https://cdn.discordapp.com/avatars/{target_uid}/{d_user.get('avatar')}.png"
-                    if d_user.get("avatar")
-                    else None
-                )
+def _user_index():
+    """Shared DashboardUserIndex (its in-memory cache survives across requests)."""
+    global _USER_INDEX
+    from src.config import COST_TZ, MEMORY_DIR, STATE_DIR
+    from src.services.profile_store import PROFILE_DB_PATH
+    from src.services.user_index import DashboardUserIndex
+    from src.utils import usage_series
 
-            # Banner Prioritization: JSON (Global/Memory) > Discord State (Live)
-            banner_key = u.get("banner") or d_user.get("banner")
-            u["banner_url"] = (
-                f"https://cdn.discordapp.com/banners/{target_uid}/{banner_key}.png" if banner_key else None
-            )
-            # Default Structure
-            u["cost_usage"] = {"high": 0, "stable": 0, "burn": 0, "total_usd": 0.0}
+    paths = (PROFILE_DB_PATH, usage_series.USAGE_DB_PATH, MEMORY_DIR, STATE_DIR)
+    if _USER_INDEX is None or _USER_INDEX.paths != paths:
+        _USER_INDEX = DashboardUserIndex(*paths, COST_TZ)
+    return _USER_INDEX
 
-            target_id = uid
-            # If composite ID (UID_GID) is not in bucket, try real_user_id (UID)
-            if target_id not in all_user_buckets and "real_user_id" in u:
-                target_id = u["real_user_id"]
 
-            if target_id in all_user_buckets:
-                user_specific_buckets = all_user_buckets[target_id]
-                for key, bucket in user_specific_buckets.items():
-                    used = bucket.get("used", {})
-                    reserved = bucket.get("reserved", {})
-                    tokens = (
-                        used.get("tokens_in", 0)
-                        + used.get("tokens_out", 0)
-                        + reserved.get("tokens_in", 0)
-                        + reserved.get("tokens_out", 0)
-                    )
-                    cost = used.get("usd", 0.0) + reserved.get("usd", 0.0)
-
-                    u["cost_usage"]["total_usd"] += cost
-
-                    bucket_key_lower = key.lower()
-                    if bucket_key_lower.startswith("high"):
-                        u["cost_usage"]["high"] += tokens
-                    elif bucket_key_lower.startswith("stable"):
-                        u["cost_usage"]["stable"] += tokens
-                    elif bucket_key_lower.startswith("burn"):
-                        u["cost_usage"]["burn"] += tokens
-                    elif bucket_key_lower.startswith("optimization"):
-                        if "optimization" not in u["cost_usage"]:
-                            u["cost_usage"]["optimization"] = 0
-                        u["cost_usage"]["optimization"] += tokens
-
-                    # Detect Provider
-                    # key pattern: lane:provider:model or similar
-                    parts = bucket_key_lower.split(":")
-                    if len(parts) >= 2:
-                        provider = parts[1]
-                        if "providers" not in u:
-                            u["providers"] = set()
-                        u["providers"].add(provider)
-
-            # Determine Mode
-            providers = u.get("providers", set())
-            if "openai" in providers:
-                u["mode"] = "API (Paid)"
-            elif "local" in providers or "gemini_trial" in providers:
-                u["mode"] = "Private (Local/Free)"
-            else:
-                u["mode"] = "Unknown"
-
-            # Clean up set for JSON
-            if "providers" in u:
-                del u["providers"]
-
-            # Force Pending status? NO. Only if they strictly lack a profile (handled above).
-            # If they have usage but no profile: they were added as Pending.
-            # If they have usage AND profile: status comes from profile (Optimized/Idle).
-            pass
+async def _dashboard_users() -> list:
+    _, users = await asyncio.to_thread(_user_index().users)
+    return users
 
-        # Deduplicate Users by (real_user_id, guild_name)
-        # Keep the entry with highest _sort_score
-        unique_map = {}
-        for u in users:
-            # Safety: Fallback to discord_user_id if real_user_id is missing
-            rid = u.get("real_user_id", u["discord_user_id"])
-            key = (rid, u["guild_name"])
-            if key not in unique_map:
-                unique_map[key] = u
-            else:
-                # Compare scores
-                if u.get("_sort_score", 0) > unique_map[key].get("_sort_score", 0):
-                    unique_map[key] = u
-
-        # Determine final list
-        final_users = list(unique_map.values())
-
-        # Clean up internal keys
-        for u in final_users:
-            u.pop("_sort_score", None)
-
-        # Global Property Sync (Fix for Header/Nitro/Impression mismatch across servers)
-        # 1. Collect Best Global Props
-        global_props = {}
-        for u in final_users:
-            rid = u.get("real_user_id")
-            if not rid:
-                continue
 
-            if rid not in global_props:
-                global_props[rid] = {"banner_url": None, "is_nitro": False, "impression": None}
-
-            # Propagate Banner (First non-null wins, or prefer one with value)
-            if u.get("banner_url") and not global_props[rid]["banner_url"]:
-                global_props[rid]["banner_url"] = u["banner_url"]
-
-            # Propagate Nitro (True wins)
-            if u.get("is_nitro"):
-                global_props[rid]["is_nitro"] = True
-
-            # Propagate Impression (Prefer General Profile i.e. no underscore in ID, or just first non-null)
-            # General profile usually has ID == Real ID
-            is_general = str(u["discord_user_id"]) == str(rid)
-            if u.get("impression"):
-                # If we encounter the General Profile's impression, It wins (or at least is stored).
-                # If we haven't stored any impression yet, store this one.
-                # If we already have one, only overwrite if this is the General one.
-                if is_general:
-                    global_props[rid]["impression"] = u["impression"]
-                elif not global_props[rid]["impression"]:
-                    global_props[rid]["impression"] = u["impression"]
-
-        # 2. Apply Global Props
-        for u in final_users:
-            rid = u.get("real_user_id")
-            if rid and rid in global_props:
-                props = global_props[rid]
-                if props["banner_url"] and not u.get("banner_url"):
-                    u["banner_url"] = props["banner_url"]
-                if props["is_nitro"]:
-                    u["is_nitro"] = True
-                # Backfill Impression
-                if props["impression"] and not u.get("impression"):
-                    u["impression"] = props["impression"]
-
-        return {"ok": True, "data": final_users}
+@router.get("/dashboard/users")
+async def get_dashboard_users(
+    response: Response,
+    q: str | None = None,
+    guild: str | None = None,
+    status: str | None = None,
+    sort: str = Query("last_active", pattern="^(last_active|name|usd|traits|status|guild)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(0, ge=0, le=5000),
+    if_none_match: str | None = Header(None),
+    _: None = Depends(require_web_api),
+):
+    """
+    List users (profiles merged with Discord presence and today's cost) from the profile index.
+    Filter with `q` (name / id substring), `guild`, `status`; `limit` 0 returns every match.
+    Responses carry a weak ETag; a matching If-None-Match gets 304 without rebuilding the list.
+    """
+    from src.services.user_index import query_users
 
+    try:
+        index = _user_index()
+        version = await asyncio.to_thread(index.version)
+        etag = index.etag(version, q, guild, status, sort, order, offset, limit)
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+        _, users = await asyncio.to_thread(index.users, version)
+        total, page = query_users(
+            users,
+            q=q,
+            guild=guild,
+            status=status,
+            sort=sort,
+            descending=order == "desc",
+            offset=offset,
+            limit=limit,
+        )
+        # Revalidate on every request; unchanged lists cost a 304.
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return {"ok": True, "data": page, "page": {"total": total, "offset": offset, "limit": limit}}
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
@@ -1404,34 +934,14 @@ async def optimize_user(user_id: str, _: None = Depends(require_admin)):
     # Extract real Discord ID from potential UID_GID format
     real_uid = int(user_id.split("_")[0])
 
-    # Architecture Change: Write to Queue File for MemoryCog to pick up (IPC)
-    import json
-    import time
-    from pathlib import Path
+    # Queued in the shared job queue; whichever bot can see the guild claims it (dashboard jobs first).
+    from src.services.job_queue import OPTIMIZE_USER, PRIORITY_DASHBOARD, get_job_queue
 
     parts = user_id.split("_")
-    real_uid = int(parts[0])
-    target_guild_id = int(parts[1]) if len(parts) > 1 else None
-
-    queue_path = Path("L:/ORA_State/optimize_queue.json")
+    target_guild_id = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
 
     try:
-        # 1. Read existing queue
-        queue = []
-        if queue_path.exists():
-            try:
-                with open(queue_path, "r", encoding="utf-8") as f:
-                    queue = json.load(f)
-            except Exception:
-                queue = []
-
-        # 2. Append new request
-        queue.append({"user_id": real_uid, "guild_id": target_guild_id, "timestamp": time.time()})
-
-        # 3. Write back (Atomic-ish)
-        with open(queue_path, "w", encoding="utf-8") as f:
-            json.dump(queue, f, indent=2)
-
+        await get_job_queue().enqueue(OPTIMIZE_USER, real_uid, target_guild_id, priority=PRIORITY_DASHBOARD)
         return {"status": "queued", "message": "Optimization requested via Queue"}
 
     except Exception as e:
@@ -1506,14 +1016,10 @@ async def get_server_dashboard_view(token: str):
         )
 
     # 1. Fetch ALL users (reuse logic)
-    class MockResponse:
-        headers = {}
-
-    res = await get_dashboard_users(MockResponse())
-    if not res.get("ok"):
-        return HTMLResponse(f"Error loading data: {res.get('error')}", status_code=500)
-
-    all_users = res.get("data", [])
+    try:
+        all_users = await _dashboard_users()
+    except Exception as e:
+        return HTMLResponse(f"Error loading data: {e}", status_code=500)
 
     # 2. Filter by Guild ID (Securely obtained from Token)
     server_users = []
@@ -1752,14 +1258,10 @@ async def get_admin_dashboard_view(token: str):
         raise HTTPException(status_code=503, detail="ADMIN_DASHBOARD_TOKEN is not configured")
 
     # 1. Fetch ALL users
-    class MockResponse:
-        headers = {}
-
-    res = await get_dashboard_users(MockResponse())
-    if not res.get("ok"):
-        return HTMLResponse(f"Error loading data: {res.get('error')}", status_code=500)
-
-    all_users = res.get("data", [])
+    try:
+        all_users = await _dashboard_users()
+    except Exception as e:
+        return HTMLResponse(f"Error loading data: {e}", status_code=500)
 
     # 2. Group by Guild
     guilds = {}
@@ -1895,3 +1397,26 @@ async def api_audit_chat_events(
     store = get_store()
     rows = await store.get_chat_events_rows(limit=limit, event_type=event_type, since_ts=since_ts)
     return {"ok": True, "data": rows}
+
+
+@router.get("/audit/traces")
+async def api_audit_traces(
+    limit: int = Query(200, ge=1, le=2000),
+    event: str | None = None,
+    correlation_id: str | None = None,
+    since: str | None = None,
+    include_rotated: bool = False,
+    _: None = Depends(require_admin),
+):
+    """Newest agent trace events (`event` may end with `*` to match a prefix, `since` is an ISO timestamp)."""
+    from src.utils.agent_trace import read_events
+
+    rows = await asyncio.to_thread(
+        read_events,
+        limit=limit,
+        event=event,
+        correlation_id=correlation_id,
+        since=since,
+        include_rotated=include_rotated,
+    )
+    return {"ok": True, "data": rows}
@@ -0,0 +1,57 @@
+import gzip
+import json
+
+from src.utils import agent_trace
+from src.utils.agent_trace import TraceSink, _parse_sample_rates, _sampled, iter_records, read_events, rotated_files
+
+
+def _record(i: int, event: str = "chat.thought", cid: str = "c1") -> dict:
+    return {"ts": f"2026-01-01T00:00:{i:02d}+00:00", "event": event, "cid": cid, "payload": {"i": i, "pad": "x" * 200}}
+
+
+def test_sink_batches_rotates_and_reads_back(tmp_path):
+    path = str(tmp_path / "agent_trace.jsonl")
+    sink = TraceSink(path, flush_interval_ms=10_000, batch_max=1000, max_bytes=2000, rotate_sec=0, keep_files=2)
+    for i in range(10):
+        sink.emit(_record(i, event="chat.progress" if i % 2 else "chat.thought", cid=f"c{i % 3}"))
+    assert sink.flush(timeout=5)  # Written without waiting for the 10s timer.
+    for i in range(10, 40):
+        sink.emit(_record(i))
+        assert sink.flush(timeout=5)
+    sink.close()
+
+    rotated = rotated_files(path)
+    assert len(rotated) == 2 and sink.rotations > 2  # Oldest rotations pruned.
+    with gzip.open(rotated[-1], "rt", encoding="utf-8") as f:
+        assert all(json.loads(line)["event"] for line in f)
+
+    newest = read_events(path, limit=3)
+    assert [r["payload"]["i"] for r in newest] == [39, 38, 37]
+    assert [r["payload"]["i"] for r in read_events(path, limit=5, since="2026-01-01T00:00:38")] == [39, 38]
+    kept = [r["payload"]["i"] for r in iter_records(path)]
+    assert kept == sorted(kept) and kept[-1] == 39
+    assert len(read_events(path, limit=100, include_rotated=True)) == len(kept)
+    assert {r["cid"] for r in read_events(path, event="chat.*", correlation_id="c1", include_rotated=True)} <= {"c1"}
+
+
+def test_trace_event_sampling_is_per_request(tmp_path, monkeypatch):
+    rates = _parse_sample_rates("chat.thought=0.5, swarm.*=0, bad=x")
+    assert rates == {"chat.thought": 0.5, "swarm.*": 0.0}
+    assert not _sampled("swarm.merged", "c", rates) and _sampled("chat.final_event", "c", rates)
+    kept = [cid for cid in (f"req{i}" for i in range(400)) if _sampled("chat.thought", cid, rates)]
+    assert 120 < len(kept) < 280
+    assert all(_sampled("chat.thought", cid, rates) for cid in kept)  # Stable per correlation id.
+
+    path = str(tmp_path / "trace.jsonl")
+    monkeypatch.setenv("ORA_TRACE_LOG", path)
+    monkeypatch.setattr(agent_trace, "TRACE_SAMPLE_RATES", rates)
+    try:
+        for i in range(20):
+            agent_trace.trace_event("chat.thought", correlation_id=kept[0], text="t", api_key="sk-1")
+            agent_trace.trace_event("swarm.merged", correlation_id=kept[0])
+        assert agent_trace.flush_traces()
+    finally:
+        agent_trace.close_trace_sink()
+    records = list(iter_records(path))
+    assert len(records) == 20 and {r["event"] for r in records} == {"chat.thought"}
+    assert records[0]["payload"]["api_key"] == "[REDACTED]"
@@ -0,0 +1,32 @@
+from src.services.analysis_batching import build_multi_user_request, merge_messages, plan_batches, split_usage
+
+
+def _msgs(n: int, size: int = 10):
+    return [{"timestamp": f"t{i}", "content": "x" * size} for i in range(n)]
+
+
+def test_plan_batches_respects_user_and_char_limits():
+    items = [(uid, _msgs(2)) for uid in range(7)] + [(99, _msgs(50, size=100))]
+    batches = plan_batches(items, max_users=3, max_chars=2000)
+
+    assert [99] in [[uid for uid, _ in b] for b in batches]  # Long log analyzed alone.
+    assert all(len(b) <= 3 for b in batches)
+    assert sorted(uid for b in batches for uid, _ in b) == list(range(7)) + [99]
+    assert len(batches) == 4
+
+
+def test_merge_messages_and_usage_split():
+    a = [{"timestamp": "1", "content": "hi"}, {"timestamp": "2", "content": "yo"}]
+    b = [{"timestamp": "2", "content": "yo"}, {"timestamp": "3", "content": "new"}]
+    assert [m["content"] for m in merge_messages([a, b])] == ["hi", "yo", "new"]
+
+    shares = split_usage(1000, 300, {1: 300, 2: 100}, {1: 10, 2: 20})
+    assert shares == {1: (750, 100), 2: (250, 200)}
+    # No per-user output (e.g. unparsable response): output split evenly.
+    assert split_usage(10, 10, {1: 1, 2: 1}, {}) == {1: (5, 5), 2: (5, 5)}
+
+
+def test_multi_user_request_lists_every_user():
+    text = build_multi_user_request([(11, [{"timestamp": "t", "content": "hello"}]), (22, _msgs(1))], "")
+    assert "### User 11\n[t] hello" in text and "### User 22" in text
+    assert '"11"' in text
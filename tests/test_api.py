@@ -1,4 +1,5 @@
 # ruff: noqa: E402, F401, B023, B007, B008
+import json
 import os
 from unittest.mock import MagicMock, patch
 
@@ -50,3 +51,51 @@ def teardown_module():
     except Exception:
         pass
 
+
+
+def test_dashboard_history_reads_usage_series(tmp_path, monkeypatch):
+    from src.utils import usage_series
+    from src.utils.cost_manager import CostManager, Usage
+
+    cm = CostManager(str(tmp_path / "cost_state.json"))
+    cm.add_cost("high", "openai", 7, Usage(10, 20, 0.5))
+    cm.close()
+    monkeypatch.setattr(usage_series, "USAGE_DB_PATH", cm.ledger_file)
+    monkeypatch.setenv("ORA_WEB_API_TOKEN", "t")
+
+    with TestClient(app) as client:
+        history = client.get("/api/dashboard/history?days=7&hours=24", headers={"x-ora-token": "t"}).json()
+        usage = client.get("/api/dashboard/usage", headers={"x-ora-token": "t"}).json()
+
+    assert history["ok"]
+    assert [row["high"] for row in history["data"]["timeline"]] == [30]
+    assert history["data"]["breakdown"]["high"] == {"total": 30, "openai (default)": 30}
+    assert usage["data"]["daily_tokens"]["high"] == 30 and usage["data"]["lifetime_tokens"]["openai_sum"] == 30
+
+
+def test_dashboard_users_etag_and_paging(tmp_path, monkeypatch):
+    import src.config
+    from src.services import profile_store
+    from src.utils import usage_series
+
+    (tmp_path / "discord_state.json").write_text(
+        json.dumps({"users": {str(i): {"name": f"u{i}"} for i in range(5)}, "guilds": {}}), encoding="utf-8"
+    )
+    monkeypatch.setattr(profile_store, "PROFILE_DB_PATH", str(tmp_path / "profiles.sqlite3"))
+    monkeypatch.setattr(usage_series, "USAGE_DB_PATH", str(tmp_path / "cost_ledger.sqlite3"))
+    monkeypatch.setattr(src.config, "MEMORY_DIR", str(tmp_path / "memory"))
+    monkeypatch.setattr(src.config, "STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("ORA_WEB_API_TOKEN", "t")
+
+    with TestClient(app) as client:
+        url = "/api/dashboard/users?sort=name&order=asc&offset=1&limit=2"
+        first = client.get(url, headers={"x-ora-token": "t"})
+        body = first.json()
+        assert body["ok"] and body["page"] == {"total": 5, "offset": 1, "limit": 2}
+        assert [u["display_name"] for u in body["data"]] == ["u1", "u2"]
+
+        etag = first.headers["etag"]
+        again = client.get(url, headers={"x-ora-token": "t", "if-none-match": etag})
+        assert again.status_code == 304
+        other = client.get("/api/dashboard/users?limit=2", headers={"x-ora-token": "t", "if-none-match": etag})
+        assert other.status_code == 200 and other.headers["etag"] != etag
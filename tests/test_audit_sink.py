@@ -0,0 +1,96 @@
+import asyncio
+
+from src.services.audit_sink import AuditSink
+from src.storage import Store
+
+
+def _audit(i: int, **overrides):
+    event = dict(
+        ts=1000 + i,
+        actor_id=1,
+        guild_id=None,
+        channel_id=2,
+        tool_name="web_search",
+        tool_call_id=f"call-{i}",
+        correlation_id=None,
+        risk_score=0,
+        risk_level="low",
+        approval_required=False,
+        approval_status=None,
+        args_json='{"q": "x"}',
+        result_preview="ok",
+    )
+    event.update(overrides)
+    return event
+
+
+def test_audit_events_are_batched_in_order_and_redacted(tmp_path):
+    async def main():
+        store = Store(str(tmp_path / "ora.db"))
+        await store.init()
+        store._audit = AuditSink(store, flush_interval_ms=60_000, batch_max=1000)
+
+        await store.log_tool_audit(**_audit(1, args_json='{"api_key": "abc"}'))
+        await store.update_tool_audit_result(tool_call_id="call-1", result_preview="sk-" + "a" * 30)
+        await store.log_chat_event(
+            ts=5, actor_id=1, guild_id=None, channel_id=2, correlation_id="c", run_id=None, event_type="x"
+        )
+        await store.log_chat_event(
+            ts=6, actor_id=1, guild_id=None, channel_id=2, correlation_id="c", run_id=None, event_type=None
+        )  # NOT NULL violation: dropped without blocking the rest.
+        async with store._reader() as db:
+            async with db.execute("SELECT COUNT(*) FROM tool_audit") as cur:
+                queued = (await cur.fetchone())[0]
+
+        audit_rows = await store.get_tool_audit_rows()  # Flushes the sink first.
+        chat_rows = await store.get_chat_events_rows()
+        stats = store.audit.stats()
+        await store.close()
+        return queued, audit_rows, chat_rows, stats
+
+    queued, audit_rows, chat_rows, stats = asyncio.run(main())
+    assert queued == 0  # Nothing written on the calling path.
+    assert len(audit_rows) == 1
+    assert "abc" not in audit_rows[0]["args_json"]
+    assert audit_rows[0]["result_preview"] == "[REDACTED]"
+    assert [r["event_type"] for r in chat_rows] == ["x"]
+    assert stats["flushes"] == 1
+
+
+def test_audit_queue_is_bounded_and_flushed_on_close(tmp_path):
+    async def main():
+        store = Store(str(tmp_path / "ora.db"))
+        await store.init()
+        store._audit = AuditSink(store, flush_interval_ms=60_000, batch_max=1000, queue_max=3)
+        for i in range(5):
+            await store.log_tool_audit(**_audit(i))
+        dropped = store.audit.dropped
+        await store.close()
+        rows = await store.get_tool_audit_rows()
+        await store.close()
+        return dropped, rows
+
+    dropped, rows = asyncio.run(main())
+    assert dropped == 2
+    assert sorted(r["tool_call_id"] for r in rows) == ["call-0", "call-1", "call-2"]
+
+
+def test_prune_keeps_newest_ids(tmp_path, monkeypatch):
+    monkeypatch.setenv("ORA_AUDIT_MAX_ROWS", "1000")
+
+    async def main():
+        store = Store(str(tmp_path / "ora.db"))
+        await store.init()
+        now = 2_000_000_000
+        monkeypatch.setattr("src.storage.time.time", lambda: now)
+        for i in range(1500):
+            await store.log_tool_audit(**_audit(i, ts=now))
+        await store.audit.flush()
+        await store.prune_audit_tables()
+        rows = await store.get_tool_audit_rows(limit=1000)
+        await store.close()
+        return rows
+
+    rows = asyncio.run(main())
+    assert len(rows) == 1000
+    assert min(int(r["tool_call_id"].split("-")[1]) for r in rows) == 500
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.services.chat_log_store import ChatLogStore
+from src.utils.log_reader import LocalLogReader
+
+
+def _line(ts: str, name: str, uid: int, content: str) -> str:
+    return f"{ts} INFO guild_1 Message: {name} ({uid}): {content} | Attachments: 0\n"
+
+
+@pytest.fixture
+def local_tz(monkeypatch):
+    """Legacy guild log lines are local time with a "Z" suffix; run with a non-UTC local zone."""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _store(tmp_path) -> ChatLogStore:
+    reader = LocalLogReader()
+    reader.LOG_DIR = str(tmp_path)
+    return ChatLogStore(str(tmp_path / "chat.sqlite3"), reader=reader)
+
+
+def test_chat_log_store_imports_log_tails_incrementally(tmp_path, local_tz):
+    active = tmp_path / "1.log"
+    active.write_text(
+        _line("2024-01-01T10:00:00Z", "alice", 10, "hello")
+        + _line("2024-01-01T10:01:00Z", "bob", 20, "hi")
+        + "2024-01-01T10:01:30Z INFO guild_1 not a message\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "1_private.log").write_text(_line("2024-01-01T09:00:00Z", "alice", 10, "secret"), encoding="utf-8")
+
+    async def main():
+        store = _store(tmp_path)
+        first = await store.recent_messages(1, user_id=10)
+        assert [m["content"] for m in first] == ["hello", "secret"]
+        assert [m["content"] for m in await store.recent_messages(1, user_id=10, is_public=True)] == ["hello"]
+
+        # Only the appended bytes are read; a half-written line waits for its newline.
+        with open(active, "a", encoding="utf-8") as f:
+            f.write(_line("2024-01-01T11:00:00Z", "alice", 10, "again") + "2024-01-01T11:01:00Z INFO guild_1 Mess")
+        assert await store.import_guild_logs(1) == 1
+        assert await store.import_guild_logs(1) == 0
+
+        # Rotation: lines written before the rollover are read from {path}.1, then the new file from 0.
+        with open(active, "a", encoding="utf-8") as f:
+            f.write("\n" + _line("2024-01-01T12:00:00Z", "alice", 10, "before rollover"))
+        os.replace(active, str(active) + ".1")
+        active.write_text(_line("2024-01-01T15:00:00+00:00", "alice", 10, "rotated"), encoding="utf-8")
+        latest = await store.recent_messages(1, limit=3, user_id=10)
+        await store.close()
+        return latest
+
+    latest = asyncio.run(main())
+    assert [m["content"] for m in latest] == ["rotated", "before rollover", "again"]
+    assert latest[0] == {
+        "author_name": "alice",
+        "author_id": 10,
+        "content": "rotated",
+        "timestamp": "2024-01-01T15:00:00.000000+00:00",
+    }
+    assert latest[1]["timestamp"] == "2024-01-01T03:00:00.000000+00:00"  # Legacy local (JST) "Z" stamp.
+
+
+def test_chat_log_store_archived_messages_are_deduplicated(tmp_path):
+    msgs = [
+        {
+            "message_id": i,
+            "author_id": 10,
+            "author_name": "alice",
+            "content": f"m{i}",
+            "timestamp": f"2024-01-01T10:00:0{i}",
+        }
+        for i in range(5)
+    ]
+
+    async def main():
+        store = _store(tmp_path)
+        assert await store.add_messages(1, 100, msgs[:3], is_public=False) == 3
+        assert await store.add_messages(1, 100, msgs, is_public=False) == 2  # Overlapping forward/backward scans.
+        private = await store.recent_messages(1, limit=3, user_id=10, is_public=False)
+        public = await store.recent_messages(1, user_id=10, is_public=True)
+        await store.close()
+        return private, public
+
+    private, public = asyncio.run(main())
+    assert [m["content"] for m in private] == ["m4", "m3", "m2"]
+    assert public == []
+
+
+def test_chat_log_store_log_lines_and_archived_copies_are_stored_once(tmp_path, local_tz):
+    (tmp_path / "1.log").write_text(
+        _line("2024-01-01T19:00:01Z", "alice", 10, "first line")  # 10:00:01 UTC
+        + _line("2024-01-01T10:05:00+00:00", "alice", 10, "log only"),
+        encoding="utf-8",
+    )
+    archived = [
+        {
+            "message_id": 1,
+            "author_id": 10,
+            "author_name": "alice",
+            "content": "first line\nsecond line",
+            "timestamp": "2024-01-01T10:00:00.700000+00:00",
+        },
+        {
+            "message_id": 2,
+            "author_id": 10,
+            "author_name": "alice",
+            "content": "archive only",
+            "timestamp": "2024-01-01T10:06:00+00:00",
+        },
+        {
+            "message_id": 3,
+            "author_id": 10,
+            "author_name": "alice",
+            "content": "late log",
+            "timestamp": "2024-01-01T10:07:00.200000+00:00",
+        },
+    ]
+
+    async def main():
+        store = _store(tmp_path)
+        assert await store.import_guild_logs(1) == 2
+        # Message 1 takes over its log line's row; 2 and 3 are new.
+        assert await store.add_messages(1, 100, archived, is_public=True) == 2
+        # The log line of an already archived message is skipped.
+        with open(tmp_path / "1.log", "a", encoding="utf-8") as f:
+            f.write(_line("2024-01-01T10:07:01+00:00", "alice", 10, "late log"))
+        assert await store.import_guild_logs(1) == 0
+        rows = await store.recent_messages(1, user_id=10)
+        await store.close()
+        return rows
+
+    rows = asyncio.run(main())
+    assert [m["content"] for m in rows] == ["late log", "archive only", "log only", "first line\nsecond line"]
+    assert rows[-1]["timestamp"] == "2024-01-01T10:00:00.700000+00:00"
@@ -0,0 +1,84 @@
+# ruff: noqa: E402
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "core", "src")))
+
+import pytest
+
+from ora_core.engine.simple_worker import EventManager
+
+
+async def _collect(agen):
+    return [e async for e in agen]
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_replays_buffered_events():
+    em = EventManager(delta_flush_ms=0)
+    await em.emit("run-1", "delta", {"text": "Hel"})
+    await em.emit("run-1", "delta", {"text": "lo"})
+    await em.emit("run-1", "final", {"text": "Hello"})
+
+    events = await _collect(em.listen("run-1"))
+    assert [e["id"] for e in events] == [1, 2, 3]
+    assert events[-1]["event"] == "final"
+
+
+@pytest.mark.asyncio
+async def test_resume_from_last_event_id_without_duplicates():
+    em = EventManager(delta_flush_ms=0)
+    await em.emit("run-2", "delta", {"text": "a"})
+    await em.emit("run-2", "delta", {"text": "b"})
+
+    task = asyncio.create_task(_collect(em.listen("run-2", last_event_id=1)))
+    await asyncio.sleep(0)
+    await em.emit("run-2", "final", {"text": "ab"})
+    events = await asyncio.wait_for(task, timeout=1)
+
+    assert [(e["id"], e["event"]) for e in events] == [(2, "delta"), (3, "final")]
+
+
+@pytest.mark.asyncio
+async def test_multiple_subscribers_receive_every_event():
+    em = EventManager(delta_flush_ms=0)
+    first = asyncio.create_task(_collect(em.listen("run-3")))
+    second = asyncio.create_task(_collect(em.listen("run-3")))
+    await asyncio.sleep(0)
+    assert em.stream_stats()["subscribers"] == 2
+
+    await em.emit("run-3", "delta", {"text": "x"})
+    await em.emit("run-3", "final", {"text": "x"})
+
+    a, b = await asyncio.wait_for(asyncio.gather(first, second), timeout=1)
+    assert [e["id"] for e in a] == [e["id"] for e in b] == [1, 2]
+    assert "run-3" not in em.listeners
+
+
+def test_slow_subscriber_coalesces_deltas():
+    from ora_core.engine.simple_worker import Subscriber
+
+    sub = Subscriber("run-4", maxsize=2, policy="coalesce")
+    for i, text in enumerate(["a", "b", "c", "d"], start=1):
+        sub.offer({"id": i, "event": "delta", "data": {"text": text}})
+    sub.offer({"id": 5, "event": "final", "data": {"text": "abcd"}})
+
+    pending = list(sub._pending)
+    assert pending[-2] == {"id": 4, "event": "delta", "data": {"text": "bcd"}}
+    assert pending[-1]["event"] == "final"
+    assert sub.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_deltas_are_coalesced_within_flush_window():
+    em = EventManager(delta_flush_ms=50, delta_flush_bytes=1024)
+    task = asyncio.create_task(_collect(em.listen("run-5")))
+    await asyncio.sleep(0)
+
+    for token in ["Hel", "lo", ", ", "world"]:
+        await em.emit("run-5", "delta", {"text": token})
+    await em.emit("run-5", "final", {"text": "Hello, world"})
+
+    events = await asyncio.wait_for(task, timeout=1)
+    assert [(e["event"], e["data"]["text"]) for e in events] == [("delta", "Hello, world"), ("final", "Hello, world")]
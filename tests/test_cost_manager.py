@@ -0,0 +1,107 @@
+import json
+import sqlite3
+
+from src.utils.cost_manager import CostManager, Usage
+
+
+def _ledger_rows(cm: CostManager) -> int:
+    with sqlite3.connect(cm.ledger_file) as conn:
+        return conn.execute("SELECT COUNT(*) FROM cost_events").fetchone()[0]
+
+
+def _state(cm: CostManager):
+    bucket = cm.user_buckets["7"]["stable:openai"]
+    return bucket.used, bucket.reserved, bucket.hard_stopped, cm.user_hourly["7"]["stable:openai"], cm.global_buckets
+
+
+def test_cost_ledger_replays_events_after_unclean_stop(tmp_path):
+    path = str(tmp_path / "cost_state.json")
+    cm = CostManager(path)
+    cm.reserve("stable", "openai", 7, "r1", Usage(100, 100, 0.01))
+    cm.commit("stable", "openai", 7, "r1", Usage(30, 40, 0.005))
+    cm.reserve("stable", "openai", 7, "r2", Usage(10, 10, 0.001))
+    cm.rollback("stable", "openai", 7, "r2", mode="keep")
+    cm.reserve("stable", "openai", 7, "r3", Usage(5, 5, 0.0))
+    cm._record("hard_stop", "stable", "openai", 7)
+    cm.add_cost("optimization", "openai", 7, Usage(1, 2, 0.0001))
+
+    # Appends only: the snapshot was not rewritten per call.
+    assert _ledger_rows(cm) == 8
+    assert not (tmp_path / "cost_state.json").exists()
+
+    restored = CostManager(path)  # No close(): simulates a crash.
+    assert _state(restored) == _state(cm)
+    assert restored.user_buckets["7"]["stable:openai"].used == Usage(40, 50, 0.006)
+    assert restored.user_buckets["7"]["stable:openai"].reserved == Usage(5, 5, 0.0)
+
+
+def test_cost_snapshot_compacts_ledger(tmp_path):
+    path = str(tmp_path / "cost_state.json")
+    cm = CostManager(path)
+    cm.reserve("stable", "openai", 7, "r1", Usage(100, 100, 0.01))
+    cm.commit("stable", "openai", 7, "r1", Usage(30, 40, 0.005))
+    cm.close()
+
+    assert _ledger_rows(cm) == 0
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["user_buckets"]["7"]["stable:openai"]["used"] == {"tokens_in": 30, "tokens_out": 40, "usd": 0.005}
+
+    # Events after the snapshot are replayed on top of it, and only once.
+    cm = CostManager(path)
+    cm.add_cost("stable", "openai", 7, Usage(1, 1, 0.0))
+    restored = CostManager(path)
+    assert restored.user_buckets["7"]["stable:openai"].used == Usage(31, 41, 0.005)
+    restored.close()
+    assert CostManager(path).user_buckets["7"]["stable:openai"].used == Usage(31, 41, 0.005)
+
+
+def test_usage_series_rollups_and_seed(tmp_path):
+    from src.utils.usage_series import downsample
+
+    path = str(tmp_path / "cost_state.json")
+    cm = CostManager(path)
+    cm.reserve("stable", "openai", 7, "r1", Usage(100, 100, 0.5))
+    cm.commit("stable", "openai", 7, "r1", Usage(30, 40, 0.25))
+    cm.add_cost("optimization", "openai", 8, Usage(1, 2, 0.125))  # Mirrored into the global bucket: counted once.
+    today = cm._get_current_time_keys()[0]
+
+    assert cm.series.series("day", today) == [
+        {"period": today, "tokens": 73, "usd": 0.375, "lanes": {"optimization": 3, "stable": 70}}
+    ]
+    assert [p["tokens"] for p in cm.series.series("hour", user_id=7)] == [70]
+    assert {(r["lane"], r["tokens_in"]) for r in cm.series.totals("month")} == {("optimization", 1), ("stable", 30)}
+    assert [u["user_id"] for u in cm.series.top_users("day", today)] == ["7", "8"]
+    cm.close()
+
+    # An existing cost state without series (previous versions) is rolled up once on startup.
+    (tmp_path / "cost_ledger.sqlite3").unlink()
+    seeded = CostManager(path)
+    # The mirrored global optimization bucket is not counted on top of the user's charge.
+    assert [p["tokens"] for p in seeded.series.series("day", today)] == [73]
+    seeded.close()
+    assert [p["tokens"] for p in CostManager(path).series.series("day", today)] == [73]
+
+    points = [{"period": f"2024-01-{d:02d}", "tokens": d, "usd": 0.0, "lanes": {"high": d}} for d in range(1, 11)]
+    binned = downsample("day", points, 4)
+    assert len(binned) <= 4 and sum(p["tokens"] for p in binned) == 55
+    months = [{"period": p, "tokens": 1, "usd": 0.0, "lanes": {}} for p in ("2023-12", "2024-01", "2024-02")]
+    # Bins are aligned to their width, so 2024-01 and 2024-02 share a bin across the year boundary.
+    assert [(p["period"], p["tokens"]) for p in downsample("month", months, 2)] == [("2023-11", 1), ("2024-01", 2)]
+
+
+def test_usage_series_seed_counts_mirrored_add_cost_once(tmp_path):
+    path = str(tmp_path / "cost_state.json")
+    cm = CostManager(path)
+    cm.add_cost("optimization", "openai", 7, Usage(40, 60, 1.0))
+    cm.reserve("stable", "openai", None, "r1", Usage(10, 10, 0.5))
+    cm.commit("stable", "openai", None, "r1", Usage(5, 5, 0.5))  # Unattributed: global bucket only.
+    cm.close()
+    (tmp_path / "cost_ledger.sqlite3").unlink()
+
+    seeded = CostManager(path)
+    totals = {r["lane"]: r for r in seeded.series.totals("month")}
+    assert (totals["optimization"]["tokens_in"] + totals["optimization"]["tokens_out"], totals["optimization"]["usd"]) == (100, 1.0)
+    assert (totals["stable"]["tokens_in"], totals["stable"]["usd"]) == (5, 0.5)
+    assert [p["usd"] for p in seeded.series.series("hour", user_id=7)] == [1.0]
+    seeded.close()
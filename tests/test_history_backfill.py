@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.services.chat_log_store import ChatLogStore
+from src.services.history_backfill import BackfillEngine
+
+
+class FakeChannel:
+    """Channel whose message ids are 1..n (in order), with a discord.py-like history()."""
+
+    def __init__(self, channel_id: int, guild_id: int, n: int):
+        self.id = channel_id
+        self.name = f"ch{channel_id}"
+        self.guild = SimpleNamespace(id=guild_id)
+        self.created_at = None
+        self.ids = list(range(channel_id * 1000 + 1, channel_id * 1000 + n + 1))
+        self.requests = 0
+
+    @property
+    def last_message_id(self):
+        return self.ids[-1] if self.ids else None
+
+    async def history(self, limit=100, before=None, after=None, oldest_first=None):
+        self.requests += 1
+        ids = self.ids
+        if before is not None:
+            ids = [i for i in ids if i < before.id]
+        if after is not None:
+            ids = [i for i in ids if i > after.id]
+        page = ids[:limit] if oldest_first else list(reversed(ids))[:limit]
+        for i in page:
+            yield SimpleNamespace(id=i)
+
+
+def test_backfill_archives_all_channels_and_resumes(tmp_path):
+    saved = {}
+    active = 0
+    peak = 0
+
+    async def save(guild_id, channel_id, msgs, is_public):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        saved.setdefault(channel_id, set()).update(m.id for m in msgs)
+        active -= 1
+
+    big, small, empty = FakeChannel(1, 10, 250), FakeChannel(2, 10, 30), FakeChannel(3, 20, 0)
+    channels = [(big, True), (small, False), (empty, True)]
+
+    async def main():
+        store = ChatLogStore(str(tmp_path / "chat.sqlite3"))
+        engine = BackfillEngine(store, save, concurrency=3, requests_per_sec=1000, page_size=50)
+        first = await engine.run_cycle(channels, deadline_sec=30)
+
+        # New messages arrive: the next cycle only fetches the tail of that channel.
+        small.ids.extend(range(2031, 2041))
+        big.requests = small.requests = empty.requests = 0
+        second = await BackfillEngine(store, save, page_size=50).run_cycle(channels, deadline_sec=30)
+        cursors = await store.get_cursors()
+        await store.close()
+        return first, second, cursors
+
+    first, second, cursors = asyncio.run(main())
+    assert saved[1] == set(big.ids) and saved[2] == set(small.ids)
+    assert first["channels_complete"] == 3 and first["messages"] == 280 and first["eta_sec"] == 0
+    assert peak > 1
+    assert second["requests"] == 1 and second["messages"] == 10
+    assert (big.requests, small.requests, empty.requests) == (0, 1, 0)
+    assert cursors[1] == {"guild_id": 10, "newest": 1250, "oldest": 1001, "complete": True}
+
+
+def test_backfill_respects_deadline_and_checkpoints(tmp_path):
+    async def save(guild_id, channel_id, msgs, is_public):
+        pass
+
+    channel = FakeChannel(1, 10, 1000)
+
+    async def main():
+        store = ChatLogStore(str(tmp_path / "chat.sqlite3"))
+        engine = BackfillEngine(store, save, concurrency=1, requests_per_sec=10, page_size=50)
+        stats = await engine.run_cycle([(channel, True)], deadline_sec=0.2)
+        cursor = (await store.get_cursors())[1]
+        await store.close()
+        return stats, cursor
+
+    stats, cursor = asyncio.run(main())
+    assert 0 < stats["requests"] < 20
+    assert stats["pending_channels"] == 1 and stats["eta_sec"] is not None
+    assert cursor["newest"] == 1000 + 1000 and not cursor["complete"]
+    assert cursor["oldest"] == 2000 - 50 * stats["requests"] + 1
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from src.services import job_queue as jq
+from src.services.job_queue import OPTIMIZE_USER, PRIORITY_DASHBOARD, JobQueue
+
+
+def test_job_queue_dedup_priority_and_guild_claim(tmp_path):
+    async def main():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        await queue.enqueue_many(OPTIMIZE_USER, [(1, 100), (2, 200), (1, 100)])
+        await queue.enqueue(OPTIMIZE_USER, 2, 200, priority=PRIORITY_DASHBOARD)
+        assert await queue.counts(OPTIMIZE_USER) == {"queued": 2}
+
+        # Worker that only sees guild 100 cannot take user 2's job.
+        jobs = await queue.claim(OPTIMIZE_USER, "w1", guild_ids=[100], limit=5)
+        assert [(j["user_id"], j["guild_id"]) for j in jobs] == [(1, 100)]
+
+        jobs = await queue.claim(OPTIMIZE_USER, "w2", guild_ids=[100, 200], limit=5)
+        assert [(j["user_id"], j["priority"]) for j in jobs] == [(2, PRIORITY_DASHBOARD)]
+        assert await queue.claim(OPTIMIZE_USER, "w3", limit=5) == []
+
+        # Re-enqueueing a running job does not create a duplicate.
+        await queue.enqueue(OPTIMIZE_USER, 2, 200)
+        await queue.complete(jobs[0]["id"], "ok")
+        assert await queue.counts(OPTIMIZE_USER) == {"running": 1, "done": 1}
+        await queue.close()
+
+    asyncio.run(main())
+
+
+def test_job_queue_lease_expiry_and_retry_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(jq, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(jq, "JOB_RETRY_BASE_SEC", 0.0)
+
+    async def main():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        await queue.enqueue(OPTIMIZE_USER, 5, 500)
+
+        # A crashed worker's lease expires and the job is handed to someone else.
+        first = await queue.claim(OPTIMIZE_USER, "dead", lease_sec=-1)
+        second = await queue.claim(OPTIMIZE_USER, "alive")
+        assert first[0]["id"] == second[0]["id"]
+        assert second[0]["attempts"] == 2 and second[0]["claimed_by"] == "alive"
+
+        # Out of attempts: the failure is final.
+        assert await queue.fail(second[0]["id"], "boom") is False
+        assert await queue.counts() == {"failed": 1}
+
+        await queue.enqueue(OPTIMIZE_USER, 6, 600)
+        job = (await queue.claim(OPTIMIZE_USER, "w"))[0]
+        assert await queue.fail(job["id"], "transient") is True
+        retried = await queue.claim(OPTIMIZE_USER, "w")
+        assert retried[0]["id"] == job["id"] and retried[0]["last_error"] == "transient"
+        await queue.close()
+
+    asyncio.run(main())
+
+
+def test_job_queue_imports_legacy_json(tmp_path):
+    legacy = tmp_path / "optimize_queue.json"
+    legacy.write_text(json.dumps([{"user_id": 1, "guild_id": 10}, {"user_id": 1, "guild_id": 10}, {"user_id": 2}]))
+
+    async def main():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+        assert await queue.import_legacy_json(OPTIMIZE_USER, str(legacy)) == 3
+        jobs = await queue.claim(OPTIMIZE_USER, "w", guild_ids=[10], limit=10)
+        await queue.close()
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert sorted((j["user_id"], j["guild_id"]) for j in jobs) == [(1, 10), (2, None)]
+    assert not legacy.exists() and (tmp_path / "optimize_queue.json.migrated").exists()
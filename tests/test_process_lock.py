@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from src.utils.process_lock import LockTimeout, ProcessLock, lock_stats
+
+
+def _hold_lock(path: str, ready, seconds: float) -> None:
+    async def run():
+        async with ProcessLock(path, name="test.child"):
+            ready.set()
+            await asyncio.sleep(seconds)
+
+    asyncio.run(run())
+
+
+def test_process_lock_serializes_coroutines(tmp_path):
+    path = str(tmp_path / "profile.json")
+    active = 0
+    peak = 0
+
+    async def worker():
+        nonlocal active, peak
+        async with ProcessLock(path, name="test.local"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(5)))
+
+    asyncio.run(main())
+    assert peak == 1
+    stats = lock_stats()["test.local"]
+    assert stats["acquired"] == 5
+    assert stats["contended"] >= 1
+    assert os.path.exists(path + ".lock")  # Left in place; only the OS lock is released.
+
+
+def test_process_lock_waits_for_other_process_and_times_out(tmp_path):
+    path = str(tmp_path / "optimize_queue.json")
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    proc = ctx.Process(target=_hold_lock, args=(path, ready, 0.6))
+    proc.start()
+    try:
+        assert ready.wait(10)
+
+        async def main():
+            with pytest.raises(LockTimeout):
+                await ProcessLock(path, timeout=0.1, name="test.cross").acquire()
+            start = time.monotonic()
+            async with ProcessLock(path, timeout=10, name="test.cross"):
+                return time.monotonic() - start
+
+        waited = asyncio.run(main())
+        assert waited > 0.1
+        stats = lock_stats()["test.cross"]
+        assert stats["timeouts"] == 1
+        assert stats["acquired"] == 1
+    finally:
+        proc.join(10)
+
+
+def test_process_lock_released_when_holder_dies(tmp_path):
+    path = str(tmp_path / "channel.json")
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    proc = ctx.Process(target=_hold_lock, args=(path, ready, 30))
+    proc.start()
+    assert ready.wait(10)
+    proc.kill()
+    proc.join(10)
+
+    async def main():
+        async with ProcessLock(path, timeout=2, name="test.dead"):
+            pass
+
+    asyncio.run(main())
+    assert lock_stats()["test.dead"]["timeouts"] == 0
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc/self/fd")
+def test_cancelled_acquire_does_not_leak_descriptors(tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    path = str(tmp_path / "profile.json")
+    # Held "elsewhere": a separate open file description, as another process would have.
+    holder = os.open(path + ".lock", os.O_CREAT | os.O_RDWR)
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    try:
+
+        async def main():
+            for _ in range(20):
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(ProcessLock(path, timeout=10, name="test.cancel").acquire(), 0.05)
+
+        before = len(os.listdir("/proc/self/fd"))
+        asyncio.run(main())
+        assert len(os.listdir("/proc/self/fd")) <= before
+    finally:
+        os.close(holder)
@@ -0,0 +1,159 @@
+import json
+import time
+
+import pytest
+
+from src.services.profile_store import ProfileCache, ProfileStore, parse_profile_key
+
+
+def test_parse_profile_key():
+    assert parse_profile_key("123") == ("123", None, "global")
+    assert parse_profile_key("123_456_public") == ("123", "456", "public")
+    assert parse_profile_key("123_456_private") == ("123", "456", "private")
+    assert parse_profile_key("123_456") == ("123", "456", "public")
+
+
+async def test_save_writes_only_changed_fields_and_history_is_append_only(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.sqlite3"))
+    assert await store.get("1_2_public") is None
+
+    assert await store.save("1_2_public", {"name": "a", "traits": ["x"], "status": "New"})
+    assert not await store.save("1_2_public", {"name": "a", "traits": ["x"], "status": "New"})
+    assert await store.save("1_2_public", {"name": "b", "traits": ["x"]})
+
+    for i in range(3):
+        await store.append_history("1_2_public", {"content": f"m{i}", "timestamp": f"2026-01-0{i + 1}T00:00:00"})
+    # raw_history passed to save() on an existing profile is ignored (history is append-only).
+    await store.save("1_2_public", {"name": "b", "traits": ["x"], "raw_history": []})
+
+    profile = await store.get("1_2_public")
+    assert profile["name"] == "b" and "status" not in profile
+    assert [e["content"] for e in profile["raw_history"]] == ["m0", "m1", "m2"]
+    assert [e["content"] for e in await store.history("1_2_public", since_ts="2026-01-02")] == ["m1", "m2"]
+    assert await store.find("name", ["b"]) == ["1_2_public"]
+
+    assert await store.prune_history(keep=1) == 2
+    assert [e["content"] for e in await store.history("1_2_public")] == ["m2"]
+    await store.close()
+
+
+async def test_append_history_seeds_new_profile_and_reopen_sees_it(tmp_path):
+    db = str(tmp_path / "profiles.sqlite3")
+    store = ProfileStore(db)
+    await store.append_history("9", {"content": "hi", "timestamp": "t"}, defaults={"status": "New"})
+    await store.close()
+
+    reopened = ProfileStore(db)
+    assert (await reopened.get("9")) == {"status": "New", "raw_history": [{"content": "hi", "timestamp": "t"}]}
+    await reopened.close()
+
+
+async def test_import_json_dir(tmp_path):
+    users = tmp_path / "users"
+    users.mkdir()
+    (users / "5_7_public.json").write_text(
+        json.dumps({"name": "n", "raw_history": [{"content": "old", "timestamp": "t"}]}), encoding="utf-8"
+    )
+    (users / "5_journal.md").write_text("ignored", encoding="utf-8")
+    (users / "bad_file.json").write_text("{", encoding="utf-8")
+
+    store = ProfileStore(str(tmp_path / "profiles.sqlite3"))
+    assert await store.import_json_dir(str(users)) == {"imported": 1, "skipped": 0, "failed": 0, "history": 1}
+    assert (await store.import_json_dir(str(users)))["skipped"] == 1
+    assert (await store.get("5_7_public"))["raw_history"][0]["content"] == "old"
+    await store.close()
+
+
+def test_profile_cache_returns_copies_and_rejects_stale_loads():
+    cache = ProfileCache(max_entries=2, ttl_sec=60)
+    key = ("user", "1", "2", "public")
+    assert cache.lookup(key) == (False, None)
+
+    cache.put(key, {"traits": ["a"], "raw_history": [{"content": "m"}]})
+    hit, profile = cache.lookup(key)
+    profile["traits"].append("mutated")
+    profile["raw_history"].append({"content": "x"})
+    assert cache.lookup(key)[1] == {"traits": ["a"], "raw_history": [{"content": "m"}]}
+
+    # History appends are patched into cached views (newest PROFILE_HISTORY_LIMIT kept).
+    assert cache.append_history("1_2_private", [{"content": "p"}]) == 0
+    assert cache.append_history("1_2_public", [{"content": f"n{i}"} for i in range(150)]) == 1
+    history = cache.lookup(key)[1]["raw_history"]
+    assert len(history) == 100 and history[-1] == {"content": "n149"}
+
+    # A load that started before an invalidation (or an append) of the same user must not
+    # repopulate the cache; loads of other users are unaffected.
+    generation = cache.generation_for(key)
+    other = ("user", "3", "2", "public")
+    other_generation = cache.generation_for(other)
+    assert cache.invalidate_profile_key("1_2_public") == 1
+    cache.put(key, {"traits": ["stale"]}, generation)
+    cache.put(other, {"traits": ["fresh"]}, other_generation)
+    assert cache.lookup(key) == (False, None)
+    assert cache.lookup(other)[1] == {"traits": ["fresh"]}
+    generation = cache.generation_for(key)
+    cache.append_history("1_2_public", [{"content": "late"}])
+    cache.put(key, {"traits": ["a"], "raw_history": []}, generation)
+    assert cache.lookup(key) == (False, None)
+
+    cache.put(("channel", "9"), None)
+    assert cache.lookup(("channel", "9")) == (True, None)
+    assert cache.invalidate_profile_key("1") == 0  # global key covers all guilds of user 1
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.lookup(("channel", "9"))
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+async def test_changes_since_reports_other_writers_fields_and_history(tmp_path, monkeypatch):
+    db = str(tmp_path / "profiles.sqlite3")
+    main, worker = ProfileStore(db), ProfileStore(db)
+    await worker.update_fields("3_4_public", {"status": "New"})
+    since = await main.change_seq()
+
+    await worker.update_fields("3_4_public", {"status": "Optimized"})
+    await worker.append_history_batch({"5_4_public": [{"content": "a"}]})
+    await main.append_history("6_4_public", {"content": "own"})  # Own writes are already in main's cache.
+    since, keys = await main.changes_since(since)
+    assert keys == ["3_4_public", "5_4_public"]
+
+    # Appends to an existing profile are reported too, and nothing is reported twice.
+    await worker.append_history_batch({"3_4_public": [{"content": "b"}]})
+    since, keys = await main.changes_since(since)
+    assert keys == ["3_4_public"]
+    assert await main.changes_since(since) == (since, [])
+
+    # A reader that fell behind the trimmed log is told to drop everything.
+    monkeypatch.setattr("src.services.profile_store.PROFILE_CHANGE_LOG_SIZE", 1)
+    await worker.update_fields("3_4_public", {"status": "x"})
+    await worker.update_fields("3_4_public", {"status": "y"})
+    assert (await main.changes_since(since))[1] is None
+    await main.close()
+    await worker.close()
+
+
+async def test_failed_write_is_rolled_back_not_committed_by_the_next_one(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.sqlite3"))
+    with pytest.raises(TypeError):
+        await store.append_history("3_2_public", {"content": "hi"}, defaults={"name": "a", "bad": object()})
+    await store.update_fields("9_2_public", {"status": "New"})
+
+    assert await store.get("3_2_public") is None and not store.has("3_2_public")
+    assert await store.keys() == ["9_2_public"]
+    await store.close()
+
+
+async def test_failed_history_batch_retry_seeds_defaults_without_duplicates(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.sqlite3"))
+    defaults = {"5_2_public": {"status": "New"}, "6_2_public": {"status": "New"}}
+    with pytest.raises(TypeError):
+        await store.append_history_batch(
+            {"5_2_public": [{"content": "a"}], "6_2_public": [{"content": object()}]}, defaults=defaults
+        )
+    await store.append_history_batch({"5_2_public": [{"content": "a"}], "6_2_public": [{"content": "b"}]}, defaults=defaults)
+
+    profile = await store.get("5_2_public")
+    assert profile["status"] == "New" and [e["content"] for e in profile["raw_history"]] == ["a"]
+    assert (await store.get("6_2_public"))["status"] == "New"
+    await store.close()
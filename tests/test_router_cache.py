@@ -0,0 +1,70 @@
+import time
+
+from src.cogs.handlers.router_cache import RouterDecisionCache, normalize_prompt
+from src.cogs.tools import registry
+
+
+def test_normalized_prompts_share_a_cache_entry():
+    cache = RouterDecisionCache(max_entries=8, ttl_sec=60)
+    cache.put(cache.make_key("bundle", "prefix", "Play music!"), ["VOICE_AUDIO"], {"download": False})
+
+    hit = cache.get(cache.make_key("bundle", "prefix", "  play   MUSIC "))
+    assert hit == {"categories": ["VOICE_AUDIO"], "intents": {"download": False}}
+    assert cache.get(cache.make_key("other-bundle", "prefix", "play music")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert normalize_prompt("ＳＣＲＥＥＮＳＨＯＴ　this。") == "screenshot this"
+
+
+def test_lru_and_ttl_eviction():
+    cache = RouterDecisionCache(max_entries=2, ttl_sec=60)
+    for p in ["a", "b", "c"]:
+        cache.put(cache.make_key("b", "p", p), ["OTHER"], {})
+    assert cache.get(cache.make_key("b", "p", "a")) is None
+    assert cache.get(cache.make_key("b", "p", "c")) is not None
+
+    key = cache.make_key("b", "p", "c")
+    cache._entries[key]["ts"] = time.time() - 120
+    assert cache.get(key) is None
+
+
+def test_registry_change_invalidates_cache():
+    cache = RouterDecisionCache(ttl_sec=60)
+    registry.add_registry_listener(cache.invalidate)
+    try:
+        cache.put(cache.make_key("b", "p", "x"), ["MCP"], {})
+        registry.register_tool(
+            "mcp__test__ping", impl="mcp:test:ping", schema={"name": "mcp__test__ping", "parameters": {}}
+        )
+        assert cache.stats()["size"] == 0
+    finally:
+        registry.unregister_tools("mcp__test__")
+        registry.remove_registry_listener(cache.invalidate)
+
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / "router_cache.json")
+    cache = RouterDecisionCache(ttl_sec=60, persist_path=path)
+    cache.put(cache.make_key("b", "p", "save this video"), ["WEB_FETCH"], {"download": True})
+    cache.save()
+
+    restored = RouterDecisionCache(ttl_sec=60, persist_path=path)
+    assert restored.get(restored.make_key("b", "p", "save this video"))["categories"] == ["WEB_FETCH"]
+
+
+def test_pre_router_only_answers_clear_intents():
+    from src.cogs.handlers.pre_router import PreRouter
+
+    index = registry.get_tool_index()
+    router = PreRouter(mode="on")
+    router.build(index.categories, index.bundle_id)
+
+    assert router.predict("play music")["category"] == "VOICE_AUDIO"
+    assert router.predict("音楽流して")["category"] == "VOICE_AUDIO"
+    assert router.predict("explain quantum physics")["confident"] is False
+
+    # Only allow-listed categories skip the LLM router; SYSTEM_UTIL is always kept.
+    assert router.fast_path(router.predict("play music"), index.categories) == ["VOICE_AUDIO", "SYSTEM_UTIL"]
+    download = router.predict("動画を保存して")
+    assert download["category"] == "WEB_FETCH" and router.fast_path(download, index.categories) is None
+    assert PreRouter(mode="shadow").fast_path(router.predict("play music"), index.categories) is None
@@ -1,4 +1,6 @@
 # ruff: noqa: E402, F401, B023, B007, B008
+import asyncio
+import sqlite3
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -93,3 +95,65 @@ async def test_backup_integrity_failure():
 
         # Verify rename NOT called (since we use replace now)
         mock_rename.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_store_reuses_pooled_wal_connections(tmp_path):
+    store = Store(str(tmp_path / "ora.db"), readers=2)
+    await store.init()
+    writer = store._db
+
+    async with store._reader() as db:
+        async with db.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+
+    await asyncio.gather(*(store.add_points(i % 5, 1) for i in range(50)), *(store.get_points(1) for _ in range(20)))
+    assert [await store.get_points(i) for i in range(5)] == [10] * 5
+    assert store._db is writer and len(store._readers) == 2
+
+    # Work left uncommitted by a failing call is rolled back, as when a per-call connection closed.
+    with pytest.raises(RuntimeError):
+        async with store._writer() as db:
+            await db.execute("UPDATE users SET points = 0")
+            raise RuntimeError("boom")
+    assert await store.get_points(1) == 10
+
+    await store.close()
+    assert store._db is None
+    assert await store.get_points(1) == 10  # Reopens lazily.
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_conversation_search_fts_backfill_and_ranking(tmp_path):
+    path = str(tmp_path / "ora.db")
+    # Rows written before the FTS migration existed.
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+        "platform TEXT NOT NULL, message TEXT NOT NULL, response TEXT, created_at INTEGER NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO conversations(user_id, platform, message, response, created_at) VALUES "
+        "('1', 'discord', '昨日は浅草でラーメンを食べた', 'いいですね', 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = Store(path)
+    await store.init()
+    assert store._fts_enabled
+    await store.add_conversation("1", "discord", "ラーメン ラーメン ラーメン大好き", None)
+    await store.add_conversation("2", "discord", "ラーメンの話", "Python code")
+
+    hits = await store.search_conversations("ラーメン", user_id="1")
+    assert [h["message"] for h in hits] == ["ラーメン ラーメン ラーメン大好き", "昨日は浅草でラーメンを食べた"]
+    assert "**ラーメン**" in hits[1]["snippet"]
+    assert [h["user_id"] for h in await store.search_conversations("python ラーメン")] == ["2"]
+
+    # Deletes are reflected in the index; short terms fall back to LIKE with a snippet.
+    assert await store.clear_conversations("1") == 2
+    assert [h["user_id"] for h in await store.search_conversations("ラーメン")] == ["2"]
+    short = await store.search_conversations("話")
+    assert short[0]["snippet"] == "ラーメンの**話**"
+    await store.close()
@@ -0,0 +1,33 @@
+from src.cogs.tools import registry
+
+
+def _tool(name, tags=()):
+    return {"name": name, "description": name, "parameters": {}, "tags": list(tags)}
+
+
+def test_tool_index_is_memoized_until_registry_changes():
+    tools = [_tool("web_download"), _tool("web_screenshot"), _tool("say")]
+    first = registry.get_tool_index(tools)
+    assert registry.get_tool_index(tools) is first
+    assert [t["name"] for t in first.categories["WEB_FETCH"]] == ["web_download"]
+    assert [t["name"] for t in first.categories["WEB_READ"]] == ["web_screenshot"]
+    assert "- SYSTEM_UTIL:" in first.category_prompt
+    assert "- MCP:" not in first.category_prompt
+
+    registry.notify_tools_changed("test")
+    rebuilt = registry.get_tool_index(tools)
+    assert rebuilt is not first
+    assert rebuilt.bundle_id == first.bundle_id
+
+
+def test_get_tool_schemas_returns_cached_view():
+    view = registry.get_tool_schemas()
+    assert registry.get_tool_schemas() is view
+    registry.register_tool("mcp__t__echo", impl="mcp:t:echo", schema={"name": "mcp__t__echo"}, tags=["mcp"])
+    try:
+        updated = registry.get_tool_schemas()
+        assert updated is not view
+        assert any(s["name"] == "mcp__t__echo" for s in updated)
+        assert registry.classify_tool("mcp__t__echo", ("mcp",)) == "MCP"
+    finally:
+        registry.unregister_tools("mcp__t__")
@@ -0,0 +1,79 @@
+import json
+import sqlite3
+
+from src.services.profile_store import ProfileStore
+from src.services.user_index import DashboardUserIndex, query_users
+from src.utils.cost_manager import CostManager, Usage
+
+
+async def test_profile_store_maintains_index(tmp_path):
+    db = str(tmp_path / "profiles.sqlite3")
+    store = ProfileStore(db)
+    await store.save("1_2_public", {"name": "alice", "traits": ["a", "b"], "guild_name": "G"})
+    await store.update_fields("1_2_public", {"status": "Processing"})
+    await store.append_history("3", {"content": "hi", "timestamp": "t"}, defaults={"name": "bob"})
+    await store.append_history("1_2_public", {"content": "again", "timestamp": "t"})
+
+    await store.close()
+
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute(
+            "SELECT profile_key, display_name, status, trait_count, last_active FROM profile_index ORDER BY profile_key"
+        ).fetchall()
+        assert [r[:4] for r in rows] == [("1_2_public", "alice", "Processing", 2), ("3", "bob", "New", 0)]
+        assert all(r[4] > 0 for r in rows)
+        conn.execute("DELETE FROM profile_index")
+
+    # Profiles written before the index existed are backfilled on open.
+    reopened = ProfileStore(db)
+    assert await reopened.get("3") is not None
+    await reopened.close()
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM profile_index").fetchone()[0] == 2
+
+
+async def test_dashboard_index_merges_caches_and_pages(tmp_path):
+    memory, state = tmp_path / "memory", tmp_path / "state"
+    memory.mkdir()
+    state.mkdir()
+    store = ProfileStore(str(memory / "profiles.sqlite3"))
+    await store.save("1_2_public", {"name": "User_1", "traits": ["a"], "status": "Optimized"})
+    await store.save("5", {"name": "eve", "traits": []})
+    await store.close()
+    (memory / "8.json").write_text(json.dumps({"name": "legacy", "traits": ["x", "y"]}), encoding="utf-8")
+    (state / "discord_state.json").write_text(
+        json.dumps(
+            {
+                "users": {"1": {"name": "alice", "status": "online", "avatar": "av"}, "9": {"name": "zed"}},
+                "guilds": {"2": "Guild"},
+            }
+        ),
+        encoding="utf-8",
+    )
+    cm = CostManager(str(state / "cost_state.json"))
+    cm.add_cost("high", "openai", 1, Usage(10, 20, 0.25))
+    cm.close()
+
+    index = DashboardUserIndex(str(memory / "profiles.sqlite3"), cm.ledger_file, str(memory), str(state))
+    version, users = index.users()
+    by_id = {u["discord_user_id"]: u for u in users}
+    assert set(by_id) == {"1_2_public", "5", "8", "1", "9"}
+    alice = by_id["1_2_public"]
+    assert alice["display_name"] == "alice" and alice["guild_name"] == "Guild" and alice["discord_status"] == "online"
+    assert (
+        alice["cost_usage"]["high"] == 30 and alice["cost_usage"]["total_usd"] == 0.25 and alice["mode"] == "API (Paid)"
+    )
+    assert by_id["8"]["points"] == 2 and by_id["9"]["status"] == "Online"
+
+    # Unchanged inputs: same version, no rebuild.
+    assert index.version() == version
+    index.users()
+    assert index.builds == 1
+    cm = CostManager(str(state / "cost_state.json"))
+    cm.add_cost("stable", "local", 5, Usage(1, 1, 0.0))
+    cm.close()
+    assert index.version() != version
+
+    total, page = query_users(index.users()[1], sort="traits", offset=0, limit=2)
+    assert total == 5 and [u["discord_user_id"] for u in page] == ["8", "1_2_public"]
+    assert query_users(users, q="ALI")[0] == 2 and query_users(users, status="online")[0] == 1
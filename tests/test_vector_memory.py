@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+import zlib
+
+from src.services.vector_memory import VectorMemory
+
+
+class SlowHashEmbedding:
+    """Deterministic offline embedding that blocks like real model inference."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        time.sleep(self.delay)
+        out = []
+        for text in input:
+            vec = [0.0] * 32
+            for word in text.lower().split():
+                vec[zlib.crc32(word.strip(".?!").encode()) % 32] += 1.0
+            norm = sum(v * v for v in vec) ** 0.5 or 1.0
+            out.append([v / norm for v in vec])
+        return out
+
+    @staticmethod
+    def name() -> str:
+        return "test-hash"
+
+
+async def test_adds_are_batched_and_searchable(tmp_path):
+    vm = VectorMemory("t_batch", path=str(tmp_path), embedding_function=SlowHashEmbedding())
+    await asyncio.gather(
+        vm.add_memory("I love eating sushi on Fridays.", "u1"),
+        vm.add_memory("My favorite anime is Naruto.", "u1"),
+        vm.add_memory("Guild movie night is on Saturday.", "u2", {"guild_id": "g1"}),
+    )
+    # Reads never wait for the write-coalescing window: queued adds are not visible yet.
+    assert await vm.search_memory("love eating sushi", user_id="u1", threshold=1.0) == []
+    await vm.flush()
+    results = await vm.search_memory("love eating sushi", user_id="u1", threshold=1.0)
+    assert (vm.stats["adds"], vm.stats["add_batches"]) == (3, 1)
+    assert results[0] == "I love eating sushi on Fridays."
+    assert all("Guild" not in r for r in results)
+
+    shared = await vm.search_memory("movie night", user_id="u3", guild_id="g1", threshold=1.0)
+    assert shared == ["Guild movie night is on Saturday."]
+    await vm.close()
+
+
+async def test_concurrent_searches_share_a_batch_and_keep_loop_responsive(tmp_path):
+    ef = SlowHashEmbedding()
+    vm = VectorMemory("t_lag", path=str(tmp_path), embedding_function=ef)
+    for i in range(10):
+        await vm.add_memory(f"user {i} likes topic number {i}", f"u{i}")
+    await vm.flush()
+
+    ef.delay = 0.05
+    ef.calls = 0
+    lags = []
+
+    async def tick():
+        for _ in range(10):
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t0 - 0.005)
+
+    results, _ = await asyncio.gather(
+        asyncio.gather(*[vm.search_memory(f"likes topic number {i}", user_id=f"u{i}", threshold=1.0) for i in range(10)]),
+        tick(),
+    )
+    assert [r[0] for r in results] == [f"user {i} likes topic number {i}" for i in range(10)]
+    assert ef.calls == 1  # one embedding call for all ten users
+    assert max(lags) < 0.04  # a blocking 50ms embedding call would show up here
+    await vm.close()
+
+
+async def test_scored_search_merges_scopes_and_caches_query_embeddings(tmp_path):
+    ef = SlowHashEmbedding()
+    vm = VectorMemory("t_scope", path=str(tmp_path), embedding_function=ef)
+    await vm.add_memory("private note about sushi", "u1")
+    await vm.add_memory("guild note about sushi night", "u2", {"guild_id": "g1"})
+    await vm.add_memory("other guild sushi", "u3", {"guild_id": "g2"})
+    await vm.flush()
+
+    hits = await vm.search_memory_scored("sushi", user_id="u1", guild_id="g1", threshold=1.0)
+    assert {h["text"] for h in hits} == {"private note about sushi", "guild note about sushi night"}
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+    assert {h["scope"] for h in hits} == {"u_u1", "g_g1"}
+
+    calls = ef.calls
+    await vm.search_memory_scored("sushi", user_id="u1", guild_id="g1", threshold=1.0)
+    assert ef.calls == calls
+    assert vm.cache_stats()["hits"] == 1
+    await vm.close()
+
+
+async def test_legacy_collection_is_migrated_into_scopes(tmp_path):
+    import chromadb
+
+    ef = SlowHashEmbedding()
+    legacy = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection(
+        "t_legacy", metadata={"hnsw:space": "cosine"}, embedding_function=ef
+    )
+    legacy.add(
+        ids=["a", "b"],
+        documents=["old private memory", "old shared memory"],
+        metadatas=[{"user_id": "u1"}, {"user_id": "u2", "guild_id": "g1"}],
+    )
+
+    vm = VectorMemory("t_legacy", path=str(tmp_path), embedding_function=ef)
+    gate = threading.Event()
+    migrate = vm._migrate_legacy_sync
+    vm._migrate_legacy_sync = lambda: gate.wait(5) and migrate()
+    # A caller cancelled by its timeout neither stops nor restarts the migration.
+    try:
+        await asyncio.wait_for(vm._ensure_migrated(), timeout=0.01)
+    except asyncio.TimeoutError:
+        pass
+    task = vm._migration_task
+    assert task is not None and not task.done()
+    # While it runs, queries read the legacy collection directly.
+    hits = await vm.search_memory_scored("old shared memory", guild_id="g1", threshold=1.0)
+    assert [(h["text"], h["scope"]) for h in hits] == [("old shared memory", "legacy")]
+    assert vm._migration_task is task
+    gate.set()
+    await vm._ensure_migrated()
+    assert vm.stats["migrated"] == 2
+    assert vm.client.get_collection("t_legacy").count() == 0
+    await vm.close()
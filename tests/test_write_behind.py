@@ -0,0 +1,53 @@
+import asyncio
+
+from src.utils.write_behind import WriteBehindBuffer
+
+
+async def test_burst_is_coalesced_into_one_flush():
+    flushed = []
+
+    async def flush(batch):
+        flushed.append(batch)
+
+    wb = WriteBehindBuffer(flush, flush_interval_sec=0.02, max_pending=100)
+    for i in range(10):
+        wb.add("user-1", i)
+    wb.add("user-2", "x")
+    assert wb.depth == 11
+
+    await asyncio.sleep(0.05)
+    assert flushed == [{"user-1": list(range(10)), "user-2": ["x"]}]
+    stats = wb.stats()
+    assert (stats["depth"], stats["flushes"], stats["items_flushed"], stats["max_depth"]) == (0, 1, 11, 11)
+
+
+async def test_size_threshold_flushes_without_waiting_for_timer():
+    flushed = []
+
+    async def flush(batch):
+        flushed.append(sum(len(v) for v in batch.values()))
+
+    wb = WriteBehindBuffer(flush, flush_interval_sec=60, max_pending=5)
+    for i in range(5):
+        wb.add("k", i)
+    await asyncio.sleep(0.01)
+    assert flushed == [5]
+
+
+async def test_failed_flush_is_requeued_and_close_is_durable():
+    calls = []
+
+    async def flush(batch):
+        calls.append({k: list(v) for k, v in batch.items()})
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    wb = WriteBehindBuffer(flush, flush_interval_sec=60, max_pending=100)
+    wb.add("k", 1)
+    assert await wb.flush() == 0
+    wb.add("k", 2)
+    assert wb.depth == 2 and not wb.closed
+
+    await wb.close()
+    assert calls[-1] == {"k": [1, 2]}
+    assert wb.depth == 0 and wb.stats()["failures"] == 1 and wb.closed